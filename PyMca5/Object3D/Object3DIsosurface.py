@@ -0,0 +1,195 @@
+#/*##########################################################################
+# Copyright (C) 2004-2026 V.A. Sole, European Synchrotron Radiation Facility
+#
+# This file is part of the PyMca X-ray Fluorescence Toolkit developed at
+# the ESRF by the Software group.
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by the
+# Free Software Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# This file is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+#
+# Please contact the ESRF industrial unit (industry@esrf.fr) if this license
+# is a problem for you.
+#
+#############################################################################*/
+__author__ = "V.A. Sole - ESRF Data Analysis"
+__contact__ = "sole@esrf.fr"
+__license__ = "LGPL2+"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+"""
+Isosurface extraction of a 3D array sampled on a regular grid.
+
+The meshes are returned as indexed triangle lists (vertices, normals and
+triangle indices) so that they can be rendered with vertex arrays, saved
+or post-processed. No OpenGL context is needed.
+"""
+import logging
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+import numpy
+from PyMca5.Object3D import Object3DMarchingCubes
+
+_logger = logging.getLogger(__name__)
+
+
+def _getAxes(values, x=None, y=None, z=None):
+    shape = values.shape
+    axes = []
+    for i, axis in enumerate([x, y, z]):
+        if axis is None:
+            axis = numpy.arange(shape[i], dtype=numpy.float32)
+        else:
+            axis = numpy.ascontiguousarray(axis, dtype=numpy.float32).ravel()
+        if axis.size != shape[i]:
+            raise ValueError("Axis %d size %d does not match data size %d" % \
+                             (i, axis.size, shape[i]))
+        axes.append(axis)
+    return axes
+
+
+def getSlabs(size, decimation=1, nslabs=1):
+    """
+    Split the first dimension of a grid in nslabs ranges of cube indices.
+    The limits are multiples of the decimation so that the cubes marched
+    in each slab are those the whole volume would have given.
+
+    :param size: Number of grid points along the first dimension
+    :param decimation: Step between the grid points used
+    :param nslabs: Requested number of slabs
+    :return: List of (start, end) tuples
+    """
+    ncubes = max((size - 1) // decimation, 0)
+    nslabs = max(min(nslabs, ncubes), 1)
+    limits = numpy.linspace(0, ncubes, nslabs + 1).astype(numpy.int64)
+    limits = numpy.unique(limits) * decimation
+    if limits.size < 2:
+        return [(0, size)]
+    return [(int(limits[i]), int(limits[i + 1])) \
+            for i in range(limits.size - 1)]
+
+
+def getIsosurface(values, level, x=None, y=None, z=None,
+                  decimation=1, nthreads=None):
+    """
+    Extract the isosurface of a 3D array using marching cubes.
+
+    :param values: 3D array
+    :param level: Isosurface value
+    :param x: Grid coordinates along the first dimension (default arange)
+    :param y: Grid coordinates along the second dimension (default arange)
+    :param z: Grid coordinates along the third dimension (default arange)
+    :param decimation: Use one grid point out of decimation along each axis
+    :param nthreads: Number of threads (default is the number of CPUs)
+    :return: vertices (n, 3) float32, normals (n, 3) float32 and
+             indices (m, 3) uint32 of the triangles
+    """
+    values = numpy.ascontiguousarray(values, dtype=numpy.float32)
+    if len(values.shape) != 3:
+        raise ValueError("Expected a 3D array")
+    x, y, z = _getAxes(values, x, y, z)
+    decimation = int(decimation)
+    if decimation < 1:
+        raise ValueError("Decimation must be a positive integer")
+    steps = (decimation, decimation, decimation)
+    if nthreads is None:
+        nthreads = multiprocessing.cpu_count()
+    # a few slabs per thread to balance the load
+    slabs = getSlabs(values.shape[0], decimation,
+                     nslabs=1 if nthreads < 2 else 4 * nthreads)
+
+    def march(slab):
+        return Object3DMarchingCubes.marchingCubes(values, x, y, z,
+                                                   float(level), steps,
+                                                   slab[0], slab[1])
+
+    if (nthreads < 2) or (len(slabs) < 2):
+        results = [march(slab) for slab in slabs]
+    else:
+        pool = ThreadPool(min(nthreads, len(slabs)))
+        try:
+            results = pool.map(march, slabs)
+        finally:
+            pool.close()
+            pool.join()
+    if len(results) == 1:
+        vertices, normals, edges = results[0]
+    else:
+        vertices = numpy.concatenate([r[0] for r in results])
+        normals = numpy.concatenate([r[1] for r in results])
+        edges = numpy.concatenate([r[2] for r in results])
+    # vertices lying on the same grid edge are shared among triangles
+    edges, first, inverse = numpy.unique(edges,
+                                         return_index=True,
+                                         return_inverse=True)
+    indices = inverse.astype(numpy.uint32).reshape(-1, 3)
+    _logger.debug("Isosurface at %s: %d vertices %d triangles",
+                  level, first.size, indices.shape[0])
+    return vertices[first], normals[first], indices
+
+
+def getNormalColors(normals):
+    """
+    Per vertex RGB colors derived from the normals, as used when no
+    color is given to an isosurface.
+
+    :param normals: Array of shape (n, 3)
+    :return: float32 array of shape (n, 3)
+    """
+    positive = numpy.clip(normals, 0.0, None)
+    negative = -0.5 * numpy.clip(normals, None, 0.0)
+    colors = positive + numpy.roll(negative, -1, axis=1) + \
+             numpy.roll(negative, -2, axis=1)
+    return colors.astype(numpy.float32)
+
+
+class IsosurfaceCache(object):
+    """
+    Keep the meshes already computed for a volume keyed by
+    (level, decimation) so that changing the display properties of an
+    isosurface or going back to a previous level does not march again.
+    """
+    def __init__(self, values, x=None, y=None, z=None, maxsize=10):
+        self._values = numpy.ascontiguousarray(values, dtype=numpy.float32)
+        if len(self._values.shape) != 3:
+            raise ValueError("Expected a 3D array")
+        self._x, self._y, self._z = _getAxes(self._values, x, y, z)
+        self._maxsize = maxsize
+        self._cache = {}
+        self._order = []
+
+    def getMesh(self, level, decimation=1, nthreads=None):
+        """
+        Return the (vertices, normals, indices) of the isosurface at
+        the given level. See getIsosurface.
+        """
+        key = (float(level), int(decimation))
+        if key in self._cache:
+            self._order.remove(key)
+            self._order.append(key)
+            return self._cache[key]
+        mesh = getIsosurface(self._values, key[0],
+                             self._x, self._y, self._z,
+                             decimation=key[1],
+                             nthreads=nthreads)
+        self._cache[key] = mesh
+        self._order.append(key)
+        while len(self._order) > self._maxsize:
+            del self._cache[self._order.pop(0)]
+        return mesh
+
+    def isCached(self, level, decimation=1):
+        return (float(level), int(decimation)) in self._cache
+
+    def clear(self):
+        self._cache = {}
+        self._order = []
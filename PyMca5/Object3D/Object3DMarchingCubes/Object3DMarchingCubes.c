@@ -0,0 +1,444 @@
+#/*##########################################################################
+#
+# The PyMca X-Ray Fluorescence Toolkit
+#
+# Copyright (c) 2004-2026 European Synchrotron Radiation Facility
+#
+# This file is part of the PyMca X-ray Fluorescence Toolkit developed at
+# the ESRF by the Software group.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#############################################################################*/
+/*
+ * Marching cubes on a regular grid returning arrays instead of issuing
+ * OpenGL calls. It does not need a GL context and it releases the GIL
+ * while marching, so several slabs of the same volume can be processed
+ * in parallel from Python threads.
+ */
+#include <Python.h>
+#include <./numpy/arrayobject.h>
+#include <stdlib.h>
+#include <string.h>
+#include <math.h>
+#include "MarchingCubesTables.h"
+
+struct module_state {
+    PyObject *error;
+};
+
+#if PY_MAJOR_VERSION >= 3
+#define GETSTATE(m) ((struct module_state*)PyModule_GetState(m))
+#else
+#define GETSTATE(m) (&_state)
+static struct module_state _state;
+#endif
+
+/* positions, relative to corner 0, of each of the 8 corners of a cube */
+static const int aiCornerOffset[8][3] =
+{
+        {0, 0, 0},{1, 0, 0},{1, 1, 0},{0, 1, 0},
+        {0, 0, 1},{1, 0, 1},{1, 1, 1},{0, 1, 1}
+};
+
+/* corners joined by each of the 12 edges of a cube */
+static const int aiEdgeConnection[12][2] =
+{
+        {0,1}, {1,2}, {2,3}, {3,0},
+        {4,5}, {5,6}, {6,7}, {7,4},
+        {0,4}, {1,5}, {2,6}, {3,7}
+};
+
+typedef struct {
+    const float *values;
+    const float *axis[3];
+    npy_intp size[3];
+    int step[3];
+    float isoValue;
+    /* output triangle soup, three vertices per triangle */
+    float *vertices;
+    float *normals;
+    npy_int64 *edges;
+    npy_intp nVertices;
+    npy_intp allocated;
+} MeshBuffer;
+
+static int growBuffer(MeshBuffer *mesh, npy_intp needed)
+{
+    npy_intp allocated;
+    void *p;
+
+    if (needed <= mesh->allocated)
+        return 0;
+    allocated = mesh->allocated > 0 ? 2 * mesh->allocated : 3 * 1024;
+    while (allocated < needed)
+        allocated *= 2;
+    p = realloc(mesh->vertices, 3 * allocated * sizeof(float));
+    if (p == NULL)
+        return -1;
+    mesh->vertices = (float *) p;
+    p = realloc(mesh->normals, 3 * allocated * sizeof(float));
+    if (p == NULL)
+        return -1;
+    mesh->normals = (float *) p;
+    p = realloc(mesh->edges, allocated * sizeof(npy_int64));
+    if (p == NULL)
+        return -1;
+    mesh->edges = (npy_int64 *) p;
+    mesh->allocated = allocated;
+    return 0;
+}
+
+static void freeBuffer(MeshBuffer *mesh)
+{
+    free(mesh->vertices);
+    free(mesh->normals);
+    free(mesh->edges);
+    mesh->vertices = NULL;
+    mesh->normals = NULL;
+    mesh->edges = NULL;
+}
+
+/* Gradient of the field at a grid point, using central differences at the
+ * current decimation (one sided at the borders). */
+static void getGradient(const MeshBuffer *mesh, const npy_intp *p, float *gradient)
+{
+    int axis;
+    npy_intp low[3], high[3];
+    npy_intp strides[3];
+    float delta;
+
+    strides[0] = mesh->size[1] * mesh->size[2];
+    strides[1] = mesh->size[2];
+    strides[2] = 1;
+    for (axis = 0; axis < 3; axis++)
+    {
+        memcpy(low, p, 3 * sizeof(npy_intp));
+        memcpy(high, p, 3 * sizeof(npy_intp));
+        low[axis] = p[axis] - mesh->step[axis];
+        if (low[axis] < 0)
+            low[axis] = 0;
+        high[axis] = p[axis] + mesh->step[axis];
+        if (high[axis] > (mesh->size[axis] - 1))
+            high[axis] = mesh->size[axis] - 1;
+        delta = mesh->axis[axis][high[axis]] - mesh->axis[axis][low[axis]];
+        if (delta != 0.0)
+        {
+            gradient[axis] = (mesh->values[high[0] * strides[0] + high[1] * strides[1] + high[2]] -
+                              mesh->values[low[0] * strides[0] + low[1] * strides[1] + low[2]]) / delta;
+        }
+        else
+        {
+            gradient[axis] = 0.0;
+        }
+    }
+}
+
+/* March the cubes whose first index lies in [xStart, xEnd).
+ * Returns -1 on memory error. */
+static int marchSlab(MeshBuffer *mesh, npy_intp xStart, npy_intp xEnd)
+{
+    npy_intp iX, iY, iZ;
+    npy_intp strides[3];
+    npy_intp corners[8][3];
+    npy_intp *pLow, *pHigh;
+    npy_int64 edgeKeys[12];
+    float cubeValues[8];
+    float edgeVertex[12][3];
+    float edgeNormal[12][3];
+    float gradientLow[3], gradientHigh[3];
+    float vLow, vHigh, offset, norm;
+    int iCorner, iEdge, iTriangle, iVertex, iAxis, edgeAxis;
+    int flagIndex, edgeFlags, c0, c1;
+    npy_intp n;
+
+    strides[0] = mesh->size[1] * mesh->size[2];
+    strides[1] = mesh->size[2];
+    strides[2] = 1;
+    for (iX = xStart; (iX < xEnd) && ((iX + mesh->step[0]) < mesh->size[0]); iX += mesh->step[0])
+    for (iY = 0; (iY + mesh->step[1]) < mesh->size[1]; iY += mesh->step[1])
+    for (iZ = 0; (iZ + mesh->step[2]) < mesh->size[2]; iZ += mesh->step[2])
+    {
+        flagIndex = 0;
+        for (iCorner = 0; iCorner < 8; iCorner++)
+        {
+            corners[iCorner][0] = iX + aiCornerOffset[iCorner][0] * mesh->step[0];
+            corners[iCorner][1] = iY + aiCornerOffset[iCorner][1] * mesh->step[1];
+            corners[iCorner][2] = iZ + aiCornerOffset[iCorner][2] * mesh->step[2];
+            cubeValues[iCorner] = mesh->values[corners[iCorner][0] * strides[0] +
+                                               corners[iCorner][1] * strides[1] +
+                                               corners[iCorner][2]];
+            if (cubeValues[iCorner] <= mesh->isoValue)
+                flagIndex |= 1 << iCorner;
+        }
+        edgeFlags = aiCubeEdgeFlags[flagIndex];
+        if (edgeFlags == 0)
+            continue;
+
+        for (iEdge = 0; iEdge < 12; iEdge++)
+        {
+            if (!(edgeFlags & (1 << iEdge)))
+                continue;
+            /* always interpolate from the lower grid point so that the
+             * neighbouring cubes sharing this edge give the very same vertex */
+            c0 = aiEdgeConnection[iEdge][0];
+            c1 = aiEdgeConnection[iEdge][1];
+            edgeAxis = 0;
+            for (iAxis = 0; iAxis < 3; iAxis++)
+            {
+                if (aiCornerOffset[c0][iAxis] != aiCornerOffset[c1][iAxis])
+                    edgeAxis = iAxis;
+            }
+            if (aiCornerOffset[c0][edgeAxis] > aiCornerOffset[c1][edgeAxis])
+            {
+                iCorner = c0;
+                c0 = c1;
+                c1 = iCorner;
+            }
+            pLow = corners[c0];
+            pHigh = corners[c1];
+            vLow = cubeValues[c0];
+            vHigh = cubeValues[c1];
+            if (vHigh != vLow)
+                offset = (mesh->isoValue - vLow) / (vHigh - vLow);
+            else
+                offset = 0.5;
+            getGradient(mesh, pLow, gradientLow);
+            getGradient(mesh, pHigh, gradientHigh);
+            norm = 0.0;
+            for (iAxis = 0; iAxis < 3; iAxis++)
+            {
+                vLow = mesh->axis[iAxis][pLow[iAxis]];
+                vHigh = mesh->axis[iAxis][pHigh[iAxis]];
+                edgeVertex[iEdge][iAxis] = vLow + offset * (vHigh - vLow);
+                edgeNormal[iEdge][iAxis] = gradientLow[iAxis] + \
+                                offset * (gradientHigh[iAxis] - gradientLow[iAxis]);
+                norm += edgeNormal[iEdge][iAxis] * edgeNormal[iEdge][iAxis];
+            }
+            if (norm > 0.0)
+            {
+                norm = (float) sqrt(norm);
+                for (iAxis = 0; iAxis < 3; iAxis++)
+                    edgeNormal[iEdge][iAxis] /= norm;
+            }
+            edgeKeys[iEdge] = (npy_int64) (pLow[0] * strides[0] + pLow[1] * strides[1] + pLow[2]) * 3 + edgeAxis;
+        }
+
+        for (iTriangle = 0; iTriangle < 5; iTriangle++)
+        {
+            if (a2iTriangleConnectionTable[flagIndex][3 * iTriangle] < 0)
+                break;
+            if (growBuffer(mesh, mesh->nVertices + 3) < 0)
+                return -1;
+            for (iCorner = 0; iCorner < 3; iCorner++)
+            {
+                iVertex = a2iTriangleConnectionTable[flagIndex][3 * iTriangle + iCorner];
+                n = mesh->nVertices;
+                memcpy(&mesh->vertices[3 * n], edgeVertex[iVertex], 3 * sizeof(float));
+                memcpy(&mesh->normals[3 * n], edgeNormal[iVertex], 3 * sizeof(float));
+                mesh->edges[n] = edgeKeys[iVertex];
+                mesh->nVertices++;
+            }
+        }
+    }
+    return 0;
+}
+
+static PyObject *
+marchingCubes(PyObject *self, PyObject *args)
+{
+    PyObject *valuesInput, *xInput, *yInput, *zInput;
+    PyObject *stepsInput = NULL;
+    PyArrayObject *valuesArray = NULL;
+    PyArrayObject *axisArray[3] = {NULL, NULL, NULL};
+    PyArrayObject *verticesArray = NULL, *normalsArray = NULL, *edgesArray = NULL;
+    PyObject *result = NULL;
+    MeshBuffer mesh;
+    double isoValue;
+    npy_intp xStart = 0;
+    npy_intp xEnd = -1;
+    npy_intp dims[2];
+    int i, status;
+
+    memset(&mesh, 0, sizeof(MeshBuffer));
+    mesh.step[0] = mesh.step[1] = mesh.step[2] = 1;
+
+    if (!PyArg_ParseTuple(args, "OOOOd|Onn", &valuesInput, &xInput, &yInput, &zInput,
+                          &isoValue, &stepsInput, &xStart, &xEnd))
+        return NULL;
+
+    if ((stepsInput != NULL) && (stepsInput != Py_None))
+    {
+        if (!PyArg_ParseTuple(stepsInput, "iii", &mesh.step[0], &mesh.step[1], &mesh.step[2]))
+            return NULL;
+    }
+    for (i = 0; i < 3; i++)
+    {
+        if (mesh.step[i] < 1)
+        {
+            PyErr_SetString(PyExc_ValueError, "Steps must be positive integers");
+            return NULL;
+        }
+    }
+
+    axisArray[0] = (PyArrayObject *) PyArray_ContiguousFromAny(xInput, NPY_FLOAT, 1, 0);
+    axisArray[1] = (PyArrayObject *) PyArray_ContiguousFromAny(yInput, NPY_FLOAT, 1, 0);
+    axisArray[2] = (PyArrayObject *) PyArray_ContiguousFromAny(zInput, NPY_FLOAT, 1, 0);
+    valuesArray = (PyArrayObject *) PyArray_ContiguousFromAny(valuesInput, NPY_FLOAT, 1, 0);
+    if ((axisArray[0] == NULL) || (axisArray[1] == NULL) || \
+        (axisArray[2] == NULL) || (valuesArray == NULL))
+        goto finish;
+
+    for (i = 0; i < 3; i++)
+    {
+        mesh.axis[i] = (const float *) PyArray_DATA(axisArray[i]);
+        mesh.size[i] = PyArray_SIZE(axisArray[i]);
+    }
+    if (PyArray_SIZE(valuesArray) != (mesh.size[0] * mesh.size[1] * mesh.size[2]))
+    {
+        PyErr_SetString(PyExc_ValueError,
+                        "Number of values does not match the grid dimensions");
+        goto finish;
+    }
+    mesh.values = (const float *) PyArray_DATA(valuesArray);
+    mesh.isoValue = (float) isoValue;
+    if ((xEnd < 0) || (xEnd > mesh.size[0]))
+        xEnd = mesh.size[0];
+    if (xStart < 0)
+        xStart = 0;
+
+    Py_BEGIN_ALLOW_THREADS
+    status = marchSlab(&mesh, xStart, xEnd);
+    Py_END_ALLOW_THREADS
+
+    if (status < 0)
+    {
+        PyErr_NoMemory();
+        goto finish;
+    }
+
+    dims[0] = mesh.nVertices;
+    dims[1] = 3;
+    verticesArray = (PyArrayObject *) PyArray_SimpleNew(2, dims, NPY_FLOAT);
+    normalsArray = (PyArrayObject *) PyArray_SimpleNew(2, dims, NPY_FLOAT);
+    edgesArray = (PyArrayObject *) PyArray_SimpleNew(1, dims, NPY_INT64);
+    if ((verticesArray == NULL) || (normalsArray == NULL) || (edgesArray == NULL))
+        goto finish;
+    if (mesh.nVertices > 0)
+    {
+        memcpy(PyArray_DATA(verticesArray), mesh.vertices, 3 * mesh.nVertices * sizeof(float));
+        memcpy(PyArray_DATA(normalsArray), mesh.normals, 3 * mesh.nVertices * sizeof(float));
+        memcpy(PyArray_DATA(edgesArray), mesh.edges, mesh.nVertices * sizeof(npy_int64));
+    }
+    result = Py_BuildValue("NNN", PyArray_Return(verticesArray),
+                                  PyArray_Return(normalsArray),
+                                  PyArray_Return(edgesArray));
+    verticesArray = NULL;
+    normalsArray = NULL;
+    edgesArray = NULL;
+
+finish:
+    freeBuffer(&mesh);
+    Py_XDECREF(valuesArray);
+    for (i = 0; i < 3; i++)
+        Py_XDECREF(axisArray[i]);
+    Py_XDECREF(verticesArray);
+    Py_XDECREF(normalsArray);
+    Py_XDECREF(edgesArray);
+    return result;
+}
+
+
+static char marchingCubesDoc[] =
+"marchingCubes(values, x, y, z, isoValue, steps=(1, 1, 1), xStart=0, xEnd=-1)\n"
+"\n"
+"Extract the isosurface of values, sampled on the regular grid defined by\n"
+"the x, y and z axes, at isoValue. Only the cubes whose first index lies in\n"
+"[xStart, xEnd) are marched. The GIL is released during the computation.\n"
+"\n"
+"Returns a triangle soup as three arrays: the vertices (n, 3) and the\n"
+"normals (n, 3) as float32 and, as int64, the key of the grid edge each\n"
+"vertex lies on. Vertices with the same key are identical.";
+
+
+static PyMethodDef Object3DMarchingCubesMethods[] = {
+    {"marchingCubes", marchingCubes, METH_VARARGS, marchingCubesDoc},
+    {NULL, NULL, 0, NULL} /* sentinel */
+};
+
+
+#if PY_MAJOR_VERSION >= 3
+
+static int Object3DMarchingCubes_traverse(PyObject *m, visitproc visit, void *arg) {
+    Py_VISIT(GETSTATE(m)->error);
+    return 0;
+}
+
+static int Object3DMarchingCubes_clear(PyObject *m) {
+    Py_CLEAR(GETSTATE(m)->error);
+    return 0;
+}
+
+static struct PyModuleDef moduledef = {
+    PyModuleDef_HEAD_INIT,
+    "Object3DMarchingCubes",     /* m_name */
+    "Isosurface extraction without OpenGL",   /* m_doc */
+    sizeof(struct module_state), /* m_size */
+    Object3DMarchingCubesMethods,   /* m_methods */
+    NULL,                    /* m_reload */
+    Object3DMarchingCubes_traverse, /* m_traverse */
+    Object3DMarchingCubes_clear,    /* m_clear */
+    NULL,                    /* m_free */
+};
+
+#define INITERROR return NULL
+
+PyObject *
+PyInit_Object3DMarchingCubes(void)
+
+#else
+#define INITERROR return
+
+void
+initObject3DMarchingCubes(void)
+#endif
+{
+    struct module_state *st;
+#if PY_MAJOR_VERSION >= 3
+    PyObject *module = PyModule_Create(&moduledef);
+#else
+    PyObject *module = Py_InitModule("Object3DMarchingCubes", Object3DMarchingCubesMethods);
+#endif
+
+    if (module == NULL)
+        INITERROR;
+    st = GETSTATE(module);
+
+    st->error = PyErr_NewException("Object3DMarchingCubes.error", NULL, NULL);
+    if (st->error == NULL) {
+        Py_DECREF(module);
+        INITERROR;
+    }
+
+    import_array()
+
+#if PY_MAJOR_VERSION >= 3
+    return module;
+#endif
+}
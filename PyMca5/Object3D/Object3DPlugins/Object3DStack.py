@@ -50,6 +50,11 @@
     except:
         import Object3DCTools
 
+try:
+    from PyMca5.Object3D import Object3DIsosurface
+except ImportError:
+    from Object3D import Object3DIsosurface
+
 try:
     from PyMca5.Object3D.Object3DPlugins import Object3DMeshConfig
 except ImportError:
@@ -88,6 +93,7 @@ def __init__(self, name = "3D-Array"):
         self._selected     = False
         self._vertexSelectionMode = False
         self.drawMode = 'POINT'
+        self._isosurfaceCache = None
         self.__isosurfacesDict = {}
         for i in range(5):
             self.__isosurfacesDict[i] = {}
@@ -227,6 +233,11 @@ def setStack(self, data, x=None, y=None, z=None, xyz=None):
         else:
             raise ValueError("Unhandled case")
 
+        # the meshes of the previous data are not valid any more
+        self._isosurfaceCache = None
+        for key in self.__isosurfacesDict.keys():
+            self.__isosurfacesDict[key]['value'] = None
+
         old_shape = self.values.shape
         self.nVertices = self.xSize * self.ySize * self.zSize
         self.values.shape = self.nVertices, 1
@@ -236,6 +247,19 @@ def setStack(self, data, x=None, y=None, z=None, xyz=None):
         #restore original shape
         self.values.shape = old_shape
 
+    def getIsosurface(self, value, decimation=1):
+        """
+        Return the vertices, normals and triangle indices of the isosurface
+        at the given value. The meshes are kept per (value, decimation).
+        """
+        if self._isosurfaceCache is None:
+            self._isosurfaceCache = Object3DIsosurface.IsosurfaceCache( \
+                            self.values.reshape(self.xSize,
+                                                self.ySize,
+                                                self.zSize),
+                            self._x, self._y, self._z)
+        return self._isosurfaceCache.getMesh(value, decimation)
+
     def getColors(self):
         old_shape = self.values.shape
         self.values.shape = -1, 1
@@ -331,10 +355,7 @@ def drawObject(self):
                     GL.glNewList(self.__isosurfacesDict[i]['list'],
                                                  GL.GL_COMPILE)
 
-                    GL.glBegin(GL.GL_TRIANGLES)
-                    Object3DCTools.gridMarchingCubes(self._x, self._y, self._z, self.values, value, color, (1, 1, 1), 1)
-                    #Object3DCTools.gridMarchingCubes(self._x, self._y, self._z, self.values, value, None, (1, 1, 1), 1)
-                    GL.glEnd()
+                    self._drawIsosurface(value, color)
                     GL.glEndList()
                     GL.glCallList(self.__isosurfacesDict[i]['list'])
                     GL.glDisable(GL.GL_LIGHTING)
@@ -354,6 +375,23 @@ def drawObject(self):
         if DEBUG:
             print("Drawing takes ", time.time() - t0)
 
+    def _drawIsosurface(self, value, color):
+        vertices, normals, indices = self.getIsosurface(value)
+        if not indices.size:
+            return
+        GL.glEnableClientState(GL.GL_VERTEX_ARRAY)
+        GL.glEnableClientState(GL.GL_NORMAL_ARRAY)
+        GL.glVertexPointerf(vertices)
+        GL.glNormalPointerf(normals)
+        if color is None:
+            GL.glEnableClientState(GL.GL_COLOR_ARRAY)
+            GL.glColorPointerf(Object3DIsosurface.getNormalColors(normals))
+        GL.glDrawElementsui(GL.GL_TRIANGLES, indices)
+        if color is None:
+            GL.glDisableClientState(GL.GL_COLOR_ARRAY)
+        GL.glDisableClientState(GL.GL_NORMAL_ARRAY)
+        GL.glDisableClientState(GL.GL_VERTEX_ARRAY)
+
     def _getVertexSelectionColors(self):
         self.vertexSelectionColors = numpy.zeros((self.nVertices,4),
                                                  numpy.uint8)
@@ -134,6 +134,13 @@ def build_Object3DCTools(ext_modules):
                         include_dirs = includes)
     ext_modules.append(module)
 
+def build_Object3DMarchingCubes(ext_modules):
+    module  = Extension(name = 'Object3D.Object3DMarchingCubes',
+                        sources = glob.glob('Object3DMarchingCubes/*.c'),
+                        define_macros = define_macros,
+                        include_dirs = [numpy.get_include(), 'Object3DCTools'])
+    ext_modules.append(module)
+
 def build_Object3DQhull(ext_modules):
     module  = Extension(name = 'Object3D.Object3DQhull',
                         sources = glob.glob('Object3DQhull/src/*.c'),
@@ -144,6 +151,7 @@ def build_Object3DQhull(ext_modules):
 
 ext_modules = []
 build_Object3DCTools(ext_modules)
+build_Object3DMarchingCubes(ext_modules)
 build_Object3DQhull(ext_modules)
 
 # data_files fix from http://wiki.python.org/moin/DistutilsInstallDataScattered
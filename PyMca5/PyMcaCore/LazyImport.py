@@ -0,0 +1,107 @@
+#/*##########################################################################
+#
+# The PyMca X-Ray Fluorescence Toolkit
+#
+# Copyright (c) 2004-2026 European Synchrotron Radiation Facility
+#
+# This file is part of the PyMca X-ray Fluorescence Toolkit developed at
+# the ESRF by the Software group.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#############################################################################*/
+__author__ = "V.A. Sole - ESRF Data Analysis"
+__contact__ = "sole@esrf.fr"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+__doc__ = """
+Deferred imports of modules only needed on user request.
+
+A LazyModule instance stands for a module and imports it the first time
+one of its attributes is accessed.
+"""
+import sys
+import logging
+import importlib
+
+_logger = logging.getLogger(__name__)
+
+
+class LazyModule(object):
+    """
+    Proxy to a module imported on first attribute access.
+    """
+    def __init__(self, name):
+        self.__dict__["_lazyName"] = name
+        self.__dict__["_lazyModule"] = None
+
+    def _lazyLoad(self):
+        module = self.__dict__["_lazyModule"]
+        if module is None:
+            name = self.__dict__["_lazyName"]
+            _logger.debug("Importing %s on first use", name)
+            module = importlib.import_module(name)
+            self.__dict__["_lazyModule"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._lazyLoad(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._lazyLoad(), attr, value)
+
+    def __repr__(self):
+        if self.__dict__["_lazyModule"] is None:
+            return "<lazy module '%s'>" % self.__dict__["_lazyName"]
+        return repr(self.__dict__["_lazyModule"])
+
+
+def isLoaded(module):
+    """
+    True if the module has been imported.
+    """
+    if isinstance(module, LazyModule):
+        return module.__dict__["_lazyModule"] is not None
+    return True
+
+def load(module):
+    """
+    Import the module behind a LazyModule if not done yet and return it.
+    The errors raised by the import are propagated.
+    """
+    if isinstance(module, LazyModule):
+        return module._lazyLoad()
+    return module
+
+def isAvailable(name):
+    """
+    True if the module can be found, without importing it. Its parent
+    packages are imported.
+    """
+    if name in sys.modules:
+        return True
+    try:
+        if sys.version_info < (3, 4):
+            import pkgutil
+            return pkgutil.find_loader(name) is not None
+        import importlib.util
+        return importlib.util.find_spec(name) is not None
+    except:
+        _logger.debug("Module %s not available: %s", name, sys.exc_info()[1])
+        return False
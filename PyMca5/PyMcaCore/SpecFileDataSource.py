@@ -35,6 +35,7 @@
 import numpy
 import types
 import logging
+import zlib
 from . import DataObject
 from PyMca5.PyMcaIO import specfilewrapper as specfile
 
@@ -43,6 +44,10 @@
 
 SOURCE_TYPE = "SpecFile"
 
+# bytes checked on refresh to detect files rewritten in place
+FILE_HEAD_LENGTH = 1024 * 1024
+FILE_TAIL_LENGTH = 64
+
 # Scan types
 # ----------
 SF_EMPTY       = 0        # empty scan
@@ -80,16 +85,69 @@ def __init__(self, nameInput):
         self.refresh()
 
     def refresh(self):
+        previousObjectList = getattr(self, "_sourceObjectList", [])
+        previousStampList = getattr(self, "_sourceStampList", [])
         self._sourceObjectList=[]
+        self._sourceStampList = []
         self.__fileHeaderList = []
         for name in self.__sourceNameList:
             if not os.path.exists(name):
                 raise ValueError("File %s does not exists" % name)
-        for name in self.__sourceNameList:
-            self._sourceObjectList.append(specfile.Specfile(name))
+        for i, name in enumerate(self.__sourceNameList):
+            sourceObject = None
+            if i < len(previousObjectList) and \
+               hasattr(previousObjectList[i], "update") and \
+               self.__isAppended(name, previousStampList[i]):
+                # SPEC files only need to parse the appended scans
+                sourceObject = previousObjectList[i]
+                try:
+                    sourceObject.update()
+                except:
+                    _logger.debug("refresh %s", sys.exc_info()[1])
+                    sourceObject = None
+            if sourceObject is None:
+                sourceObject = specfile.Specfile(name)
+            self._sourceObjectList.append(sourceObject)
+            self._sourceStampList.append(self.__getFileStamp(name))
             self.__fileHeaderList.append(False)
         self.__lastKeyInfo = {}
 
+    def __getFileStamp(self, name, size=None):
+        """
+        Size, modification time, checksum of the beginning of the file and
+        last bytes of the file. If size is given, the checksum and the last
+        bytes are taken as if the file had that size.
+        """
+        fileStat = os.stat(name)
+        if size is None:
+            size = fileStat.st_size
+        with open(name, "rb") as f:
+            head = f.read(min(size, FILE_HEAD_LENGTH))
+            f.seek(max(size - FILE_TAIL_LENGTH, 0))
+            tail = f.read(min(size, FILE_TAIL_LENGTH))
+        return (size, fileStat.st_mtime, zlib.crc32(head) & 0xffffffff, tail)
+
+    def __isAppended(self, name, previousStamp):
+        """
+        True if the file did not change or only got data appended since
+        previousStamp was taken. A file rewritten in place keeps stale scan
+        offsets in the already opened object and has to be opened again.
+        """
+        size, mtime = previousStamp[:2]
+        fileStat = os.stat(name)
+        if fileStat.st_size < size:
+            return False
+        if fileStat.st_size == size:
+            if fileStat.st_mtime != mtime:
+                return False
+            return True
+        try:
+            stamp = self.__getFileStamp(name, size=size)
+        except (IOError, OSError):
+            _logger.debug("refresh %s", sys.exc_info()[1])
+            return False
+        return stamp[2:] == previousStamp[2:]
+
     def getSourceInfo(self):
         """
         Returns information about the specfile object created by
@@ -496,23 +554,31 @@ def getDataObject(self,key,selection=None):
                 output.y    = None
                 output.m    = None
                 output.data = None
-                npoints = output.info['NbMca']/output.info['NbMcaDet']
+                npoints = output.info['NbMca'] // output.info['NbMcaDet']
                 index = 0
                 scan_obj = self._sourceObjectList[index].select(scan_key)
                 SPECFILE = True
                 if isinstance(self._sourceObjectList[index], specfile.specfilewrapper):
                     SPECFILE = False
-                for i in range(npoints):
-                    if SPECFILE:
-                        wmca_no= mca_no + output.info['NbMcaDet'] * i
-                        mcaData= scan_obj.mca(wmca_no)
-                    else:
+                if SPECFILE:
+                    nDet = output.info['NbMcaDet']
+                    for i, block in specfile.iterMcaBlocks(scan_obj,
+                                            mca_no,
+                                            mca_no + nDet * (npoints - 1),
+                                            nDet):
+                        if i == 0:
+                            nChannels = block.shape[1]
+                            output.data = numpy.zeros((npoints, nChannels),
+                                                      numpy.float32)
+                        output.data[i:i + block.shape[0], :] = block
+                else:
+                    for i in range(npoints):
                         mca_key = '%s.%d' % (scan_key, mca_no)
                         mcaData = self._getMcaData(mca_key).data
-                    if i == 0:
-                        nChannels = mcaData.shape[0]
-                        output.data = numpy.zeros((npoints, nChannels), numpy.float32)
-                    output.data[i,:] = mcaData
+                        if i == 0:
+                            nChannels = mcaData.shape[0]
+                            output.data = numpy.zeros((npoints, nChannels), numpy.float32)
+                        output.data[i,:] = mcaData
                 #I have all the MCA data ready for image plot
                 if selectiontype == 'STACK':
                     output.data.shape = 1, npoints, -1
@@ -42,12 +42,20 @@
 
 
 class SpsDataSource(object):
-    def __init__(self, name):
+    def __init__(self, name, zerocopy=False):
+        """
+        :param str name: SPEC version
+        :param bool zerocopy: if True, the data of non-scan arrays are
+            read-only views onto the shared memory instead of copies.
+            SPEC can update them at any time, use isDataObjectConsistent
+            to find out if that happened while they were in use.
+        """
         if not isinstance(name, str):
             raise TypeError("Constructor needs string as first argument")
         self.name = name
         self.sourceName = name
         self.sourceType = SOURCE_TYPE
+        self.zerocopy = zerocopy
 
     def refresh(self):
         pass
@@ -86,7 +94,7 @@ def getDataObject(self, key_list, selection=None):
                 data = DataObject.DataObject()
                 data.info = self.__getArrayInfo(key)
                 data.info['selection'] = selection
-                data.data = sps.getdata(self.name, key)
+                data.data = self.__getData(key, data.info)
                 if nolist:
                     if selection is not None:
                         scantest = (data.info['flag'] &
@@ -178,6 +186,45 @@ def getDataObject(self, key_list, selection=None):
         else:
             return None
 
+    def __getData(self, key, info):
+        scantest = (info['flag'] & sps.TAG_SCAN) == sps.TAG_SCAN
+        if self.zerocopy and (key not in ["SCAN_D"]) and (not scantest):
+            view = sps.getdataview(self.name, key)
+            if view is not None:
+                # the counter of the mapped segment itself, even if SPEC
+                # recreated the array after the array info was read
+                info["updatecounter"] = sps.dataviewcounter(view)
+                info["zerocopy"] = True
+                return view
+            _logger.debug("Cannot map %s, copying it", key)
+        return sps.getdata(self.name, key)
+
+    def isDataObjectConsistent(self, dataObject):
+        """
+        Check that the shared memory behind a data object obtained with
+        zerocopy set was not updated since the object was obtained.
+
+        Read the object and then call this method: if it returns False,
+        the values read may mix two updates and the object has to be
+        obtained again. Objects holding copies are always consistent.
+        """
+        info = dataObject.info
+        if not info.get("zerocopy", False):
+            return True
+        arrays = [dataObject.data]
+        for name in ["x", "y", "m"]:
+            item = getattr(dataObject, name, None)
+            if item is not None:
+                arrays.extend(item)
+        for array in arrays:
+            if array is None:
+                continue
+            # arrays built afterwards (default x axis, ...) are not views
+            counter = sps.dataviewcounter(array)
+            if counter is not None:
+                return counter == info["updatecounter"]
+        return True
+
     def __getSourceInfo(self):
         arraylist = []
         sourcename = self.name
@@ -28,9 +28,12 @@
 __license__ = "MIT"
 __copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
 from . import XiaEdf
+import numpy
 import sys
 import os
 import time
+import multiprocessing
+from multiprocessing.pool import ThreadPool
 
 __version__="$Revision: 1.11 $"
 
@@ -120,99 +123,79 @@ def parseFiles(filelist, verbose=0, keep_sum=0, log_cb=None, done_cb=None, error
         return None
 
 
-def correctFiles(xiafiles, deadtime=1, livetime=0, sums=None, avgflag=0, outdir=None, outname="corr", force=0, \
-		    verbose=0, log_cb=None, done_cb=None, error_cb=None):
-    (log_cb, done_cb, error_cb)= checkCB(log_cb, done_cb, error_cb)
+def correctGroup(group, deadtime=1, livetime=0, sums=None, avgflag=0, outdir=None, outname="corr", force=0, \
+                 verbose=0, dtype=None):
+    """
+    Correct one group of xia files as returned by parseFiles.
+
+    The messages are not emitted but returned so that the groups can be
+    processed in any thread. It returns a tuple (saved, errors, messages)
+    where messages is a list of ("log", args) and ("error", args) items
+    to be passed to the corresponding callbacks.
+    """
+    messages= []
+    def log_cb(*var):
+        messages.append(("log", var))
+    def error_cb(*var):
+        messages.append(("error", var))
 
-    processed= 0
     saved= 0
-    total= 0
     errors= 0
-    tps= time.time()
-
-    done_cb(0, total)
-    total= len(xiafiles)
 
-    log_cb("Correcting xia files ...")
+    if not group[0].isScan():
+        file= group[0]
+        name= file.get()
+        log_cb("Working on %s"%name, 1, verbose)
 
-    for group in xiafiles:
-        if not group[0].isScan():
-            file= group[0]
+        try:
+            xia= XiaEdf.XiaEdfCountFile(name)
+            file.setDirectory(outdir)
+            file.appendPrefix(outname)
             name= file.get()
-            log_cb("Working on %s"%name, 1, verbose)
-
-            try:
-                xia= XiaEdf.XiaEdfCountFile(name)
-                file.setDirectory(outdir)
-                file.appendPrefix(outname)
-                name= file.get()
-
-                if sums is not None:
-                    err= xia.sum(sums, deadtime, livetime, avgflag)
-                    file.setType("sum", -1)
-                else:
-                    err= xia.correct(deadtime, livetime)
-                if len(err):
-                    error_cb(" - WARNING: in %s"%name)
-                    for msg in err:
-                        error_cb("     * " + msg)
 
-                log_cb(" - Saving %s"%name)
-                xia.save(name, force)
-                saved += 1
-
-            except XiaEdf.XiaEdfError:
-                errors += 1
-                log_cb(sys.exc_info()[1])
-
-        else:
-            groupfiles= [ file.get() for file in group ]
-            name= groupfiles[-1]
-            log_cb("Reading %s"%name, 1, verbose)
-
-            try:
-                xia= XiaEdf.XiaEdfScanFile(name, groupfiles[:-1])
-            except XiaEdf.XiaEdfError:
-                xia= None
-                errors += 1
-                error_cb(sys.exc_info()[1])
-
-            if xia is not None:
-                for file in group:
-                    file.setDirectory(outdir)
-                    file.appendPrefix(outname)
-
-                if sums is None:
-                    for file in group[:-1]:
-                        det= file.getDetector()
+            if sums is not None:
+                err= xia.sum(sums, deadtime, livetime, avgflag)
+                file.setType("sum", -1)
+            else:
+                err= xia.correct(deadtime, livetime, dtype)
+            if len(err):
+                error_cb(" - WARNING: in %s"%name)
+                for msg in err:
+                    error_cb("     * " + msg)
 
-                        if det is not None:
-                            log_cb("Working on detector #%02d"%det, 1, verbose)
-                            try:
-                                err= xia.correct(det, deadtime, livetime)
-                                name= file.get()
+            log_cb(" - Saving %s"%name)
+            xia.save(name, force)
+            saved += 1
 
-                                if len(err):
-                                    error_cb(" - WARNING: in %s"%name)
-                                    for msg in err:
-                                        error_cb("     * " + msg)
+        except XiaEdf.XiaEdfError:
+            errors += 1
+            log_cb(sys.exc_info()[1])
 
-                                log_cb(" - Saving %s"%name)
-                                xia.save(name, force)
+    else:
+        groupfiles= [ file.get() for file in group ]
+        name= groupfiles[-1]
+        log_cb("Reading %s"%name, 1, verbose)
+
+        try:
+            xia= XiaEdf.XiaEdfScanFile(name, groupfiles[:-1])
+        except XiaEdf.XiaEdfError:
+            xia= None
+            errors += 1
+            error_cb(sys.exc_info()[1])
+
+        if xia is not None:
+            for file in group:
+                file.setDirectory(outdir)
+                file.appendPrefix(outname)
 
-                                saved += 1
+            if sums is None:
+                for file in group[:-1]:
+                    det= file.getDetector()
 
-                            except XiaEdf.XiaEdfError:
-                                errors += 1
-                                error_cb(sys.exc_info()[1])
-                else:
-                    log_cb("Working on group %s"%name, 1, verbose)
-                    file= group[-1]
-                    for isum in range(len(sums)):
+                    if det is not None:
+                        log_cb("Working on detector #%02d"%det, 1, verbose)
                         try:
-                            err= xia.sum(sums[isum], deadtime, livetime, avgflag)
-
-                            file.setType("sum", isum+1)
+                            err= xia.correct(det, deadtime, livetime, dtype)
                             name= file.get()
 
                             if len(err):
@@ -224,12 +207,91 @@ def correctFiles(xiafiles, deadtime=1, livetime=0, sums=None, avgflag=0, outdir=
                             xia.save(name, force)
 
                             saved += 1
+
                         except XiaEdf.XiaEdfError:
                             errors += 1
                             error_cb(sys.exc_info()[1])
+            else:
+                log_cb("Working on group %s"%name, 1, verbose)
+                file= group[-1]
+                for isum in range(len(sums)):
+                    try:
+                        err= xia.sum(sums[isum], deadtime, livetime, avgflag, dtype)
+
+                        file.setType("sum", isum+1)
+                        name= file.get()
+
+                        if len(err):
+                            error_cb(" - WARNING: in %s"%name)
+                            for msg in err:
+                                error_cb("     * " + msg)
+
+                        log_cb(" - Saving %s"%name)
+                        xia.save(name, force)
+
+                        saved += 1
+                    except XiaEdf.XiaEdfError:
+                        errors += 1
+                        error_cb(sys.exc_info()[1])
+
+    return saved, errors, messages
+
+
+def correctFiles(xiafiles, deadtime=1, livetime=0, sums=None, avgflag=0, outdir=None, outname="corr", force=0, \
+		    verbose=0, log_cb=None, done_cb=None, error_cb=None, nthreads=1, dtype=None):
+    """
+    Correct the groups of xia files returned by parseFiles.
+
+    The groups are independent and, if nthreads is larger than one, they
+    are processed by a pool of threads. Reading, correcting and writing
+    the EDF files is mostly done in numpy and in the operating system, so
+    the work overlaps with the I/O of the other groups. A value of zero
+    or None uses as many threads as CPUs. The callbacks are always called
+    from the calling thread and in the order of the groups.
+    """
+    (log_cb, done_cb, error_cb)= checkCB(log_cb, done_cb, error_cb)
+
+    processed= 0
+    saved= 0
+    total= 0
+    errors= 0
+    tps= time.time()
+
+    done_cb(0, total)
+    total= len(xiafiles)
 
-        processed += 1
-        done_cb(processed, total)
+    if not nthreads:
+        nthreads= multiprocessing.cpu_count()
+    nthreads= max(1, min(nthreads, total))
+
+    log_cb("Correcting xia files ...")
+
+    def correct(group):
+        return correctGroup(group, deadtime, livetime, sums, avgflag, outdir, outname, force, \
+                            verbose, dtype)
+
+    pool= None
+    if nthreads > 1:
+        pool= ThreadPool(nthreads)
+        results= pool.imap(correct, xiafiles)
+    else:
+        results= (correct(group) for group in xiafiles)
+
+    try:
+        for groupSaved, groupErrors, messages in results:
+            for kind, var in messages:
+                if kind=="log":
+                    log_cb(*var)
+                else:
+                    error_cb(*var)
+            saved += groupSaved
+            errors += groupErrors
+            processed += 1
+            done_cb(processed, total)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
 
     done_cb(total, total)
     log_cb("\n* %d groups processed and %d files saved in %.2f sec"%(processed, saved, time.time()-tps))
@@ -245,8 +307,10 @@ def parseArguments():
 
     prog= os.path.basename(sys.argv[0])
 
-    long = ["help", "input=", "output=", "force", "verbose", "deadtime", "livetime", "sum=", "avg", "name=", "parsing"]
-    short= ["h",    "i:",     "o:",      "f",     "v",       "d",        "l",        "s:",   "a",   "n:",    "p"]
+    long = ["help", "input=", "output=", "force", "verbose", "deadtime", "livetime", "sum=", "avg", "name=", "parsing",
+            "jobs=", "single"]
+    short= ["h",    "i:",     "o:",      "f",     "v",       "d",        "l",        "s:",   "a",   "n:",    "p",
+            "j:",    "F"]
 
     try:
         opts, args= getopt.getopt(sys.argv[1:], " ".join(short), long)
@@ -257,7 +321,8 @@ def parseArguments():
 
     parsing= 0
     options= {"input": [], "files": [], "output": None, "force": 0, "name": "corr",
-		"verbose": 0, "deadtime": 0, "livetime": 0, "sums": None, "avgflag": 0, "parsing": 0}
+		"verbose": 0, "deadtime": 0, "livetime": 0, "sums": None, "avgflag": 0, "parsing": 0,
+		"jobs": 1, "dtype": None}
 
     for opt, arg in opts:
         if opt in ("-h", "--help"):
@@ -293,6 +358,15 @@ def parseArguments():
             options["avgflag"]= 1
         if opt in ("-p", "--parsing"):
             options["parsing"]= 1
+        if opt in ("-j", "--jobs"):
+            try:
+                options["jobs"]= int(arg)
+            except ValueError:
+                print("XiaCorrect ERROR: Cannot parse number of jobs")
+                print("\t%s"%arg)
+                sys.exit(0)
+        if opt in ("-F", "--single"):
+            options["dtype"]= numpy.float32
 
 
     for iinput in options["input"]:
@@ -330,7 +404,7 @@ def printHelp():
     prog= os.path.basename(sys.argv[0])
     msg= """
 
-%s [-h] [-v] [-f] [-d] [-l] [-a] [-s <detlist>] [-i <directory>] [-o <directory>] [<files ...>]
+%s [-h] [-v] [-f] [-d] [-l] [-a] [-j <jobs>] [-F] [-s <detlist>] [-i <directory>] [-o <directory>] [<files ...>]
 
 Options:
     [-h]/[--help]
@@ -362,6 +436,12 @@ def printHelp():
     [-o]/[--output]
             Specify output directories. If not specified, output
             files are saved in the same place as input file.
+    [-j]/[--jobs] <number>
+            Number of file groups processed in parallel.
+            Default is 1. Use 0 to use all the CPUs.
+    [-F]/[--single]
+            Store corrected data in single precision (float32)
+            to halve the memory and the size of the output files.
     [-n]/[--name]
 	    String to be appended to prefix for output filename.
 	    Default is \"corr\".
@@ -388,7 +468,8 @@ def mainCommandLine():
                     print(" - ", file.get())
         else:
             correctFiles(files, options["deadtime"], options["livetime"], options["sums"], options["avgflag"], \
-                 options["output"], options["name"], options["force"], options["verbose"])
+                 options["output"], options["name"], options["force"], options["verbose"], \
+                 nthreads=options["jobs"], dtype=options["dtype"])
 
 def mainGUI(app=None):
     from PyMca5.PyMcaGui import PyMcaQt as qt
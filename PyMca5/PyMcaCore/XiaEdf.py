@@ -47,6 +47,36 @@
 XiaStatNb= len(XiaStatIndex.keys())
 XiaStatLabels= ["xdet", "xevt", "xicr", "xocr", "xlt", "xdt"]
 
+def _cmp(a, b):
+    # python 2 cmp, None being lower than anything else
+    if a is None or b is None:
+        return (a is not None) - (b is not None)
+    return (a > b) - (a < b)
+
+def _fillNullPoints(values, valid, default):
+    """
+    Replace in place the invalid points of each column of values by the
+    mean of the two neighbour points, by the only valid neighbour point
+    or by default if none of the neighbours is valid.
+    """
+    prevValid= numpy.zeros(valid.shape, bool)
+    prevValid[1:]= valid[:-1]
+    nextValid= numpy.zeros(valid.shape, bool)
+    nextValid[:-1]= valid[1:]
+    prevValues= numpy.zeros(values.shape, values.dtype)
+    prevValues[1:]= values[:-1]
+    nextValues= numpy.zeros(values.shape, values.dtype)
+    nextValues[:-1]= values[1:]
+
+    invalid= numpy.logical_not(valid)
+    both= invalid & prevValid & nextValid
+    values[both]= (prevValues[both] + nextValues[both]) / 2.
+    mask= invalid & prevValid & ~nextValid
+    values[mask]= prevValues[mask]
+    mask= invalid & nextValid & ~prevValid
+    values[mask]= nextValues[mask]
+    values[invalid & ~prevValid & ~nextValid]= default
+
 def checkEdfForRead(filename):
     if not os.path.isfile(filename):
         raise XiaEdfError("Cannot find file <%s>"%filename)
@@ -98,7 +128,7 @@ def reset(self):
         try:
             self.__readStat()
         except:
-            raise XiaEdfError("Cannot parse header in <%s>"%filename)
+            raise XiaEdfError("Cannot parse header in <%s>"%self.filename)
 
     def __readStat(self):
         self.header= self.edf.GetHeader(0)
@@ -109,14 +139,14 @@ def __readStat(self):
             self.statArray= None
             return self.nbDet
 
-        self.detList= range(self.nbDet)
+        self.detList= list(range(self.nbDet))
         det= self.header.get("xdet", None)
         if det is not None:
             dets= det.split()
             if len(dets)==self.nbDet:
-                self.detList= map(int, dets)
+                self.detList= [int(x) for x in dets]
 
-        self.statArray = numpy.zeros(XiaStatNb*self.nbDet, numpy.int)
+        self.statArray = numpy.zeros(XiaStatNb*self.nbDet, numpy.int64)
         idx= 0
         for det in self.detList:
             self.statArray[idx+XiaStatIndex["det"]]= int(self.header.get("xdet%02d"%det, det))
@@ -161,7 +191,12 @@ def getStat(self, detector=-1):
             idx= self.detList.index(detector)
             return self.statArray[(idx*XiaStatNb):((idx+1)*XiaStatNb)]
 
-    def correct(self, deadtime=1, livetime=0):
+    def correct(self, deadtime=1, livetime=0, dtype=None):
+        """
+        Correct the spectra of all the detectors. The data are converted
+        once to dtype (default float64) and then corrected in place. Using
+        numpy.float32 halves the memory needed.
+        """
         message= []
         corrflag= int(self.header.get("xcorr", 0))
         if livetime and corrflag&2:
@@ -171,38 +206,39 @@ def correct(self, deadtime=1, livetime=0):
             raise XiaEdfError("<%s> seems already deadtime corrected"%self.filename)
 
         self.__readData()
-        self.data= self.data.astype(numpy.float)
+        if dtype is None:
+            dtype= numpy.float64
+        self.data= numpy.array(self.data, dtype=dtype, copy=False)
+
+        stat= self.statArray.reshape(-1, XiaStatNb)
+        factor= numpy.ones((stat.shape[0],), numpy.float64)
 
         if livetime:
-            lvt= numpy.zeros((self.nbDet,1), numpy.float)
-            derr= []
-            for idx in range(len(self.detList)):
-                lvt[idx]= self.statArray[idx*XiaStatNb + XiaStatIndex["lt"]] / 1000.0
-                if lvt[idx]==0.:
-                    lvt[idx]= 1.
-                    derr.append("#%02d"%self.detList[idx])
-            if len(derr):
-                message.append("Null livetime on det %s"% " ".join(derr))
-
-            self.data[1:,:]= self.data[1:,:] / lvt
+            lvt= stat[:, XiaStatIndex["lt"]] / 1000.0
+            null= lvt==0.
+            if numpy.any(null):
+                lvt[null]= 1.
+                message.append("Null livetime on det %s"% \
+                    " ".join(["#%02d"%self.detList[idx] \
+                              for idx in numpy.nonzero(null)[0]]))
+            factor /= lvt
             self.header["xcorr"]= corrflag|2
 
         if deadtime:
-            rate= numpy.zeros((self.nbDet,1), numpy.float)
-            for idx in range(len(self.detList)):
-                derr= []
-                try:
-                    rate[idx]= float(self.statArray[idx*XiaStatNb + XiaStatIndex["icr"]]) / \
-                            float(self.statArray[idx*XiaStatNb + XiaStatIndex["ocr"]])
-                except:
-                    rate[idx]= 1.
-                    derr.append("#%02d"%idx)
-            if len(derr):
-                message.append("Null OCR on det %s" % " ".join(derr))
-
-            self.data[1:,:]= self.data[1:,:] * rate
+            ocr= stat[:, XiaStatIndex["ocr"]].astype(numpy.float64)
+            icr= stat[:, XiaStatIndex["icr"]].astype(numpy.float64)
+            null= ocr==0.
+            rate= numpy.ones(ocr.shape, numpy.float64)
+            rate[~null]= icr[~null] / ocr[~null]
+            if numpy.any(null):
+                message.append("Null OCR on det %s" % \
+                    " ".join(["#%02d"%idx for idx in numpy.nonzero(null)[0]]))
+            factor *= rate
             self.header["xcorr"]= corrflag|1
 
+        if livetime or deadtime:
+            self.data[1:,:] *= factor[:, numpy.newaxis]
+
         return message
 
     def sum(self, sums=[], deadtime=0, livetime=0, average=0):
@@ -215,16 +251,16 @@ def sum(self, sums=[], deadtime=0, livetime=0, average=0):
         if deadtime or livetime:
             message+= self.correct(deadtime, livetime)
         else:
-            self.data= self.data.astype(numpy.float)
+            self.data= self.data.astype(numpy.float64)
 
-        sumdata= numpy.zeros((len(sums), self.data.shape[1]), numpy.float)
+        sumdata= numpy.zeros((len(sums), self.data.shape[1]), numpy.float64)
 
         for idx in range(len(sums)):
             if not len(sums[idx]):
                 sumdata[idx,:] = numpy.sum(self.data[1:,], 0)
                 xdet= self.detList
             else:
-                mask= numpy.zeros((self.nbDet+1,1), numpy.int)
+                mask= numpy.zeros((self.nbDet+1,1), numpy.int64)
                 xdet= []
                 for det in sums[idx]:
                     if det in self.detList:
@@ -241,7 +277,7 @@ def sum(self, sums=[], deadtime=0, livetime=0, average=0):
         else:
             self.data= sumdata
 
-        for key in self.header.keys():
+        for key in list(self.header.keys()):
             if key[0]=='x':
                 try:
                     det= int(key[-2:])
@@ -268,6 +304,7 @@ def __init__(self, statfile, detfiles):
         self.detector= None
         self.data= None
         self.header= None
+        self.__factors= {}
 
         checkEdfForRead(self.statfile)
         for file in self.detfiles:
@@ -288,12 +325,12 @@ def __readStat(self):
             self.statArray= None
             return self.nbDet
 
-        self.detList= range(self.nbDet)
+        self.detList= list(range(self.nbDet))
         det= header.get("xdet", None)
         if det is not None:
             dets= det.split()
             if len(dets)==self.nbDet:
-                self.detList= map(int, dets)
+                self.detList= [int(x) for x in dets]
 
         self.statArray= edf.GetData(0)
 
@@ -351,8 +388,65 @@ def getStat(self, detector=-1):
             idx= self.detList.index(detector)
             return self.statArray[:,(idx*XiaStatNb):((idx+1)*XiaStatNb)]
 
-    def correct(self, detector, deadtime=1, livetime=0):
-        message= []
+    def getCorrectionFactors(self, deadtime=1, livetime=0):
+        """
+        Return the factors correcting the spectra of all the detectors as
+        an array of shape (points, detectors) and the warning messages of
+        each detector as a dictionary. Results are computed once for all
+        the detectors.
+        """
+        key= (bool(deadtime), bool(livetime))
+        if key in self.__factors:
+            return self.__factors[key]
+
+        nbDet= len(self.detList)
+        pts= self.statArray.shape[0]
+        stat= self.statArray[:, :(nbDet*XiaStatNb)].reshape(pts, nbDet, XiaStatNb)
+        factors= numpy.ones((pts, nbDet), numpy.float64)
+        messages= dict([(det, []) for det in self.detList])
+
+        if livetime:
+            lvt= stat[:, :, XiaStatIndex["lt"]] / 1000.0
+            valid= lvt > 0.
+            _fillNullPoints(lvt, valid, 1.)
+            for idx in numpy.nonzero(~numpy.all(valid, 0))[0]:
+                perr= numpy.nonzero(~valid[:, idx])[0]
+                messages[self.detList[idx]].append( \
+                    "Null livetime on det #%02d points %s"% \
+                        (self.detList[idx], self.__pointRange(perr)))
+            factors /= lvt
+
+        if deadtime:
+            ocr= stat[:, :, XiaStatIndex["ocr"]].astype(numpy.float64)
+            icr= stat[:, :, XiaStatIndex["icr"]].astype(numpy.float64)
+            valid= (ocr > 0.) & (icr > 0.)
+            _fillNullPoints(ocr, valid, -1.)
+            _fillNullPoints(icr, valid, -1.)
+            for idx in numpy.nonzero(~numpy.all(valid, 0))[0]:
+                perr= numpy.nonzero(~valid[:, idx])[0]
+                messages[self.detList[idx]].append( \
+                    "Null ICR|OCR on det #%02d points %s"% \
+                        (self.detList[idx], self.__pointRange(perr)))
+
+            rate= numpy.ones((pts, nbDet), numpy.float64)
+            valid= (ocr > 0.) & (icr > 0.)
+            rate[valid]= icr[valid] / ocr[valid]
+            for idx in numpy.nonzero(~numpy.all(valid, 0))[0]:
+                perr= numpy.nonzero(~valid[:, idx])[0]
+                messages[self.detList[idx]].append( \
+                    "No DeadTime correction perfomed on det #%02d points %s"% \
+                        (self.detList[idx], self.__pointRange(perr)))
+            factors *= rate
+
+        self.__factors[key]= (factors, messages)
+        return self.__factors[key]
+
+    def correct(self, detector, deadtime=1, livetime=0, dtype=None):
+        """
+        Correct the spectra of the given detector. The data are converted
+        once to dtype (default float64) and then corrected in place. Using
+        numpy.float32 halves the memory needed.
+        """
         if detector!=self.detector:
             self.__readData(detector)
 
@@ -363,79 +457,23 @@ def correct(self, detector, deadtime=1, livetime=0):
         if deadtime and corrflag&1:
             raise XiaEdfError("det #%02d seems already deadtime corrected"%detector)
 
-        self.data= self.data.astype(numpy.float)
+        if dtype is None:
+            dtype= numpy.float64
+        self.data= numpy.array(self.data, dtype=dtype, copy=False)
+        if not (deadtime or livetime):
+            return []
+
+        factors, messages= self.getCorrectionFactors(deadtime, livetime)
         idx= self.detList.index(detector)
-        pts= self.statArray.shape[0]
+        self.data *= factors[:, idx:(idx+1)]
 
         if livetime:
-            lvt= numpy.zeros((pts, 1), numpy.float)
-            lvt[:,0]= self.statArray[:,((XiaStatNb*idx)+XiaStatIndex["lt"])] / 1000.0
-
-            perr= self.__checkNullLivetime(lvt, pts)
-            if len(perr):
-                message.append("Null livetime on det #%02d points %s"%(detector, self.__pointRange(perr)))
-
-            self.data= self.data / lvt
-            self.header["xcorr"]= corrflag|2
-
+            corrflag |= 2
         if deadtime:
-            rate= numpy.zeros((self.statArray.shape[0], 1), numpy.float)
-            count= numpy.zeros((self.statArray.shape[0], 2), numpy.float)
-
-            count[:,0]= self.statArray[:, (XiaStatNb*idx)+XiaStatIndex["ocr"]]
-            count[:,1]= self.statArray[:, (XiaStatNb*idx)+XiaStatIndex["icr"]]
+            corrflag |= 1
+        self.header["xcorr"]= corrflag
 
-            perr= self.__checkNullCount(count, pts)
-            if len(perr):
-                message.append("Null ICR|OCR on det #%02d points %s"%(detector, self.__pointRange(perr)))
-
-            perr= []
-            for ipt in range(pts):
-                if count[ipt,0]>0 and count[ipt,1]>0:
-                    rate[ipt,0]= count[ipt,1]/count[ipt,0]
-                else:
-                    rate[ipt,0]= 1.
-                    perr.append(ipt)
-
-            if len(perr):
-                message.append("No DeadTime correction perfomed on det #%02d points %s"%(detector, self.__pointRange(perr)))
-
-            self.data= self.data * rate
-            self.header["xcorr"]= corrflag|1
-
-        return message
-
-    def __checkNullCount(self, count, pts):
-        perr= []
-        check= numpy.sum(numpy.greater(count,0.), 1)
-        for ipt in range(pts):
-            if check[ipt]!=2:
-                perr.append(ipt)
-                if (ipt!=0 and check[ipt-1]==2) and (ipt!=pts-1 and check[ipt+1]==2):
-                    count[ipt,:]= (count[ipt-1,:]+count[ipt+1,:])/2.
-                elif (ipt!=0 and check[ipt-1]==2):
-                    count[ipt,:]= count[ipt-1,:]
-                elif (ipt!=pts-1 and check[ipt+1]==2):
-                    count[ipt,:]= count[ipt+1,:]
-                else:
-                    count[ipt,:]= -1
-        return perr
-
-    def __checkNullLivetime(self, lvt, pts):
-        perr= []
-        check= numpy.greater(lvt, 0.)
-        for ipt in range(pts):
-            if check[ipt]==0:
-                perr.append(ipt)
-                if (ipt!=0 and check[ipt-1]==1) and (ipt!=pts-1 and check[ipt+1]==1):
-                     lvt[ipt,0]= (lvt[ipt+1]+lvt[ipt-1])/2.
-                elif (ipt!=0 and check[ipt-1]==1):
-                     lvt[ipt,0]= lvt[ipt-1,0]
-                elif (ipt!=pts-1 and check[ipt+1]==1):
-                     lvt[ipt,0]= lvt[ipt+1,0]
-                else:
-                     lvt[ipt,0]= 1.
-        return perr
+        return list(messages[detector])
 
     def __pointRange(self, ptlist):
         nb= len(ptlist)
@@ -459,7 +497,7 @@ def __pointRange(self, ptlist):
 
         return "["+ ",".join(ptrange)+"]"
 
-    def sum(self, detectors=[], deadtime=0, livetime=0, average=0):
+    def sum(self, detectors=[], deadtime=0, livetime=0, average=0, dtype=None):
         message= []
         if not len(detectors):
             sumdet= self.detList
@@ -469,15 +507,17 @@ def sum(self, detectors=[], deadtime=0, livetime=0, average=0):
         sumdata= None
         for det in sumdet:
             if deadtime or livetime:
-                message+= self.correct(det, deadtime, livetime)
+                message+= self.correct(det, deadtime, livetime, dtype)
             else:
                 self.__readData(det)
-                self.data= self.data.astype(numpy.float)
+                self.data= numpy.array(self.data,
+                        dtype=numpy.float64 if dtype is None else dtype,
+                        copy=False)
 
             if sumdata is None:
                 sumdata= self.data * 1.0
             else:
-                sumdata= sumdata + self.data
+                sumdata += self.data
 
         if average:
             self.data= sumdata / len(sumdet)
@@ -538,15 +578,15 @@ def isGroupedWith(self, other):
         if (self.isScan() and other.isScan()) or (self.isCount() and other.isCount()):
             file1= "%s/%s"%(self.dir is None and "." or self.dir, self.prefix is None and "" or self.prefix)
             file2= "%s/%s"%(other.dir is None and "." or other.dir, other.prefix is None and "" or other.prefix)
-            res= cmp(file1, file2)
+            res= _cmp(file1, file2)
             if res!=0: return 0
 
-            res= cmp(self.index, other.index)
+            res= _cmp(self.index, other.index)
             if res!=0: return 0
 
             file1= "%s.%s"%(self.suffix is None and "" or self.suffix, self.ext is None and "" or self.ext)
             file2= "%s.%s"%(other.suffix is None and "" or other.suffix, other.ext is None and "" or other.ext)
-            res= cmp(file1, file2)
+            res= _cmp(file1, file2)
             if res!=0: return 0
 
             return 1
@@ -583,6 +623,8 @@ def get(self):
     def __reset(self):
         self.file= None         # --- full filename
         self.dir = None         # --- directory
+        self.prefix= None       # --- file prefix
+        self.ext= None          # --- file extension
         self.type= None         # --- file type = "ct", "st", "det"
         self.index= []          # --- file indexes
         self.suffix= None       # --- suffix
@@ -612,7 +654,7 @@ def __parseFilename(self, filename):
         else:
             self.prefix= "_".join(filelist[0:xiaidx])
             try:
-                self.index= map(int, filelist[xiaidx+1:])
+                self.index= [int(x) for x in filelist[xiaidx+1:]]
             except:
                 self.suffix= "_".join(filelist[xiaidx+1:])
 
@@ -667,33 +709,36 @@ def __createFilename(self):
             if self.ext is not None:
                 self.file= "%s.%s"%(self.file, self.ext)
 
+    def __lt__(self, other):
+        return self.__cmp__(other) < 0
+
     def __cmp__(self, other):
         file1= "%s/%s"%(self.dir is None and "." or self.dir, self.prefix is None and "" or self.prefix)
         file2= "%s/%s"%(other.dir is None and "." or other.dir, other.prefix is None and "" or other.prefix)
-        res= cmp(file1, file2)
+        res= _cmp(file1, file2)
         if res!=0:
             return res
 
-        res= cmp(self.ext, other.ext)
+        res= _cmp(self.ext, other.ext)
         if res!=0:
             return res
 
-        res= cmp(self.index, other.index)
+        res= _cmp(self.index, other.index)
         if res!=0:
             return res
 
-        res= cmp(self.type, other.type)
+        res= _cmp(self.type, other.type)
         if res!=0:
             return res
 
         if self.type=="det" or self.type=="sum":
-            res= cmp(self.det, other.det)
+            res= _cmp(self.det, other.det)
             if res!=0:
                 return res
 
         file1= "%s.%s"%(self.suffix is None and "" or self.suffix, self.ext is None and "" or self.ext)
         file2= "%s.%s"%(other.suffix is None and "" or other.suffix, other.ext is None and "" or other.ext)
-        return cmp(file1, file2)
+        return _cmp(file1, file2)
 
 
 def testScan():
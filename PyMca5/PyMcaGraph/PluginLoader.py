@@ -34,25 +34,121 @@
 
 Class to handle loading of plugins according to target method.
 
-On instantiation, this clase imports all the plugins found in the PLUGINS_DIR
-directory and stores them into the attributes pluginList and pluginInstanceDict
+On instantiation, this class looks for the plugins found in the PLUGINS_DIR
+directory and lists them in the attribute pluginList. The plugin modules are
+imported and instantiated on first use, when their instance is requested from
+the attribute pluginInstanceDict or when calling loadPlugins.
+
+The entry points defined by each plugin file are kept in a manifest cached
+in MANIFEST_FILE, so that unchanged files do not need to be read again.
 
 """
 import os
 import sys
 import glob
+import json
 import logging
+import weakref
 
 PLUGINS_DIR = None
 
+# file caching the entry points of the plugin files, by default
+# PluginManifest.json in the PyMca settings directory
+MANIFEST_FILE = None
+
 _logger = logging.getLogger(__name__)
 
+_MANIFEST = None
+_MANIFEST_VERSION = 1
+
+
+def getManifestFile():
+    if MANIFEST_FILE is not None:
+        return MANIFEST_FILE
+    try:
+        import PyMca5
+        return os.path.join(PyMca5.getDefaultSettingsDirectory(),
+                            "PluginManifest.json")
+    except:
+        _logger.debug("Cannot access settings directory")
+        return None
+
+def _loadManifest():
+    global _MANIFEST
+    fileName = getManifestFile()
+    if (_MANIFEST is None) or (_MANIFEST.get("file") != fileName):
+        _MANIFEST = {"file": fileName, "entries": {}, "modified": False}
+        if (fileName is not None) and os.path.exists(fileName):
+            try:
+                with open(fileName, "r") as f:
+                    ddict = json.load(f)
+                if ddict.get("version") == _MANIFEST_VERSION:
+                    _MANIFEST["entries"] = ddict["entries"]
+            except:
+                _logger.warning("Ignoring invalid plugin manifest %s",
+                                fileName)
+    return _MANIFEST
+
+def _saveManifest(manifest):
+    if (not manifest["modified"]) or (manifest["file"] is None):
+        return
+    try:
+        with open(manifest["file"], "w") as f:
+            json.dump({"version": _MANIFEST_VERSION,
+                       "entries": manifest["entries"]}, f)
+        manifest["modified"] = False
+    except:
+        _logger.debug("Cannot write plugin manifest %s", manifest["file"])
+
+def getEntryPoints(fname, manifest=None):
+    """
+    Names of the functions defined at module level by a plugin file.
+
+    They are read from the manifest unless the file has been modified.
+    """
+    if manifest is None:
+        manifest = _loadManifest()
+    info = os.stat(fname)
+    key = os.path.abspath(fname)
+    entry = manifest["entries"].get(key)
+    if (entry is not None) and (entry["mtime"] == info.st_mtime) and \
+       (entry["size"] == info.st_size):
+        return entry["entryPoints"]
+    entryPoints = []
+    # in Python 3, rb implies bytes and not strings
+    with open(fname, 'r') as f:
+        for line in f:
+            if line.startswith("def "):
+                entryPoints.append(line.split(" ")[1].split("(")[0])
+    manifest["entries"][key] = {"mtime": info.st_mtime,
+                                "size": info.st_size,
+                                "entryPoints": entryPoints}
+    manifest["modified"] = True
+    return entryPoints
+
+
+class _PluginInstanceDict(dict):
+    """
+    Dictionary of plugin instances creating them on first access.
+    """
+    def __init__(self, loader):
+        dict.__init__(self)
+        self._loader = weakref.ref(loader)
+
+    def __missing__(self, key):
+        loader = self._loader()
+        if (loader is None) or (not loader._loadPlugin(key)):
+            raise KeyError(key)
+        return dict.__getitem__(self, key)
+
 
 class PluginLoader(object):
     def __init__(self, method=None, directoryList=None):
         self._pluginDirList = []
         self.pluginList = []
-        self.pluginInstanceDict = {}
+        self.pluginInstanceDict = _PluginInstanceDict(self)
+        self._pendingPlugins = {}
+        self._pluginExceptionMessage = ""
         self.getPlugins(method=method, directoryList=directoryList)
 
     def setPluginDirectoryList(self, dirlist):
@@ -73,7 +169,8 @@ def getPluginDirectoryList(self):
 
     def getPlugins(self, method=None, directoryList=None, exceptions=False):
         """
-        Import or reloads all the available plugins with the target method
+        Find or reload all the available plugins with the target method.
+        The plugins are imported on first use.
 
         :param method: The method to be searched for.
         :type method: string, default "getPlugin1DInstance"
@@ -81,7 +178,7 @@ def getPlugins(self, method=None, directoryList=None, exceptions=False):
         :type directoryList: list or None (default).
         :param exceptions: If True, return the list of error messages
         :type exceptions: boolean (default False)
-        :return: The number of plugins loaded. If exceptions is True, also the
+        :return: The number of plugins found. If exceptions is True, also the
                  text with the error encountered.
         """
         if method is None:
@@ -96,6 +193,9 @@ def getPlugins(self, method=None, directoryList=None, exceptions=False):
         exceptionMessage = ""
         self._pluginDirList = directoryList
         self.pluginList = []
+        self._pendingPlugins = {}
+        self._pluginExceptionMessage = ""
+        manifest = _loadManifest()
         for directory in self._pluginDirList:
             if directory is None:
                 continue
@@ -104,49 +204,33 @@ def getPlugins(self, method=None, directoryList=None, exceptions=False):
 
             fileList = glob.glob(os.path.join(directory, "*.py"))
             # prevent unnecessary imports
-            moduleList = []
             for fname in fileList:
-                # in Python 3, rb implies bytes and not strings
-                f = open(fname, 'r')
-                lines = f.readlines()
-                f.close()
-                f = None
-                for line in lines:
-                    if line.startswith("def"):
-                        if line.split(" ")[1].startswith(targetMethod):
-                            moduleList.append(fname)
-                            break
-            for module in moduleList:
                 try:
-                    pluginName = os.path.basename(module)[:-3]
-                    _logger.debug("pluginName %s", pluginName)
-                    plugin = pluginName
-                    if directory not in sys.path:
-                        sys.path.insert(0, directory)
-                    if pluginName in self.pluginList:
-                        idx = self.pluginList.index(pluginName)
-                        del self.pluginList[idx]
-                    if plugin in self.pluginInstanceDict.keys():
-                        del self.pluginInstanceDict[plugin]
-                    if plugin in sys.modules:
-                        if hasattr(sys.modules[plugin], targetMethod):
-                            if sys.version.startswith('3'):
-                                import imp
-                                imp.reload(sys.modules[plugin])
-                            else:
-                                reload(sys.modules[plugin])
-                    else:
-                        __import__(plugin)
-                    if hasattr(sys.modules[plugin], targetMethod):
-                        theCall = getattr(sys.modules[plugin], targetMethod)
-                        self.pluginInstanceDict[plugin] = theCall(self)
-                        self.pluginList.append(plugin)
+                    entryPoints = getEntryPoints(fname, manifest)
                 except:
                     exceptionMessage += \
-                        "Problem importing module %s\n" % plugin
-                    exceptionMessage += "%s\n" % sys.exc_info()[0]
+                        "Problem reading file %s\n" % fname
                     exceptionMessage += "%s\n" % sys.exc_info()[1]
-                    exceptionMessage += "%s\n" % sys.exc_info()[2]
+                    continue
+                for name in entryPoints:
+                    if name.startswith(targetMethod):
+                        break
+                else:
+                    continue
+                plugin = os.path.basename(fname)[:-3]
+                _logger.debug("pluginName %s", plugin)
+                if directory not in sys.path:
+                    sys.path.insert(0, directory)
+                if plugin in self.pluginList:
+                    idx = self.pluginList.index(plugin)
+                    del self.pluginList[idx]
+                if plugin in self.pluginInstanceDict.keys():
+                    del self.pluginInstanceDict[plugin]
+                # already imported modules are reloaded on first use
+                self._pendingPlugins[plugin] = (targetMethod,
+                                                plugin in sys.modules)
+                self.pluginList.append(plugin)
+        _saveManifest(manifest)
 
         if len(exceptionMessage) and _logger.getEffectiveLevel() == logging.DEBUG:
             raise IOError(exceptionMessage)
@@ -155,9 +239,74 @@ def getPlugins(self, method=None, directoryList=None, exceptions=False):
         else:
             return len(self.pluginList)
 
+    def _loadPlugin(self, plugin):
+        """
+        Import and instantiate a plugin found by getPlugins.
+
+        :return: True if the instance is available in pluginInstanceDict
+        """
+        if plugin not in self._pendingPlugins:
+            return False
+        targetMethod, reloadModule = self._pendingPlugins.pop(plugin)
+        try:
+            if reloadModule and (plugin in sys.modules):
+                if hasattr(sys.modules[plugin], targetMethod):
+                    if sys.version.startswith('3'):
+                        import imp
+                        imp.reload(sys.modules[plugin])
+                    else:
+                        reload(sys.modules[plugin])
+            else:
+                __import__(plugin)
+            if hasattr(sys.modules[plugin], targetMethod):
+                theCall = getattr(sys.modules[plugin], targetMethod)
+                instance = theCall(self)
+                dict.__setitem__(self.pluginInstanceDict, plugin, instance)
+                self._pluginLoaded(plugin, instance)
+                return True
+        except:
+            self._pluginExceptionMessage += \
+                "Problem importing module %s\n" % plugin
+            self._pluginExceptionMessage += "%s\n" % sys.exc_info()[0]
+            self._pluginExceptionMessage += "%s\n" % sys.exc_info()[1]
+            self._pluginExceptionMessage += "%s\n" % sys.exc_info()[2]
+            _logger.warning("Problem importing plugin %s: %s",
+                            plugin, sys.exc_info()[1])
+        if plugin in self.pluginList:
+            del self.pluginList[self.pluginList.index(plugin)]
+        return False
+
+    def _pluginLoaded(self, plugin, instance):
+        """
+        Called after instantiating a plugin. To be overloaded.
+        """
+        pass
+
+    def loadPlugins(self, exceptions=False):
+        """
+        Import and instantiate all the plugins not already loaded.
+
+        Plugins failing to load are removed from pluginList.
+
+        :param exceptions: If True, return the list of error messages
+        :type exceptions: boolean (default False)
+        :return: The number of plugins loaded. If exceptions is True, also the
+                 text with the error encountered.
+        """
+        for plugin in list(self.pluginList):
+            self._loadPlugin(plugin)
+        exceptionMessage = self._pluginExceptionMessage
+        if len(exceptionMessage) and _logger.getEffectiveLevel() == logging.DEBUG:
+            raise IOError(exceptionMessage)
+        if exceptions:
+            return len(self.pluginList), exceptionMessage
+        else:
+            return len(self.pluginList)
+
 def main(targetMethod, directoryList):
     loader = PluginLoader()
-    n = loader.getPlugins(targetMethod, directoryList)
+    loader.getPlugins(targetMethod, directoryList)
+    n = loader.loadPlugins()
     print("Loaded %d plugins" % n)
     for m in loader.pluginList:
         print("Module %s" % m)
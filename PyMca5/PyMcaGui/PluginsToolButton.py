@@ -126,8 +126,17 @@ def _disconnectPlotSignals(self):
     def getPlugins(self, method=None, directoryList=None, exceptions=False):
         """method overloaded to update signal connections when loading plugins"""
         self._disconnectPlotSignals()
-        PluginLoader.getPlugins(self, method, directoryList, exceptions)
+        result = PluginLoader.getPlugins(self, method, directoryList, exceptions)
         self._connectPlotSignals()
+        return result
+
+    def _pluginLoaded(self, plugin, instance):
+        """method overloaded to connect the signals of plugins loaded
+        on first use"""
+        if hasattr(instance, "activeCurveChanged") and callable(instance.activeCurveChanged):
+            self.plot.sigActiveCurveChanged.connect(instance.activeCurveChanged)
+        if hasattr(instance, "activeImageChanged") and callable(instance.activeImageChanged):
+            self.plot.sigActiveImageChanged.connect(instance.activeImageChanged)
 
     def _pluginClicked(self):
         actionNames = []
@@ -146,6 +155,8 @@ def _pluginClicked(self):
         menu.addSeparator()
         actionNames.append(text)
         callableKeys = ["Dummy0", "Dummy1", "Dummy2"]
+        # plugins are imported on first use
+        self.loadPlugins()
         pluginInstances = self.pluginInstanceDict
         for pluginName in self.pluginList:
             if pluginName in ["PyMcaPlugins.Plugin1DBase", "Plugin1DBase"]:
@@ -185,7 +196,8 @@ def _pluginClicked(self):
 
         idx = actionNames.index(a.text())
         if a.text() == "Reload Plugins":
-            n, message = self.getPlugins(exceptions=True)
+            self.getPlugins()
+            n, message = self.loadPlugins(exceptions=True)
             if n < 1:
                 msg = qt.QMessageBox(self)
                 msg.setIcon(qt.QMessageBox.Information)
@@ -899,6 +899,8 @@ def _pluginClicked(self):
         actionList.append(text)
         menu.addSeparator()
         callableKeys = ["Dummy0", "Dummy1", "Dummy2"]
+        # plugins are imported on first use
+        self.loadPlugins()
         for m in self.pluginList:
             if m in ["PyMcaPlugins.Plugin1DBase", "Plugin1DBase"]:
                 continue
@@ -935,7 +937,8 @@ def _pluginClicked(self):
             return None
         idx = actionList.index(a.text())
         if idx == 0:
-            n, message = self.getPlugins(exceptions=True)
+            self.getPlugins()
+            n, message = self.loadPlugins(exceptions=True)
             if n < 1:
                 msg = qt.QMessageBox(self)
                 msg.setIcon(qt.QMessageBox.Information)
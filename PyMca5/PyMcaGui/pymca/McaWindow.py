@@ -48,14 +48,18 @@
 from . import ScanWindow
 from . import McaCalibrationControlGUI
 from PyMca5.PyMcaIO import ConfigDict
-from PyMca5.PyMcaGui.physics.xrf import McaAdvancedFit
 from PyMca5.PyMcaGui.physics.xrf import McaCalWidget
 from PyMca5.PyMcaCore import DataObject
+from PyMca5.PyMcaCore import LazyImport
 from . import McaSimpleFit
 from PyMca5.PyMcaMath.fitting import Specfit
 from PyMca5.PyMcaGui.pymca.McaLegendselector import McaLegendsDockWidget
 from PyMca5.PyMcaGui.plotting.PyMca_Icons import IconDict
 
+# the advanced fit window is only built when requested
+McaAdvancedFit = LazyImport.LazyModule(
+                        "PyMca5.PyMcaGui.physics.xrf.McaAdvancedFit")
+
 MATPLOTLIB = True
 
 # force understanding of utf-8 encoding
@@ -106,7 +110,9 @@ def __init__(self, parent=None, name="Mca Window", fit=True, backend=None,
         self.simplefit = McaSimpleFit.McaSimpleFit(specfit=self.specfit)
         self.specfit.fitconfig['McaMode'] = 1
 
-        self.advancedfit = McaAdvancedFit.McaAdvancedFit()
+        self._advancedfit = None
+        self._advancedfitConfiguration = None
+        self._advancedfitConfigDir = None
 
         self._buildCalibrationControlWidget()
 
@@ -145,6 +151,53 @@ def __init__(self, parent=None, name="Mca Window", fit=True, backend=None,
         self.yMinToZero.setVisible(False)
         self.subtractAction.setVisible(False)
 
+    def _getAdvancedFit(self):
+        if self._advancedfit is None:
+            self._advancedfit = McaAdvancedFit.McaAdvancedFit()
+            self._advancedfit.sigMcaAdvancedFitSignal.connect(self.__anasignal)
+            if self._advancedfitConfiguration is not None:
+                self._advancedfit.mcafit.configure(
+                                        self._advancedfitConfiguration)
+                self._advancedfitConfiguration = None
+            if self._advancedfitConfigDir is not None:
+                self._advancedfit.configDir = self._advancedfitConfigDir
+                self._advancedfitConfigDir = None
+        return self._advancedfit
+
+    advancedfit = property(_getAdvancedFit,
+                           doc="Advanced fit window, built on first use")
+
+    def isAdvancedFitCreated(self):
+        return self._advancedfit is not None
+
+    def getAdvancedFitConfiguration(self):
+        """
+        Return the advanced fit configuration and configuration directory
+        without building the advanced fit window. Both can be None.
+        """
+        if self._advancedfit is None:
+            return self._advancedfitConfiguration, self._advancedfitConfigDir
+        return self._advancedfit.mcafit.configure(), \
+               self._advancedfit.configDir
+
+    def setAdvancedFitConfiguration(self, configuration=None, configDir=None):
+        """
+        Configure the advanced fit. If its window is not built yet, the
+        configuration is applied when it gets built.
+        """
+        if self._advancedfit is None:
+            if configuration is not None:
+                self._advancedfitConfiguration = configuration
+            if configDir is not None:
+                self._advancedfitConfigDir = configDir
+            return
+        if configuration is not None:
+            self._advancedfit.mcafit.configure(configuration)
+            if not self._advancedfit.isHidden():
+                self._advancedfit._updateTop()
+        if configDir is not None:
+            self._advancedfit.configDir = configDir
+
     def getLegendsDockWidget(self):
         # customize the legendsdockwidget to handle curve renaming
         if self._legendsDockWidget is None:
@@ -177,7 +230,6 @@ def _buildCalibrationControlWidget(self):
 
     def connections(self):
         self.simplefit.sigMcaSimpleFitSignal.connect(self.__anasignal)
-        self.advancedfit.sigMcaAdvancedFitSignal.connect(self.__anasignal)
         self.getCurvesRoiDockWidget().sigROISignal.connect(self.emitCurrentROISignal)
 
     def mcaSimpleFitSignal(self):
@@ -190,7 +242,8 @@ def mcaSimpleFitSignal(self):
             msg.exec_()
             return
         x, y, info = self.getDataAndInfoFromLegend(legend)
-        self.advancedfit.hide()
+        if self._advancedfit is not None:
+            self._advancedfit.hide()
         self.simplefit.show()
         self.simplefit.setFocus()
         self.simplefit.raise_()
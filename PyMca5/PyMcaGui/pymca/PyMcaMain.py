@@ -153,17 +153,16 @@
 else:
     QString = qt.safe_str
 
-try:
-    from PyMca5.PyMcaGui.physics.xrf import XRFMCPyMca
-    XRFMC_FLAG = True
-except:
-    XRFMC_FLAG = False
+# modules only needed on user request are imported on first use,
+# import errors are reported then (see _loadModule)
+from PyMca5.PyMcaCore import LazyImport
 
-try:
-    from PyMca5.PyMcaGui.pymca import SumRulesTool
-    SUMRULES_FLAG = True
-except:
-    SUMRULES_FLAG = False
+XRFMCPyMca = LazyImport.LazyModule("PyMca5.PyMcaGui.physics.xrf.XRFMCPyMca")
+XRFMC_FLAG = LazyImport.isAvailable("PyMca5.PyMcaGui.physics.xrf.XRFMCPyMca")
+
+SumRulesTool = LazyImport.LazyModule("PyMca5.PyMcaGui.pymca.SumRulesTool")
+SUMRULES_FLAG = ("silx.gui.plot" in sys.modules) and \
+                LazyImport.isAvailable("PyMca5.PyMcaGui.pymca.SumRulesTool")
 
 # prefer lazy import to avoid OpenCL related crashes on startup
 TOMOGUI_FLAG = True
@@ -233,8 +232,9 @@
 from PyMca5.PyMcaGui.pymca import ScanWindow
 from PyMca5.PyMcaGui.pymca import McaWindow
 
-from PyMca5.PyMcaGui.pymca import PyMcaImageWindow
-from PyMca5.PyMcaGui.pymca import PyMcaHKLImageWindow
+PyMcaImageWindow = LazyImport.LazyModule("PyMca5.PyMcaGui.pymca.PyMcaImageWindow")
+PyMcaHKLImageWindow = LazyImport.LazyModule(
+                            "PyMca5.PyMcaGui.pymca.PyMcaHKLImageWindow")
 try:
     #This is to make sure it is properly frozen
     #and that Object3D is fully supported
@@ -249,31 +249,26 @@
 except:
     OBJECT3D = False
 from PyMca5.PyMcaGui.pymca import QDispatcher
-from PyMca5.PyMcaGui import ElementsInfo
-from PyMca5.PyMcaGui import PeakIdentifier
-from PyMca5.PyMcaGui.pymca import PyMcaBatch
+from PyMca5.PyMcaPhysics.xrf import Elements
+ElementsInfo = LazyImport.LazyModule("PyMca5.PyMcaGui.ElementsInfo")
+PeakIdentifier = LazyImport.LazyModule("PyMca5.PyMcaGui.PeakIdentifier")
+PyMcaBatch = LazyImport.LazyModule("PyMca5.PyMcaGui.pymca.PyMcaBatch")
 ###########import Fit2Spec
-from PyMca5.PyMcaGui.pymca import Mca2Edf
-try:
-    from PyMca5.PyMcaGui.pymca import QStackWidget
-    from PyMca5.PyMcaGui.pymca import StackSelector
-    STACK = True
-except:
-    STACK = False
-from PyMca5.PyMcaGui.pymca import PyMcaPostBatch
-from PyMca5.PyMcaGui import RGBCorrelator
-from PyMca5.PyMcaGui import MaterialEditor
+Mca2Edf = LazyImport.LazyModule("PyMca5.PyMcaGui.pymca.Mca2Edf")
+QStackWidget = LazyImport.LazyModule("PyMca5.PyMcaGui.pymca.QStackWidget")
+StackSelector = LazyImport.LazyModule("PyMca5.PyMcaGui.pymca.StackSelector")
+STACK = LazyImport.isAvailable("PyMca5.PyMcaGui.pymca.QStackWidget")
+PyMcaPostBatch = LazyImport.LazyModule("PyMca5.PyMcaGui.pymca.PyMcaPostBatch")
+RGBCorrelator = LazyImport.LazyModule("PyMca5.PyMcaGui.RGBCorrelator")
+MaterialEditor = LazyImport.LazyModule("PyMca5.PyMcaGui.MaterialEditor")
 
 from PyMca5.PyMcaIO import ConfigDict
 from PyMca5 import PyMcaDirs
 
 XIA_CORRECT = False
+XiaCorrect = LazyImport.LazyModule("PyMca5.PyMcaCore.XiaCorrect")
 if QTVERSION > '4.3.0':
-    try:
-        from PyMca5.PyMcaCore import XiaCorrect
-        XIA_CORRECT = True
-    except:
-        pass
+    XIA_CORRECT = LazyImport.isAvailable("PyMca5.PyMcaCore.XiaCorrect")
 
 SOURCESLIST = QDispatcher.QDataSource.source_types.keys()
 
@@ -751,20 +746,25 @@ def getConfig(self):
         #fit related
         d['Elements'] = {}
         d['Elements']['Material'] = {}
-        d['Elements']['Material'].update(ElementsInfo.Elements.Material)
+        d['Elements']['Material'].update(Elements.Material)
         d['Fit'] = {}
-        if self.mcaWindow.advancedfit.configDir is not None:
-            d['Fit'] ['ConfigDir'] = self.mcaWindow.advancedfit.configDir * 1
-        d['Fit'] ['Configuration'] = {}
-        d['Fit'] ['Configuration'].update(self.mcaWindow.advancedfit.mcafit.configure())
-        d['Fit'] ['Information'] = {}
-        d['Fit'] ['Information'].update(self.mcaWindow.advancedfit.info)
-        d['Fit'] ['LastFit'] = {}
-        d['Fit'] ['LastFit']['hidden'] = self.mcaWindow.advancedfit.isHidden()
-        d['Fit'] ['LastFit']['xdata0'] = self.mcaWindow.advancedfit.mcafit.xdata0
-        d['Fit'] ['LastFit']['ydata0'] = self.mcaWindow.advancedfit.mcafit.ydata0
-        d['Fit'] ['LastFit']['sigmay0']= self.mcaWindow.advancedfit.mcafit.sigmay0
-        d['Fit'] ['LastFit']['fitdone']= self.mcaWindow.advancedfit._fitdone()
+        configuration, configDir = \
+                        self.mcaWindow.getAdvancedFitConfiguration()
+        if configDir is not None:
+            d['Fit'] ['ConfigDir'] = configDir * 1
+        if configuration is not None:
+            d['Fit'] ['Configuration'] = {}
+            d['Fit'] ['Configuration'].update(configuration)
+        if self.mcaWindow.isAdvancedFitCreated():
+            advancedfit = self.mcaWindow.advancedfit
+            d['Fit'] ['Information'] = {}
+            d['Fit'] ['Information'].update(advancedfit.info)
+            d['Fit'] ['LastFit'] = {}
+            d['Fit'] ['LastFit']['hidden'] = advancedfit.isHidden()
+            d['Fit'] ['LastFit']['xdata0'] = advancedfit.mcafit.xdata0
+            d['Fit'] ['LastFit']['ydata0'] = advancedfit.mcafit.ydata0
+            d['Fit'] ['LastFit']['sigmay0']= advancedfit.mcafit.sigmay0
+            d['Fit'] ['LastFit']['fitdone']= advancedfit._fitdone()
         #d['Fit'] ['LastFit']['fitdone']= 1
         #d['Fit'] ['LastFit']['xmin'] = self.mcaWindow.advancedfit.mcafit.sigma0
         #d['Fit'] ['LastFit']['xmax'] = self.mcaWindow.advancedfit.mcafit.sigma0
@@ -900,7 +900,7 @@ def __configureRoi(self, ddict):
 
     def __configureElements(self, ddict):
         if 'Material' in ddict:
-            ElementsInfo.Elements.Material.update(ddict['Material'])
+            Elements.Material.update(ddict['Material'])
 
     def __configureFit(self, d):
         if 'Configuration' in d:
@@ -928,12 +928,12 @@ def __configureFit(self, d):
                     print("hidden")
 
     def __configureFit(self, d):
-        if 'Configuration' in d:
-            self.mcaWindow.advancedfit.mcafit.configure(d['Configuration'])
-            if not self.mcaWindow.advancedfit.isHidden():
-                self.mcaWindow.advancedfit._updateTop()
-        if 'ConfigDir' in d:
-            self.mcaWindow.advancedfit.configDir = d['ConfigDir'] * 1
+        # kept until the advanced fit window is built
+        configuration = d.get('Configuration', None)
+        configDir = d.get('ConfigDir', None)
+        if configDir is not None:
+            configDir = configDir * 1
+        self.mcaWindow.setAdvancedFitConfiguration(configuration, configDir)
         if False and ('LastFit' in d):
             if (d['LastFit']['ydata0'] != None) and \
                (d['LastFit']['ydata0'] != 'None'):
@@ -1169,6 +1169,8 @@ def toggleSource(self,**kw):
 
     def __elementsInfo(self):
         if self.elementsInfo is None:
+            if not self._loadModule(ElementsInfo):
+                return
             self.elementsInfo=ElementsInfo.ElementsInfo(None,"Elements Info")
         if self.elementsInfo.isHidden():
            self.elementsInfo.show()
@@ -1176,6 +1178,8 @@ def __elementsInfo(self):
 
     def __attTool(self):
         if self.attenuationTool is None:
+            if not self._loadModule(MaterialEditor):
+                return
             self.attenuationTool = MaterialEditor.MaterialEditor(toolmode=True)
         if self.attenuationTool.isHidden():
             self.attenuationTool.show()
@@ -1183,6 +1187,8 @@ def __attTool(self):
 
     def __peakIdentifier(self):
         if self.identifier is None:
+            if not self._loadModule(PeakIdentifier):
+                return
             self.identifier=PeakIdentifier.PeakIdentifier(energy=5.9,
                                 useviewer=1)
             self.identifier.mySlot()
@@ -1192,6 +1198,8 @@ def __peakIdentifier(self):
 
     def __batchFitting(self):
         if self.__batch is None:
+            if not self._loadModule(PyMcaBatch):
+                return
             self.__batch = PyMcaBatch.McaBatchGUI(fl=0,actions=1)
         if self.__batch.isHidden():
             self.__batch.show()
@@ -1199,6 +1207,8 @@ def __batchFitting(self):
 
     def __mca2EdfConversion(self):
         if self.__mca2Edf is None:
+            if not self._loadModule(Mca2Edf):
+                return
             self.__mca2Edf = Mca2Edf.Mca2EdfGUI(fl=0,actions=1)
         if self.__mca2Edf.isHidden():
             self.__mca2Edf.show()
@@ -1212,6 +1222,8 @@ def __fit2SpecConversion(self):
         self.__fit2Spec.raise_()
 
     def __rgbCorrelator(self):
+        if not self._loadModule(PyMcaPostBatch):
+            return
         if self.__correlator is None:
             self.__correlator = []
         fileTypeList = ["Batch Result Files (*dat)",
@@ -1339,6 +1351,8 @@ def __getStackOfFiles(self, typelist, message="", getfilter=False):
 
     def __roiImaging(self):
         if self.__imagingTool is None:
+            if not self._loadModule(QStackWidget):
+                return
             rgbWidget = None
             try:
                 widget = QStackWidget.QStackWidget(mcawidget=self.mcaWindow,
@@ -1404,18 +1418,42 @@ def closeEvent(self, event):
                     _logger.debug("Error closing widget")
         return PyMcaMdi.PyMcaMdi.closeEvent(self, event)
 
+    def _loadModule(self, module):
+        """
+        Import a module deferred at startup. Return False and report the
+        error if it cannot be imported.
+        """
+        try:
+            LazyImport.load(module)
+        except:
+            _logger.debug("Import error", exc_info=True)
+            msg = qt.QMessageBox(self)
+            msg.setIcon(qt.QMessageBox.Critical)
+            msg.setWindowTitle("Import Error")
+            msg.setText("Import Error: %s" % sys.exc_info()[1])
+            msg.setDetailedText(traceback.format_exc())
+            msg.exec_()
+            return False
+        return True
+
     def __xiaCorrect(self):
+        if not self._loadModule(XiaCorrect):
+            return
         qApp = qt.QApplication.instance()
         XiaCorrect.mainGUI(qApp)
 
     def _xrfmcPyMca(self):
         if self._xrfmcTool is None:
+            if not self._loadModule(XRFMCPyMca):
+                return
             self._xrfmcTool = XRFMCPyMca.XRFMCPyMca()
         self._xrfmcTool.show()
         self._xrfmcTool.raise_()
 
     def _sumRules(self):
         if self._sumRulesTool is None:
+            if not self._loadModule(SumRulesTool):
+                return
             self._sumRulesTool = SumRulesTool.SumRulesWindow()
         self._sumRulesTool.show()
         self._sumRulesTool.raise_()
@@ -36,7 +36,8 @@ class QHDF5Stack1D(HDF5Stack1D.HDF5Stack1D):
     def __init__(self, filelist=None,
                        selection=None,
                        scanlist=None,
-                       dtype=None):
+                       dtype=None,
+                       lazy=None):
         if (filelist is None) or (selection is None):
             wizard = QHDF5StackWizard.QHDF5StackWizard()
             if filelist is not None:
@@ -48,7 +49,8 @@ def __init__(self, filelist=None,
             filelist, selection, scanlist = wizard.getParameters()
         HDF5Stack1D.HDF5Stack1D.__init__(self, filelist, selection,
                                 scanlist=scanlist,
-                                dtype=dtype)
+                                dtype=dtype,
+                                lazy=lazy)
 
     def onBegin(self, nfiles):
         self.bars =qt.QWidget()
@@ -44,9 +44,10 @@ class QSpsDataSource(QSource.QSource):
     Emitted signals are :
     updated
     """
-    def __init__(self, sourceName):
+    def __init__(self, sourceName, zerocopy=False):
         QSource.QSource.__init__(self)
-        self.__dataSource = SpsDataSource.SpsDataSource(sourceName)
+        self.__dataSource = SpsDataSource.SpsDataSource(sourceName,
+                                                        zerocopy=zerocopy)
         #easy speed up by making a local reference
         self.sourceName = self.__dataSource.sourceName
         self.isUpdated  = self.__dataSource.isUpdated
@@ -36,6 +36,8 @@
 from PyMca5.PyMcaGui import PyMcaQt as qt
 from PyMca5.PyMcaIO import EDFStack
 from PyMca5.PyMcaIO import SpecFileStack
+from PyMca5.PyMcaIO import LuciaMap
+from PyMca5.PyMcaIO import RenishawMap
 DEBUG = 0
 
 class SimpleThread(qt.QThread):
@@ -101,3 +103,35 @@ def onProgress(self,index):
     def onEnd(self):
         self.bars.hide()
         del self.bars
+
+class QChunkProgressMixIn(object):
+    """
+    Progress bar for the readers of text maps reporting the chunks read.
+    """
+    def onBegin(self, nchunks):
+        self.bars =qt.QWidget()
+        self.bars.setWindowTitle("Reading progress")
+        self.barsLayout = qt.QGridLayout(self.bars)
+        self.barsLayout.setContentsMargins(2, 2, 2, 2)
+        self.barsLayout.setSpacing(3)
+        self.progressBar   = qt.QProgressBar(self.bars)
+        self.progressLabel = qt.QLabel(self.bars)
+        self.progressLabel.setText('Chunk Progress:')
+        self.barsLayout.addWidget(self.progressLabel,0,0)
+        self.barsLayout.addWidget(self.progressBar,0,1)
+        self.progressBar.setMaximum(nchunks)
+        self.progressBar.setValue(0)
+        self.bars.show()
+
+    def onProgress(self,index):
+        self.progressBar.setValue(index)
+
+    def onEnd(self):
+        self.bars.hide()
+        del self.bars
+
+class QLuciaMap(QChunkProgressMixIn, LuciaMap.LuciaMap):
+    pass
+
+class QRenishawMap(QChunkProgressMixIn, RenishawMap.RenishawMap):
+    pass
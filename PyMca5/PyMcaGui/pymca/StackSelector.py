@@ -40,7 +40,6 @@
 from PyMca5.PyMcaIO import MRCMap
 from PyMca5.PyMcaIO import OmnicMap
 from PyMca5.PyMcaIO import OpusDPTMap
-from PyMca5.PyMcaIO import LuciaMap
 from PyMca5.PyMcaIO import SupaVisioMap
 from PyMca5.PyMcaIO import AifiraMap
 from PyMca5.PyMcaIO import TextImageStack
@@ -51,7 +50,7 @@
 from PyMca5.PyMcaIO import OmdaqLmf
 from PyMca5.PyMcaIO import JcampOpusStack
 from PyMca5.PyMcaIO import FsmMap
-from .QStack import QStack, QSpecFileStack
+from .QStack import QStack, QSpecFileStack, QLuciaMap, QRenishawMap
 try:
     from PyMca5.PyMcaGui.pymca import QHDF5Stack1D
     import h5py
@@ -124,7 +123,7 @@ def getStack(self, filelist=None, imagestack=None):
                   filelist[0].upper().endswith("TIFF")):
                 stack = TiffStack.TiffStack(imagestack=True)
             elif filefilter.upper().startswith("RENISHAW"):
-                stack = RenishawMap.RenishawMap(filelist[0])
+                stack = QRenishawMap(filelist[0])
                 omnicfile = True
             elif filefilter.upper().startswith("PerkinElmer-FSM"):
                 stack = FsmMap.FsmMap(filelist[0])
@@ -151,7 +150,7 @@ def getStack(self, filelist=None, imagestack=None):
                 stack = OmnicMap.OmnicMap(filelist[0])
                 omnicfile = True
             elif line.startswith('#\tDate'):
-                stack = LuciaMap.LuciaMap(filelist[0])
+                stack = QLuciaMap(filelist[0])
                 omnicfile = True
             elif filelist[0].upper().endswith("RAW.GZ")or\
                  filelist[0].upper().endswith("EDF.GZ")or\
@@ -189,7 +188,7 @@ def getStack(self, filelist=None, imagestack=None):
                 # columns would be accepted as a Renishaw Map
                 # by other hand, I do not know how to handle
                 # that case as a stack.
-                stack = RenishawMap.RenishawMap(filelist[0])
+                stack = QRenishawMap(filelist[0])
                 omnicfile = True
             elif OmdaqLmf.isOmdaqLmf(filelist[0]):
                 stack = OmdaqLmf.OmdaqLmf(filelist[0])
@@ -285,7 +284,7 @@ def getStackFromPattern(self, filepattern, begin, end, increment=None,
         elif line.startswith('Spectral'):
             stack = OmnicMap.OmnicMap(args[0])
         elif line.startswith('#\tDate:'):
-            stack = LuciaMap.LuciaMap(args[0])
+            stack = QLuciaMap(args[0])
         elif args[0][-4:].upper() in ["PIGE", "PIXE"]:
             stack = SupaVisioMap.SupaVisioMap(args[0])
         elif args[0][-3:].upper() in ["RBS"]:
@@ -48,6 +48,10 @@
 HDF5 = True
 try:
     import h5py
+    try:
+        from PyMca5.PyMcaIO import HDF5ChunkWriter
+    except ImportError:
+        import HDF5ChunkWriter
     if sys.version_info < (3, ):
         text_dtype = h5py.special_dtype(vlen=unicode)
     else:
@@ -310,25 +314,17 @@ def getHDF5FileInstanceAndBuffer(filename, shape,
         pass
     if compression:
         _logger.debug("Saving compressed and chunked dataset")
-        chunk1 = int(shape[1] / 10)
-        if chunk1 == 0:
-            chunk1 = shape[1]
-        for i in [11, 10, 8, 7, 5, 4]:
-            if (shape[1] % i) == 0:
-                chunk1 = int(shape[1] / i)
-                break
-        chunk2 = int(shape[2] / 10)
-        if chunk2 == 0:
-            chunk2 = shape[2]
-        for i in [11, 10, 8, 7, 5, 4]:
-            if (shape[2] % i) == 0:
-                chunk2 = int(shape[2] / i)
-                break
+        if interpretation in [b"image", u"image"]:
+            mcaIndex = 0
+        else:
+            mcaIndex = -1
+        chunks = HDF5ChunkWriter.getChunkShape(shape, dtype, mcaIndex=mcaIndex)
         data = nxData.require_dataset(buffername,
                                       shape=shape,
                                       dtype=dtype,
-                                      chunks=(1, chunk1, chunk2),
-                                      compression=compression)
+                                      chunks=chunks,
+                                      **HDF5ChunkWriter.getCompressionOptions(
+                                                                compression))
     else:
         #no chunking
         _logger.debug("Saving not compressed and not chunked dataset")
@@ -414,7 +410,15 @@ def save3DArrayAsMonochromaticTiff(data, filename,
 
 # it should be used to name the data that for the time being is named 'data'.
 def save3DArrayAsHDF5(data, filename, axes=None, labels=None, dtype=None, mode='nexus',
-                      mcaindex=-1, interpretation=None, compression=None):
+                      mcaindex=-1, interpretation=None, compression=None,
+                      nthreads=None):
+    """
+    Save a 3D array as an HDF5 file.
+
+    When compression is requested (see HDF5ChunkWriter.getCompressionOptions)
+    the dataset is chunked for both spectrum and image access and, for gzip,
+    its chunks are compressed on nthreads threads.
+    """
     if not HDF5:
         raise IOError('h5py does not seem to be installed in your system')
     if (mcaindex == 0) and (interpretation in ["spectrum", None]):
@@ -457,39 +461,37 @@ def save3DArrayAsHDF5(data, filename, axes=None, labels=None, dtype=None, mode='
             pass
         if modify:
             if interpretation in [b"image", u"image"]:
-                if compression:
+                if compression and isinstance(data, numpy.ndarray):
                     _logger.debug("Saving compressed and chunked dataset")
-                    #risk of taking a 10 % more space in disk
-                    chunk1 = int(shape[1] / 10)
-                    if chunk1 == 0:
-                        chunk1 = shape[1]
-                    for i in [11, 10, 8, 7, 5, 4]:
-                        if (shape[1] % i) == 0:
-                            chunk1 = int(shape[1] / i)
-                            break
-                    chunk2 = int(shape[2] / 10)
-                    for i in [11, 10, 8, 7, 5, 4]:
-                        if (shape[2] % i) == 0:
-                            chunk2 = int(shape[2] / i)
-                            break
-                    dset = nxData.require_dataset('data',
-                                                  shape=shape,
-                                                  dtype=dtype,
-                                                  chunks=(1, chunk1, chunk2),
-                                                  compression=compression)
+                    dset = HDF5ChunkWriter.createDataset(nxData, 'data',
+                                            data=data.transpose(2, 0, 1),
+                                            dtype=dtype,
+                                            compression=compression,
+                                            mcaIndex=0,
+                                            nthreads=nthreads)
                 else:
-                    _logger.debug("Saving not compressed and not chunked dataset")
-                    #print not compressed -> Not chunked
-                    dset = nxData.require_dataset('data',
-                                                  shape=shape,
-                                                  dtype=dtype,
-                                                  compression=None)
-                for i in range(data.shape[-1]):
-                    tmp = data[:, :, i:i + 1]
-                    tmp.shape = 1, shape[1], shape[2]
-                    dset[i, 0:shape[1], :] = tmp
-                    _logger.info("Saved item %d of %d",
-                                 i + 1, data.shape[-1])
+                    if compression:
+                        _logger.debug("Saving compressed and chunked dataset")
+                        dset = nxData.require_dataset('data',
+                                    shape=shape,
+                                    dtype=dtype,
+                                    chunks=HDF5ChunkWriter.getChunkShape(shape,
+                                                            dtype, mcaIndex=0),
+                                    **HDF5ChunkWriter.getCompressionOptions(
+                                                                compression))
+                    else:
+                        _logger.debug("Saving not compressed and not chunked dataset")
+                        #print not compressed -> Not chunked
+                        dset = nxData.require_dataset('data',
+                                                      shape=shape,
+                                                      dtype=dtype,
+                                                      compression=None)
+                    for i in range(data.shape[-1]):
+                        tmp = data[:, :, i:i + 1]
+                        tmp.shape = 1, shape[1], shape[2]
+                        dset[i, 0:shape[1], :] = tmp
+                        _logger.info("Saved item %d of %d",
+                                     i + 1, data.shape[-1])
             elif 0:
                 # if I do not match the input and output shapes it takes ages
                 # to save the images as spectra. However, it is much faster
@@ -518,59 +520,55 @@ def save3DArrayAsHDF5(data, filename, axes=None, labels=None, dtype=None, mode='
                 # if I do not match the input and output shapes it takes ages
                 # to save the images as spectra. This is a very fast saving, but
                 # the performance is awful when reading.
-                if compression:
+                if compression and isinstance(data, numpy.ndarray):
+                    # chunks holding parts of several spectra are fine
+                    # for both spectrum and image access
                     _logger.debug("Saving compressed and chunked dataset")
-                    dset = nxData.require_dataset('data',
-                               shape=shape,
-                               dtype=dtype,
-                               chunks=(shape[0], shape[1], 1),
-                               compression=compression)
+                    dset = HDF5ChunkWriter.createDataset(nxData, 'data',
+                                            data=data.transpose(1, 2, 0),
+                                            dtype=dtype,
+                                            compression=compression,
+                                            mcaIndex=-1,
+                                            nthreads=nthreads)
                 else:
-                    _logger.debug("Saving not compressed and not chunked dataset")
-                    dset = nxData.require_dataset('data',
-                                                  shape=shape,
-                                                  dtype=dtype,
-                                                  compression=None)
-                for i in range(data.shape[0]):
-                    tmp = data[i:i + 1, :, :]
-                    tmp.shape = shape[0], shape[1], 1
-                    dset[:, :, i:i + 1] = tmp
+                    if compression:
+                        _logger.debug("Saving compressed and chunked dataset")
+                        dset = nxData.require_dataset('data',
+                                   shape=shape,
+                                   dtype=dtype,
+                                   chunks=(shape[0], shape[1], 1),
+                                   compression=compression)
+                    else:
+                        _logger.debug("Saving not compressed and not chunked dataset")
+                        dset = nxData.require_dataset('data',
+                                                      shape=shape,
+                                                      dtype=dtype,
+                                                      compression=None)
+                    for i in range(data.shape[0]):
+                        tmp = data[i:i + 1, :, :]
+                        tmp.shape = shape[0], shape[1], 1
+                        dset[:, :, i:i + 1] = tmp
         else:
             if compression:
                 _logger.debug("Saving compressed and chunked dataset")
-                chunk1 = int(shape[1] / 10)
-                if chunk1 == 0:
-                    chunk1 = shape[1]
-                for i in [11, 10, 8, 7, 5, 4]:
-                    if (shape[1] % i) == 0:
-                        chunk1 = int(shape[1] / i)
-                        break
-                chunk2 = int(shape[2] / 10)
-                if chunk2 == 0:
-                    chunk2 = shape[2]
-                for i in [11, 10, 8, 7, 5, 4]:
-                    if (shape[2] % i) == 0:
-                        chunk2 = int(shape[2] / i)
-                        break
-                _logger.debug("Used chunk size = (1, %d, %d)",
-                              chunk1, chunk2)
-                dset = nxData.require_dataset('data',
-                                              shape=shape,
-                                              dtype=dtype,
-                                              chunks=(1, chunk1, chunk2),
-                                              compression=compression)
+                dset = HDF5ChunkWriter.createDataset(nxData, 'data',
+                                                     data=data,
+                                                     dtype=dtype,
+                                                     compression=compression,
+                                                     mcaIndex=mcaindex,
+                                                     nthreads=nthreads)
             else:
                 _logger.debug("Saving not compressed and notchunked dataset")
                 dset = nxData.require_dataset('data',
                                               shape=shape,
                                               dtype=dtype,
                                               compression=None)
-            tmpData = numpy.zeros((1, data.shape[1], data.shape[2]),
-                                  data.dtype)
-            for i in range(data.shape[0]):
-                tmpData[0:1] = data[i:i + 1]
-                dset[i:i + 1] = tmpData[0:1]
-                _logger.info("Saved item %d of %d", i + 1, data.shape[0])
+                tmpData = numpy.zeros((1, data.shape[1], data.shape[2]),
+                                      data.dtype)
+                for i in range(data.shape[0]):
+                    tmpData[0:1] = data[i:i + 1]
+                    dset[i:i + 1] = tmpData[0:1]
+                    _logger.info("Saved item %d of %d", i + 1, data.shape[0])
 
         nxData.attrs["signal"] = u'data'
 
@@ -620,12 +618,12 @@ def save3DArrayAsHDF5(data, filename, axes=None, labels=None, dtype=None, mode='
                 raise IOError("Cannot overwrite existing file!")
         hdf = h5py.File(filename, 'a')
         if compression:
-            hdf.require_dataset('data',
-                                shape=shape,
-                                dtype=dtype,
-                                data=data,
-                                chunks=(1, shape[1], shape[2]),
-                                compression=compression)
+            HDF5ChunkWriter.createDataset(hdf, 'data',
+                                          data=data,
+                                          dtype=dtype,
+                                          compression=compression,
+                                          mcaIndex=mcaindex,
+                                          nthreads=nthreads)
         else:
             hdf.require_dataset('data',
                                 shape=shape,
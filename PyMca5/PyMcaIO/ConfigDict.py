@@ -31,12 +31,17 @@
 __license__ = "MIT"
 __copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
 import sys
+import struct
 if sys.version_info < (3,):
     import ConfigParser
     from StringIO import StringIO
+    _INTEGER_TYPES = (int, long)
+    _TEXT_TYPE = unicode
 else:
     import configparser as ConfigParser
     from io import StringIO
+    _INTEGER_TYPES = (int,)
+    _TEXT_TYPE = str
 try:
     import numpy
     USE_NUMPY = True
@@ -44,6 +49,275 @@
     # do not use numpy, use lists
     USE_NUMPY = False
 
+# Read the text files with the parser of this module instead of ConfigParser.
+# It gives the same result, anything it does not handle (syntax errors,
+# DEFAULT section, interpolation) is still left to ConfigParser.
+USE_FAST_PARSER = sys.version_info >= (3,)
+
+BINARY_MAGIC = b"\x93PyMcaCfg"
+BINARY_VERSION = 1
+
+
+class _UnsupportedSyntax(Exception):
+    pass
+
+
+def _parseLines(lines):
+    """
+    Split the lines of a configuration file into sections and options
+    following the rules of the python 3 ConfigParser.
+
+    :param lines: iterable of text lines
+    :return: list of (section, [(option, value), ...]) in file order
+    :raises _UnsupportedSyntax: for what only ConfigParser handles
+    """
+    sectcre = ConfigParser.RawConfigParser.SECTCRE
+    result = []
+    added = set()
+    section = None
+    options = None
+    values = None
+    indentLevel = 0
+    for line in lines:
+        value = line.strip()
+        if not value:
+            # empty lines belong to the value unless no line follows
+            if values is not None:
+                values.append("")
+            continue
+        if value[0] in "#;":
+            continue
+        indent = len(line) - len(line.lstrip())
+        if (values is not None) and (indent > indentLevel):
+            # continuation line
+            values.append(value)
+            continue
+        indentLevel = indent
+        match = sectcre.match(value) if value[0] == "[" else None
+        if match:
+            section = match.group("header")
+            if (section in added) or (section == "DEFAULT"):
+                raise _UnsupportedSyntax(section)
+            added.add(section)
+            options = []
+            result.append((section, options))
+            values = None
+            continue
+        if options is None:
+            # missing section header
+            raise _UnsupportedSyntax(line)
+        # the option name ends at the first delimiter as with OPTCRE
+        i = value.find("=")
+        j = value.find(":")
+        if (j >= 0) and ((j < i) or (i < 0)):
+            i = j
+        option = value[:i].rstrip()
+        if (i < 0) or (not option):
+            raise _UnsupportedSyntax(line)
+        if (section, option) in added:
+            raise _UnsupportedSyntax(option)
+        added.add((section, option))
+        values = [value[i + 1:].lstrip()]
+        options.append((option, values))
+
+    parsed = []
+    for section, options in result:
+        items = []
+        for option, values in options:
+            value = "\n".join(values).rstrip()
+            if "%" in value:
+                # ConfigParser interpolation
+                raise _UnsupportedSyntax(value)
+            items.append((option, value))
+        parsed.append((section, items))
+    return parsed
+
+
+# binary layout: magic, version, the sizes of the sections and the sections:
+# one tag per item, int64 values (integers and container sizes), float64
+# values, character lengths of the strings, utf-8 text of all the strings
+# and, one after the other, the items of any other type
+_HEADER = struct.Struct("<6Q")
+
+
+def _toBytes(obj):
+    tags = []
+    ints = []
+    floats = []
+    strings = []
+    other = []
+
+    def encode(item):
+        itemType = type(item)
+        if itemType is _TEXT_TYPE:
+            tags.append("s")
+            strings.append(item)
+        elif itemType is float:
+            tags.append("f")
+            floats.append(item)
+        elif (itemType is int) and (-2**63 <= item < 2**63):
+            tags.append("i")
+            ints.append(item)
+        elif (itemType is dict) or (itemType is ConfigDict):
+            tags.append("d")
+            ints.append(len(item))
+            for key in item:
+                encode(key)
+                encode(item[key])
+        elif itemType is list:
+            tags.append("l")
+            ints.append(len(item))
+            for value in item:
+                encode(value)
+        elif item is None:
+            tags.append("N")
+        elif item is True:
+            tags.append("T")
+        elif item is False:
+            tags.append("F")
+        elif USE_NUMPY and isinstance(item, (numpy.ndarray, numpy.generic)):
+            dtype = item.dtype
+            if dtype.hasobject or (dtype.fields is not None):
+                raise TypeError("Unsupported array type %s" % dtype)
+            descr = dtype.str.encode("ascii")
+            other.append(struct.pack("<B", len(descr)))
+            other.append(descr)
+            if isinstance(item, numpy.ndarray):
+                tags.append("a")
+                other.append(struct.pack("<B%dQ" % item.ndim,
+                                         item.ndim, *item.shape))
+            else:
+                tags.append("g")
+            data = item.tobytes()
+            other.append(struct.pack("<Q", len(data)))
+            other.append(data)
+        elif isinstance(item, bytes) or isinstance(item, _INTEGER_TYPES):
+            if isinstance(item, bytes):
+                tags.append("b")
+                data = item
+            else:
+                # out of the int64 range
+                tags.append("I")
+                data = str(int(item)).encode("ascii")
+            other.append(struct.pack("<Q", len(data)))
+            other.append(data)
+        elif isinstance(item, tuple):
+            tags.append("t")
+            ints.append(len(item))
+            for value in item:
+                encode(value)
+        elif isinstance(item, list):
+            encode(list(item))
+        elif isinstance(item, _TEXT_TYPE):
+            encode(_TEXT_TYPE(item))
+        elif isinstance(item, float):
+            encode(float(item))
+        elif hasattr(item, "keys"):
+            encode(dict([(key, item[key]) for key in item.keys()]))
+        else:
+            raise TypeError("Unsupported type %s" % type(item))
+
+    encode(obj)
+    tags = "".join(tags).encode("ascii")
+    text = "".join(strings).encode("utf-8", "surrogatepass")
+    lengths = [len(string) for string in strings]
+    other = b"".join(other)
+    return b"".join([BINARY_MAGIC,
+                     struct.pack("<B", BINARY_VERSION),
+                     _HEADER.pack(len(tags), len(ints), len(floats),
+                                  len(lengths), len(text), len(other)),
+                     tags,
+                     struct.pack("<%dq" % len(ints), *ints),
+                     struct.pack("<%dd" % len(floats), *floats),
+                     struct.pack("<%dQ" % len(lengths), *lengths),
+                     text,
+                     other])
+
+
+def _fromBytes(data):
+    n = len(BINARY_MAGIC)
+    if data[:n] != BINARY_MAGIC:
+        raise ValueError("Not a binary configuration")
+    version = struct.unpack_from("<B", data, n)[0]
+    if version > BINARY_VERSION:
+        raise ValueError("Unsupported binary configuration version %d" % \
+                         version)
+    offset = n + 1
+    nTags, nInts, nFloats, nStrings, nText, nOther = \
+                        _HEADER.unpack_from(data, offset)
+    offset += _HEADER.size
+    tags = data[offset:offset + nTags].decode("ascii")
+    offset += nTags
+    ints = iter(struct.unpack_from("<%dq" % nInts, data, offset))
+    offset += 8 * nInts
+    floats = iter(struct.unpack_from("<%dd" % nFloats, data, offset))
+    offset += 8 * nFloats
+    lengths = struct.unpack_from("<%dQ" % nStrings, data, offset)
+    offset += 8 * nStrings
+    text = data[offset:offset + nText].decode("utf-8", "surrogatepass")
+    offset += nText
+    strings = []
+    start = 0
+    for length in lengths:
+        strings.append(text[start:start + length])
+        start += length
+    strings = iter(strings)
+    tags = iter(tags)
+    # position in the section of the other items
+    position = [offset]
+
+    def decodeOther(tag):
+        offset = position[0]
+        if tag in "ag":
+            n = struct.unpack_from("<B", data, offset)[0]
+            dtype = numpy.dtype(data[offset + 1:offset + 1 + n].decode("ascii"))
+            offset += 1 + n
+            if tag == "a":
+                ndim = struct.unpack_from("<B", data, offset)[0]
+                shape = struct.unpack_from("<%dQ" % ndim, data, offset + 1)
+                offset += 1 + 8 * ndim
+        n = struct.unpack_from("<Q", data, offset)[0]
+        offset += 8
+        item = data[offset:offset + n]
+        position[0] = offset + n
+        if tag == "a":
+            return numpy.frombuffer(item, dtype=dtype).reshape(shape).copy()
+        if tag == "g":
+            return numpy.frombuffer(item, dtype=dtype)[0]
+        if tag == "I":
+            return int(item.decode("ascii"))
+        return item
+
+    def decode():
+        tag = next(tags)
+        if tag == "s":
+            return next(strings)
+        if tag == "f":
+            return next(floats)
+        if tag == "i":
+            return next(ints)
+        if tag == "d":
+            item = {}
+            for i in range(next(ints)):
+                key = decode()
+                item[key] = decode()
+            return item
+        if tag == "l":
+            return [decode() for i in range(next(ints))]
+        if tag == "t":
+            return tuple([decode() for i in range(next(ints))])
+        if tag == "N":
+            return None
+        if tag == "T":
+            return True
+        if tag == "F":
+            return False
+        if tag in "agbI":
+            return decodeOther(tag)
+        raise ValueError("Invalid binary configuration item type %s" % tag)
+
+    return decode()
+
 
 class ConfigDict(dict):
     def __init__(self, defaultdict=None, initdict=None, filelist=None):
@@ -96,10 +370,15 @@ def read(self, filelist, sections=None):
         """
         filelist = self.__tolist(filelist)
         sections = self.__tolist(sections)
-        cfg = ConfigParser.ConfigParser()
-        cfg.optionxform = self.__convert
-        cfg.read(filelist)
-        self.__read(cfg, sections)
+        parsed = None
+        if USE_FAST_PARSER:
+            parsed = self.__parseFiles(filelist)
+        if parsed is None:
+            cfg = ConfigParser.ConfigParser()
+            cfg.optionxform = self.__convert
+            cfg.read(filelist)
+            parsed = self.__getParsed(cfg)
+        self.__read(parsed, sections)
 
         for ffile in filelist:
             self.filelist.append([ffile, sections])
@@ -109,29 +388,58 @@ def readfp(self, filelike, sections=None):
         """
         read the input file-like object into the internal dictionary
         """
-        cfg = ConfigParser.ConfigParser()
-        cfg.optionxform = self.__convert
-        cfg.readfp(filelike)
-        self.__read(cfg, sections)
+        sections = self.__tolist(sections)
+        lines = filelike.readlines()
+        parsed = None
+        if USE_FAST_PARSER:
+            try:
+                parsed = _parseLines(lines)
+            except _UnsupportedSyntax:
+                pass
+        if parsed is None:
+            cfg = ConfigParser.ConfigParser()
+            cfg.optionxform = self.__convert
+            if hasattr(cfg, "read_file"):
+                cfg.read_file(lines)
+            else:
+                cfg.readfp(StringIO("".join(lines)))
+            parsed = self.__getParsed(cfg)
+        self.__read(parsed, sections)
         self._check()
 
-    def __read(self, cfg, sections=None):
-        cfgsect = cfg.sections()
+    def __parseFiles(self, filelist):
+        # None if ConfigParser has to be used
+        parsed = []
+        for ffile in filelist:
+            try:
+                fp = open(ffile)
+            except (IOError, OSError):
+                # ignored by ConfigParser too
+                continue
+            try:
+                parsed.extend(_parseLines(fp))
+            except _UnsupportedSyntax:
+                return None
+            finally:
+                fp.close()
+        return parsed
 
-        if sections is None:
-            readsect = cfgsect
-        else:
-            readsect = [sect for sect in cfgsect if sect in sections]
+    def __getParsed(self, cfg):
+        return [(sect, [(opt, cfg.get(sect, opt)) for opt in cfg.options(sect)])
+                for sect in cfg.sections()]
 
-        for sect in readsect:
+    def __read(self, parsed, sections=None):
+        for sect, options in parsed:
+            if (sections is not None) and (sect not in sections):
+                continue
             ddict = self
             for subsectw in sect.split('.'):
                 subsect = subsectw.replace("_|_", ".")
                 if not (subsect in ddict):
                     ddict[subsect] = {}
                 ddict = ddict[subsect]
-            for opt in cfg.options(sect):
-                ddict[opt] = self.__parse_data(cfg.get(sect, opt))
+            for opt, value in options:
+                ddict[opt] = self.__parse_data(value)
 
     def __parse_data(self, data):
         if len(data):
@@ -173,13 +481,52 @@ def __parse_line(self, line):
             return self.__parse_string(line.strip())
 
     def __parse_string(self, sstr):
-        try:
-            return int(sstr)
-        except ValueError:
+        # avoid the exceptions for strings int and float cannot convert
+        first = sstr[:1]
+        if first.isalpha() and (first not in "iInN"):
+            # neither a number nor inf or nan
+            return sstr
+        if ("." not in sstr) and ("e" not in sstr) and ("E" not in sstr):
             try:
-                return float(sstr)
+                return int(sstr)
             except ValueError:
-                return sstr
+                pass
+        try:
+            return float(sstr)
+        except ValueError:
+            return sstr
+
+    def tobytes(self):
+        """
+        Binary representation of the dictionary.
+
+        Contrary to the text format, it restores the values with their
+        exact type and value: numbers, strings, bytes, None, booleans,
+        lists, tuples, dictionaries, numpy arrays and numpy scalars.
+        """
+        return _toBytes(self)
+
+    def frombytes(self, data):
+        """
+        Update the dictionary with the output of tobytes
+        """
+        self.update(_fromBytes(data))
+        self._check()
+
+    def readbinary(self, filename):
+        """
+        read a file written by writebinary into the internal dictionary
+        """
+        with open(filename, "rb") as fp:
+            self.frombytes(fp.read())
+        self.filelist.append([filename, None])
+
+    def writebinary(self, filename):
+        """
+        Write the current dictionary in binary format to the given filename
+        """
+        with open(filename, "wb") as fp:
+            fp.write(self.tobytes())
 
     def tostring(self, sections=None):
         tmp = StringIO()
@@ -0,0 +1,359 @@
+#/*##########################################################################
+#
+# The PyMca X-Ray Fluorescence Toolkit
+#
+# Copyright (c) 2004-2026 European Synchrotron Radiation Facility
+#
+# This file is part of the PyMca X-ray Fluorescence Toolkit developed at
+# the ESRF by the Software group.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#############################################################################*/
+__author__ = "V.A. Sole - ESRF Data Analysis"
+__contact__ = "sole@esrf.fr"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+"""
+Chunked and compressed writing of HDF5 datasets.
+
+The chunks of datasets using the deflate (gzip) and shuffle filters are
+encoded on a pool of threads (zlib releases the GIL) and stored with
+write_direct_chunk, bypassing the serial HDF5 filter pipeline. Datasets
+using other filters (lzf, bitshuffle, ...) are written through h5py.
+"""
+import zlib
+import logging
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+import numpy
+import h5py
+try:
+    import hdf5plugin
+except ImportError:
+    hdf5plugin = None
+
+_logger = logging.getLogger(__name__)
+
+# target size of a chunk in bytes
+CHUNK_BYTES = 1024 * 1024
+
+# maximum chunk length along the spectrum (or image stack) axis
+MCA_CHUNK_SIZE = 256
+
+# default gzip compression level (the one used by h5py)
+GZIP_LEVEL = 4
+
+# upper limit of the chunk cache of datasets filled incrementally
+CHUNK_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+def getChunkShape(shape, dtype, mcaIndex=-1, chunkbytes=None):
+    """
+    Chunk shape suited to read both spectra (all the elements along
+    the mcaIndex axis) and images (one element along that axis).
+
+    The chunk spans up to MCA_CHUNK_SIZE elements along the mcaIndex axis,
+    so that a spectrum is read from a few chunks and an image does not
+    require reading the complete dataset. The remaining size is spread
+    as a square tile over the other axes.
+
+    :param tuple shape: shape of the dataset
+    :param dtype: data type of the dataset
+    :param int mcaIndex: index of the spectrum axis
+    :param int chunkbytes: target size of the chunks in bytes
+    :returns tuple: chunk shape
+    """
+    if chunkbytes is None:
+        chunkbytes = CHUNK_BYTES
+    shape = tuple(int(n) for n in shape)
+    ndim = len(shape)
+    if not ndim:
+        return None
+    itemsize = numpy.dtype(dtype).itemsize
+    nItems = max(1, int(chunkbytes // itemsize))
+    mcaIndex = mcaIndex % ndim
+    chunks = [1] * ndim
+    chunks[mcaIndex] = max(1, min(shape[mcaIndex], MCA_CHUNK_SIZE, nItems))
+    nItems = max(1, nItems // chunks[mcaIndex])
+    others = [i for i in range(ndim) if i != mcaIndex]
+    # fill the fastest varying axes first
+    for n, axis in enumerate(reversed(others)):
+        side = int(round(nItems ** (1.0 / (len(others) - n))))
+        chunks[axis] = max(1, min(shape[axis], side))
+        nItems = max(1, nItems // chunks[axis])
+    return tuple(max(1, min(c, n)) for c, n in zip(chunks, shape))
+
+
+def getCompressionOptions(compression=None, level=None):
+    """
+    Keyword arguments of h5py.Group.create_dataset for a compression
+    specification.
+
+    :param compression: None (no compression), True, "gzip", "lzf",
+                        "bitshuffle" or a gzip compression level (0-9)
+    :param int level: gzip compression level
+    :returns dict:
+    """
+    if compression in [None, False]:
+        return {}
+    if compression is True:
+        compression = "gzip"
+    elif isinstance(compression, int):
+        level = compression
+        compression = "gzip"
+    if compression == "bitshuffle":
+        if hdf5plugin is not None:
+            # LZ4 compression of the bit shuffled chunks
+            return dict(hdf5plugin.Bitshuffle())
+        _logger.warning("hdf5plugin not available, using gzip compression")
+        compression = "gzip"
+    if compression in ["gzip", "deflate"]:
+        if level is None:
+            level = GZIP_LEVEL
+        return {"compression": "gzip",
+                "compression_opts": level,
+                "shuffle": True}
+    if compression == "lzf":
+        return {"compression": "lzf",
+                "shuffle": True}
+    # leave the decision to h5py
+    return {"compression": compression}
+
+
+def getChunkCacheOptions(shape, chunks, dtype):
+    """
+    Keyword arguments of h5py.Group.create_dataset giving a dataset
+    a chunk cache able to hold all the chunks sharing a position along
+    the first axis. Writing such a dataset in C order then compresses
+    every chunk once, instead of reading it back and compressing it
+    again at each partial write.
+
+    :returns dict: empty if not supported by h5py
+    """
+    if h5py.version.version_tuple < (3, 0):
+        return {}
+    nChunks = 1
+    for n, c in zip(shape[1:], chunks[1:]):
+        nChunks *= (n + c - 1) // c
+    chunkBytes = numpy.dtype(dtype).itemsize
+    for c in chunks:
+        chunkBytes *= c
+    nbytes = min(CHUNK_CACHE_MAX_BYTES, (nChunks + 1) * chunkBytes)
+    if nbytes <= CHUNK_BYTES:
+        return {}
+    # a prime number of slots about 10 times the number of cached chunks
+    nslots = 10 * (nbytes // chunkBytes + 1) + 1
+    while any(nslots % i == 0 for i in range(2, int(nslots ** 0.5) + 1)):
+        nslots += 2
+    return {"rdcc_nbytes": int(nbytes), "rdcc_nslots": int(nslots)}
+
+
+def _getDirectFilters(dataset):
+    """
+    Filter pipeline of the dataset as a list of (name, level) or None
+    when the chunks cannot be encoded here.
+    """
+    if dataset.chunks is None:
+        return None
+    if not hasattr(dataset.id, "write_direct_chunk"):
+        return None
+    if dataset.dtype.kind not in "biuf":
+        return None
+    dcpl = dataset.id.get_create_plist()
+    filters = []
+    for i in range(dcpl.get_nfilters()):
+        code, flags, values, name = dcpl.get_filter(i)
+        if code == h5py.h5z.FILTER_SHUFFLE:
+            filters.append(("shuffle", None))
+        elif code == h5py.h5z.FILTER_DEFLATE:
+            if len(values):
+                level = int(values[0])
+            else:
+                level = GZIP_LEVEL
+            filters.append(("deflate", level))
+        else:
+            return None
+    return filters
+
+
+def _encodeChunk(args):
+    chunk, filters = args
+    buffer = numpy.ascontiguousarray(chunk)
+    for name, level in filters:
+        if name == "shuffle":
+            # the HDF5 shuffle filter groups the bytes by significance
+            itemsize = chunk.dtype.itemsize
+            if itemsize > 1:
+                buffer = buffer.view(numpy.uint8).reshape(-1, itemsize).T
+                buffer = numpy.ascontiguousarray(buffer)
+        elif name == "deflate":
+            buffer = numpy.frombuffer(zlib.compress(buffer.tobytes(), level),
+                                      dtype=numpy.uint8)
+    return buffer.tobytes()
+
+
+def _iterChunkSlices(shape, chunks):
+    """
+    Yields the offset and the slices of all the chunks of a dataset.
+    """
+    counts = [(n + c - 1) // c for n, c in zip(shape, chunks)]
+    for index in numpy.ndindex(*counts):
+        offset = tuple(i * c for i, c in zip(index, chunks))
+        slices = tuple(slice(o, min(o + c, n))
+                       for o, c, n in zip(offset, chunks, shape))
+        yield offset, slices
+
+
+def _writeSlabs(dataset, data):
+    # plain writing through h5py along the first axis
+    if dataset.chunks:
+        step = dataset.chunks[0]
+    else:
+        step = max(1, int(dataset.shape[0] // 100))
+    for i in range(0, dataset.shape[0], step):
+        dataset[i:i + step] = data[i:i + step]
+
+
+def writeDataset(dataset, data, nthreads=None):
+    """
+    Write an array into a dataset of the same shape.
+
+    When the dataset is chunked and only uses the deflate and shuffle
+    filters, its chunks are encoded on nthreads threads and stored
+    with write_direct_chunk. Otherwise the data are written through h5py.
+
+    :param h5py.Dataset dataset: destination
+    :param data: numpy array or any sliceable object with a shape
+    :param int nthreads: number of encoding threads (default: cpu count)
+    """
+    shape = dataset.shape
+    if tuple(data.shape) != tuple(shape):
+        raise ValueError("Data shape %s does not match dataset shape %s" % \
+                         (data.shape, shape))
+    if not len(shape) or not dataset.size:
+        dataset[()] = numpy.asarray(data)
+        return
+    filters = _getDirectFilters(dataset)
+    if filters is None:
+        _logger.debug("Writing %s through h5py", dataset.name)
+        _writeSlabs(dataset, data)
+        return
+    if nthreads is None:
+        nthreads = multiprocessing.cpu_count()
+    chunks = dataset.chunks
+    dtype = dataset.dtype
+    fillvalue = dataset.fillvalue
+    batchSize = 4 * max(1, nthreads)
+    if nthreads > 1:
+        pool = ThreadPool(nthreads)
+        mapper = pool.map
+    else:
+        pool = None
+        mapper = lambda func, items: [func(item) for item in items]
+    try:
+        chunkIter = _iterChunkSlices(shape, chunks)
+        while True:
+            batch = []
+            for offset, slices in chunkIter:
+                block = numpy.asarray(data[slices], dtype=dtype)
+                if block.shape != chunks:
+                    # edge chunks are stored complete
+                    full = numpy.empty(chunks, dtype=dtype)
+                    full[()] = fillvalue
+                    full[tuple(slice(0, n) for n in block.shape)] = block
+                    block = full
+                batch.append((offset, block))
+                if len(batch) == batchSize:
+                    break
+            if not batch:
+                break
+            encoded = mapper(_encodeChunk,
+                             [(block, filters) for offset, block in batch])
+            for (offset, block), buffer in zip(batch, encoded):
+                dataset.id.write_direct_chunk(offset, buffer)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+def createDataset(parent, name, data=None, shape=None, dtype=None,
+                  compression=None, chunks=True, mcaIndex=-1,
+                  nthreads=None, **kwargs):
+    r"""
+    Create a dataset and optionally fill it with writeDataset.
+    Compressed datasets created without data get a chunk cache suited
+    to incremental writing (see getChunkCacheOptions).
+
+    :param h5py.Group parent:
+    :param str name:
+    :param data: initial data (numpy array or sliceable object)
+    :param tuple shape: defaults to the shape of data
+    :param dtype: defaults to the type of data
+    :param compression: see getCompressionOptions
+    :param chunks: True for getChunkShape, None or a chunk shape
+    :param int mcaIndex: spectrum axis used to choose the chunk shape
+    :param int nthreads: number of encoding threads
+    :param \**kwargs: see h5py.Group.create_dataset
+    :returns h5py.Dataset:
+    """
+    if shape is None:
+        shape = data.shape
+    if dtype is None:
+        dtype = data.dtype
+    options = getCompressionOptions(compression)
+    if options and chunks is None:
+        chunks = True
+    if chunks is True:
+        chunks = getChunkShape(shape, dtype, mcaIndex=mcaIndex)
+    if options and (data is None) and chunks:
+        options.update(getChunkCacheOptions(shape, chunks, dtype))
+    options.update(kwargs)
+    dataset = parent.create_dataset(name, shape=shape, dtype=dtype,
+                                    chunks=chunks, **options)
+    if data is not None:
+        writeDataset(dataset, data, nthreads=nthreads)
+    return dataset
+
+
+class ArrayDifference(object):
+    """
+    Sliceable difference of two arrays (or datasets) of the same shape,
+    evaluated on access.
+    """
+    def __init__(self, a, b):
+        if tuple(a.shape) != tuple(b.shape):
+            raise ValueError("Shapes %s and %s differ" % (a.shape, b.shape))
+        self._a = a
+        self._b = b
+        self.shape = tuple(a.shape)
+        self.ndim = len(self.shape)
+        self.dtype = numpy.result_type(a.dtype, b.dtype)
+
+    def __getitem__(self, item):
+        return numpy.subtract(self._a[item], self._b[item], dtype=self.dtype)
+
+    def __array__(self, dtype=None, copy=None):
+        # the difference is always computed into a new array, which
+        # satisfies any value of copy
+        result = self[()]
+        if dtype is not None:
+            result = result.astype(dtype, copy=False)
+        return result
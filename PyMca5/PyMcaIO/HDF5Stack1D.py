@@ -30,7 +30,9 @@
 __contact__ = "sole@esrf.fr"
 __license__ = "MIT"
 __copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+import os
 import posixpath
+import tempfile
 import numpy
 import h5py
 import logging
@@ -52,16 +54,24 @@
 
 SOURCE_TYPE = "HDF5Stack1D"
 
+# stacks bigger than this (in megabytes) spread over several files are
+# exposed as a virtual dataset instead of being copied into memory
+VIRTUAL_DATASET_MIN_MB = 1024
+
 class HDF5Stack1D(DataObject.DataObject):
     def __init__(self, filelist, selection,
                        scanlist=None,
-                       dtype=None):
+                       dtype=None,
+                       lazy=None):
         DataObject.DataObject.__init__(self)
 
         #the data type of the generated stack
         self.__dtype0 = dtype
         self.__dtype  = dtype
 
+        # None: automatic, True: always try a virtual dataset, False: never
+        self.__lazy = lazy
+
         if filelist is not None:
             if selection is not None:
                 self.loadFileList(filelist, selection, scanlist)
@@ -82,6 +92,12 @@ def loadFileList(self, filelist, selection, scanlist=None):
                  /whatever1/whatever2/counts
                  That means scanlist = ["/whatever1"]
                  and               selection['y'] = "/whatever2/counts"
+
+        When every file contributes one scan (for instance one file per map
+        line) and no monitor is selected, the files can be combined into an
+        HDF5 virtual dataset of shape (nFiles, nMcaPerFile, nChannels)
+        instead of being copied into memory. See the lazy keyword of the
+        constructor.
         """
         _logger.debug("filelist = %s", filelist)
         _logger.debug("selection = %s", selection)
@@ -281,71 +297,87 @@ def loadFileList(self, filelist, selection, scanlist=None):
         considerAsImages = False
         dim0, dim1, mcaDim = self.getDimensions(nFiles, nScans, shape,
                                                 index=mcaIndex)
-        try:
-            if self.__dtype in [numpy.float32, numpy.int32]:
-                bytefactor = 4
-            elif self.__dtype in [numpy.int16, numpy.uint16]:
-                bytefactor = 2
-            elif self.__dtype in [numpy.int8, numpy.uint8]:
-                bytefactor = 1
-            else:
-                bytefactor = 8
-
-            neededMegaBytes = nFiles * dim0 * dim1 * (mcaDim * bytefactor/(1024*1024.))
-            physicalMemory = None
-            if hasattr(PhysicalMemory, "getAvailablePhysicalMemoryOrNone"):
-                physicalMemory = PhysicalMemory.getAvailablePhysicalMemoryOrNone()
-            if not physicalMemory:
-                physicalMemory = PhysicalMemory.getPhysicalMemoryOrNone()
-            if physicalMemory is None:
-                # 6 Gigabytes of available memory
-                # should be a good compromise in 2018
-                physicalMemory = 6000
-            else:
-                physicalMemory /= (1024*1024.)
-            if (neededMegaBytes > (0.95*physicalMemory))\
-               and (nFiles == 1) and (len(shape) == 3):
-                if self.__dtype0 is None:
-                    if (bytefactor == 8) and (neededMegaBytes < (2*physicalMemory)):
-                        # try reading as float32
-                        print("Forcing the use of float32 data")
-                        self.__dtype = numpy.float32
-                    else:
-                        raise MemoryError("Force dynamic loading")
-                else:
-                    raise MemoryError("Force dynamic loading")
-            if (mcaIndex == 0) and ( nFiles == 1) and (nScans == 1):
-                #keep the original arrangement but in memory
-                self.data = numpy.zeros(yDataset.shape, self.__dtype)
-                considerAsImages = True
-            else:
-                # force arrangement as spectra
-                self.data = numpy.zeros((dim0, dim1, mcaDim), self.__dtype)
-            DONE = False
-        except (MemoryError, ValueError):
-            # some versions report ValueError instead of MemoryError
-            if (nFiles == 1) and (len(shape) == 3):
-                _logger.warning("Attempting dynamic loading")
-                if mSelection is not None:
-                    _logger.warning("Ignoring monitor")
-                self.data = yDataset
-                if mSelection is not None:
-                    mdtype = tmpHdf[mpath].dtype
-                    if mdtype not in [numpy.float64, numpy.float32]:
-                        mdtype = numpy.float64
-                    mDataset = numpy.asarray(tmpHdf[mpath], dtype=mdtype)
-                    self.monitor = [mDataset]
+        VIRTUAL = False
+        if self._useVirtualDataset(nFiles, nScans, ySelectionList,
+                                    mSelection, shape, mcaIndex, yDataset):
+            # one scan per file: expose the files as a single lazy stack
+            virtualSources = self._getVirtualSources(hdfStack, scanlist,
+                                                     JUST_KEYS, ySelection)
+            virtualData = self._getVirtualDataset(virtualSources, mcaDim)
+            if virtualData is not None:
+                _logger.info("Using a virtual dataset over %d files", nFiles)
+                self.data = virtualData
                 if xSelection is not None:
                     xDataset = tmpHdf[xpath][()]
-                    self.x = [xDataset]
-                if h5py.version.version < '2.0':
-                    #prevent automatic closing keeping a reference
-                    #to the open file
-                    self._fileReference = hdfStack
+                mcaIndex = len(self.data.shape) - 1
+                VIRTUAL = True
                 DONE = True
-            else:
-                # what to do if the number of dimensions is only 2?
-                raise
+        if not VIRTUAL:
+            try:
+                if self.__dtype in [numpy.float32, numpy.int32]:
+                    bytefactor = 4
+                elif self.__dtype in [numpy.int16, numpy.uint16]:
+                    bytefactor = 2
+                elif self.__dtype in [numpy.int8, numpy.uint8]:
+                    bytefactor = 1
+                else:
+                    bytefactor = 8
+
+                neededMegaBytes = nFiles * dim0 * dim1 * (mcaDim * bytefactor/(1024*1024.))
+                physicalMemory = None
+                if hasattr(PhysicalMemory, "getAvailablePhysicalMemoryOrNone"):
+                    physicalMemory = PhysicalMemory.getAvailablePhysicalMemoryOrNone()
+                if not physicalMemory:
+                    physicalMemory = PhysicalMemory.getPhysicalMemoryOrNone()
+                if physicalMemory is None:
+                    # 6 Gigabytes of available memory
+                    # should be a good compromise in 2018
+                    physicalMemory = 6000
+                else:
+                    physicalMemory /= (1024*1024.)
+                if (neededMegaBytes > (0.95*physicalMemory))\
+                   and (nFiles == 1) and (len(shape) == 3):
+                    if self.__dtype0 is None:
+                        if (bytefactor == 8) and (neededMegaBytes < (2*physicalMemory)):
+                            # try reading as float32
+                            print("Forcing the use of float32 data")
+                            self.__dtype = numpy.float32
+                        else:
+                            raise MemoryError("Force dynamic loading")
+                    else:
+                        raise MemoryError("Force dynamic loading")
+                if (mcaIndex == 0) and ( nFiles == 1) and (nScans == 1):
+                    #keep the original arrangement but in memory
+                    self.data = numpy.zeros(yDataset.shape, self.__dtype)
+                    considerAsImages = True
+                else:
+                    # force arrangement as spectra
+                    self.data = numpy.zeros((dim0, dim1, mcaDim), self.__dtype)
+                DONE = False
+            except (MemoryError, ValueError):
+                # some versions report ValueError instead of MemoryError
+                if (nFiles == 1) and (len(shape) == 3):
+                    _logger.warning("Attempting dynamic loading")
+                    if mSelection is not None:
+                        _logger.warning("Ignoring monitor")
+                    self.data = yDataset
+                    if mSelection is not None:
+                        mdtype = tmpHdf[mpath].dtype
+                        if mdtype not in [numpy.float64, numpy.float32]:
+                            mdtype = numpy.float64
+                        mDataset = numpy.asarray(tmpHdf[mpath], dtype=mdtype)
+                        self.monitor = [mDataset]
+                    if xSelection is not None:
+                        xDataset = tmpHdf[xpath][()]
+                        self.x = [xDataset]
+                    if h5py.version.version < '2.0':
+                        #prevent automatic closing keeping a reference
+                        #to the open file
+                        self._fileReference = hdfStack
+                    DONE = True
+                else:
+                    # what to do if the number of dimensions is only 2?
+                    raise
 
         # get the mca information associated to the path
         mcaObjectPaths = NexusTools.getMcaObjectPaths(tmpHdf, path)
@@ -358,7 +390,9 @@ def loadFileList(self, filelist, selection, scanlist=None):
             if len(list(mcaObjectPaths.keys())) > 1: # not just "counts"
                 self._pathHasRelevantInfo = True
                 if "live_time" in mcaObjectPaths:
-                    if DONE:
+                    if VIRTUAL:
+                        _time = self._getVirtualTime(virtualSources, "live_time")
+                    elif DONE:
                         # hopefully it will fit into memory
                         if mcaObjectPaths["live_time"] in tmpHdf:
                             _time = tmpHdf[mcaObjectPaths["live_time"]][()]
@@ -375,7 +409,9 @@ def loadFileList(self, filelist, selection, scanlist=None):
                                     (self.data.shape[0] * self.data.shape[1]),
                                     dtype=numpy.float64)                
                 elif "elapsed_time" in mcaObjectPaths:
-                    if DONE:
+                    if VIRTUAL:
+                        _time = self._getVirtualTime(virtualSources, "elapsed_time")
+                    elif DONE:
                         # hopefully it will fit into memory
                         if mcaObjectPaths["elapsed_time"] in tmpHdf:
                             _time = \
@@ -696,7 +732,7 @@ def loadFileList(self, filelist, selection, scanlist=None):
                                 self.data[i:i+1] += yDataset[i:i+1]
         else:
             self.info["McaIndex"] = mcaIndex
-            if _time:
+            if _time is not None:
                 nRequiredValues = 1
                 for i in range(len(self.data.shape)):
                     if i != mcaIndex:
@@ -736,6 +772,125 @@ def loadFileList(self, filelist, selection, scanlist=None):
         if _time is not None:
             self.info["McaLiveTime"] = _time
 
+    def _useVirtualDataset(self, nFiles, nScans, ySelectionList, mSelection,
+                           shape, mcaIndex, yDataset):
+        if self.__lazy is False:
+            return False
+        if (nFiles < 2) or (nScans != 1) or (len(ySelectionList) != 1):
+            return False
+        if not hasattr(h5py, "VirtualLayout"):
+            return False
+        if h5py.version.hdf5_version_tuple < (1, 10):
+            return False
+        if mSelection is not None:
+            # normalizing by the monitor requires the data in memory
+            if self.__lazy:
+                _logger.warning("Monitor selected, loading data into memory")
+            return False
+        if (len(shape) > 3) or (mcaIndex != (len(shape) - 1)):
+            return False
+        if self.__dtype0 is not None:
+            if numpy.dtype(self.__dtype0) != yDataset.dtype:
+                return False
+        if self.__lazy:
+            return True
+        neededMegaBytes = nFiles * yDataset.size * \
+                          (yDataset.dtype.itemsize / (1024 * 1024.))
+        return neededMegaBytes > VIRTUAL_DATASET_MIN_MB
+
+    def _getVirtualSources(self, hdfStack, scanlist, JUST_KEYS, ySelection):
+        """
+        Returns a list of (h5py file, dataset path) with the selected
+        dataset of each file of the stack.
+        """
+        sources = []
+        for hdf in hdfStack._sourceObjectList:
+            if JUST_KEYS:
+                goodEntryNames = []
+                for entry in hdf["/"].keys():
+                    if hasattr(hdf["/" + entry], "keys"):
+                        goodEntryNames.append(entry)
+                entryName = goodEntryNames[int(scanlist[0].split(".")[-1])-1]
+                path = "/" + entryName + ySelection
+            else:
+                path = scanlist[0] + ySelection
+            sources.append((hdf, path))
+        return sources
+
+    def _getVirtualDataset(self, sources, mcaDim):
+        """
+        Maps the datasets of the given sources into a read-only virtual
+        dataset of shape (nSources, nMcaPerSource, mcaDim).
+        Returns None if the datasets do not share shape and type.
+        """
+        datasets = [hdf[path] for hdf, path in sources]
+        shape = datasets[0].shape
+        dtype = datasets[0].dtype
+        for dataset in datasets:
+            if (dataset.shape != shape) or (dataset.dtype != dtype):
+                _logger.info("Datasets differ, cannot use a virtual dataset")
+                return None
+        nMca = 1
+        for dim in shape[:-1]:
+            nMca *= dim
+        layout = h5py.VirtualLayout(shape=(len(datasets), nMca, mcaDim),
+                                    dtype=dtype)
+        for i, dataset in enumerate(datasets):
+            # the dataset may be an external link, use its actual location
+            vsource = h5py.VirtualSource(os.path.abspath(dataset.file.filename),
+                                         dataset.name,
+                                         shape=shape,
+                                         dtype=dtype)
+            if len(shape) == 1:
+                layout[i, 0] = vsource
+            elif len(shape) == 2:
+                layout[i] = vsource
+            else:
+                for row in range(shape[0]):
+                    layout[i, row * shape[1]:(row + 1) * shape[1]] = \
+                                                                vsource[row]
+        # The source files inherit the driver and the access mode of the
+        # file containing the virtual dataset. It has to be a regular file
+        # opened read-only not to conflict with other readers.
+        fd, fileName = tempfile.mkstemp(prefix="pymca_vds_", suffix=".h5")
+        os.close(fd)
+        with h5py.File(fileName, "w") as h5:
+            h5.create_virtual_dataset("data", layout)
+        h5 = h5py.File(fileName, "r")
+        try:
+            # not needed anymore once opened
+            os.remove(fileName)
+        except OSError:
+            _logger.debug("Cannot remove temporary file %s", fileName)
+        # prevent automatic closing keeping a reference to the file
+        self._virtualFile = h5
+        return h5["data"]
+
+    def _getVirtualTime(self, sources, key):
+        """
+        Concatenates the live or elapsed times of all the sources.
+        Returns None if any of them lacks the information.
+        """
+        timeList = []
+        for hdf, path in sources:
+            timePath = NexusTools.getMcaObjectPaths(hdf, path).get(key, None)
+            timeData = None
+            if timePath is None:
+                pass
+            elif timePath in hdf:
+                timeData = hdf[timePath][()]
+            elif "::" in timePath:
+                externalFile, externalPath = timePath.split("::")
+                with h5py.File(externalFile, "r") as timeHdf:
+                    timeData = timeHdf[externalPath][()]
+            if timeData is None:
+                _logger.warning("No %s information for %s", key, path)
+                _logger.warning("Ignoring time information")
+                return None
+            timeList.append(numpy.asarray(timeData,
+                                          dtype=numpy.float64).reshape(-1))
+        return numpy.concatenate(timeList)
+
     def getDimensions(self, nFiles, nScans, shape, index=None):
         #some body may want to overwrite this
         """
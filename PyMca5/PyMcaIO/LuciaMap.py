@@ -35,92 +35,146 @@
 import os
 import sys
 import re
+import logging
 import numpy
 from PyMca5.PyMcaCore import DataObject
+from PyMca5.PyMcaIO import TextNumberReader
 
 SOURCE_TYPE = "EdfFileStack"
+_logger = logging.getLogger(__name__)
+
+
+# separator between spectra
+_SEPARATOR = re.compile(br"-{2,}")
 
 
 class LuciaMap(DataObject.DataObject):
-    def __init__(self, filename, infofile=None):
+    def __init__(self, filename, infofile=None, dataFile=None):
+        """
+        :param filename: Map file
+        :param infofile: File with the map dimensions
+        :param dataFile: Optional .npy file onto which the stack is
+                         memory mapped instead of being kept in memory
+        """
         DataObject.DataObject.__init__(self)
 
-        with open(filename, 'r') as f:
-            data = f.read()
-
-        data.replace("\r\n", "\n")
         self.sourceName = [filename]
-        firstByte = data.index("\n\n")
-
-        header = data[0:firstByte]
-        #get rid of the date
-        data = data[firstByte:]
-
-        #leave only the '----' as separator
-        data.replace("\r", "")
-        data.replace("\n", "")
-        sep = '-'
-        while sep in data:
-            sep = sep + '-'
-        sep = sep[1:]
-        data = data.split(sep)
-        if len(data[0]) != len(data[-1]):
-            if len(data[0]) > 1:
-                del data[-1]
-            else:
-                del data[0]
-
-        #get the number of channels
-        exp = re.compile('(-?[0-9]+\.?[0-9]*)')
-        spectrum = [float(x) for x in exp.findall(data[0])]
-        self.nChannels = len(spectrum)
-        self.nSpectra = len(data)
-        self.nRows = self.nSpectra
-
-        #try to get the information
-        if infofile is None:
-            infofile = ""
-            split = filename.split('_')
-            if len(split) > 1:
-                for i in range(len(split) - 1):
-                    if i == 0:
-                        infofile = split[i]
-                    else:
-                        infofile += "_" + split[i]
-                infofile = infofile + "_Infos_" +\
-                            split[-1].replace('.mca', '.dat')
-
-        if os.path.exists(infofile):
-            info = self._getInfo(infofile)
-            if ('vwidth' in info) and ('vstep' in info):
-                vwidth = info['vwidth']
-                vstep = info['vstep']
-                if abs(vstep) > 0:
-                    self.nRows = int((vwidth / vstep) + 1)
-
-        #fill the header
-        self.header = header
-
-        #arrange as an EDF Stack
-        self.info = {}
-        self.__nFiles = 1
-
-        self.__nImagesPerFile = 1
-
-        #self.nRows = 41
-        self.nCols = self.nSpectra / self.nRows
-
-        self.data = numpy.zeros((self.nRows,
-                                 self.nCols,
-                                 self.nChannels),
-                                 numpy.float32)
-        n = 0
-        for i in range(self.nRows):
-            for j in range(self.nCols):
-                s = data[n]
-                spectrum = numpy.array([float(x) for x in exp.findall(s)])
-                self.data[i, j, :] = spectrum[:]
-                n = n + 1
+        header = []
+        with open(filename, 'rb') as f:
+            # the header ends at the first empty line
+            while True:
+                line = f.readline()
+                if not line:
+                    raise IOError("Cannot find the end of the header")
+                if not line.strip():
+                    break
+                header.append(line.rstrip(b"\r\n").decode("latin-1"))
+            dataStart = f.tell()
+
+        # count the values and the number of channels of the first
+        # spectrum in a first pass, the spectra are separated by dashes
+        # iterChunks can yield one chunk more than this estimate, the
+        # second pass uses the number of chunks read by the first one
+        fileSize = os.path.getsize(filename)
+        nChunks = max(1, -(-fileSize // TextNumberReader.CHUNK_BYTES))
+        self.onBegin(2 * nChunks)
+        try:
+            nValues = 0
+            nChannels = None
+            firstSpectrum = 0
+            i = 0
+            with open(filename, 'rb') as f:
+                f.seek(dataStart)
+                for chunk in TextNumberReader.iterChunks(f):
+                    if nChannels is None:
+                        pieces = _SEPARATOR.split(chunk)
+                        for k, piece in enumerate(pieces):
+                            firstSpectrum += \
+                                    TextNumberReader.countNumbers(piece)
+                            if firstSpectrum and (k < (len(pieces) - 1)):
+                                nChannels = firstSpectrum
+                                break
+                    nValues += TextNumberReader.countNumbers(
+                                                _SEPARATOR.sub(b" ", chunk))
+                    i += 1
+                    self.onProgress(min(i, nChunks))
+            nRead = i
+            if nChannels is None:
+                nChannels = firstSpectrum
+            if not nChannels:
+                raise IOError("No spectra found in %s" % filename)
+            self.nChannels = nChannels
+            self.nSpectra = nValues // nChannels
+            if nValues % nChannels:
+                # incomplete last spectrum
+                _logger.warning("Ignoring %d values at the end of the file",
+                                nValues % nChannels)
+            self.nRows = self.nSpectra
+
+            #try to get the information
+            if infofile is None:
+                infofile = ""
+                split = filename.split('_')
+                if len(split) > 1:
+                    for i in range(len(split) - 1):
+                        if i == 0:
+                            infofile = split[i]
+                        else:
+                            infofile += "_" + split[i]
+                    infofile = infofile + "_Infos_" +\
+                                split[-1].replace('.mca', '.dat')
+
+            if os.path.exists(infofile):
+                info = self._getInfo(infofile)
+                if ('vwidth' in info) and ('vstep' in info):
+                    vwidth = info['vwidth']
+                    vstep = info['vstep']
+                    if abs(vstep) > 0:
+                        self.nRows = int((vwidth / vstep) + 1)
+
+            #fill the header
+            self.header = "\n".join(header)
+
+            #arrange as an EDF Stack
+            self.info = {}
+            self.__nFiles = 1
+
+            self.__nImagesPerFile = 1
+
+            #self.nRows = 41
+            self.nCols = self.nSpectra // self.nRows
+            if self.nCols < 1:
+                self.nRows = self.nSpectra
+                self.nCols = 1
+            if self.nRows * self.nCols != self.nSpectra:
+                _logger.warning("Ignoring %d spectra not filling a row",
+                                self.nSpectra - self.nRows * self.nCols)
+
+            # second pass, converting the values straight into the stack
+            self.data = TextNumberReader.allocateArray((self.nRows,
+                                                        self.nCols,
+                                                        self.nChannels),
+                                                       numpy.float32,
+                                                       filename=dataFile)
+            flatData = self.data.reshape(-1)
+            i = 0
+            n = 0
+            with open(filename, 'rb') as f:
+                f.seek(dataStart)
+                for chunk in TextNumberReader.iterChunks(f):
+                    if n >= flatData.size:
+                        break
+                    values = TextNumberReader.parseNumbers(
+                                                _SEPARATOR.sub(b" ", chunk))
+                    values = values[:flatData.size - n]
+                    flatData[n:n + values.size] = values
+                    n += values.size
+                    i += 1
+                    self.onProgress(nChunks + (i * nChunks) // nRead)
+            if n != flatData.size:
+                raise IOError("Unexpected number of values in %s" % filename)
+        finally:
+            self.onEnd()
 
         shape = self.data.shape
         for i in range(len(shape)):
@@ -135,6 +189,15 @@ def __init__(self, filename, infofile=None):
         self.info["McaCalib"] = [0.0, 1.0, 0.0]
         self.info["Channel0"] = 0.0
 
+    def onBegin(self, n):
+        pass
+
+    def onProgress(self, n):
+        pass
+
+    def onEnd(self):
+        pass
+
     def _getInfo(self, filename):
         '''
         This dictionnary is to be internally normalized for the time
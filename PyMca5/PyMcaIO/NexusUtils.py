@@ -274,7 +274,8 @@ def updateDataset(parent, name, data):
     """
     try:
         parent[name] = data
-    except RuntimeError:
+    except (RuntimeError, OSError):
+        # h5py >= 3 raises OSError when the name exists
         parent[name][()] = data
 
 
@@ -33,6 +33,7 @@
 import os
 import sys
 import re
+import mmap
 import struct
 import numpy
 import copy
@@ -45,6 +46,14 @@
 SOURCE_TYPE = "EdfFileStack"
 
 
+def _index(data, chain, start=0):
+    # mmap objects provide find but not index
+    offset = data.find(chain, start)
+    if offset < 0:
+        raise ValueError("<%s> not found" % chain)
+    return offset
+
+
 class OmnicMap(DataObject.DataObject):
     '''
     Class to read OMNIC .map files
@@ -62,23 +71,23 @@ def __init__(self, filename):
             It is expected to work with OMNIC versions 7.x and 8.x
         '''
         DataObject.DataObject.__init__(self)
-        if sys.platform == 'win32':
-            fid = open(filename, 'rb')
-        else:
-            fid = open(filename, 'r')
-        data = fid.read()
-        fid.close()
+        fid = open(filename, 'rb')
+        # the file is only read where needed
+        data = mmap.mmap(fid.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._parseFile(filename, data)
+        finally:
+            data.close()
+            fid.close()
 
+    def _parseFile(self, filename, data):
         try:
             omnicInfo = self._getOmnicInfo(data)
         except:
             omnicInfo = None
         self.sourceName = [filename]
-        if sys.version < '3.0':
-            searchedChain = "Spectrum "
-        else:
-            searchedChain = bytes("Spectrum ", 'utf-8')
-        firstByte = data.index(searchedChain)
+        searchedChain = b"Spectrum "
+        firstByte = _index(data, searchedChain)
         s = data[firstByte:(firstByte + 100 - 16)]
         if sys.version >= '3.0':
             s = str(s)
@@ -96,12 +105,8 @@ def __init__(self, filename):
             xPosition, yPosition = self.getPositionFromIndexAndInfo(0, omnicInfo)
         _logger.debug("spectrumIndex, nSpectra, xPosition, yPosition = %d %d %f %f",
                       spectrumIndex, self.nSpectra, xPosition, yPosition)
-        if sys.version < '3.0':
-            chain = "Spectrum"
-        else:
-            chain = bytes("Spectrum", 'utf-8')
-        secondByte = data[(firstByte + 1):].index(chain)
-        secondByte += firstByte + 1
+        chain = b"Spectrum"
+        secondByte = _index(data, chain, firstByte + 1)
         _logger.debug("secondByte = %s", secondByte)
         self.nChannels = int((secondByte - firstByte - 100) / 4)
         _logger.debug("nChannels = %d", self.nChannels)
@@ -136,23 +141,24 @@ def __init__(self, filename):
         #arrange as an EDF Stack
         self.info = {}
         self.__nFiles = int(self.nSpectra / self.nRows)
-        self.data = numpy.zeros((self.__nFiles, self.nRows, self.nChannels),
-                                 dtype=numpy.float32)
-
         self.__nImagesPerFile = 1
-        offset = firstByte - 16 + 100  # starting position of the data
-        delta = 100 + self.nChannels * 4
-        fmt = "%df" % self.nChannels
+
+        # each spectrum is preceded by a 100 bytes header, the spectra
+        # are read as the strided field of an array of records
+        spectrumType = numpy.dtype([("header", "V100"),
+                                    ("data", "<f4", (self.nChannels,))])
+        records = numpy.memmap(filename, dtype=spectrumType, mode="c",
+                               offset=self.firstSpectrumOffset,
+                               shape=(self.__nFiles * self.nRows,))
+        self.data = records["data"].reshape(self.__nFiles, self.nRows,
+                                            self.nChannels)
+        # deal with nan at the source, only the pages containing them
+        # are copied into memory
         for i in range(self.__nFiles):
-            for j in range(self.nRows):
-                # this approach is inneficient when compared to a direct
-                # data readout, but it allows to deal with nan at the source
-                tmpData = numpy.zeros((self.nChannels,), dtype=numpy.float32)
-                tmpData[:] = struct.unpack(fmt,\
-                                data[offset:(offset + delta - 100)])
-                finiteData = numpy.isfinite(tmpData)
-                self.data[i, j, finiteData] = tmpData[finiteData]
-                offset = int(offset + delta)
+            block = self.data[i]
+            finiteData = numpy.isfinite(block)
+            if not finiteData.all():
+                block[~finiteData] = 0.0
         shape = self.data.shape
         for i in range(len(shape)):
             key = 'Dim_%d' % (i + 1,)
@@ -229,19 +235,14 @@ def getMapInformation(self, data):
             Dictionnary with map gemoetrical acquisition parameters
         '''
         #look for the chain 'Position'
-        if sys.version < '3.0':
-            chain = 'Position'
-        else:
-            chain = bytes('Position', 'utf-8')
-        offset = data.index(chain)
+        chain = b'Position'
+        offset = _index(data, chain)
         positions = [offset]
         while True:
-            try:
-                a = data[(offset + 1):].index(chain)
-                offset = a + offset + 1
-                positions.append(offset)
-            except ValueError:
+            offset = data.find(chain, offset + 1)
+            if offset < 0:
                 break
+            positions.append(offset)
 
         ddict = {}
         #map description position
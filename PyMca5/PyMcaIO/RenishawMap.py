@@ -55,88 +55,133 @@
 import re
 import numpy
 from PyMca5.PyMcaCore import DataObject
+from PyMca5.PyMcaIO import TextNumberReader
 
 SOURCE_TYPE = "EdfFileStack"
 
+def _getOrderOfAppearance(values):
+    """
+    Index of each value in the list of distinct values sorted by first
+    appearance.
+    """
+    unique, first, inverse = numpy.unique(values,
+                                          return_index=True,
+                                          return_inverse=True)
+    rank = numpy.empty(first.shape, dtype=numpy.int64)
+    rank[numpy.argsort(first, kind="mergesort")] = numpy.arange(first.size)
+    return rank[inverse], unique.size
+
+
 class RenishawMap(DataObject.DataObject):
-    def __init__(self, filename, infofile=None):
+    def __init__(self, filename, infofile=None, dataFile=None):
+        """
+        :param filename: Text file with y, x, wavelength and value columns
+        :param infofile: Not used
+        :param dataFile: Optional .npy file onto which the stack is
+                         memory mapped instead of being kept in memory.
+                         The file holds one spectrum per row.
+        """
         DataObject.DataObject.__init__(self)
 
-        # allocate buffers greater than any spected number of channels
-        x = numpy.zeros((10000,), numpy.float32)
-        y = numpy.zeros((10000,), numpy.float32)
-        wl = numpy.zeros((10000,), numpy.float32)
-        data = numpy.zeros((10000,), numpy.float32)
-        #import time
-        #t0 = time.time()
-        with open(filename, 'r') as f:
-            nChannels = 0
+        # the first spectrum gives the number of channels and the motor
+        # changing first
+        wl = []
+        with open(filename, 'rb') as f:
             for line in f:
-                # read the first line
-                y[nChannels], x[nChannels], wl[nChannels], data[nChannels] = \
-                              [float(value) for value in line.split("\t")]
-                if nChannels == 0:
-                    firstChannel = wl[0]
-                elif wl[nChannels] == firstChannel:
+                y, x, channel, value = \
+                              [float(item) for item in line.split(b"\t")]
+                if not len(wl):
+                    firstY = y
+                elif channel == wl[0]:
                     break
-                nChannels += 1
-            if y[0] == y[nChannels]:
-                firstChangesFirst = False
+                wl.append(channel)
+            nChannels = len(wl)
+            firstChangesFirst = (y != firstY)
+        wl = numpy.array(wl, dtype=numpy.float32)
+
+        # first pass: count the lines and read the positions at the first
+        # line of each spectrum
+        # iterChunks can yield one chunk more than this estimate, the
+        # second pass uses the number of chunks read by the first one
+        fileSize = os.path.getsize(filename)
+        nChunks = max(1, -(-fileSize // TextNumberReader.CHUNK_BYTES))
+        self.onBegin(2 * nChunks)
+        try:
+            nLines = 0
+            positions = []
+            i = 0
+            with open(filename, 'rb') as f:
+                for chunk in TextNumberReader.iterChunks(f):
+                    buffer = numpy.frombuffer(chunk, dtype=numpy.uint8)
+                    ends = numpy.flatnonzero(buffer == ord("\n"))
+                    if (not ends.size) or (ends[-1] != len(chunk) - 1):
+                        ends = numpy.append(ends, len(chunk))
+                    starts = numpy.concatenate(([0], ends[:-1] + 1))
+                    selected = range((-nLines) % nChannels, ends.size,
+                                     nChannels)
+                    if len(selected):
+                        lines = [chunk[starts[k]:ends[k]] for k in selected]
+                        values = TextNumberReader.parseNumbers(
+                                                        b"\n".join(lines))
+                        if values.size != 4 * len(selected):
+                            raise IOError(
+                                    "Expected four columns in Renishaw map")
+                        values.shape = -1, 4
+                        positions.append(values[:, :2])
+                    nLines += ends.size
+                    i += 1
+                    self.onProgress(min(i, nChunks))
+            nRead = i
+            if nLines % nChannels:
+                raise IOError("Not a regular Renishaw map or " + \
+                              "a not a complete file")
+            nSpectra = nLines // nChannels
+            positions = numpy.concatenate(positions)
+
+            # final place of each spectrum according to its position
+            if firstChangesFirst:
+                columns, rows = positions[:, 0], positions[:, 1]
             else:
-                firstChangesFirst = True
-            nLines = nChannels + 1 + sum([1 for l in f])
-        #print("ELAPSED 0 = ", time.time() - t0)
-        if nLines % nChannels:
-            raise IOError("Not a regular Renishaw map or a not a complete file")
-        nSpectra = int(nLines / nChannels)
-        #print("N Channels = %d" % nChannels)
-        #print("N Lines = %d" % nLines)
-        #print("N Spectra = %f" % (nLines/nChannels))
-
-        rows = numpy.zeros((nSpectra,), numpy.float32)
-        columns = numpy.zeros((nSpectra,), numpy.float32)
-        wl = numpy.array(wl[:nChannels], dtype=numpy.float32)        
-        data = numpy.zeros((nSpectra, nChannels), numpy.float32)
-        nRows = 0
-        nColumns = 0
-        #t0 = time.time()
-        myFloat = numpy.float32
-        actualRows = []
-        actualColumns = []
-        indices = [None] * nSpectra
-        with open(filename, 'r') as f:
-            for i in range(nSpectra):
-                for j in range(nChannels):
-                    line = f.readline()
-                if firstChangesFirst:
-                    column, row, dummy1, dummy2 = \
-                            [float(value) for value in line.split("\t")]
-                else:
-                    row, column, dummy1, dummy2 = \
-                            [float(value) for value in line.split("\t")]
-                #positions.append((row, column, i))
-                if row not in actualRows:
-                    actualRows.append(row)
-                if column not in actualColumns:
-                    actualColumns.append(column)
-                indices[i] = (actualRows.index(row), actualColumns.index(column))
-        nRows = len(actualRows)
-        nColumns = len(actualColumns)
-        #positions.sort()
-        data.shape = nRows, nColumns, nChannels
-        with open(filename, 'r') as f:
-            for i in range(nSpectra):
-                row, column = indices[i]
-                for j in range(nChannels):
-                    line = f.readline()
-                    d1, d2, d3, data[row, column, j] = \
-                              [myFloat(value) for value in line.split("\t")]
-        #print "nRows = ", nRows
-        #print "nColumns= ", nColumns
-        #print columns[::nColumns]
-        #print rows[::nRows]
-        #print "product = ", nRows * nColumns
-        #print("ELAPSED tinal = ", time.time() - t0)
+                rows, columns = positions[:, 0], positions[:, 1]
+            rowIndices, nRows = _getOrderOfAppearance(rows)
+            columnIndices, nColumns = _getOrderOfAppearance(columns)
+            if nRows * nColumns != nSpectra:
+                raise IOError("Not a regular Renishaw map")
+            target = rowIndices * nColumns + columnIndices
+            if numpy.all(target == numpy.arange(nSpectra)):
+                # stored in reading order
+                target = None
+
+            # second pass, the values are written straight to their place
+            data = TextNumberReader.allocateArray((nSpectra, nChannels),
+                                                  numpy.float32,
+                                                  filename=dataFile)
+            flatData = data.reshape(-1)
+            i = 0
+            line = 0
+            with open(filename, 'rb') as f:
+                for chunk in TextNumberReader.iterChunks(f):
+                    values = TextNumberReader.parseNumbers(chunk)
+                    if values.size % 4:
+                        raise IOError("Expected four columns in Renishaw map")
+                    values.shape = -1, 4
+                    n = values.shape[0]
+                    if (line + n) > nLines:
+                        raise IOError("Unexpected number of values")
+                    if target is None:
+                        flatData[line:line + n] = values[:, 3]
+                    else:
+                        index = numpy.arange(line, line + n)
+                        flatData[target[index // nChannels] * nChannels + \
+                                 index % nChannels] = values[:, 3]
+                    line += n
+                    i += 1
+                    self.onProgress(nChunks + (i * nChunks) // nRead)
+            if line != nLines:
+                raise IOError("Unexpected number of values")
+            data.shape = nRows, nColumns, nChannels
+        finally:
+            self.onEnd()
 
         # arrange as EDF stack
         self.sourceName = filename
@@ -156,6 +201,15 @@ def __init__(self, filename, infofile=None):
         self.info["Channel0"] = 0.0
         self.x = [wl]
 
+    def onBegin(self, n):
+        pass
+
+    def onProgress(self, n):
+        pass
+
+    def onEnd(self):
+        pass
+
 def isRenishawMapFile(filename):
     try:
         if filename.endswith(".txt"):
@@ -0,0 +1,196 @@
+#/*##########################################################################
+#
+# The PyMca X-Ray Fluorescence Toolkit
+#
+# Copyright (c) 2004-2020 European Synchrotron Radiation Facility
+#
+# This file is part of the PyMca X-ray Fluorescence Toolkit developed at
+# the ESRF by the Software group.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#############################################################################*/
+__author__ = "V.A. Sole - ESRF Data Analysis"
+__contact__ = "sole@esrf.fr"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+"""
+Persistent index of the files read through specfilewrapper.
+
+SPEC files keep the offsets of their scans in a binary index file written
+by the specfile library itself. The index records the size and the
+modification time of the data file and it is only trusted if the file did
+not shrink, the file header and first scan have the same checksum and the
+bytes at the beginning of its last scan did not change. A modified file of
+the same size is considered rewritten and parsed again. When the file just
+grew, only the appended part is parsed.
+
+The other formats handled by specfilewrapper are parsed in Python. Their
+parsers are pickled and reused while the size and the modification time of
+the file do not change. The pickled parsers are stamped with
+PARSER_FORMAT_VERSION, that has to be increased whenever the attributes of
+the parser classes change. Otherwise the file is parsed again.
+
+The cache is disabled unless a directory is given, either calling
+setCacheDirectory or through the PYMCA_SPECFILE_INDEX_DIR environment
+variable.
+
+Usage::
+
+    from PyMca5.PyMcaIO import SpecFileIndexCache
+    SpecFileIndexCache.setCacheDirectory("/tmp/specfileindex")
+"""
+import os
+import hashlib
+import logging
+import tempfile
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+from PyMca5 import version as pymcaVersion
+
+_logger = logging.getLogger(__name__)
+
+# increase it whenever the content of the cached files changes
+CACHE_FORMAT_VERSION = 1
+# increase it whenever the pickled parser classes change
+PARSER_FORMAT_VERSION = 1
+
+INDEX_SUFFIX = ".sfidx"
+PARSER_SUFFIX = ".pkl"
+
+_CACHE_DIRECTORY = None
+
+
+def setCacheDirectory(directory=None):
+    """
+    Set the directory where the indices are stored. A value of None
+    disables the cache.
+    """
+    global _CACHE_DIRECTORY
+    if directory is None:
+        _CACHE_DIRECTORY = None
+        return
+    directory = os.path.join(os.path.abspath(directory),
+                             "specfileindex_v%d_%s" % (CACHE_FORMAT_VERSION,
+                                                       pymcaVersion()))
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    _CACHE_DIRECTORY = directory
+
+def getCacheDirectory():
+    return _CACHE_DIRECTORY
+
+def isEnabled():
+    return _CACHE_DIRECTORY is not None
+
+def _getBaseName(filename):
+    if _CACHE_DIRECTORY is None:
+        return None
+    name = os.path.abspath(filename)
+    if not isinstance(name, bytes):
+        name = name.encode("utf-8", "replace")
+    return os.path.join(_CACHE_DIRECTORY, hashlib.sha1(name).hexdigest())
+
+def getIndexFileName(filename):
+    """
+    Name of the index file used by the specfile library for the given
+    SPEC file or None if the cache is disabled.
+    """
+    baseName = _getBaseName(filename)
+    if baseName is None:
+        return None
+    return baseName + INDEX_SUFFIX
+
+def _getFileStamp(filename):
+    fileStat = os.stat(filename)
+    return PARSER_FORMAT_VERSION, fileStat.st_size, fileStat.st_mtime
+
+def loadParser(filename):
+    """
+    Return the cached parser of the given file or None if there is no
+    valid entry.
+    """
+    baseName = _getBaseName(filename)
+    if baseName is None:
+        return None
+    cacheFile = baseName + PARSER_SUFFIX
+    if not os.path.exists(cacheFile):
+        return None
+    try:
+        with open(cacheFile, "rb") as f:
+            stamp = pickle.load(f)
+            if stamp != _getFileStamp(filename):
+                _logger.debug("Outdated parser cache for %s", filename)
+                return None
+            return pickle.load(f)
+    except Exception:
+        _logger.warning("Cannot read parser cache for %s", filename)
+        return None
+
+def saveParser(filename, parser):
+    """
+    Store the parser of the given file. Parsers that cannot be pickled
+    are silently ignored.
+    """
+    baseName = _getBaseName(filename)
+    if baseName is None:
+        return
+    tmpName = None
+    try:
+        stamp = _getFileStamp(filename)
+        fd, tmpName = tempfile.mkstemp(dir=_CACHE_DIRECTORY,
+                                       suffix=PARSER_SUFFIX)
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(stamp, f, protocol=2)
+            pickle.dump(parser, f, protocol=2)
+        cacheFile = baseName + PARSER_SUFFIX
+        if hasattr(os, "replace"):
+            os.replace(tmpName, cacheFile)
+        else:
+            if os.path.exists(cacheFile):
+                os.remove(cacheFile)
+            os.rename(tmpName, cacheFile)
+        tmpName = None
+    except Exception:
+        _logger.debug("Cannot cache parser of %s", filename)
+    finally:
+        if tmpName is not None and os.path.exists(tmpName):
+            os.remove(tmpName)
+
+def clear():
+    """
+    Remove all the cached indices and parsers.
+    """
+    if _CACHE_DIRECTORY is None:
+        return
+    for name in os.listdir(_CACHE_DIRECTORY):
+        if name.endswith(INDEX_SUFFIX) or name.endswith(PARSER_SUFFIX):
+            try:
+                os.remove(os.path.join(_CACHE_DIRECTORY, name))
+            except OSError:
+                _logger.warning("Cannot remove %s", name)
+
+if os.environ.get("PYMCA_SPECFILE_INDEX_DIR"):
+    try:
+        setCacheDirectory(os.environ["PYMCA_SPECFILE_INDEX_DIR"])
+    except OSError:
+        _logger.warning("Cannot use %s as SPEC file index directory",
+                        os.environ["PYMCA_SPECFILE_INDEX_DIR"])
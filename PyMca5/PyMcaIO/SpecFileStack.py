@@ -169,13 +169,11 @@ def loadFileList(self, filelist, fileindex=0, shape=None):
                 # prevent problems if the scan number is different
                 # scan = tempInstance.select(keylist[-1])
                 scan = tempInstance[-1]
-                iterationList = range(scan.nbmca())
-                for i in iterationList:
-                    # mcadata = scan_obj.mca(i)
+                for i, block in specfile.iterMcaBlocks(scan):
                     self.data[0,
-                              i,
-                              :] = scan.mca(i + 1)[:]
-                    self.incrProgressBar += 1
+                              i:i + block.shape[0],
+                              :] = block
+                    self.incrProgressBar += block.shape[0]
                     self.onProgress(self.incrProgressBar)
                 filecounter = 1
         elif shape is None:
@@ -189,19 +187,20 @@ def loadFileList(self, filelist, fileindex=0, shape=None):
                                          arrRet.shape[0]),
                                          arrRet.dtype.char)
                 filecounter = 0
-                for tempFileName in filelist:
-                    tempInstance = specfile.Specfile(tempFileName)
-                    # it can only be here if there is one scan per file
-                    # prevent problems if the scan number is different
-                    # scan = tempInstance.select(keylist[-1])
-                    scan = tempInstance[-1]
-                    for i in iterlist:
-                        # mcadata = scan_obj.mca(i)
-                        self.data[filecounter,
-                                  0,
-                                  :] = scan.mca(i)[:]
-                        self.incrProgressBar += 1
-                        self.onProgress(self.incrProgressBar)
+                # it can only be here if there is one scan per file
+                # prevent problems if the scan number is different
+                # only the last of the mcas is kept, the files are
+                # read in parallel
+                lastMca = iterlist[-1]
+                for block in specfile.readMcaBlocks(filelist,
+                                                    first=lastMca,
+                                                    last=lastMca,
+                                                    scan=-1):
+                    self.data[filecounter,
+                              0,
+                              :] = block[0]
+                    self.incrProgressBar += len(iterlist)
+                    self.onProgress(self.incrProgressBar)
                     filecounter += 1
             except MemoryError:
                 qtflag = False
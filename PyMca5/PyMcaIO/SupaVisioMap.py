@@ -33,39 +33,32 @@
 import sys
 import os
 import numpy
-import struct
-import time
 import logging
 from PyMca5 import DataObject
-from PyMca5.PyMcaIO import PyMcaIOHelper
 
 
 _logger = logging.getLogger(__name__)
 
 SOURCE_TYPE = "EdfFileStack"
+# readings at higher channels are ignored
+NUMBER_OF_CHANNELS = 2048
+EVENTS_PER_BLOCK = 1024 * 1024
 
 class SupaVisioMap(DataObject.DataObject):
     def __init__(self, filename):
         DataObject.DataObject.__init__(self)
 
-        fileSize = os.path.getsize(filename)
-        if sys.platform == 'win32':
-            fid = open(filename, 'rb')
-        else:
-            fid = open(filename, 'r')
-        data=fid.read()
-        fid.close()
         self.sourceName = [filename]
-        e0 = time.time()
-
-        values = struct.unpack("%dH" % (len(data)/2), data)
-        data = numpy.array(values, numpy.uint16)
-        #print values
-        nrows = values[1]
-        ncols = values[2]
+        # the file is a header of three unsigned shorts followed by
+        # (y, x, channel) unsigned short triplets, one per event
+        data = numpy.memmap(filename, dtype="<u2", mode="r")
+        nrows = int(data[1])
+        ncols = int(data[2])
         self.nSpectra = nrows * ncols
-        data.shape = [len(data)/3, 3]
-        self.nChannels = data[:,2].max() + 1
+        nEvents = data.size // 3
+        # the last two triplets have never been taken as events
+        events = data[3:3 * (nEvents - 2)].reshape(-1, 3)
+        self.nChannels = NUMBER_OF_CHANNELS
 
         #fill the header
         self.header =[]
@@ -73,11 +66,11 @@ def __init__(self, filename):
 
         #arrange as an EDF Stack
         self.info = {}
-        self.__nFiles = (self.nSpectra)/self.nRows
+        self.__nFiles = (self.nSpectra) // self.nRows
         self.__nImagesPerFile = 1
 
-        e0 = time.time()
-        self.data = PyMcaIOHelper.fillSupaVisio(data).astype(numpy.float);
+        self.data = self._histogramEvents(events, ncols, nrows,
+                                          self.nChannels)
         shape = self.data.shape
         for i in range(len(shape)):
             key = 'Dim_%d' % (i+1,)
@@ -91,6 +84,25 @@ def __init__(self, filename):
         self.info["McaCalib"] = [0.0, 1.0, 0.0]
         self.info["Channel0"] = 0.0
 
+    def _histogramEvents(self, events, nX, nY, nChannels):
+        output = numpy.zeros((nX * nY * nChannels,), dtype=numpy.float64)
+        # events are histogrammed in blocks to limit the temporary memory
+        for start in range(0, events.shape[0], EVENTS_PER_BLOCK):
+            block = numpy.array(events[start:start + EVENTS_PER_BLOCK],
+                                dtype=numpy.int64)
+            y = block[:, 0]
+            x = block[:, 1]
+            channel = block[:, 2]
+            good = (channel < nChannels) & (x < nX) & (y < nY)
+            if not good.all():
+                _logger.warning("Ignoring %d bad readings",
+                                block.shape[0] - good.sum())
+            index = (x[good] * nY + y[good]) * nChannels + channel[good]
+            index, counts = numpy.unique(index, return_counts=True)
+            output[index] += counts
+        output.shape = nX, nY, nChannels
+        return output
+
 if __name__ == "__main__":
     filename = None
     if len(sys.argv) > 1:
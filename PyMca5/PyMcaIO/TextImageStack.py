@@ -33,15 +33,163 @@
 import numpy
 import sys
 import os
+import hashlib
 import logging
+import tempfile
+import warnings
+import multiprocessing
 from PyMca5 import DataObject
 
 SOURCE_TYPE = "EdfFileStack"
 _logger = logging.getLogger(__name__)
 
+# increase it whenever the layout of the cache files changes
+CACHE_FORMAT_VERSION = 1
+
+# minimum number of files to justify starting a pool of processes
+PARALLEL_MIN_FILES = 64
+
+if sys.version_info < (3,):
+    _SEPARATORS = None
+else:
+    _SEPARATORS = bytes.maketrans(b",;\t\r", b"    ")
+
+
+def readTextImage(filename, dtype=None):
+    """
+    Read a text file with one row of the image per line. The numbers can be
+    separated by blanks, tabs, commas or semicolons. Anything else (comments,
+    missing values, ...) is handled by numpy.loadtxt.
+
+    The values are parsed as float64 and then converted to dtype. As with
+    numpy.loadtxt, an integer dtype requires integer values in range.
+    """
+    with open(filename, "rb") as f:
+        content = f.read()
+    data = None
+    if (_SEPARATORS is not None) and (b"#" not in content):
+        content = content.translate(_SEPARATORS).strip()
+        firstLine = content.split(b"\n", 1)[0]
+        nColumns = len(firstLine.split())
+        nRows = content.count(b"\n") + 1
+        with warnings.catch_warnings():
+            # incomplete reads are detected below
+            warnings.simplefilter("ignore")
+            data = numpy.fromstring(content.decode("latin-1"),
+                                    dtype=numpy.float64, sep=" ")
+        if nColumns and (data.size == nRows * nColumns):
+            data.shape = nRows, nColumns
+        else:
+            data = None
+    if data is None:
+        data = numpy.loadtxt(filename)
+    if data.ndim == 1:
+        data.shape = 1, -1
+    if dtype is not None:
+        dtype = numpy.dtype(dtype)
+        if dtype.kind in "iu":
+            info = numpy.iinfo(dtype)
+            if numpy.any(data != numpy.floor(data)) or \
+               (data.size and ((data.min() < info.min) or \
+                               (data.max() > info.max))):
+                raise ValueError("%s contains values that are not %s " \
+                                 "integers" % (filename, dtype.name))
+        data = data.astype(dtype, copy=False)
+    return data
+
+def _replaceFile(source, destination):
+    # os.replace is not available under Python 2 and os.rename does not
+    # overwrite an existing file under Windows
+    try:
+        os.rename(source, destination)
+    except OSError:
+        if not os.path.exists(destination):
+            raise
+        os.remove(destination)
+        os.rename(source, destination)
+
+def _getCachePrefix(filelist, dtype):
+    # the same for all the versions of the given list of files
+    key = hashlib.sha1()
+    key.update(("%d %s" % (CACHE_FORMAT_VERSION,
+                           numpy.dtype(dtype).str)).encode("utf-8"))
+    for filename in filelist:
+        key.update(os.path.abspath(filename).encode("utf-8"))
+    return ".pymca_textstack_%s_" % key.hexdigest()
+
+def getCacheFileName(filelist, dtype, directory=None):
+    """
+    Name of the binary cache of the given text images. It depends on the
+    names, sizes and modification times of the files, so any modification
+    of the input gives a different cache file. The caches of the same list
+    of files share the same prefix.
+    """
+    key = hashlib.sha1()
+    for filename in filelist:
+        fileStat = os.stat(filename)
+        key.update(("%d %d" % (fileStat.st_size,
+                               int(fileStat.st_mtime * 1000))).encode("utf-8"))
+    if directory is None:
+        directory = os.path.dirname(os.path.abspath(filelist[0]))
+    return os.path.join(directory, _getCachePrefix(filelist, dtype) + \
+                                   "%s.npy" % key.hexdigest())
+
+def removeSupersededCaches(filelist, dtype, keep=None, directories=None):
+    """
+    Remove the caches of previous versions of the given list of files.
+
+    :param keep: Name of the cache file not to be removed
+    :param directories: Directories to clean, by default the one of the
+                        first file and the temporary directory
+    :return: List of removed files
+    """
+    if directories is None:
+        directories = [os.path.dirname(os.path.abspath(filelist[0])),
+                       tempfile.gettempdir()]
+    prefix = _getCachePrefix(filelist, dtype)
+    if keep is not None:
+        keep = os.path.abspath(keep)
+    removed = []
+    for directory in directories:
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            continue
+        for name in names:
+            if not (name.startswith(prefix) and name.endswith(".npy")):
+                continue
+            fullName = os.path.join(directory, name)
+            if os.path.abspath(fullName) == keep:
+                continue
+            try:
+                os.remove(fullName)
+                removed.append(fullName)
+            except OSError:
+                # still mapped by someone on some platforms
+                _logger.info("Cannot remove cache %s", fullName)
+    return removed
+
+def _readBatch(args):
+    # worker function: read the given files, store them in the cache if any
+    cacheName, batch, dtype = args
+    if cacheName is None:
+        return [(index, readTextImage(filename, dtype=dtype))
+                for index, filename in batch]
+    data = numpy.load(cacheName, mmap_mode="r+")
+    for index, filename in batch:
+        image = readTextImage(filename, dtype=dtype)
+        if image.shape != data.shape[1:]:
+            raise ValueError("Image in %s has shape %s instead of %s" % \
+                             (filename, image.shape, data.shape[1:]))
+        data[index] = image
+    data.flush()
+    del data
+    return [(index, None) for index, filename in batch]
+
 
 class TextImageStack(DataObject.DataObject):
-    def __init__(self, filelist = None, imagestack=None, dtype=None):
+    def __init__(self, filelist = None, imagestack=None, dtype=None,
+                 cache=True, nprocesses=None):
         DataObject.DataObject.__init__(self)
         self.incrProgressBar=0
         self.__keyList = []
@@ -50,6 +198,8 @@ def __init__(self, filelist = None, imagestack=None, dtype=None):
         else:
             self.__imageStack = imagestack
         self.__dtype = dtype
+        self.cache = cache
+        self.nprocesses = nprocesses
         if filelist is not None:
             if type(filelist) != type([]):
                 filelist = [filelist]
@@ -59,6 +209,18 @@ def __init__(self, filelist = None, imagestack=None, dtype=None):
                 self.loadFileList(filelist)
 
     def loadFileList(self, filelist, fileindex=0):
+        """
+        Read the list of text images.
+
+        The images are stored in a binary cache (a .npy file next to the
+        first image or, if not writable, in the temporary directory) that
+        is memory mapped. Later loads of the same unmodified files just map
+        the cache. Writing a new cache removes the ones of previous versions
+        of the same files. Long lists of files are parsed by a pool of
+        processes.
+        Set the cache attribute to False to keep the stack in memory and
+        the nprocesses attribute to control the number of processes.
+        """
         if type(filelist) == type(''):
             filelist = [filelist]
         self.__keyList = []
@@ -67,51 +229,27 @@ def loadFileList(self, filelist, fileindex=0):
         self.sourceType = SOURCE_TYPE
         self.info = {}
         self.__nFiles=len(filelist)
-        #read first file
-        arrRet = numpy.loadtxt(filelist[0])
         if self.__dtype is None:
-            self.__dtype = arrRet.dtype
+            # readTextImage default
+            self.__dtype = numpy.dtype(numpy.float64)
         self.__nImagesPerFile = 1
 
-        #try to allocate the memory
-        shape = self.__nFiles, arrRet.shape[0], arrRet.shape[1]
-        samplingStep = 1
-        try:
-            self.data = numpy.zeros(shape, self.__dtype)
-        except (MemoryError, ValueError):
-            for i in range(3):
-                print("\7")
-            samplingStep = None
-            i = 2
-            while samplingStep is None:
-                _logger.warning("**************************************************")
-                _logger.warning(" Memory error!, attempting %dx%d sampling reduction ", i, i)
-                _logger.warning("**************************************************")
-                s1, s2 = arrRet[::i, ::i].shape
-                try:
-                    self.data = numpy.zeros((self.__nFiles, s1, s2),
-                                         self.__dtype)
-                    samplingStep = i
-                except (MemoryError, ValueError):
-                    i += 1
-
-        #fill the array
         self.onBegin(self.__nFiles)
         self.__imageStack = True
         self.incrProgressBar=0
-        if samplingStep == 1:
-            for tempFileName in filelist:
-                self.data[self.incrProgressBar]=numpy.loadtxt(tempFileName,
-                                                        dtype=self.__dtype)
-                self.incrProgressBar += 1
-                self.onProgress(self.incrProgressBar)
+        cacheName = None
+        if self.cache:
+            cacheName = self.__findCache(filelist)
+        if cacheName is not None:
+            _logger.info("Using cache %s", cacheName)
+            # modifications of the data are not written to the cache
+            self.data = numpy.load(cacheName, mmap_mode="c")
+            self.incrProgressBar = self.__nFiles
+            self.onProgress(self.incrProgressBar)
         else:
-            for tempFileName in filelist:
-                pieceOfStack=numpy.loadtxt(tempFileName, dtype=self.__dtype)
-                self.data[self.incrProgressBar] = pieceOfStack[::samplingStep,
-                                                               ::samplingStep]
-                self.incrProgressBar += 1
-                self.onProgress(self.incrProgressBar)
+            #read first file
+            firstImage = readTextImage(filelist[0], dtype=self.__dtype)
+            self.data = self.__readFileList(filelist, firstImage)
         self.onEnd()
         if self.__imageStack:
             self.info["McaIndex"] = 0
@@ -124,6 +262,94 @@ def loadFileList(self, filelist, fileindex=0):
         self.info["NumberOfFiles"] = self.__nFiles * 1
         self.info["Size"] = self.__nFiles * self.__nImagesPerFile
 
+    def __cacheCandidates(self, filelist):
+        directories = [os.path.dirname(os.path.abspath(filelist[0])),
+                       tempfile.gettempdir()]
+        return [getCacheFileName(filelist, self.__dtype, directory=directory)
+                for directory in directories]
+
+    def __findCache(self, filelist):
+        for cacheName in self.__cacheCandidates(filelist):
+            if os.path.exists(cacheName):
+                return cacheName
+        return None
+
+    def __readFileList(self, filelist, firstImage):
+        shape = (self.__nFiles,) + firstImage.shape
+        cacheName = None
+        if self.cache:
+            for candidate in self.__cacheCandidates(filelist):
+                tmpName = candidate + ".%d.tmp" % os.getpid()
+                try:
+                    data = numpy.lib.format.open_memmap(tmpName, mode="w+",
+                                                        dtype=self.__dtype,
+                                                        shape=shape)
+                except (IOError, OSError):
+                    _logger.info("Cannot write cache %s", candidate)
+                    continue
+                # the workers write the other images into the file
+                data[0] = firstImage
+                del data
+                cacheName = candidate
+                break
+            if cacheName is None:
+                _logger.warning("Cannot create any cache, reading in memory")
+        if cacheName is None:
+            data = numpy.zeros(shape, self.__dtype)
+            data[0] = firstImage
+        self.incrProgressBar += 1
+        self.onProgress(self.incrProgressBar)
+
+        nprocesses = self.nprocesses
+        if nprocesses is None:
+            if self.__nFiles < PARALLEL_MIN_FILES:
+                nprocesses = 1
+            else:
+                nprocesses = multiprocessing.cpu_count()
+        indexedFiles = list(enumerate(filelist))[1:]
+        nprocesses = max(1, min(nprocesses, len(indexedFiles)))
+        batchSize = max(1, min(100, len(indexedFiles) // (4 * nprocesses)))
+        batches = [(None if cacheName is None else tmpName,
+                    indexedFiles[i:i + batchSize], self.__dtype)
+                   for i in range(0, len(indexedFiles), batchSize)]
+
+        pool = None
+        try:
+            if nprocesses > 1:
+                if sys.version_info >= (3, 4):
+                    # do not fork a process that may be running Qt threads
+                    context = multiprocessing.get_context("spawn")
+                else:
+                    context = multiprocessing
+                pool = context.Pool(processes=nprocesses)
+                results = pool.imap_unordered(_readBatch, batches)
+            else:
+                results = (_readBatch(batch) for batch in batches)
+            for result in results:
+                for index, image in result:
+                    if image is not None:
+                        if image.shape != shape[1:]:
+                            raise ValueError(
+                                "Image in %s has shape %s instead of %s" % \
+                                    (filelist[index], image.shape, shape[1:]))
+                        data[index] = image
+                    self.incrProgressBar += 1
+                self.onProgress(self.incrProgressBar)
+        except:
+            if cacheName is not None and os.path.exists(tmpName):
+                os.remove(tmpName)
+            raise
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        if cacheName is None:
+            return data
+        _replaceFile(tmpName, cacheName)
+        removeSupersededCaches(filelist, self.__dtype, keep=cacheName)
+        return numpy.load(cacheName, mmap_mode="c")
+
     def onBegin(self, n):
         pass
 
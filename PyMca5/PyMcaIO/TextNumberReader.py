@@ -0,0 +1,153 @@
+#/*##########################################################################
+#
+# The PyMca X-Ray Fluorescence Toolkit
+#
+# Copyright (c) 2004-2026 European Synchrotron Radiation Facility
+#
+# This file is part of the PyMca X-ray Fluorescence Toolkit developed at
+# the ESRF by the Software group.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#############################################################################*/
+__author__ = "V.A. Sole - ESRF Data Analysis"
+__contact__ = "sole@esrf.fr"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+__doc__ = """
+Streaming conversion of large text files of numbers into arrays.
+
+The files are read in chunks of complete lines. Each chunk is converted
+with a single call to numpy.fromstring and the number of converted values
+is checked against the number of tokens of the chunk. Chunks containing
+anything else than numbers fall back to a regular expression extracting
+the numbers. The memory used does not depend on the size of the file.
+"""
+import re
+import sys
+import logging
+import warnings
+import numpy
+
+_logger = logging.getLogger(__name__)
+
+# size of the chunks read from the files
+CHUNK_BYTES = 8 * 1024 * 1024
+
+# commas, semicolons and tabs are number separators
+if sys.version_info < (3,):
+    import string
+    _TRANSLATION = string.maketrans(",;\t\r", "    ")
+else:
+    _TRANSLATION = bytes.maketrans(b",;\t\r", b"    ")
+_NUMERIC = b"0123456789.+-eE \n"
+_BLANK = numpy.zeros((256,), dtype=bool)
+_BLANK[numpy.frombuffer(b" \t\r\n\v\f,;", dtype=numpy.uint8)] = True
+
+NUMBER_PATTERN = re.compile(br"[-+]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)" \
+                            br"(?:[eE][-+]?[0-9]+)?")
+
+
+def iterChunks(f, chunkBytes=None):
+    """
+    Read a binary file object in chunks ending at a line end.
+
+    :param f: File object opened in binary mode
+    :param chunkBytes: Approximate size of the chunks (default CHUNK_BYTES)
+    :return: Iterator over bytes
+    """
+    if chunkBytes is None:
+        chunkBytes = CHUNK_BYTES
+    remainder = b""
+    while True:
+        block = f.read(chunkBytes)
+        if not block:
+            if remainder:
+                yield remainder
+            return
+        if remainder:
+            block = remainder + block
+        end = block.rfind(b"\n")
+        if end < 0:
+            remainder = block
+            continue
+        remainder = block[end + 1:]
+        yield block[:end + 1]
+
+
+def countTokens(chunk):
+    """
+    Number of groups of characters separated by blanks, commas or
+    semicolons.
+    """
+    if not len(chunk):
+        return 0
+    blank = _BLANK[numpy.frombuffer(chunk, dtype=numpy.uint8)]
+    starts = ~blank
+    starts[1:] &= blank[:-1]
+    return int(numpy.count_nonzero(starts))
+
+
+def parseNumbers(chunk, dtype=numpy.float64):
+    """
+    Numbers contained in a chunk of text.
+
+    :param chunk: bytes
+    :param dtype: Type of the output
+    :return: 1D array
+    """
+    text = chunk.translate(_TRANSLATION)
+    data = None
+    if not text.translate(None, _NUMERIC):
+        with warnings.catch_warnings():
+            # incomplete conversions are detected below
+            warnings.simplefilter("ignore")
+            data = numpy.fromstring(text.decode("latin-1"),
+                                    dtype=numpy.float64, sep=" ")
+        if data.size != countTokens(text):
+            data = None
+    if data is None:
+        _logger.debug("Extracting numbers with a regular expression")
+        data = numpy.array([float(x) for x in NUMBER_PATTERN.findall(text)],
+                           dtype=numpy.float64)
+    if data.dtype != dtype:
+        data = data.astype(dtype)
+    return data
+
+
+def countNumbers(chunk):
+    """
+    Number of values parseNumbers finds in a well formed chunk, without
+    converting them.
+    """
+    text = chunk.translate(_TRANSLATION)
+    if not text.translate(None, _NUMERIC):
+        return countTokens(text)
+    return len(NUMBER_PATTERN.findall(text))
+
+
+def allocateArray(shape, dtype, filename=None):
+    """
+    Zero filled array of the given shape, memory mapped onto a .npy file
+    when filename is given.
+    """
+    if filename is None:
+        return numpy.zeros(shape, dtype=dtype)
+    return numpy.lib.format.open_memmap(filename, mode="w+",
+                                        dtype=dtype, shape=tuple(shape))
@@ -100,6 +100,7 @@
 #define  SF_ERR_USER_NOT_FOUND      13
 #define  SF_ERR_COL_NOT_FOUND       14
 #define  SF_ERR_MCA_NOT_FOUND       15
+#define  SF_ERR_MCA_SIZE            16
 
 typedef struct _SfCursor {
     long  int scanno;      /* nb of scans */
@@ -138,6 +139,7 @@ typedef struct _SpecFile{
   long           *data_info;
   SfCursor        cursor;
   short           updating;
+  char           *idxname;
 } SpecFile;
 
 typedef struct _SpecFileOut{
@@ -171,6 +173,8 @@ typedef struct _SpecScan {
  * init
  */
 DllExport extern    SpecFile  *SfOpen        ( char *name, int *error );
+DllExport extern    SpecFile  *SfOpenIndexed ( char *name, char *idxname,
+                                                             int *error );
 DllExport extern    short      SfUpdate      ( SpecFile *sf,int *error );
 DllExport extern    int        SfClose       ( SpecFile *sf );
 
@@ -254,6 +258,11 @@ DllExport extern int  SfGetMca  ( SpecFile *sf, long index, long mcano,
                                           double **retdata, int *error );
 DllExport extern long SfMcaCalib ( SpecFile *sf, long index, double **calib,
                                           int *error );
+DllExport extern long SfMcaBuffer ( SpecFile *sf, long index, char **buffer,
+                                          int *error );
+DllExport extern long SfParseMcaBlock ( char *buffer, long size, long first,
+                                        long last, long step, double *data,
+                                        long nchannels, int *error );
 
   /*
    * Write and write related functions
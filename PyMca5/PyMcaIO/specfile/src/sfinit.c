@@ -135,6 +135,7 @@
 
 DllExport SpecFile * SfOpen   ( char *name,int *error);
 DllExport SpecFile * SfOpen2  ( int fd, char *name,int *error);
+DllExport SpecFile * SfOpenIndexed ( char *name, char *idxname, int *error);
 DllExport int        SfClose  ( SpecFile *sf);
 DllExport short      SfUpdate ( SpecFile *sf, int *error);
 DllExport char     * SfError  ( int error);
@@ -156,13 +157,15 @@ static void  sfHeaderLine  ( SpecFile *sf, SfCursor *cursor, char c,int *error);
 static void  sfNewBlock    ( SpecFile *sf, SfCursor *cursor, short how,int *error);
 static void  sfSaveScan    ( SpecFile *sf, SfCursor *cursor, int *error);
 static void  sfAssignScanNumbers (SpecFile *sf);
+static int   sfCompareScans (const void *a, const void *b);
 static void  sfReadFile    ( SpecFile *sf, SfCursor *cursor, int *error);
 static void  sfResumeRead  ( SpecFile *sf, SfCursor *cursor, int *error);
-#ifdef SPECFILE_USE_INDEX_FILE
+static SpecFile *sfOpenFile ( int fd, char *name, char *idxname, int *error);
 static short sfOpenIndex   ( SpecFile *sf, SfCursor *cursor, int *error);
 static short sfReadIndex   ( int sfi, SpecFile *sf, SfCursor *cursor, int *error);
 static void  sfWriteIndex  ( SpecFile *sf, SfCursor *cursor, int *error);
-#endif
+static long  sfIndexHeadLength ( SpecFile *sf, long size);
+static int   sfIndexChecksum   ( int fd, long length, unsigned long *checksum);
 
 /*
  * errors
@@ -189,6 +192,7 @@ sf_errors errors[]={
 { SF_ERR_USER_NOT_FOUND   , "User not found error ( SpecFile )"       },
 { SF_ERR_COL_NOT_FOUND    , "Column not found error ( SpecFile )"      },
 { SF_ERR_MCA_NOT_FOUND    , "Mca not found ( SpecFile )"      },
+{ SF_ERR_MCA_SIZE         , "Mca with different number of channels ( SpecFile )" },
 /* MUST be always the last one : */
 { SF_ERR_NO_ERRORS        , "OK ( SpecFile )"              },
 };
@@ -252,6 +256,61 @@ SfOpen(char *name, int *error) {
 
 DllExport SpecFile *
 SfOpen2(int fd, char *name,int *error) {
+#ifdef SPECFILE_USE_INDEX_FILE
+   SpecFile   *sf;
+   char       *idxname;
+
+   idxname = (char *)malloc(sizeof(char) * (strlen(name) + strlen(SF_ISFX) + 1));
+   if (idxname == (char *)NULL) {
+      *error = SF_ERR_MEMORY_ALLOC;
+      return ( (SpecFile *) NULL );
+   }
+   sprintf(idxname,"%s%s",name,SF_ISFX);
+   sf = sfOpenFile(fd, name, idxname, error);
+   free(idxname);
+   return(sf);
+#else
+   return(sfOpenFile(fd, name, (char *)NULL, error));
+#endif
+}
+
+
+/*********************************************************************
+ *   Function:          SpecFile *SfOpenIndexed( name, idxname, error)
+ *
+ *   Description:       Opens connection to Spec data file using
+ *                      (and keeping up to date) an index file.
+ *                      If the index file corresponds to the data file,
+ *                      the data file is not read. If the data file
+ *                      was appended to since the index was written,
+ *                      only the appended part is read.
+ *
+ *   Parameters:
+ *              Input :
+ *                      (1) Filename
+ *                      (2) Index filename
+ *              Output:
+ *                      (3) error number
+ *   Returns:
+ *                      SpecFile pointer.
+ *                      NULL if not successful.
+ *
+ *   Possible errors:
+ *                      SF_ERR_FILE_OPEN
+ *                      SF_ERR_MEMORY_ALLOC
+ *
+ *********************************************************************/
+DllExport SpecFile *
+SfOpenIndexed(char *name, char *idxname, int *error) {
+
+   int         fd;
+   fd   = open(name,SF_OPENFLAG);
+   return (sfOpenFile(fd, name, idxname, error));
+}
+
+
+static SpecFile *
+sfOpenFile(int fd, char *name, char *idxname, int *error) {
    SpecFile   *sf;
    short       idxret;
    SfCursor      cursor;
@@ -296,6 +355,9 @@ SfOpen2(int fd, char *name,int *error) {
    sf->data            = (double **)NULL;
    sf->data_info       = (long *)NULL;
    sf->updating        = 0;
+   sf->idxname         = (char *)NULL;
+   if (idxname != (char *)NULL)
+       sf->idxname     = (char *)strdup(idxname);
 
   /*
    * Init cursor
@@ -311,15 +373,11 @@ SfOpen2(int fd, char *name,int *error) {
    cursor.file_header  = 0;
 
 
-#ifdef SPECFILE_USE_INDEX_FILE
   /*
    * Check if index file
    *   open it and continue from there
    */
    idxret = sfOpenIndex(sf,&cursor,error);
-#else
-   idxret = SF_INIT;
-#endif
 
    switch(idxret) {
       case SF_MODIFIED:
@@ -342,12 +400,12 @@ SfOpen2(int fd, char *name,int *error) {
 
   /*
    * Once is all done assign scan numbers and orders
+   * (they are already in an up to date index)
    */
-   sfAssignScanNumbers(sf);
-
-#ifdef SPECFILE_USE_INDEX_FILE
-   if (idxret != SF_READY) sfWriteIndex(sf,&cursor,error);
-#endif
+   if (idxret != SF_READY) {
+       sfAssignScanNumbers(sf);
+       sfWriteIndex(sf,&cursor,error);
+   }
    return(sf);
 }
 
@@ -383,6 +441,8 @@ SfClose( SpecFile *sf )
      }
 
      free ((char *)sf->sfname);
+     if (sf->idxname != NULL)
+        free ((char *)sf->idxname);
      if (sf->scanbuffer != NULL)
         free ((char *)sf->scanbuffer);
 
@@ -432,15 +492,15 @@ SfUpdate ( SpecFile *sf, int *error )
 
     mtime = mystat.st_mtime;
 
-    if (sf->m_time != mtime)  {
+    /* the modification time has a resolution of one second */
+    if ((sf->m_time != mtime) || \
+        ((long) mystat.st_size != sf->cursor.bytecnt))  {
        sfResumeRead (sf,&(sf->cursor),error);
        sfReadFile   (sf,&(sf->cursor),error);
 
        sf->m_time = mtime;
        sfAssignScanNumbers(sf);
-#ifdef SPECFILE_USE_INDEX_FILE
        sfWriteIndex (sf,&(sf->cursor),error);
-#endif
        return(1);
     }else{
        return(0);
@@ -547,104 +607,242 @@ sfResumeRead  ( SpecFile *sf, SfCursor *cursor, int *error) {
 }
 
 
-#ifdef SPECFILE_USE_INDEX_FILE
+/*
+ * Index file: header, cursor and the list of scans. The header allows to
+ * reject indices written on other platforms or for other files. It also
+ * keeps a checksum of the file header and first scan (at most
+ * SF_IDX_HEAD bytes) and the first bytes of the last scan, to detect files
+ * rewritten in place.
+ */
+#define SF_IDX_SIGNATURE  "PyMca SpecFile index"
+#define SF_IDX_VERSION    2
+#define SF_IDX_MAGIC      0x01020304L
+#define SF_IDX_ANCHOR     64
+#define SF_IDX_HEAD       (1024 * 1024)
+
+typedef struct _SfIndexHeader {
+    char  signature[24];
+    long  magic;
+    long  version;
+    long  sizeof_cursor;
+    long  sizeof_scan;
+    long  m_time;
+    long  size;
+    long  no_scans;
+    long  anchor_offset;
+    long  anchor_length;
+    char  anchor[SF_IDX_ANCHOR];
+    long  head_length;
+    unsigned long head_checksum;
+} SfIndexHeader;
+
+
 static short
 sfOpenIndex ( SpecFile *sf, SfCursor *cursor, int *error) {
-    char *idxname;
-    short namelength;
     int   sfi;
+    short ret;
 
-    namelength = strlen(sf->sfname) + strlen(SF_ISFX) + 1;
-
-    idxname = (char *)malloc(sizeof(char) * namelength);
-
-    sprintf(idxname,"%s%s",sf->sfname,SF_ISFX);
+    if (sf->idxname == (char *)NULL)
+        return(SF_INIT);
 
-    if ((sfi = open(idxname,SF_OPENFLAG)) == -1) {
-        free(idxname);
+    if ((sfi = open(sf->idxname,SF_OPENFLAG)) == -1)
         return(SF_INIT);
-    } else {
-        free(idxname);
-        return(sfReadIndex(sfi,sf,cursor,error));
-    }
+
+    ret = sfReadIndex(sfi,sf,cursor,error);
+    close(sfi);
+    if (ret == SF_INIT)
+        lseek(sf->fd,0,SEEK_SET);
+    return(ret);
 }
 
-
+
 static short
 sfReadIndex   ( int sfi, SpecFile *sf, SfCursor *cursor, int *error) {
-    SfCursor   filecurs;
-    char       buffer[200];
-    long       bytesread,i=0;
-    SpecScan   scan;
-    short      modif = 0;
-    long       mtime;
-
-   /*
-    * read signature
-    */
-    bytesread = read(sfi,buffer,sizeof(SF_SIGNATURE));
-    if (strcmp(buffer,SF_SIGNATURE) || bytesread == 0 ) {
+    SfIndexHeader  header;
+    SfCursor       filecurs;
+    SpecScan      *scans;
+    struct stat    mystat;
+    char           anchor[SF_IDX_ANCHOR];
+    long           i, nbytes;
+    unsigned long  checksum;
+
+    if (read(sfi,&header,sizeof(SfIndexHeader)) != sizeof(SfIndexHeader))
+        return(SF_INIT);
+    if (strncmp(header.signature,SF_IDX_SIGNATURE,sizeof(header.signature)) ||
+        (header.magic != SF_IDX_MAGIC) ||
+        (header.version != SF_IDX_VERSION) ||
+        (header.sizeof_cursor != (long) sizeof(SfCursor)) ||
+        (header.sizeof_scan != (long) sizeof(SpecScan)) ||
+        (header.no_scans < 1) ||
+        (header.anchor_length < 1) ||
+        (header.anchor_length > SF_IDX_ANCHOR) ||
+        (header.head_length < 1) ||
+        (header.head_length > header.size))
         return(SF_INIT);
-    }
 
    /*
-    * read cursor and specfile structure
+    * the file can only have grown, a modified file of the same size has
+    * been rewritten, and the file header, the first scan and the start
+    * of the last indexed scan have to be unchanged
     */
-    if ( read(sfi,&mtime,   sizeof(long)) == 0)   return(SF_INIT);
-    if ( read(sfi,&filecurs, sizeof(SfCursor)) == 0) return(SF_INIT);
+    if (fstat(sf->fd,&mystat))
+        return(SF_INIT);
+    if ((long) mystat.st_size < header.size)
+        return(SF_INIT);
+    if (((long) mystat.st_size == header.size) &&
+        (sf->m_time != header.m_time))
+        return(SF_INIT);
+    if (lseek(sf->fd,0,SEEK_SET) == -1)
+        return(SF_INIT);
+    if (sfIndexChecksum(sf->fd,header.head_length,&checksum) ||
+        (checksum != header.head_checksum))
+        return(SF_INIT);
+    if (lseek(sf->fd,header.anchor_offset,SEEK_SET) == -1)
+        return(SF_INIT);
+    if (read(sf->fd,anchor,header.anchor_length) != header.anchor_length)
+        return(SF_INIT);
+    if (memcmp(anchor,header.anchor,header.anchor_length))
+        return(SF_INIT);
 
-    if (sf->m_time != mtime)  modif = 1;
+    if (read(sfi,&filecurs,sizeof(SfCursor)) != sizeof(SfCursor))
+        return(SF_INIT);
 
-    while(read(sfi,&scan, sizeof(SpecScan))) {
-        addToList(&(sf->list), (void *)&scan, (long)sizeof(SpecScan));
-        i++;
+    nbytes = sizeof(SpecScan) * header.no_scans;
+    if ((scans = (SpecScan *) malloc(nbytes)) == (SpecScan *)NULL)
+        return(SF_INIT);
+    if (read(sfi,scans,nbytes) != nbytes) {
+        free(scans);
+        return(SF_INIT);
     }
-    sf->no_scans = i;
+    for (i = 0; i < header.no_scans; i++)
+        addToList(&(sf->list), (void *)&(scans[i]), (long)sizeof(SpecScan));
+    free(scans);
+    sf->no_scans = header.no_scans;
 
     memcpy(cursor,&filecurs,sizeof(SfCursor));
 
-    if (modif) return(SF_MODIFIED);
+    if ((sf->m_time != header.m_time) || ((long) mystat.st_size != header.size))
+        return(SF_MODIFIED);
 
     return(SF_READY);
 }
 
-
+
 static void
 sfWriteIndex  ( SpecFile *sf, SfCursor *cursor, int *error) {
 
-    int         fdi;
-    char       *idxname;
-    short       namelength;
-    ObjectList *obj;
-    long        mtime;
-
-    namelength = strlen(sf->sfname) + strlen(SF_ISFX) + 1;
+    int            fdi;
+    char          *tmpname;
+    ObjectList    *obj;
+    SfIndexHeader  header;
+    long           nbytes;
+    int            failed = 0;
 
-    idxname = (char *)malloc(sizeof(char) * namelength);
+    if ((sf->idxname == (char *)NULL) || (sf->no_scans < 1) ||
+        (sf->list.last == (ObjectList *)NULL))
+        return;
 
-    sprintf(idxname,"%s%s",sf->sfname,SF_ISFX);
+    memset(&header,0,sizeof(SfIndexHeader));
+    strncpy(header.signature,SF_IDX_SIGNATURE,sizeof(header.signature));
+    header.magic          = SF_IDX_MAGIC;
+    header.version        = SF_IDX_VERSION;
+    header.sizeof_cursor  = sizeof(SfCursor);
+    header.sizeof_scan    = sizeof(SpecScan);
+    header.m_time         = sf->m_time;
+    header.size           = cursor->bytecnt;
+    header.no_scans       = sf->no_scans;
+    header.anchor_offset  = ((SpecScan *)sf->list.last->contents)->offset;
+    nbytes = header.size - header.anchor_offset;
+    if (nbytes > SF_IDX_ANCHOR)
+        nbytes = SF_IDX_ANCHOR;
+    if (nbytes < 1)
+        return;
+    lseek(sf->fd,header.anchor_offset,SEEK_SET);
+    header.anchor_length = read(sf->fd,header.anchor,nbytes);
+    if (header.anchor_length != nbytes)
+        return;
+    header.head_length = sfIndexHeadLength(sf,header.size);
+    lseek(sf->fd,0,SEEK_SET);
+    if (sfIndexChecksum(sf->fd,header.head_length,&(header.head_checksum)))
+        return;
 
-    /* if ((fdi = open(idxname,SF_WRITEFLAG,SF_UMASK)) == -1) { */
-    if ((fdi = open(idxname,O_CREAT | O_WRONLY,SF_UMASK)) == -1) {
-        printf("    - cannot open. Error: (%d)\n",errno);
-        free(idxname);
+    tmpname = (char *)malloc(sizeof(char) * (strlen(sf->idxname) + 5));
+    if (tmpname == (char *)NULL)
         return;
-    } else {
-        mtime = sf->m_time;
-        write(fdi,SF_SIGNATURE,sizeof(SF_SIGNATURE));
- /*
-  * Swap bytes for linux
-  */
-        write(fdi, (void *) &mtime, sizeof(long));
-        write(fdi, (void *) cursor, sizeof(SfCursor));
-        for( obj = sf->list.first; obj ; obj = obj->next)
-           write(fdi,(void *) obj->contents, sizeof(SpecScan));
-        close(fdi);
-        free(idxname);
+    sprintf(tmpname,"%s.tmp",sf->idxname);
+
+#ifdef _WINDOWS
+    fdi = open(tmpname,SF_WRITEFLAG | O_TRUNC | O_BINARY,SF_UMASK);
+#else
+    fdi = open(tmpname,SF_WRITEFLAG | O_TRUNC,SF_UMASK);
+#endif
+    if (fdi == -1) {
+        /* an index is not mandatory */
+        free(tmpname);
         return;
     }
-}
+    if (write(fdi,(void *) &header,sizeof(SfIndexHeader)) != sizeof(SfIndexHeader))
+        failed = 1;
+    if (write(fdi,(void *) cursor,sizeof(SfCursor)) != sizeof(SfCursor))
+        failed = 1;
+    for( obj = sf->list.first; obj && !failed; obj = obj->next)
+        if (write(fdi,(void *) obj->contents,sizeof(SpecScan)) != sizeof(SpecScan))
+            failed = 1;
+    close(fdi);
+    if (!failed) {
+#ifdef _WINDOWS
+        remove(sf->idxname);
 #endif
+        if (rename(tmpname,sf->idxname))
+            failed = 1;
+    }
+    if (failed)
+        remove(tmpname);
+    free(tmpname);
+}
+
+
+/*
+ * Number of bytes covered by the checksum: the file header and the first
+ * scan, up to SF_IDX_HEAD bytes
+ */
+static long
+sfIndexHeadLength ( SpecFile *sf, long size) {
+    long length = size;
+
+    if ((sf->list.first != (ObjectList *)NULL) &&
+        (sf->list.first->next != (ObjectList *)NULL))
+        length = ((SpecScan *)sf->list.first->next->contents)->offset;
+    if (length > size)
+        length = size;
+    if (length > SF_IDX_HEAD)
+        length = SF_IDX_HEAD;
+    return(length);
+}
+
+
+/*
+ * FNV-1a checksum of the next length bytes of the file
+ */
+static int
+sfIndexChecksum ( int fd, long length, unsigned long *checksum) {
+    unsigned char  buffer[8192];
+    unsigned long  hash = 2166136261UL;
+    long           nbytes, i;
+
+    while (length > 0) {
+        nbytes = (length > (long) sizeof(buffer)) ? (long) sizeof(buffer) : length;
+        if (read(fd,buffer,nbytes) != nbytes)
+            return(-1);
+        for (i = 0; i < nbytes; i++) {
+            hash ^= buffer[i];
+            hash = (hash * 16777619UL) & 0xffffffffUL;
+        }
+        length -= nbytes;
+    }
+    *checksum = hash;
+    return(0);
+}
 
 
 /*****************************************************************************
@@ -788,10 +986,24 @@ sfSaveScan(SpecFile *sf, SfCursor *cursor,int *error) {
 }
 
 
+static int
+sfCompareScans(const void *a, const void *b) {
+  SpecScan  *scan  = *(SpecScan **) a;
+  SpecScan  *scan2 = *(SpecScan **) b;
+
+  if (scan->scan_no != scan2->scan_no)
+      return((scan->scan_no < scan2->scan_no) ? -1 : 1);
+  if (scan->index != scan2->index)
+      return((scan->index < scan2->index) ? -1 : 1);
+  return(0);
+}
+
+
 static void
 sfAssignScanNumbers(SpecFile *sf) {
 
   int                    i;
+  long                   n, nscans;
   char                  *ptr;
   char                   buffer[50];
   char                   buffer2[50];
@@ -800,7 +1012,9 @@ sfAssignScanNumbers(SpecFile *sf) {
                         *object2;
   SpecScan              *scan,
                         *scan2;
+  SpecScan             **sorted;
 
+  nscans = 0;
   for ( object = (sf->list).first; object; object=object->next) {
         scan = (SpecScan *) object->contents;
 
@@ -814,6 +1028,29 @@ sfAssignScanNumbers(SpecFile *sf) {
 
         scan->scan_no = atol(buffer2);
         scan->order   = 1;
+        nscans++;
+  }
+
+  /*
+   * The order is the number of previous scans with the same number.
+   * Sorting by number and position avoids a quadratic search.
+   */
+  sorted = (SpecScan **) malloc(sizeof(SpecScan *) * (nscans + 1));
+  if (sorted != (SpecScan **) NULL) {
+      n = 0;
+      for ( object = (sf->list).first; object; object=object->next)
+          sorted[n++] = (SpecScan *) object->contents;
+      qsort(sorted, nscans, sizeof(SpecScan *), sfCompareScans);
+      for (n = 1; n < nscans; n++) {
+          if (sorted[n]->scan_no == sorted[n-1]->scan_no)
+              sorted[n]->order = sorted[n-1]->order + 1;
+      }
+      free(sorted);
+      return;
+  }
+
+  for ( object = (sf->list).first; object; object=object->next) {
+        scan = (SpecScan *) object->contents;
         for ( object2 = (sf->list).first; object2 != object; object2=object2->next) {
             scan2 = (SpecScan *) object2->contents;
             if (scan2->scan_no == scan->scan_no) scan->order++;
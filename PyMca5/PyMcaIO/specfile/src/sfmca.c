@@ -65,6 +65,7 @@
 
 #include <ctype.h>
 #include <stdlib.h>
+#include <string.h>
 /*
  * Define macro
  */
@@ -84,6 +85,11 @@ DllExport int  SfGetMca   ( SpecFile *sf, long index, long mcano,
                                           double **retdata, int *error );
 DllExport long SfMcaCalib ( SpecFile *sf, long index, double **calib,
                                           int *error );
+DllExport long SfMcaBuffer ( SpecFile *sf, long index, char **buffer,
+                                          int *error );
+DllExport long SfParseMcaBlock ( char *buffer, long size, long first,
+                                 long last, long step, double *data,
+                                 long nchannels, int *error );
 
 
 /*********************************************************************
@@ -339,3 +345,308 @@ SfMcaCalib ( SpecFile *sf, long index, double **calib, int *error )
      *calib = retdata;
      return(0);
 }
+
+
+/*********************************************************************
+ *   Function:        long SfMcaBuffer(sf, index, buffer, error)
+ *
+ *   Description:    Gets a copy of the data section of a scan to be
+ *                   parsed with SfParseMcaBlock. Working on a copy
+ *                   allows the parsing without holding any lock on
+ *                   the SpecFile structure.
+ *
+ *   Parameters:
+ *        Input :    (1) File pointer
+ *            (2) Index
+ *        Output:
+ *            (3) Null terminated buffer
+ *            (4) error number
+ *   Returns:
+ *            Size of the buffer (without the terminating null)
+ *            ( -1 ) => errors occured
+ *   Possible errors:
+ *            SF_ERR_MEMORY_ALLOC
+ *            SF_ERR_FILE_READ
+ *            SF_ERR_SCAN_NOT_FOUND
+ *
+ *   Remark:  The memory allocated should be freed by the application
+ *
+ *********************************************************************/
+DllExport long
+SfMcaBuffer( SpecFile *sf, long index, char **buffer, int *error )
+{
+     long  headersize;
+     long  size;
+     char *ret;
+
+     *buffer = (char *) NULL;
+     if (sfSetCurrent(sf,index,error) == -1 )
+             return(-1);
+
+     headersize = ((SpecScan *)sf->current->contents)->data_offset
+                - ((SpecScan *)sf->current->contents)->offset;
+     size = ((SpecScan *)sf->current->contents)->size - headersize;
+     if (size < 0)
+         size = 0;
+
+     if ((ret = (char *) malloc(size + 1)) == (char *) NULL) {
+         *error = SF_ERR_MEMORY_ALLOC;
+          return(-1);
+     }
+     memcpy(ret, sf->scanbuffer + headersize, size);
+     ret[size] = '\0';
+     *buffer = ret;
+     return(size);
+}
+
+
+/*
+ * Powers of ten exactly represented as doubles
+ */
+static const double sfPowersOfTen[] = {
+     1e0,  1e1,  1e2,  1e3,  1e4,  1e5,  1e6,  1e7,  1e8,  1e9,  1e10, 1e11,
+     1e12, 1e13, 1e14, 1e15, 1e16, 1e17, 1e18, 1e19, 1e20, 1e21, 1e22 };
+
+#define MCA_EXACT_DIGITS   15
+#define MCA_MAX_DIGITS     19
+#define MCA_MAX_EXPONENT   22
+
+/*
+ * Number conversion independent of the process locale: the decimal
+ * separator is always a dot and setlocale is never called, so it can be
+ * used from several threads at the same time. The tokens only contain
+ * the characters accepted by isnumber and are converted as strtod would
+ * do in the C locale. Up to 15 significant digits and exponents up to
+ * 22 (all the usual MCA data) need a single correctly rounded operation
+ * and give exactly the result of strtod. Otherwise the result may differ
+ * in the last bit unless _GNU_SOURCE provides strtod_l.
+ */
+static double
+sfMcaAtof(char *strval)
+{
+     char        *ptr = strval,
+                 *exptr;
+     long double  val = 0.0;
+     double       result;
+     long         exponent = 0,
+                  expval = 0;
+     int          negative = 0,
+                  expnegative = 0,
+                  ndigits = 0,
+                  found = 0,
+                  exact = 1;
+
+     if (*ptr == '-' || *ptr == '+') {
+         negative = (*ptr == '-');
+         ptr++;
+     }
+     for ( ; *ptr >= '0' && *ptr <= '9'; ptr++) {
+         found = 1;
+         if (ndigits < MCA_MAX_DIGITS) {
+             val = 10.0 * val + (*ptr - '0');
+             if (val != 0.0)
+                 ndigits++;
+         } else {
+             exponent++;
+             if (*ptr != '0')
+                 exact = 0;
+         }
+     }
+     if (*ptr == '.') {
+         for (ptr++; *ptr >= '0' && *ptr <= '9'; ptr++) {
+             found = 1;
+             if (ndigits < MCA_MAX_DIGITS) {
+                 val = 10.0 * val + (*ptr - '0');
+                 exponent--;
+                 if (val != 0.0)
+                     ndigits++;
+             } else if (*ptr != '0') {
+                 exact = 0;
+             }
+         }
+     }
+     if (!found)
+         return(0.0);
+     if (*ptr == 'e' || *ptr == 'E') {
+         exptr = ptr + 1;
+         if (*exptr == '-' || *exptr == '+') {
+             expnegative = (*exptr == '-');
+             exptr++;
+         }
+         for ( ; *exptr >= '0' && *exptr <= '9'; exptr++) {
+             if (expval < 100000)
+                 expval = 10 * expval + (*exptr - '0');
+         }
+         exponent += (expnegative ? -expval : expval);
+     }
+     if (val == 0.0)
+         return (negative ? -0.0 : 0.0);
+
+     if (exact && (ndigits <= MCA_EXACT_DIGITS) &&
+         (exponent >= -MCA_MAX_EXPONENT) && (exponent <= MCA_MAX_EXPONENT)) {
+         /* val is an integer exactly represented as a double */
+         if (exponent < 0)
+             result = ((double) val) / sfPowersOfTen[-exponent];
+         else
+             result = ((double) val) * sfPowersOfTen[exponent];
+         return (negative ? -result : result);
+     }
+#ifdef _GNU_SOURCE
+     /* strtod_l with the C locale */
+     return PyMcaAtof(strval);
+#else
+     while (exponent > MCA_MAX_EXPONENT) {
+         val *= sfPowersOfTen[MCA_MAX_EXPONENT];
+         exponent -= MCA_MAX_EXPONENT;
+     }
+     while (exponent < -MCA_MAX_EXPONENT) {
+         val /= sfPowersOfTen[MCA_MAX_EXPONENT];
+         exponent += MCA_MAX_EXPONENT;
+     }
+     if (exponent < 0)
+         val /= sfPowersOfTen[-exponent];
+     else
+         val *= sfPowersOfTen[exponent];
+     result = (double) val;
+     return (negative ? -result : result);
+#endif
+}
+
+
+/*
+ * Parses the spectrum starting at ptr with the same rules as SfGetMca.
+ * Values beyond maxvals are counted but not stored.
+ */
+static long
+sfMcaParse(char *ptr, char *to, double *data, long maxvals)
+{
+     char    strval[100];
+     int     i = 0;
+     long    vals = 0;
+
+     if (ptr >= to)
+         return(0);
+
+     for ( ; ptr < to - 1 && (*(ptr+1) != '\n' || (*ptr == MCA_CONT)); ptr++)
+     {
+         if (*ptr == ' ' || *ptr == '\t' || *ptr == '\\' || *ptr == '\n') {
+             if ( i ) {
+                strval[i] = '\0';
+                i = 0;
+                if (vals < maxvals)
+                    data[vals] = sfMcaAtof(strval);
+                vals++;
+             }
+         } else if (isnumber(*ptr)) {
+             if (i < 98) {
+                 strval[i] = *ptr;
+                 i++;
+             }
+         }
+     }
+
+     if (isnumber(*ptr)) {
+         strval[i]    = *ptr;
+         strval[i+1]  = '\0';
+         if (vals < maxvals)
+             data[vals] = sfMcaAtof(strval);
+         vals++;
+     }
+     return(vals);
+}
+
+
+/*********************************************************************
+ *   Function:        long SfParseMcaBlock(buffer, size, first, last,
+ *                                         step, data, nchannels, error)
+ *
+ *   Description:    Parses the spectra first, first + step, ... up to
+ *                   last (starting at 1) of a buffer obtained with
+ *                   SfMcaBuffer in a single pass. The spectra in between
+ *                   are skipped without being parsed, so they can have
+ *                   a different number of channels. It neither uses the
+ *                   SpecFile structure nor changes the locale (the
+ *                   numbers are converted by sfMcaAtof) and therefore
+ *                   it can be called from several threads at the same
+ *                   time.
+ *
+ *   Parameters:
+ *        Input :    (1) Buffer
+ *            (2) Buffer size
+ *            (3) First spectrum
+ *            (4) Last spectrum
+ *            (5) Step between spectra
+ *            (6) Output array of ((last - first) / step + 1) * nchannels
+ *                values or NULL to get the number of channels of the
+ *                first spectrum
+ *            (7) Number of channels
+ *        Output:
+ *            (8) error number
+ *   Returns:
+ *            Number of channels
+ *            ( -1 ) => errors occured
+ *   Possible errors:
+ *            SF_ERR_MCA_NOT_FOUND
+ *            SF_ERR_MCA_SIZE
+ *
+ *********************************************************************/
+DllExport long
+SfParseMcaBlock( char *buffer, long size, long first, long last,
+                 long step, double *data, long nchannels, int *error )
+{
+     char   *ptr,
+            *to;
+     long    number,
+             skip,
+             spect_no = 0,
+             vals;
+
+     if ((first < 1) || (last < first) || (step < 1)) {
+         *error = SF_ERR_MCA_NOT_FOUND;
+         return(-1);
+     }
+
+     ptr = buffer;
+     to  = buffer + size;
+     while (spect_no != first) {
+         ptr = (char *) memchr(ptr, '@', to - ptr);
+         if (ptr == (char *) NULL) {
+             *error = SF_ERR_MCA_NOT_FOUND;
+             return(-1);
+         }
+         spect_no++;
+         ptr++;
+     }
+
+     if (data == (double *) NULL) {
+         /* skip the A of @A */
+         return(sfMcaParse(ptr + 1, to, (double *) NULL, 0));
+     }
+
+     for (number = first; number <= last; number += step)
+     {
+         if (number > first) {
+             /* go to the next selected spectrum */
+             for (skip = 0; skip < step; skip++) {
+                 ptr = (char *) memchr(ptr, '@', to - ptr);
+                 if (ptr == (char *) NULL)
+                     break;
+                 ptr++;
+             }
+             if (ptr == (char *) NULL) {
+                 *error = SF_ERR_MCA_NOT_FOUND;
+                 break;
+             }
+         }
+         vals = sfMcaParse(ptr + 1, to,
+                           data + ((number - first) / step) * nchannels,
+                           nchannels);
+         if (vals != nchannels) {
+             *error = SF_ERR_MCA_SIZE;
+             break;
+         }
+     }
+     if (number <= last)
+         return(-1);
+     return(nchannels);
+}
@@ -141,7 +141,7 @@ typedef struct {
    PyObject_HEAD
    SpecFile *sf;
    char     *name;
-   short     length;
+   long      length;
 } specfileobject;
 
 typedef struct {
@@ -199,7 +199,7 @@ static struct PyMethodDef  specfile_methods[] =
    /*
     * Specfile python basic operations
     */
-static PyObject * specfile_open   (char *filename);             /* create  */
+static PyObject * specfile_open   (char *filename, char *indexname); /* create */
 static PyObject * specfile_close  (PyObject *self);             /* dealloc */
 static Py_ssize_t specfile_noscans(PyObject *self);             /* length  */
 static PyObject * specfile_scan   (PyObject *self, Py_ssize_t index);   /* item    */
@@ -230,6 +230,7 @@ static PyObject   * scandata_header       (PyObject *self,PyObject *args);
 static PyObject   * scandata_fileheader   (PyObject *self,PyObject *args);
 static PyObject   * scandata_nbmca        (PyObject *self,PyObject *args);
 static PyObject   * scandata_mca          (PyObject *self,PyObject *args);
+static PyObject   * scandata_mcablock     (PyObject *self,PyObject *args);
 static PyObject   * scandata_show         (PyObject *self,PyObject *args);
 
 static struct PyMethodDef  scandata_methods[] = {
@@ -251,6 +252,7 @@ static struct PyMethodDef  scandata_methods[] = {
    {"fileheader",  scandata_fileheader,  1},
    {"nbmca",       scandata_nbmca,       1},
    {"mca",         scandata_mca,         1},
+   {"mcablock",    scandata_mcablock,    1},
    {"show",        scandata_show,        1},
    { NULL, NULL}
 };
@@ -514,7 +516,7 @@ specfile_show(PyObject *self,PyObject *args)
    * Basic specfiletype operations
    */
 static PyObject *
-specfile_open(char *filename) {      /* on x = specfile.Specfile(name) */
+specfile_open(char *filename, char *indexname) { /* on x = specfile.Specfile(name) */
     specfileobject *self;
     SpecFile       *sf;
     int             error;
@@ -524,7 +526,11 @@ specfile_open(char *filename) {      /* on x = specfile.Specfile(name) */
     if (self == NULL)
         return NULL;
 
-    if (( sf = SfOpen(filename,&error)) == NULL )
+    if (indexname != NULL)
+        sf = SfOpenIndexed(filename,indexname,&error);
+    else
+        sf = SfOpen(filename,&error);
+    if (sf == NULL )
         onError("cannot open file");
 
     self->sf = sf;
@@ -1198,6 +1204,75 @@ scandata_mca      (PyObject *self,PyObject *args)
      */
 }
 
+static PyObject   *
+scandata_mcablock (PyObject *self,PyObject *args)
+{
+    int    error = SF_ERR_NO_ERRORS;
+    long   idx, nomca, first = 1, last = -1, step = 1;
+    long   size, nchannels, ret;
+    npy_intp dims[2];
+
+    char           *buffer = NULL;
+    PyArrayObject  *r_array;
+
+    SpecFile *sf;
+
+    scandataobject *s = (scandataobject *) self;
+
+    if (!PyArg_ParseTuple(args,"|lll",&first,&last,&step))
+            onError("cannot decode arguments for mca block");
+
+    idx = s->index;
+
+    if (idx == -1 ) {
+        onError("empty scan data");
+    }
+
+    sf  = (s->file)->sf;
+
+    nomca = SfNoMca(sf,idx,&error);
+    if (nomca == -1)
+        onError("cannot get number of mca for scan");
+    if (last < 0)
+        last = nomca + 1 + last;
+    if ((first < 1) || (last < first) || (last > nomca))
+        onError("mca range out of bounds");
+    if (step < 1)
+        onError("mca step must be positive");
+
+    size = SfMcaBuffer(sf,idx,&buffer,&error);
+    if (size == -1)
+        onError("cannot read scan data");
+
+    nchannels = SfParseMcaBlock(buffer,size,first,first,1,NULL,0,&error);
+    if (nchannels == -1) {
+        free(buffer);
+        onError("cannot get mca for scan");
+    }
+
+    dims[0] = (last - first) / step + 1;
+    dims[1] = nchannels;
+    r_array = (PyArrayObject *)PyArray_SimpleNew(2,dims,NPY_DOUBLE);
+    if (r_array == NULL) {
+        free(buffer);
+        return NULL;
+    }
+
+    /* the buffer is private to this call */
+    Py_BEGIN_ALLOW_THREADS
+    ret = SfParseMcaBlock(buffer,size,first,last,step,
+                          (double *) PyArray_DATA(r_array),nchannels,&error);
+    Py_END_ALLOW_THREADS
+    free(buffer);
+
+    if (ret == -1) {
+        Py_DECREF(r_array);
+        onError(SfError(error));
+    }
+
+    return PyArray_Return(r_array);
+}
+
 static PyObject   *
 scandata_show      (PyObject *self,PyObject *args)
 {
@@ -1417,11 +1492,12 @@ specfiletype_new(self,args)
 {
    PyObject *ret;
    char *filename;
+   char *indexname = NULL;
 
 #ifdef WIN32
    PyObject *input;
    PyObject *bytesObject;
-    if (!PyArg_ParseTuple(args, "O", &input))
+    if (!PyArg_ParseTuple(args, "O|z", &input, &indexname))
     {
       return NULL;
     }
@@ -1442,20 +1518,20 @@ specfiletype_new(self,args)
             filename = PyString_AsString(bytesObject);
 #endif
         }else{
-            if (!PyArg_ParseTuple(args, "s", &filename))
+            if (!PyArg_ParseTuple(args, "s|z", &filename, &indexname))
             {
                 return NULL;
             }
         }
     }
 #else
-    if (!PyArg_ParseTuple(args, "s", &filename))
+    if (!PyArg_ParseTuple(args, "s|z", &filename, &indexname))
     {
         return NULL;
     }
 #endif
 
-    ret = (PyObject *)specfile_open(filename);
+    ret = (PyObject *)specfile_open(filename, indexname);
 
    return ret;
 
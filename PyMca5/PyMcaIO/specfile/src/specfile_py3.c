@@ -27,7 +27,7 @@ typedef struct {
     /* Type-specific fields go here. */
     SpecFile *sf;
     char     *name;
-    short     length;
+    long      length;
 } specfileobject;
 
 typedef struct {
@@ -329,6 +329,7 @@ specfile_open(PyObject *self, PyObject *args) /* on x = specfile.Specfile(name)
     PyObject *bytesObject;
 #endif
     const char *filename;
+    const char *indexname = NULL;
     specfileobject *object;
     SpecFile       *sf;
     int             error;
@@ -340,7 +341,7 @@ specfile_open(PyObject *self, PyObject *args) /* on x = specfile.Specfile(name)
      */
 
 #ifdef WIN32
-    if (!PyArg_ParseTuple(args, "O", &input))
+    if (!PyArg_ParseTuple(args, "O|z", &input, &indexname))
     {
       return NULL;
     }
@@ -352,7 +353,7 @@ specfile_open(PyObject *self, PyObject *args) /* on x = specfile.Specfile(name)
         filename = PyBytes_AsString(bytesObject);
     }
 #else
-    if (!PyArg_ParseTuple(args, "s", &filename))
+    if (!PyArg_ParseTuple(args, "s|z", &filename, &indexname))
     {
         return NULL;
     }
@@ -371,13 +372,17 @@ specfile_open(PyObject *self, PyObject *args) /* on x = specfile.Specfile(name)
 #ifdef WIN32
     Py_DECREF(bytesObject);
 #endif
-    if (( sf = SfOpen((char *) filename, &error)) == NULL )
+    if (indexname != NULL)
+        sf = SfOpenIndexed((char *) filename, (char *) indexname, &error);
+    else
+        sf = SfOpen((char *) filename, &error);
+    if (sf == NULL )
     {
         Py_DECREF(object);
         onError("cannot open file");
     }
     object->sf = sf;
-    object->length = (short) SfScanNo(sf);
+    object->length = SfScanNo(sf);
     return (PyObject *) object;
 }
 
@@ -455,6 +460,7 @@ static PyObject   * scandata_header       (PyObject *self,PyObject *args);
 static PyObject   * scandata_fileheader   (PyObject *self,PyObject *args);
 static PyObject   * scandata_nbmca        (PyObject *self,PyObject *args);
 static PyObject   * scandata_mca          (PyObject *self,PyObject *args);
+static PyObject   * scandata_mcablock     (PyObject *self,PyObject *args);
 static PyObject   * scandata_show         (PyObject *self,PyObject *args);
 
 static struct PyMethodDef  scandata_methods[] = {
@@ -476,6 +482,7 @@ static struct PyMethodDef  scandata_methods[] = {
    {"fileheader",  scandata_fileheader,  1},
    {"nbmca",       scandata_nbmca,       1},
    {"mca",         scandata_mca,         1},
+   {"mcablock",    scandata_mcablock,    1},
    {"show",        scandata_show,        1},
    { NULL, NULL}
 };
@@ -1102,6 +1109,75 @@ scandata_mca      (PyObject *self,PyObject *args)
      */
 }
 
+static PyObject   *
+scandata_mcablock (PyObject *self,PyObject *args)
+{
+    int    error = SF_ERR_NO_ERRORS;
+    long   idx, nomca, first = 1, last = -1, step = 1;
+    long   size, nchannels, ret;
+    npy_intp dims[2];
+
+    char           *buffer = NULL;
+    PyArrayObject  *r_array;
+
+    SpecFile *sf;
+
+    scandataobject *s = (scandataobject *) self;
+
+    if (!PyArg_ParseTuple(args,"|lll",&first,&last,&step))
+            onError("cannot decode arguments for mca block");
+
+    idx = s->index;
+
+    if (idx == -1 ) {
+        onError("empty scan data");
+    }
+
+    sf  = (s->file)->sf;
+
+    nomca = SfNoMca(sf,idx,&error);
+    if (nomca == -1)
+        onError("cannot get number of mca for scan");
+    if (last < 0)
+        last = nomca + 1 + last;
+    if ((first < 1) || (last < first) || (last > nomca))
+        onError("mca range out of bounds");
+    if (step < 1)
+        onError("mca step must be positive");
+
+    size = SfMcaBuffer(sf,idx,&buffer,&error);
+    if (size == -1)
+        onError("cannot read scan data");
+
+    nchannels = SfParseMcaBlock(buffer,size,first,first,1,NULL,0,&error);
+    if (nchannels == -1) {
+        free(buffer);
+        onError("cannot get mca for scan");
+    }
+
+    dims[0] = (last - first) / step + 1;
+    dims[1] = nchannels;
+    r_array = (PyArrayObject *)PyArray_SimpleNew(2,dims,NPY_DOUBLE);
+    if (r_array == NULL) {
+        free(buffer);
+        return NULL;
+    }
+
+    /* the buffer is private to this call */
+    Py_BEGIN_ALLOW_THREADS
+    ret = SfParseMcaBlock(buffer,size,first,last,step,
+                          (double *) PyArray_DATA(r_array),nchannels,&error);
+    Py_END_ALLOW_THREADS
+    free(buffer);
+
+    if (ret == -1) {
+        Py_DECREF(r_array);
+        onError(SfError(error));
+    }
+
+    return PyArray_Return(r_array);
+}
+
 static PyObject   *
 scandata_show      (PyObject *self,PyObject *args)
 {
@@ -35,6 +35,8 @@
 import numpy
 import re
 import logging
+import multiprocessing
+from multiprocessing.pool import ThreadPool
 from PyMca5.PyMcaIO import specfile
 from PyMca5.PyMcaIO import Fit2DChiFileParser
 from PyMca5.PyMcaIO import APSMEDFileParser
@@ -43,6 +45,7 @@
 from PyMca5.PyMcaIO import OlympusCSVFileParser
 from PyMca5.PyMcaIO import ThermoEMSFileParser
 from PyMca5.PyMcaIO import JcampFileParser
+from PyMca5.PyMcaIO import SpecFileIndexCache
 
 _logger = logging.getLogger(__name__)
 
@@ -75,6 +78,21 @@ def bytes(*var, **kw):
         return var[0]
 
 def Specfile(filename):
+    parser = SpecFileIndexCache.loadParser(filename)
+    if parser is not None:
+        _logger.debug("Using cached parser for %s", filename)
+        return parser
+    output, cacheable = _openFile(filename)
+    if cacheable:
+        SpecFileIndexCache.saveParser(filename, output)
+    return output
+
+def _openFile(filename):
+    """
+    Returns the object handling the file and a flag indicating if the
+    parsing results can be stored by SpecFileIndexCache. SPEC files keep
+    their own index.
+    """
     f = open(filename)
     line0  = f.readline()
     if filename.upper().endswith('DTA'):
@@ -91,7 +109,7 @@ def Specfile(filename):
                     f.close()
                     output = specfilewrapper(filename, dta=True)
                     f.close()
-                    return output
+                    return output, True
                 except:
                     #try to read in other way
                     pass
@@ -110,7 +128,8 @@ def Specfile(filename):
     if len(line):
         #it is a Specfile
         _logger.debug("This looks as a specfile")
-        output=specfile.Specfile(filename)
+        return specfile.Specfile(filename,
+                    SpecFileIndexCache.getIndexFileName(filename)), False
     elif SPX and filename.upper().endswith("SPX"):
         _logger.debug("This looks as an SPX file")
         output = SPXFileParser.SPXFileParser(filename)
@@ -126,29 +145,29 @@ def Specfile(filename):
         if (not qxas) and line0.startswith('<<'):
                 amptek = True
         if (not qxas) and (not amptek) and Fit2DChiFileParser.isFit2DChiFile(filename):
-            return Fit2DChiFileParser.Fit2DChiFileParser(filename)
+            return Fit2DChiFileParser.Fit2DChiFileParser(filename), True
         if (not qxas) and (not amptek) and APSMEDFileParser.isAPSMEDFile(filename):
-            return APSMEDFileParser.APSMEDFileParser(filename)
+            return APSMEDFileParser.APSMEDFileParser(filename), True
         if (not qxas) and (not amptek) and SRSFileParser.isSRSFile(filename):
             _logger.debug("SRSFileParser")
-            return SRSFileParser.SRSFileParser(filename)
+            return SRSFileParser.SRSFileParser(filename), True
         if (not qxas) and (not amptek) and BAXSCSVFileParser.isBAXSCSVFile(filename):
             _logger.debug("BAXSCSVFileParser")
-            return BAXSCSVFileParser.BAXSCSVFileParser(filename)
+            return BAXSCSVFileParser.BAXSCSVFileParser(filename), True
         if (not qxas) and (not amptek) and \
            OlympusCSVFileParser.isOlympusCSVFile(filename):
             _logger.debug("OlympusCSVFileParser")
-            return OlympusCSVFileParser.OlympusCSVFileParser(filename)
+            return OlympusCSVFileParser.OlympusCSVFileParser(filename), True
         if (not qxas) and (not amptek) and \
            ThermoEMSFileParser.isThermoEMSFile(filename):
             _logger.debug("ThermoEMSFileParser")
-            return ThermoEMSFileParser.ThermoEMSFileParser(filename)
+            return ThermoEMSFileParser.ThermoEMSFileParser(filename), True
         if (not qxas) and (not amptek) and \
            JcampFileParser.isJcampFile(filename):
             _logger.debug("JcampFileParser")
-            return JcampFileParser.JcampFileParser(filename)
+            return JcampFileParser.JcampFileParser(filename), True
         output = specfilewrapper(filename, amptek=amptek, qxas=qxas)
-    return output
+    return output, True
 
 class specfilewrapper(object):
     def __init__(self, filename, amptek=None, qxas=None, dta=None):
@@ -558,6 +577,84 @@ def mca(self,number):
             raise ValueError("Specfile mca numberig starts at 1")
         return self.__data[:,number-1]
 
+    def mcablock(self, first=1, last=-1, step=1):
+        if last < 0:
+            last = self.nbmca() + 1 + last
+        if (first < 1) or (last < first) or (last > self.nbmca()):
+            raise ValueError("mca range out of bounds")
+        if step < 1:
+            raise ValueError("mca step must be positive")
+        return self.__data[:, first - 1:last:step].T.copy()
+
+
+def getMcaBlock(scan, first=1, last=-1, step=1):
+    """
+    Return the spectra first, first + step, ..., last (starting at 1) of
+    a scan as a 2D array.
+
+    Scans of SPEC files are parsed in a single pass without holding the
+    GIL, the spectra in between (other detectors) are skipped without
+    being parsed. Other scan objects are read spectrum by spectrum.
+    """
+    if last < 0:
+        last = scan.nbmca() + 1 + last
+    if hasattr(scan, "mcablock"):
+        return scan.mcablock(first, last, step)
+    return numpy.array([scan.mca(i) for i in range(first, last + 1, step)])
+
+
+def iterMcaBlocks(scan, first=1, last=-1, step=1, chunksize=1024):
+    """
+    Generator of the spectra first, first + step, ..., last of a scan in
+    blocks of at most chunksize spectra.
+
+    It yields the index of the first spectrum of the block in the output
+    sequence (starting at 0) and the block itself.
+    """
+    if last < 0:
+        last = scan.nbmca() + 1 + last
+    index = 0
+    start = first
+    while start <= last:
+        end = min(start + (chunksize - 1) * step, last)
+        block = getMcaBlock(scan, start, end, step)
+        yield index, block
+        index += block.shape[0]
+        start = end + step
+
+
+def _readFileMcaBlock(args):
+    filename, scanIndex, first, last, step = args
+    sf = Specfile(filename)
+    if isinstance(scanIndex, int):
+        scan = sf[scanIndex]
+    else:
+        scan = sf.select(scanIndex)
+    return getMcaBlock(scan, first, last, step)
+
+
+def readMcaBlocks(filelist, first=1, last=-1, step=1, scan=-1, nthreads=None):
+    """
+    Generator of the spectra first to last of the same scan of several
+    files. The scan can be given as index or as key ("1.1").
+
+    The files are read in a pool of threads and the blocks are yielded
+    in the order of filelist.
+    """
+    if nthreads is None:
+        nthreads = min(len(filelist), multiprocessing.cpu_count(), 8)
+    tasks = [(filename, scan, first, last, step) for filename in filelist]
+    if nthreads < 2:
+        for task in tasks:
+            yield _readFileMcaBlock(task)
+        return
+    pool = ThreadPool(nthreads)
+    try:
+        for block in pool.imap(_readFileMcaBlock, tasks):
+            yield block
+    finally:
+        pool.terminate()
+
 class BufferedFile(object):
     def __init__(self, filename):
         f = open(filename, 'rb')
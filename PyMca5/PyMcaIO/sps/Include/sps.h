@@ -673,6 +673,45 @@ SPS_GetArrayInfo (char * spec_version, char * array_name, int *rows,
 int
 SPS_GetShmId(char *spec_version, char *array_name);
 
+/*
+   Maps the shared memory of a SPEC array read-only, independently of the
+   pointers given by SPS_GetDataPointer. The mapping stays valid even if
+   the other party quits or recreates the array, until it is given back
+   with SPS_ReturnDataView. Shape and type are read from the header of the
+   mapped segment.
+   Input: fullname : Spec version
+          array : Name of the array
+   Output: base : start of the mapped segment (to be given back)
+           rows, cols, type : description of the mapped array
+   Returns: NULL error
+            void * to the data area
+*/
+
+void *
+SPS_GetDataView(char *fullname, char *array, void **base,
+		int *rows, int *cols, int *type);
+
+/*
+   Gives back a mapping obtained with SPS_GetDataView.
+   Input: base : start of the mapped segment
+   Returns: 0 success
+            1 error
+*/
+
+int
+SPS_ReturnDataView(void *base);
+
+/*
+   Update counter of the array behind a mapping obtained with
+   SPS_GetDataView. If it changes while the data is being used, the other
+   party has written to the array in the meantime.
+   Input: base : start of the mapped segment
+   Returns: update counter
+*/
+
+u32_t
+SPS_DataViewCounter(void *base);
+
 /*
    Creates a shared memory array and the shared memory structure for
    the spec version. You can only create new arrays for specversions
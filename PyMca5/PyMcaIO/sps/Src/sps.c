@@ -187,6 +187,7 @@ int     SPS_CreateArray(char *spec_version, char *arrayname, int rows, int cols,
 int     SPS_FreeDataCopy(char *fullname, char *array);
 int     SPS_GetArrayInfo(char *spec_version, char *array_name, int *rows, int *cols, int *type, int *flag);
 int     SPS_GetFrameSize(char *spec_version, char *array_name);
+int     SPS_ReturnDataView(void *base);
 int     SPS_IsUpdated(char *fullname, char *array);
 int     SPS_LatestFrame(char *fullname, char *array);
 int     SPS_PutEnvStr(char *spec_version, char *array_name, char *identifier, char *set_value);
@@ -197,6 +198,7 @@ s32_t   SPS_GetSpecState(char *version);
 void    *SPS_GetDataCol(char *name, char *array, int my_type, int col, int row, int *act_rows);
 void    *SPS_GetDataCopy(char *fullname, char *array, int my_type, int *rows_ptr, int *cols_ptr);
 void    *SPS_GetDataPointer(char *fullname, char*array, int write_flag);
+void    *SPS_GetDataView(char *fullname, char *array, void **base, int *rows, int *cols, int *type);
 void    *SPS_GetDataRow(char *name, char *array, int my_type, int row, int col, int *act_cols);
 void    SPS_CleanUpAll(void);
 
@@ -2493,6 +2495,80 @@ SPS_GetShmId(char *spec_version, char *array_name) {
   return shmid;
 }
 
+/*
+   Maps the shared memory of a SPEC array read-only, independently of the
+   mapping used by the rest of the library. The mapping stays valid even
+   if the other party deletes or recreates the array, until it is given
+   back with SPS_ReturnDataView. Shape and type are read from the header
+   of the mapped segment, so they always describe the returned data.
+   Input: fullname : Spec version
+          array : Name of the array
+   Output: base : start of the mapped segment (to be given back)
+           rows, cols, type : description of the mapped array
+   Returns: NULL error
+            void * to the data area
+*/
+void *SPS_GetDataView(char *fullname, char *array, void **base,
+		      int *rows, int *cols, int *type) {
+  int was_attached;
+  s32_t id;
+  SHM *shm;
+  SPS_ARRAY private_shm;
+
+  if ((private_shm = convert_to_handle(fullname, array)) == NULL)
+    return NULL;
+
+  was_attached = private_shm->attached;
+
+  if (ReconnectToArray(private_shm, 0))
+    return NULL;
+
+  id = private_shm->id;
+
+  if (was_attached == 0 && private_shm->stay_attached == 0)
+    DeconnectArray(private_shm);
+
+  if ((shm = (SHM *) shmat(id, NULL, SHM_RDONLY)) == (SHM *) -1)
+    return NULL;
+
+  if (shm->head.head.magic != SHM_MAGIC) {
+    shmdt((void *) shm);
+    return NULL;
+  }
+
+  *base = (void *) shm;
+  if (rows) *rows = shm->head.head.rows;
+  if (cols) *cols = shm->head.head.cols;
+  if (type) *type = shm->head.head.type;
+
+  if (shm->head.head.version < 4)
+    return &(((struct shm_oheader *) shm)->data);
+  return &(shm->data);
+}
+
+/*
+   Gives back a mapping obtained with SPS_GetDataView.
+   Input: base : start of the mapped segment
+   Returns: 0 success
+            1 error
+*/
+int SPS_ReturnDataView(void *base) {
+  if (base == NULL || shmdt(base))
+    return 1;
+  return 0;
+}
+
+/*
+   Reads the update counter of the array behind a mapping obtained with
+   SPS_GetDataView. Comparing the values before and after using the data
+   tells if the other party has updated the array in the meantime.
+   Input: base : start of the mapped segment
+   Returns: update counter
+*/
+u32_t SPS_DataViewCounter(void *base) {
+  return ((volatile SHM *) base)->head.head.utime;
+}
+
 int
 SPS_GetFrameSize(char *spec_version, char *array_name) {
 #if SHM_VERSION >= 5
@@ -489,6 +489,102 @@ static PyObject *sps_getshmid(PyObject *self, PyObject *args)
   return Py_BuildValue("i", shmid);
 }
 
+#define SPS_DATAVIEW_NAME "sps.dataview"
+
+static void sps_dataview_release(PyObject *capsule)
+{
+  void *base;
+
+  base = PyCapsule_GetPointer(capsule, SPS_DATAVIEW_NAME);
+  if (base != NULL)
+    SPS_ReturnDataView(base);
+}
+
+static PyObject *sps_getdataview(PyObject *self, PyObject *args)
+{
+  char *spec_version, *array_name;
+  int rows, cols, type;
+  npy_intp dims[2];
+  int ptype, stype;
+  PyArrayObject *arrobj;
+  PyObject *capsule;
+  void *data, *base = NULL;
+
+  if (!PyArg_ParseTuple(args, "ss", &spec_version, &array_name)) {
+    return NULL;
+  }
+
+  if ((data = SPS_GetDataView(spec_version, array_name, &base,
+                              &rows, &cols, &type)) == NULL) {
+    struct module_state *st = GETSTATE(self);
+    PyErr_SetString(st->SPSError, "Error mapping shared memory");
+    return NULL;
+  }
+
+  dims[0]=rows;
+  dims[1]=cols;
+  ptype = sps_type2py(type);
+  stype = sps_py2type(ptype);
+
+  if (type != stype) {
+    SPS_ReturnDataView(base);
+    struct module_state *st = GETSTATE(self);
+    PyErr_SetString(st->SPSError, "Type of data in shared memory not supported");
+    return NULL;
+  }
+
+  if ((capsule = PyCapsule_New(base, SPS_DATAVIEW_NAME,
+                               sps_dataview_release)) == NULL) {
+    SPS_ReturnDataView(base);
+    return NULL;
+  }
+
+  if ((arrobj = (PyArrayObject*) PyArray_SimpleNewFromData(2, dims, ptype, data))
+      == NULL) {
+    Py_DECREF(capsule);
+    struct module_state *st = GETSTATE(self);
+    PyErr_SetString(st->SPSError, "Could not create mathematical array");
+    return NULL;
+  }
+
+  /* the array owns the mapping: it is given back when the array goes.
+     The reference to the capsule is stolen even if this fails. */
+  if (PyArray_SetBaseObject(arrobj, capsule) < 0) {
+    Py_DECREF(arrobj);
+    return NULL;
+  }
+  PyArray_CLEARFLAGS(arrobj, NPY_ARRAY_WRITEABLE);
+
+  return (PyObject*) arrobj;
+}
+
+static PyObject *sps_dataviewcounter(PyObject *self, PyObject *args)
+{
+  PyObject *in_arr, *base;
+
+  if (!PyArg_ParseTuple(args, "O", &in_arr)) {
+    return NULL;
+  }
+
+  /* views of a view keep the original array as base */
+  base = in_arr;
+  while (PyArray_Check(base)) {
+    base = PyArray_BASE((PyArrayObject *) base);
+    if (base == NULL)
+      break;
+  }
+
+  if ((base == NULL) || !PyCapsule_IsValid(base, SPS_DATAVIEW_NAME)) {
+    struct module_state *st = GETSTATE(self);
+    PyErr_SetString(st->SPSError, "Array is not a shared memory view");
+    return NULL;
+  }
+
+  return PyLong_FromUnsignedLong(
+      (unsigned long) SPS_DataViewCounter(
+          PyCapsule_GetPointer(base, SPS_DATAVIEW_NAME)));
+}
+
 static PyObject *sps_getdata(PyObject *self, PyObject *args)
 {
   char *spec_version, *array_name;
@@ -770,6 +866,8 @@ static PyMethodDef SPSMethods[] = {
   { "getkeylist",    sps_getkeylist, METH_VARARGS},
   { "getshmid",      sps_getshmid,   METH_VARARGS},
   { "getdata",       sps_getdata,    METH_VARARGS},
+  { "getdataview",   sps_getdataview, METH_VARARGS},
+  { "dataviewcounter", sps_dataviewcounter, METH_VARARGS},
   { "getdatarow",    sps_getdatarow, METH_VARARGS},
   { "getdatacol",    sps_getdatacol, METH_VARARGS},
   { "getarrayinfo",  sps_getarrayinfo, METH_VARARGS},
@@ -188,6 +188,34 @@ def getdata(spec,shm):
     spslock.release()
     return result
 
+def getdataview(spec, shm):
+    """
+    Read-only array mapped onto the shared memory, None if not possible.
+
+    No data are copied: SPEC can update the array while it is in use.
+    Compare dataviewcounter before and after using it to detect that.
+    """
+    result = None
+
+    spslock.acquire()
+    try:
+        if hasattr(sps, "getdataview"):
+            result = sps.getdataview(spec, shm)
+    except:
+        pass
+    spslock.release()
+    return result
+
+def dataviewcounter(view):
+    """
+    Current update counter of the array behind a view from getdataview,
+    None if the array is not such a view.
+    """
+    try:
+        return sps.dataviewcounter(view)
+    except:
+        return None
+
 def getdatacol(spec,shm,idx):
 
     result = []
@@ -0,0 +1,271 @@
+#/*##########################################################################
+#
+# The PyMca X-Ray Fluorescence Toolkit
+#
+# Copyright (c) 2004-2026 European Synchrotron Radiation Facility
+#
+# This file is part of the PyMca X-ray Fluorescence Toolkit developed at
+# the ESRF by the Software group.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#############################################################################*/
+__author__ = "V.A. Sole - ESRF Data Analysis"
+__contact__ = "sole@esrf.fr"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+__doc__ = """
+Alignment of a set of curves against a reference curve.
+
+All the curves are handled at once as 2D arrays: they are resampled on a
+common equidistant grid with a single interpolation, all the cross
+correlations are obtained from one real FFT along the rows and the shifts
+are applied in one pass per curve length.
+"""
+import logging
+import numpy
+
+_logger = logging.getLogger(__name__)
+
+
+def getCommonGrid(xList, reference=0, factor=1.):
+    """
+    Equidistant grid spanning all the curves with the average step of
+    the reference curve divided by factor. The first and the last points
+    are excluded.
+
+    :param xList: List of monotonically increasing x arrays
+    :param reference: Index of the reference curve
+    :param factor: Oversampling factor
+    :return: 1D array
+    """
+    step = numpy.average(numpy.diff(xList[reference]))
+    xmin = min([x.min() for x in xList])
+    xmax = max([x.max() for x in xList])
+    num = int(factor * numpy.ceil((xmax - xmin) / step))
+    return numpy.linspace(xmin, xmax, num, endpoint=False)[:-1]
+
+
+def padCurves(xList, yList, fill=numpy.nan):
+    """
+    Put curves of different lengths in 2D arrays.
+
+    :return: x and y arrays of shape (ncurves, maximum length) padded
+             with fill and the lengths of the curves
+    """
+    lengths = numpy.array([len(y) for y in yList], dtype=numpy.int64)
+    shape = (len(yList), lengths.max() if lengths.size else 0)
+    starts = numpy.cumsum(lengths) - lengths
+    rows = numpy.repeat(numpy.arange(len(yList)), lengths)
+    columns = numpy.arange(lengths.sum()) - numpy.repeat(starts, lengths)
+    x2d = numpy.full(shape, fill, dtype=numpy.float64)
+    y2d = numpy.full(shape, fill, dtype=numpy.float64)
+    if rows.size:
+        x2d[rows, columns] = numpy.concatenate(xList)
+        y2d[rows, columns] = numpy.concatenate(yList)
+    return x2d, y2d, lengths
+
+
+def resampleCurves(xList, yList, xgrid):
+    """
+    Linear interpolation of all the curves on the same grid.
+
+    All curves are interpolated with a single call to numpy.interp: each
+    curve is translated to its own interval along the abscissa so that the
+    concatenation of all of them is monotonically increasing.
+
+    :param xList: List of monotonically increasing x arrays
+    :param yList: List of y arrays
+    :param xgrid: Increasing 1D array
+    :return: Array (ncurves, len(xgrid)) of values and boolean array of
+             the same shape, True where xgrid lies strictly inside the
+             x range of the curve
+    """
+    nCurves = len(xList)
+    xgrid = numpy.asarray(xgrid, dtype=numpy.float64)
+    x2d, y2d, lengths = padCurves(xList, yList)
+    first = x2d[:, 0]
+    last = x2d[numpy.arange(nCurves), lengths - 1]
+    origin = min(first.min(), xgrid[0])
+    period = 2 * (max(last.max(), xgrid[-1]) - origin) + 1.0
+    offsets = numpy.arange(nCurves) * period - origin
+    valid = numpy.isfinite(x2d)
+    xp = (x2d + offsets[:, None])[valid]
+    fp = y2d[valid]
+    values = numpy.interp((xgrid[None, :] + offsets[:, None]).ravel(), xp, fp)
+    values.shape = nCurves, xgrid.size
+    mask = (xgrid[None, :] > first[:, None]) & (xgrid[None, :] < last[:, None])
+    return values, mask
+
+
+def normalize(y, axis=-1):
+    """
+    Scale the values to the range [0, 1] along the given axis.
+    """
+    ymin = y.min(axis=axis, keepdims=True)
+    ymax = y.max(axis=axis, keepdims=True)
+    delta = ymax - ymin
+    delta[delta == 0] = 1.0
+    return (y - ymin) / delta
+
+
+def crossCorrelate(y, reference):
+    """
+    Circular cross correlation of each row of y with the reference. The
+    zero lag is moved to the middle of each row.
+
+    :param y: 2D array (ncurves, npoints)
+    :param reference: 1D array (npoints)
+    :return: 2D array (ncurves, npoints)
+    """
+    n = y.shape[-1]
+    fftReference = numpy.fft.rfft(reference)
+    ffty = numpy.fft.rfft(y, axis=-1)
+    correlation = numpy.fft.irfft(fftReference[None, :] * ffty.conjugate(),
+                                  n=n, axis=-1)
+    return numpy.roll(correlation, n // 2, axis=-1)
+
+
+def findPeakPositions(profiles, portion=0.95, refinement="centroid"):
+    """
+    Sub-sample position of the maximum of each row.
+
+    :param profiles: 2D array
+    :param portion: With centroid refinement, the centre of mass is taken
+                    on the widest window symmetric around the maximum in
+                    which the values are above portion times the maximum
+                    (plus the first point below at each side).
+    :param refinement: "centroid", "parabola" or None
+    :return: 1D array of fractional indices
+    """
+    nRows, n = profiles.shape
+    rows = numpy.arange(nRows)
+    peak = profiles.argmax(axis=1)
+    if refinement in [None, "none"]:
+        return peak.astype(numpy.float64)
+    if refinement == "parabola":
+        left = profiles[rows, numpy.clip(peak - 1, 0, n - 1)]
+        center = profiles[rows, peak]
+        right = profiles[rows, numpy.clip(peak + 1, 0, n - 1)]
+        denominator = left - 2 * center + right
+        delta = numpy.zeros(nRows)
+        good = (denominator != 0) & (peak > 0) & (peak < (n - 1))
+        delta[good] = 0.5 * (left[good] - right[good]) / denominator[good]
+        return peak + delta
+    if refinement != "centroid":
+        raise ValueError("Unknown refinement <%s>" % refinement)
+    threshold = portion * profiles[rows, peak]
+    below = profiles <= threshold[:, None]
+    index = numpy.arange(n)[None, :]
+    # first point at or below the threshold at each side of the maximum
+    rightBelow = below & (index >= peak[:, None])
+    rightEdge = numpy.where(rightBelow.any(axis=1),
+                            rightBelow.argmax(axis=1), n - 1)
+    leftBelow = below[:, ::-1] & (index[:, ::-1] <= peak[:, None])
+    leftEdge = numpy.where(leftBelow.any(axis=1),
+                           n - 1 - leftBelow.argmax(axis=1), 0)
+    width = numpy.minimum(rightEdge - peak, peak - leftEdge)
+    # window sums from cumulative sums
+    weights = numpy.cumsum(profiles, axis=1)
+    moments = numpy.cumsum(profiles * index, axis=1)
+    start = peak - width
+    end = peak + width
+    total = weights[rows, end] - numpy.where(start > 0,
+                                weights[rows, start - 1], 0.0)
+    moment = moments[rows, end] - numpy.where(start > 0,
+                                moments[rows, start - 1], 0.0)
+    total[total == 0] = 1.0
+    return numpy.where(width > 0, moment / total, peak)
+
+
+def calculateShiftsFFT(y, reference=0, step=1.0, portion=0.95,
+                       refinement="centroid", normalizeReference=True):
+    """
+    Shifts to apply to each curve to align it with the reference curve.
+
+    :param y: 2D array with the curves sampled on the same equidistant grid
+    :param reference: Index of the reference curve or 1D reference array
+    :param step: Grid step
+    :param portion: See findPeakPositions
+    :param refinement: See findPeakPositions
+    :param normalizeReference: Scale the reference to the range [0, 1]
+    :return: 1D array of shifts in the units of the grid
+    """
+    y = numpy.asarray(y, dtype=numpy.float64)
+    if len(y.shape) != 2:
+        raise ValueError("Expected a 2D array")
+    if numpy.isscalar(reference) or \
+       (hasattr(reference, "ndim") and reference.ndim == 0):
+        reference = y[int(reference)]
+    reference = numpy.asarray(reference, dtype=numpy.float64)
+    if normalizeReference:
+        reference = normalize(reference)
+    correlation = normalize(crossCorrelate(y, reference))
+    positions = findPeakPositions(correlation, portion=portion,
+                                  refinement=refinement)
+    return (positions - y.shape[-1] // 2) * step
+
+
+def calculateShiftsMax(xList, yList, reference=0, xmin=None, xmax=None):
+    """
+    Shifts aligning the position of the maximum of each curve with the
+    one of the reference curve, considering the range [xmin, xmax].
+
+    :return: 1D array of shifts
+    """
+    x2d, y2d, lengths = padCurves(xList, yList)
+    inside = numpy.isfinite(x2d)
+    if xmin is not None:
+        inside &= (x2d >= xmin)
+    if xmax is not None:
+        inside &= (x2d <= xmax)
+    y2d[~inside] = -numpy.inf
+    rows = numpy.arange(len(yList))
+    positions = x2d[rows, y2d.argmax(axis=1)]
+    return positions[reference] - positions
+
+
+def fftShiftCurves(xList, yList, shifts):
+    """
+    Shift equidistant curves by the given amounts multiplying their
+    Fourier transform by a phase ramp. The curves with the same number
+    of points are shifted together.
+
+    :return: List of shifted y arrays
+    """
+    shifts = numpy.asarray(shifts, dtype=numpy.float64)
+    lengths = numpy.array([len(y) for y in yList])
+    output = [None] * len(yList)
+    for length in numpy.unique(lengths):
+        indices = numpy.nonzero(lengths == length)[0]
+        if length < 2:
+            for i in indices:
+                output[i] = numpy.array(yList[i], dtype=numpy.float64)
+            continue
+        y = numpy.array([yList[i] for i in indices], dtype=numpy.float64)
+        steps = numpy.array([xList[i][1] - xList[i][0] for i in indices],
+                            dtype=numpy.float64)
+        frequencies = numpy.fft.rfftfreq(length)[None, :] / steps[:, None]
+        phase = numpy.exp(-2.0j * numpy.pi * frequencies * \
+                          shifts[indices][:, None])
+        shifted = numpy.fft.irfft(numpy.fft.rfft(y, axis=-1) * phase,
+                                  n=length, axis=-1)
+        for j, i in enumerate(indices):
+            output[i] = shifted[j]
+    return output
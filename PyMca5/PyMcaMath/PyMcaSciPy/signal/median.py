@@ -35,6 +35,9 @@
 except ImportError:
     from PyMca5.PyMcaSciPy.signal import mediantools
 
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+import numpy
 from numpy import asarray
 
 def medfilt2d(input_data, kernel_size=None, conditional=0):
@@ -61,6 +64,10 @@ def medfilt2d(input_data, kernel_size=None, conditional=0):
 
     """
     image = asarray(input_data)
+    kernel_size = _getKernelSize2d(kernel_size)
+    return mediantools._medfilt2d(image, kernel_size, conditional)
+
+def _getKernelSize2d(kernel_size):
     if kernel_size is None:
         kernel_size = [3] * 2
     kernel_size = asarray(kernel_size)
@@ -71,8 +78,60 @@ def medfilt2d(input_data, kernel_size=None, conditional=0):
     for size in kernel_size:
         if (size % 2) != 1:
             raise ValueError("Each element of kernel_size should be odd.")
+    return kernel_size
 
-    return mediantools._medfilt2d(image, kernel_size, conditional)
+def medfilt2dStack(input_data, kernel_size=None, conditional=0, nthreads=None):
+    """Median filter each image of a stack of 2-dimensional arrays.
+
+  Description:
+
+    Apply medfilt2d to each input_data[i] using several threads.
+
+  Inputs:
+
+    in -- A 3 dimensional input array of shape (nimages, rows, columns).
+    kernel_size -- See medfilt2d.
+    conditional -- If different from 0 implements a conditional median filter.
+    nthreads -- Number of threads. Default is the number of CPUs.
+
+  Outputs: (out,)
+
+    out -- An array the same size as input containing the median filtered
+           images.
+
+    """
+    stack = numpy.asarray(input_data)
+    # the filter only works on native byte order
+    stack = numpy.ascontiguousarray(stack,
+                                    dtype=stack.dtype.newbyteorder('='))
+    if len(stack.shape) != 3:
+        raise ValueError("Expected a 3 dimensional array")
+    kernel_size = _getKernelSize2d(kernel_size)
+    output = numpy.empty_like(stack)
+    nImages = stack.shape[0]
+    if nthreads is None:
+        nthreads = multiprocessing.cpu_count()
+    nthreads = max(min(nthreads, nImages), 1)
+    if nthreads == 1:
+        mediantools._medfilt2d_stack(stack, output, kernel_size, conditional)
+        return output
+    # the filter releases the GIL while it works on each chunk of images
+    limits = numpy.linspace(0, nImages, nthreads + 1).astype(numpy.int64)
+
+    def filterChunk(i):
+        start, end = limits[i], limits[i + 1]
+        mediantools._medfilt2d_stack(stack[start:end],
+                                     output[start:end],
+                                     kernel_size,
+                                     conditional)
+
+    pool = ThreadPool(nthreads)
+    try:
+        pool.map(filterChunk, range(nthreads))
+    finally:
+        pool.close()
+        pool.join()
+    return output
 
 def medfilt1d(input_data, kernel_size=None, conditional=0):
     """Median filter 1-dimensional arrays.
@@ -6,9 +6,9 @@
  * on scipy that is big and potentially difficult to built on some
  * platforms.
  *
- * Using this code outside PyMca:
- *
- * The check_malloc function has to be provided for error handling.
+ * The filters return 0 on success and -1 if memory could not be
+ * allocated. They do not use any global state, so several images can be
+ * filtered at the same time from different threads.
  *
  *--------------------------------------------------------------------*/
 /* Subset of SIGTOOLS module by Travis Oliphant
@@ -49,19 +49,18 @@ OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
 DAMAGE.
 */
 #include <stdlib.h>
-
-extern char *check_malloc (int);
+#include <math.h>
 
 /* defined below */
-void f_medfilt2(float*,float*,int*,int*, int);
-void d_medfilt2(double*,double*,int*,int*, int);
-void b_medfilt2(unsigned char*,unsigned char*,int*,int*,int);
-void short_medfilt2(short*, short*,int*,int*,int);
-void ushort_medfilt2(unsigned short*,unsigned short*,int*,int*,int);
-void int_medfilt2(int*, int*,int*,int*,int);
-void uint_medfilt2(unsigned int*,unsigned int*,int*,int*,int);
-void long_medfilt2(long*, long*,int*,int*,int);
-void ulong_medfilt2(unsigned long*,unsigned long*,int*,int*,int);
+int f_medfilt2(float*,float*,int*,int*,int,int);
+int d_medfilt2(double*,double*,int*,int*,int,int);
+int b_medfilt2(unsigned char*,unsigned char*,int*,int*,int,int);
+int short_medfilt2(short*, short*,int*,int*,int,int);
+int ushort_medfilt2(unsigned short*,unsigned short*,int*,int*,int,int);
+int int_medfilt2(int*, int*,int*,int*,int,int);
+int uint_medfilt2(unsigned int*,unsigned int*,int*,int*,int,int);
+int long_medfilt2(long*, long*,int*,int*,int,int);
+int ulong_medfilt2(unsigned long*,unsigned long*,int*,int*,int,int);
 
 /* The QUICK_SELECT routine is based on Hoare's Quickselect algorithm,
  * with unrolled recursion.
@@ -119,9 +118,9 @@ TYPE NAME(TYPE arr[], int n)                                            \
     }                                                                   \
 }
 
-/* 2-D median filter with zero-padding on edges. */
+/* 2-D median filter shrinking the window on edges. */
 #define MEDIAN_FILTER_2D(NAME, TYPE, SELECT)                            \
-void NAME(TYPE* in, TYPE* out, int* Nwin, int* Ns, int flag)            \
+static int NAME(TYPE* in, TYPE* out, int* Nwin, int* Ns, int flag)      \
 {                                                                       \
     /* if flag is not 0, implements a conditional filter */             \
     int nx, ny, hN[2];                                                  \
@@ -130,7 +129,9 @@ void NAME(TYPE* in, TYPE* out, int* Nwin, int* Ns, int flag)            \
     TYPE *myvals, *fptr1, *fptr2, *ptr1, *ptr2, minval=0, maxval=0;     \
                                                                         \
     totN = Nwin[0] * Nwin[1];                                           \
-    myvals = (TYPE *) check_malloc( totN * sizeof(TYPE));               \
+    myvals = (TYPE *) malloc(totN * sizeof(TYPE));                      \
+    if (myvals == NULL)                                                 \
+        return -1;                                                      \
                                                                         \
     hN[0] = Nwin[0] >> 1;                                               \
     hN[1] = Nwin[1] >> 1;                                               \
@@ -184,6 +185,7 @@ void NAME(TYPE* in, TYPE* out, int* Nwin, int* Ns, int flag)            \
             }                                                           \
         }                                                               \
     free(myvals);                                                       \
+    return 0;                                                           \
 }
 
 /* define quick_select for floats, doubles, and unsigned characters */
@@ -200,16 +202,303 @@ QUICK_SELECT(uint_quick_select, unsigned int);
 QUICK_SELECT(long_quick_select, long);
 QUICK_SELECT(ulong_quick_select, unsigned long);
 
+
+/* Sliding histogram median filter (T. S. Huang, 1979) keeping a two level
+ * histogram (S. Perreault and P. Hebert, 2007) so that the median can be
+ * located by scanning a coarse and a fine histogram of about sqrt(nbins)
+ * bins each. The cost per pixel does not depend on the window width.
+ *
+ * It works on integer bins, so it is used for data whose values are all
+ * integers spanning less than MEDIAN_HISTOGRAM_MAX_BINS values. This
+ * covers integer images and float images of counts, the result being
+ * identical to the one obtained with the quick select. */
+
+#define MEDIAN_HISTOGRAM_MAX_BINS (1 << 18)
+
+#define MEDIAN_METHOD_AUTO 0
+#define MEDIAN_METHOD_SELECT 1
+#define MEDIAN_METHOD_HISTOGRAM 2
+
+typedef struct {
+    int *fine;
+    int *coarse;
+    int shift;
+    int count;
+    /* current coarse bin and number of values in the coarse bins below */
+    int bucket;
+    int below;
+} MedianHistogram;
+
+static void histogram_setup(int nbins, int *shift, int *ncoarse)
+{
+    int bits = 1;
+
+    while ((1 << bits) < nbins)
+        bits++;
+    *shift = bits / 2;
+    *ncoarse = ((nbins - 1) >> *shift) + 1;
+}
+
+static int histogram_init(MedianHistogram *h, int nbins)
+{
+    int ncoarse;
+
+    histogram_setup(nbins, &h->shift, &ncoarse);
+    h->fine = (int *) calloc(ncoarse << h->shift, sizeof(int));
+    h->coarse = (int *) calloc(ncoarse, sizeof(int));
+    h->count = 0;
+    h->bucket = 0;
+    h->below = 0;
+    if ((h->fine == NULL) || (h->coarse == NULL))
+    {
+        free(h->fine);
+        free(h->coarse);
+        return -1;
+    }
+    return 0;
+}
+
+static void histogram_free(MedianHistogram *h)
+{
+    free(h->fine);
+    free(h->coarse);
+}
+
+static void histogram_add(MedianHistogram *h, int bin)
+{
+    h->fine[bin]++;
+    h->coarse[bin >> h->shift]++;
+    h->count++;
+    if ((bin >> h->shift) < h->bucket)
+        h->below++;
+}
+
+static void histogram_remove(MedianHistogram *h, int bin)
+{
+    h->fine[bin]--;
+    h->coarse[bin >> h->shift]--;
+    h->count--;
+    if ((bin >> h->shift) < h->bucket)
+        h->below--;
+}
+
+/* bin of the value of the given rank, moving the current coarse bin */
+static int histogram_rank(MedianHistogram *h, int rank)
+{
+    int bin, accumulated;
+
+    while (h->below > rank)
+    {
+        h->bucket--;
+        h->below -= h->coarse[h->bucket];
+    }
+    while ((h->below + h->coarse[h->bucket]) <= rank)
+    {
+        h->below += h->coarse[h->bucket];
+        h->bucket++;
+    }
+    accumulated = h->below;
+    bin = h->bucket << h->shift;
+    while (1)
+    {
+        accumulated += h->fine[bin];
+        if (accumulated > rank)
+            return bin;
+        bin++;
+    }
+}
+
+/* number of values smaller than the given bin */
+static int histogram_count_below(const MedianHistogram *h, int bin)
+{
+    int bucket, count, i;
+
+    bucket = h->bucket;
+    count = h->below;
+    while (bucket > (bin >> h->shift))
+    {
+        bucket--;
+        count -= h->coarse[bucket];
+    }
+    while (bucket < (bin >> h->shift))
+    {
+        count += h->coarse[bucket];
+        bucket++;
+    }
+    for (i = bucket << h->shift; i < bin; i++)
+        count += h->fine[i];
+    return count;
+}
+
+static int histogram_medfilt2(const int *in, int *out, int nbins, int *Nwin, int *Ns, int flag)
+{
+    MedianHistogram h;
+    int nx, ny, hN[2];
+    int y0, y1, x1, row, column, bin, below;
+    const int *ptr;
+
+    if (histogram_init(&h, nbins) < 0)
+        return -1;
+    hN[0] = Nwin[0] >> 1;
+    hN[1] = Nwin[1] >> 1;
+    for (ny = 0; ny < Ns[0]; ny++)
+    {
+        y0 = (ny < hN[0]) ? 0 : ny - hN[0];
+        y1 = (ny >= Ns[0] - hN[0]) ? Ns[0] - 1 : ny + hN[0];
+        x1 = (hN[1] < Ns[1]) ? hN[1] : Ns[1];
+        for (column = 0; column < x1; column++)
+        {
+            ptr = in + y0 * Ns[1] + column;
+            for (row = y0; row <= y1; row++, ptr += Ns[1])
+                histogram_add(&h, *ptr);
+        }
+        for (nx = 0; nx < Ns[1]; nx++)
+        {
+            /* slide the window: new column on the right, old one on the left */
+            column = nx + hN[1];
+            if (column < Ns[1])
+            {
+                ptr = in + y0 * Ns[1] + column;
+                for (row = y0; row <= y1; row++, ptr += Ns[1])
+                    histogram_add(&h, *ptr);
+            }
+            column = nx - hN[1] - 1;
+            if (column >= 0)
+            {
+                ptr = in + y0 * Ns[1] + column;
+                for (row = y0; row <= y1; row++, ptr += Ns[1])
+                    histogram_remove(&h, *ptr);
+            }
+            bin = in[ny * Ns[1] + nx];
+            if (flag)
+            {
+                below = histogram_count_below(&h, bin);
+                if ((below != 0) && ((below + h.fine[bin]) != h.count))
+                {
+                    /* neither the minimum nor the maximum */
+                    out[ny * Ns[1] + nx] = bin;
+                    continue;
+                }
+            }
+            /* lower of middle values for even-length windows */
+            out[ny * Ns[1] + nx] = histogram_rank(&h, (h.count - 1) / 2);
+        }
+        /* empty the histogram for the next row */
+        for (column = Ns[1] - hN[1] - 1; column < Ns[1]; column++)
+        {
+            if (column < 0)
+                continue;
+            ptr = in + y0 * Ns[1] + column;
+            for (row = y0; row <= y1; row++, ptr += Ns[1])
+                histogram_remove(&h, *ptr);
+        }
+    }
+    histogram_free(&h);
+    return 0;
+}
+
+/* Is the histogram expected to be faster than the quick select? The
+ * quick select copies and partitions the whole window while the histogram
+ * needs two columns of updates and, at most, the scan of both levels.
+ * The factor has been measured on 1024x1024 images: the histogram wins
+ * for any 5x5 window and for 3x3 ones over less than 2**14 values. */
+static int histogram_is_faster(int nbins, int *Nwin)
+{
+    int shift, ncoarse;
+
+    histogram_setup(nbins, &shift, &ncoarse);
+    return (2 * Nwin[0] + ncoarse + (1 << shift)) < (48 * Nwin[0] * Nwin[1]);
+}
+
+#define IS_INTEGRAL(x) (1)
+#define IS_INTEGRAL_REAL(x) ((x) == floor(x))
+
+/* Returns 1 if the image has been filtered, 0 if the data or the window
+ * are not suited to the histogram and -1 on memory error. */
+#define HISTOGRAM_MEDIAN_FILTER_2D(NAME, TYPE, INTEGRAL)                \
+static int NAME(TYPE* in, TYPE* out, int* Nwin, int* Ns, int flag, int method) \
+{                                                                       \
+    size_t i, n;                                                        \
+    TYPE minval, maxval;                                                \
+    int nbins, status;                                                  \
+    int *bins;                                                          \
+                                                                        \
+    n = ((size_t) Ns[0]) * Ns[1];                                       \
+    if (n == 0)                                                         \
+        return 0;                                                       \
+    minval = maxval = in[0];                                            \
+    for (i = 0; i < n; i++) {                                           \
+        if (!INTEGRAL(in[i]))                                           \
+            return 0;                                                   \
+        if (in[i] < minval)                                             \
+            minval = in[i];                                             \
+        else if (in[i] > maxval)                                        \
+            maxval = in[i];                                             \
+    }                                                                   \
+    if (((double) maxval - (double) minval) >= MEDIAN_HISTOGRAM_MAX_BINS) \
+        return 0;                                                       \
+    nbins = (int) (maxval - minval) + 1;                                \
+    if ((method != MEDIAN_METHOD_HISTOGRAM) &&                          \
+        (!histogram_is_faster(nbins, Nwin)))                            \
+        return 0;                                                       \
+    bins = (int *) malloc(2 * n * sizeof(int));                         \
+    if (bins == NULL)                                                   \
+        return -1;                                                      \
+    for (i = 0; i < n; i++)                                             \
+        bins[i] = (int) (in[i] - minval);                               \
+    status = histogram_medfilt2(bins, bins + n, nbins, Nwin, Ns, flag); \
+    if (status == 0) {                                                  \
+        for (i = 0; i < n; i++)                                         \
+            out[i] = (TYPE) (minval + bins[n + i]);                     \
+    }                                                                   \
+    free(bins);                                                         \
+    return (status < 0) ? -1 : 1;                                       \
+}
+
+/* Median filter choosing the algorithm. The method can force the
+ * quick select or the histogram (if the data allow it). */
+#define MEDIAN_FILTER_2D_AUTO(NAME, TYPE, SELECT_FILTER, HISTOGRAM_FILTER) \
+int NAME(TYPE* in, TYPE* out, int* Nwin, int* Ns, int flag, int method) \
+{                                                                       \
+    int status;                                                         \
+                                                                        \
+    if (method != MEDIAN_METHOD_SELECT) {                               \
+        status = HISTOGRAM_FILTER(in, out, Nwin, Ns, flag, method);     \
+        if (status != 0)                                                \
+            return (status < 0) ? -1 : 0;                               \
+    }                                                                   \
+    return SELECT_FILTER(in, out, Nwin, Ns, flag);                      \
+}
+
 /* define medfilt for floats, doubles, and unsigned characters */
-MEDIAN_FILTER_2D(f_medfilt2, float, f_quick_select)
-MEDIAN_FILTER_2D(d_medfilt2, double, d_quick_select)
-MEDIAN_FILTER_2D(b_medfilt2, unsigned char, b_quick_select)
+MEDIAN_FILTER_2D(f_medfilt2_select, float, f_quick_select)
+MEDIAN_FILTER_2D(d_medfilt2_select, double, d_quick_select)
+MEDIAN_FILTER_2D(b_medfilt2_select, unsigned char, b_quick_select)
 
 /* define medfilt for rest of common types */
-MEDIAN_FILTER_2D(short_medfilt2, short, short_quick_select)
-MEDIAN_FILTER_2D(ushort_medfilt2, unsigned short, ushort_quick_select)
-MEDIAN_FILTER_2D(int_medfilt2, int, int_quick_select)
-MEDIAN_FILTER_2D(uint_medfilt2, unsigned int, uint_quick_select)
-MEDIAN_FILTER_2D(long_medfilt2, long, long_quick_select)
-MEDIAN_FILTER_2D(ulong_medfilt2, unsigned long, ulong_quick_select)
+MEDIAN_FILTER_2D(short_medfilt2_select, short, short_quick_select)
+MEDIAN_FILTER_2D(ushort_medfilt2_select, unsigned short, ushort_quick_select)
+MEDIAN_FILTER_2D(int_medfilt2_select, int, int_quick_select)
+MEDIAN_FILTER_2D(uint_medfilt2_select, unsigned int, uint_quick_select)
+MEDIAN_FILTER_2D(long_medfilt2_select, long, long_quick_select)
+MEDIAN_FILTER_2D(ulong_medfilt2_select, unsigned long, ulong_quick_select)
+
+HISTOGRAM_MEDIAN_FILTER_2D(f_medfilt2_histogram, float, IS_INTEGRAL_REAL)
+HISTOGRAM_MEDIAN_FILTER_2D(d_medfilt2_histogram, double, IS_INTEGRAL_REAL)
+HISTOGRAM_MEDIAN_FILTER_2D(b_medfilt2_histogram, unsigned char, IS_INTEGRAL)
+HISTOGRAM_MEDIAN_FILTER_2D(short_medfilt2_histogram, short, IS_INTEGRAL)
+HISTOGRAM_MEDIAN_FILTER_2D(ushort_medfilt2_histogram, unsigned short, IS_INTEGRAL)
+HISTOGRAM_MEDIAN_FILTER_2D(int_medfilt2_histogram, int, IS_INTEGRAL)
+HISTOGRAM_MEDIAN_FILTER_2D(uint_medfilt2_histogram, unsigned int, IS_INTEGRAL)
+HISTOGRAM_MEDIAN_FILTER_2D(long_medfilt2_histogram, long, IS_INTEGRAL)
+HISTOGRAM_MEDIAN_FILTER_2D(ulong_medfilt2_histogram, unsigned long, IS_INTEGRAL)
 
+MEDIAN_FILTER_2D_AUTO(f_medfilt2, float, f_medfilt2_select, f_medfilt2_histogram)
+MEDIAN_FILTER_2D_AUTO(d_medfilt2, double, d_medfilt2_select, d_medfilt2_histogram)
+MEDIAN_FILTER_2D_AUTO(b_medfilt2, unsigned char, b_medfilt2_select, b_medfilt2_histogram)
+MEDIAN_FILTER_2D_AUTO(short_medfilt2, short, short_medfilt2_select, short_medfilt2_histogram)
+MEDIAN_FILTER_2D_AUTO(ushort_medfilt2, unsigned short, ushort_medfilt2_select, ushort_medfilt2_histogram)
+MEDIAN_FILTER_2D_AUTO(int_medfilt2, int, int_medfilt2_select, int_medfilt2_histogram)
+MEDIAN_FILTER_2D_AUTO(uint_medfilt2, unsigned int, uint_medfilt2_select, uint_medfilt2_histogram)
+MEDIAN_FILTER_2D_AUTO(long_medfilt2, long, long_medfilt2_select, long_medfilt2_histogram)
+MEDIAN_FILTER_2D_AUTO(ulong_medfilt2, unsigned long, ulong_medfilt2_select, ulong_medfilt2_histogram)
@@ -42,7 +42,6 @@ DAMAGE.
 */
 #include "numpy/noprefix.h"
 
-#include <setjmp.h>
 
 typedef struct {
   char *data;
@@ -75,133 +74,207 @@ struct module_state {
 #define GETSTATE(m) (&_state)
 static struct module_state _state;
 #endif
-#define PYERR(message)  \
-        {struct module_state *st = GETSTATE(self);\
-            PyErr_SetString(st->error, message);goto fail;}
 
-jmp_buf MALLOC_FAIL;
+static char doc_median2d[] = "filt = _medfilt2d(data, size, conditional=0, method=0)\n"
+"\n"
+"method 0 chooses the fastest algorithm, 1 forces the quick select and 2\n"
+"the sliding histogram when the data allow it.";
+
+static char doc_median2d_stack[] = "_medfilt2d_stack(data, output, size, conditional=0, method=0)\n"
+"\n"
+"Filter in place into output each image of the C contiguous 3D array data.\n"
+"output has to be a C contiguous array of the same shape and type.";
+
+extern int f_medfilt2(float*,float*,int*,int*,int,int);
+extern int d_medfilt2(double*,double*,int*,int*,int,int);
+extern int b_medfilt2(unsigned char*,unsigned char*,int*,int*,int,int);
+extern int short_medfilt2(short*, short*,int*,int*,int,int);
+extern int ushort_medfilt2(unsigned short*,unsigned short*,int*,int*,int,int);
+extern int int_medfilt2(int*, int*,int*,int*,int,int);
+extern int uint_medfilt2(unsigned int*,unsigned int*,int*,int*,int,int);
+extern int long_medfilt2(long*, long*,int*,int*,int,int);
+extern int ulong_medfilt2(unsigned long*,unsigned long*,int*,int*,int,int);
+
+#define MEDFILT_UNSUPPORTED_TYPE -2
+
+/* Filter nimages consecutive images. Called without the GIL.
+ * Returns 0 on success, -1 on memory error or MEDFILT_UNSUPPORTED_TYPE */
+static int medfilt2_images(int typenum, int elsize, char *in, char *out, npy_intp nimages,
+                           int *Nwin, int *Idims, int flag, int method)
+{
+    npy_intp i, offset;
+    int status = 0;
 
-char *check_malloc (int);
+    offset = ((npy_intp) Idims[0]) * Idims[1] * elsize;
+    for (i = 0; (i < nimages) && (status == 0); i++, in += offset, out += offset)
+    {
+        switch (typenum) {
+        case NPY_UBYTE:
+            status = b_medfilt2((unsigned char *) in, (unsigned char *) out,\
+                                Nwin, Idims, flag, method);
+            break;
+        case NPY_FLOAT:
+            status = f_medfilt2((float *) in, (float *) out,\
+                                Nwin, Idims, flag, method);
+            break;
+        case NPY_DOUBLE:
+            status = d_medfilt2((double *) in, (double *) out,\
+                                Nwin, Idims, flag, method);
+            break;
+        case NPY_SHORT:
+            status = short_medfilt2((short *) in, (short *) out,\
+                                    Nwin, Idims, flag, method);
+            break;
+        case NPY_USHORT:
+            status = ushort_medfilt2((unsigned short *) in, (unsigned short *) out,\
+                                     Nwin, Idims, flag, method);
+            break;
+        case NPY_INT:
+            status = int_medfilt2((int *) in, (int *) out,\
+                                  Nwin, Idims, flag, method);
+            break;
+        case NPY_UINT:
+            status = uint_medfilt2((unsigned int *) in, (unsigned int *) out,\
+                                   Nwin, Idims, flag, method);
+            break;
+        case NPY_LONG:
+            status = long_medfilt2((long *) in, (long *) out,\
+                                   Nwin, Idims, flag, method);
+            break;
+        case NPY_ULONG:
+            status = ulong_medfilt2((unsigned long *) in, (unsigned long *) out,\
+                                    Nwin, Idims, flag, method);
+            break;
+        default:
+            status = MEDFILT_UNSUPPORTED_TYPE;
+        }
+    }
+    return status;
+}
 
-char *check_malloc (int size)
+static int get_window(PyObject *self, PyObject *size, int *Nwin)
 {
-    char *the_block;
+    PyArrayObject *a_size;
+    long *lhelp;
 
-    the_block = (char *)malloc(size);
-    if (the_block == NULL)
+    if (size == NULL)
+        return 0;
+    a_size = (PyArrayObject *)PyArray_ContiguousFromObject(size, NPY_LONG, 1, 1);
+    if (a_size == NULL)
+        return -1;
+    if ((PyArray_NDIM(a_size) != 1) || (PyArray_DIMS(a_size)[0] < 2))
     {
-        printf("\nERROR: unable to allocate %d bytes!\n", size);
-        longjmp(MALLOC_FAIL,-1);
+        struct module_state *st = GETSTATE(self);
+        PyErr_SetString(st->error, "Size must be a length two sequence");
+        Py_DECREF(a_size);
+        return -1;
     }
-    return(the_block);
+    lhelp = (long *) PyArray_DATA(a_size);
+    Nwin[0] = (int) lhelp[0];
+    Nwin[1] = (int) lhelp[1];
+    Py_DECREF(a_size);
+    return 0;
 }
 
+static int check_status(PyObject *self, int status)
+{
+    struct module_state *st = GETSTATE(self);
 
-static char doc_median2d[] = "filt = _median2d(data, size, conditional=0)";
-
-extern void f_medfilt2(float*,float*,int*,int*,int);
-extern void d_medfilt2(double*,double*,int*,int*,int);
-extern void b_medfilt2(unsigned char*,unsigned char*,int*,int*,int);
-extern void short_medfilt2(short*, short*,int*,int*,int);
-extern void ushort_medfilt2(unsigned short*,unsigned short*,int*,int*,int);
-extern void int_medfilt2(int*, int*,int*,int*,int);
-extern void uint_medfilt2(unsigned int*,unsigned int*,int*,int*,int);
-extern void long_medfilt2(long*, long*,int*,int*,int);
-extern void ulong_medfilt2(unsigned long*,unsigned long*,int*,int*,int);
+    if (status == MEDFILT_UNSUPPORTED_TYPE)
+    {
+        PyErr_SetString(st->error, "Median filter unsupported data type.");
+        return -1;
+    }
+    if (status < 0)
+    {
+        PyErr_SetString(st->error, "Memory allocation error.");
+        return -1;
+    }
+    return 0;
+}
 
 static PyObject *mediantools_median2d(PyObject *self, PyObject *args)
 {
     PyObject *image=NULL, *size=NULL;
     int conditional_flag=0;
-    int typenum;
-    PyArrayObject *a_image=NULL, *a_size=NULL;
+    int method=0;
+    int typenum, status;
+    PyArrayObject *a_image=NULL;
     PyArrayObject *a_out=NULL;
     int Nwin[2] = {3,3};
-    long *lhelp;
     int Idims[2] = {0, 0};
 
-    if (!PyArg_ParseTuple(args, "O|Oi", &image, &size, &conditional_flag)) return NULL;
+    if (!PyArg_ParseTuple(args, "O|Oii", &image, &size, &conditional_flag, &method)) return NULL;
 
     typenum = PyArray_ObjectType(image, 0);
     a_image = (PyArrayObject *)PyArray_ContiguousFromObject(image, typenum, 2, 2);
     if (a_image == NULL) goto fail;
 
-    if (size != NULL) {
-    a_size = (PyArrayObject *)PyArray_ContiguousFromObject(size, NPY_LONG, 1, 1);
-    if (a_size == NULL) goto fail;
-    if ((PyArray_NDIM(a_size) != 1) || (PyArray_DIMS(a_size)[0] < 2))
-        PYERR("Size must be a length two sequence");
-    lhelp = (long *) PyArray_DATA(a_size);
-    Nwin[0] = (int) (*lhelp);
-    Nwin[1] = (int) (*(lhelp++));
+    if (get_window(self, size, Nwin) < 0) goto fail;
     Idims[0] = (int) (PyArray_DIMS(a_image)[0]);
     Idims[1] = (int) (PyArray_DIMS(a_image)[1]);
-    }
 
     a_out = (PyArrayObject *)PyArray_SimpleNew(2,PyArray_DIMS(a_image),typenum);
     if (a_out == NULL) goto fail;
 
-    if (setjmp(MALLOC_FAIL)) {
-    PYERR("Memory allocation error.");
-    }
-    else {
-    switch (typenum) {
-    case NPY_UBYTE:
-        b_medfilt2((unsigned char *)PyArray_DATA(a_image), (unsigned char *)PyArray_DATA(a_out),\
-                   Nwin, Idims, conditional_flag);
-        break;
-    case NPY_FLOAT:
-        f_medfilt2((float *)PyArray_DATA(a_image), (float *)PyArray_DATA(a_out),\
-                   Nwin, Idims, conditional_flag);
-        break;
-    case NPY_DOUBLE:
-        d_medfilt2((double *)PyArray_DATA(a_image), (double *)PyArray_DATA(a_out),\
-                   Nwin, Idims, conditional_flag);
-        break;
-    case NPY_SHORT:
-        short_medfilt2((short *)PyArray_DATA(a_image), (short *)PyArray_DATA(a_out),\
-            Nwin, Idims, conditional_flag);
-        break;
-    case NPY_USHORT:
-        ushort_medfilt2((unsigned short *)PyArray_DATA(a_image), (unsigned short *)PyArray_DATA(a_out),\
-                   Nwin, Idims, conditional_flag);
-        break;
-    case NPY_INT:
-        int_medfilt2((int *)PyArray_DATA(a_image), (int *)PyArray_DATA(a_out),\
-                   Nwin, Idims, conditional_flag);
-        break;
-    case NPY_UINT:
-        uint_medfilt2((unsigned int *)PyArray_DATA(a_image), (unsigned int *)PyArray_DATA(a_out),\
-                   Nwin, Idims, conditional_flag);
-        break;
-    case NPY_LONG:
-        long_medfilt2((long *)PyArray_DATA(a_image), (long *)PyArray_DATA(a_out),\
-                   Nwin, Idims, conditional_flag);
-        break;
-    case NPY_ULONG:
-        ulong_medfilt2((unsigned long *)PyArray_DATA(a_image), (unsigned long *)PyArray_DATA(a_out),\
-                   Nwin, Idims, conditional_flag);
-        break;
-    default:
-      PYERR("Median filter unsupported data type.");
-    }
-    }
+    Py_BEGIN_ALLOW_THREADS
+    status = medfilt2_images(typenum, PyArray_ITEMSIZE(a_image),
+                             PyArray_DATA(a_image), PyArray_DATA(a_out), 1,
+                             Nwin, Idims, conditional_flag, method);
+    Py_END_ALLOW_THREADS
+    if (check_status(self, status) < 0) goto fail;
 
     Py_DECREF(a_image);
-    Py_XDECREF(a_size);
 
     return PyArray_Return(a_out);
 
  fail:
     Py_XDECREF(a_image);
-    Py_XDECREF(a_size);
     Py_XDECREF(a_out);
     return NULL;
 
 }
 
+static PyObject *mediantools_median2d_stack(PyObject *self, PyObject *args)
+{
+    PyObject *size=NULL;
+    PyArrayObject *a_image=NULL, *a_out=NULL;
+    int conditional_flag=0;
+    int method=0;
+    int typenum, status;
+    int Nwin[2] = {3,3};
+    int Idims[2] = {0, 0};
+
+    if (!PyArg_ParseTuple(args, "O!O!|Oii", &PyArray_Type, &a_image, &PyArray_Type, &a_out,
+                          &size, &conditional_flag, &method)) return NULL;
+
+    typenum = PyArray_TYPE(a_image);
+    if ((PyArray_NDIM(a_image) != 3) || !PyArray_ISCARRAY_RO(a_image) ||
+        !PyArray_ISCARRAY(a_out) || (PyArray_TYPE(a_out) != typenum) ||
+        !PyArray_SAMESHAPE(a_image, a_out))
+    {
+        PyErr_SetString(PyExc_ValueError,
+            "Expected C contiguous 3D input and writeable output of same shape and type");
+        return NULL;
+    }
+    if (get_window(self, size, Nwin) < 0) return NULL;
+    Idims[0] = (int) (PyArray_DIMS(a_image)[1]);
+    Idims[1] = (int) (PyArray_DIMS(a_image)[2]);
+
+    Py_BEGIN_ALLOW_THREADS
+    status = medfilt2_images(typenum, PyArray_ITEMSIZE(a_image),
+                             PyArray_DATA(a_image), PyArray_DATA(a_out),
+                             PyArray_DIMS(a_image)[0],
+                             Nwin, Idims, conditional_flag, method);
+    Py_END_ALLOW_THREADS
+    if (check_status(self, status) < 0) return NULL;
+
+    Py_RETURN_NONE;
+}
+
 static struct PyMethodDef mediantools_methods[] = {
     {"_medfilt2d", mediantools_median2d, METH_VARARGS, doc_median2d},
+    {"_medfilt2d_stack", mediantools_median2d_stack, METH_VARARGS, doc_median2d_stack},
     {NULL,        NULL, 0}        /* sentinel */
 };
 
@@ -35,6 +35,7 @@
 __license__ = "MIT"
 import numpy
 from numpy.linalg import solve
+from PyMca5.PyMcaMath import StackOperations
 
 ODD_SIGN = 1.0
 __LAST_COEFF = None
@@ -115,40 +116,56 @@ def getSavitzkyGolay(spectrum, npoints=3, degree=1, order=0):
     result[N:-N] = numpy.convolve(spectrum, coeff, mode='valid')
     return result
 
-def replaceStackWithSavitzkyGolay(stack, npoints=3, degree=1, order=0):
+def _convolveValid(spectra, coeff):
+    """
+    numpy.convolve(spectrum, coeff, mode='valid') of all the rows at once
+    """
+    n = coeff.size
+    length = spectra.shape[-1] - n + 1
+    result = coeff[-1] * spectra[:, :length]
+    for k in range(n - 1):
+        result += coeff[k] * spectra[:, n - 1 - k:n - 1 - k + length]
+    return result
+
+def replaceStackWithSavitzkyGolay(stack, npoints=3, degree=1, order=0, output=None, nthreads=None):
+    """
+    Replace every spectrum of the stack by its Savitzky-Golay filtered
+    version (or derivative).
+
+    Writable numpy arrays are modified in place. Other stacks (HDF5
+    datasets) are processed into a temporary memory mapped file replacing
+    the data of the stack (or into the given output). Returns the result.
+    """
     coeff = calc_coeff(npoints, degree, order)
     N = numpy.size(coeff-1) // 2
-    convolve = numpy.convolve
     mcaIndex = -1
     if hasattr(stack, "info") and hasattr(stack, "data"):
         actualData = stack.data
         mcaIndex = stack.info.get('McaIndex', -1)
     else:
         actualData = stack
-    if not isinstance(actualData, numpy.ndarray):
-        raise TypeError("This Plugin only supports numpy arrays")
-    # take a view
-    data = actualData[:]
-    oldShape = data.shape
-    if mcaIndex in [-1, len(data.shape)-1]:
-        data.shape = -1, oldShape[-1]
-        for i in range(data.shape[0]):
-            data[i,N:-N] = convolve(data[i,:],coeff, mode='valid')
-            if order > 0:
-                data[i, :N]  = data[i, N]
-                data[i, -N:] = data[i,-(N+1)]
-        data.shape = oldShape
-    elif mcaIndex == 0:
-        data.shape = oldShape[0], -1
-        for i in range(data.shape[-1]):
-            data[N:-N, i] = convolve(data[:, i],coeff, mode='valid')
-            if order > 0:
-                data[:N, i] = data[N, i]
-                data[-N:, i] = data[-(N+1), i]
-        data.shape = oldShape
-    else:
+    if mcaIndex not in [-1, 0, len(actualData.shape) - 1]:
         raise ValueError("Invalid 1D index %d" % mcaIndex)
-    return
+
+    def function(spectra):
+        if spectra.shape[-1] <= 2 * N:
+            return spectra
+        result = numpy.array(spectra, dtype=numpy.float64)
+        result[:, N:-N] = _convolveValid(result, coeff)
+        if order > 0:
+            result[:, :N] = result[:, N:N+1]
+            result[:, -N:] = result[:, -(N+1):-N]
+        return result
+
+    if output is None:
+        output = StackOperations.getOutput(actualData, floating=False)
+    output = StackOperations.applySpectrumFunction(actualData, function,
+                                                   mcaIndex=mcaIndex,
+                                                   output=output,
+                                                   nthreads=nthreads)
+    if (output is not actualData) and hasattr(stack, "data"):
+        stack.data = output
+    return output
 
 if getSavitzkyGolay(10*numpy.arange(10.), npoints=3, degree=1,order=1)[5] < 0:
     ODD_SIGN = -1
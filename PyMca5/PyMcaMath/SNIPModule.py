@@ -32,6 +32,7 @@
 __copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
 import numpy
 from PyMca5 import SpecfitFuns
+from PyMca5.PyMcaMath import StackOperations
 
 snip1d = SpecfitFuns.snip1d
 snip2d = SpecfitFuns.snip2d
@@ -48,75 +49,56 @@ def getSpectrumBackground(spectrum, width, roi_min=None, roi_max=None, smoothing
 
 getSnip1DBackground = getSpectrumBackground
 
-def subtractSnip1DBackgroundFromStack(stack, width, roi_min=None, roi_max=None,  smoothing=1):
+def _snip1DStackOperation(stack, width, roi_min, roi_max, smoothing,
+                          subtract, output, nthreads):
+    data, mcaIndex = StackOperations.getStackData(stack)
+    if mcaIndex not in [-1, 0, len(data.shape) - 1]:
+        raise ValueError("Invalid 1D index %d" % mcaIndex)
+    nChannels = data.shape[mcaIndex]
     if roi_min is None:
         roi_min = 0
     if roi_max is None:
-        roi_max = len(spectrum)
-    mcaIndex = -1
-    if hasattr(stack, "info") and hasattr(stack, "data"):
-        data = stack.data
-        mcaIndex = stack.info.get('McaIndex', -1)
-    else:
-        data = stack
-    if not isinstance(data, numpy.ndarray):
-        raise TypeError("This Plugin only supports numpy arrays")
-    oldShape = data.shape
-    if mcaIndex in [-1, len(data.shape)-1]:
-        data.shape = -1, oldShape[-1]
-        if roi_min > 0:
-            data[:, 0:roi_min] = 0
-        if roi_max < oldShape[-1]:
-            data[:, roi_max:] = 0
-        for i in range(data.shape[0]):
-            data[i,roi_min:roi_max] -= snip1d(data[i,roi_min:roi_max],
-                                              width, smoothing)
-        data.shape = oldShape
+        roi_max = nChannels
 
-    elif mcaIndex == 0:
-        data.shape = oldShape[0], -1
-        for i in range(data.shape[-1]):
-            data[roi_min:roi_max, i] -= snip1d(data[roi_min:roi_max, i],
-                                               width, smoothing)
-        data.shape = oldShape
-    else:
-        raise ValueError("Invalid 1D index %d" % mcaIndex)
-    return
+    def function(spectra):
+        result = numpy.zeros(spectra.shape, numpy.float64)
+        roi = spectra[:, roi_min:roi_max]
+        background = snip1d(roi, width, smoothing)
+        if subtract:
+            result[:, roi_min:roi_max] = roi - background
+        else:
+            result[:, roi_min:roi_max] = background
+        return result
 
-def replaceStackWithSnip1DBackground(stack, width, roi_min=None, roi_max=None,  smoothing=1):
-    if roi_min is None:
-        roi_min = 0
-    if roi_max is None:
-        roi_max = len(spectrum)
-    mcaIndex = -1
-    if hasattr(stack, "info") and hasattr(stack, "data"):
-        data = stack.data
-        mcaIndex = stack.info.get('McaIndex', -1)
-    else:
-        data = stack
-    if not isinstance(data, numpy.ndarray):
-        raise TypeError("This Plugin only supports numpy arrays")
-    oldShape = data.shape
-    if mcaIndex in [-1, len(data.shape)-1]:
-        data.shape = -1, oldShape[-1]
-        if roi_min > 0:
-            data[:, 0:roi_min] = 0
-        if roi_max < oldShape[-1]:
-            data[:, roi_max:] = 0
-        for i in range(data.shape[0]):
-            data[i,roi_min:roi_max] = snip1d(data[i,roi_min:roi_max],
-                                              width, smoothing)
-        data.shape = oldShape
+    if output is None:
+        output = StackOperations.getOutput(data, floating=False)
+    output = StackOperations.applySpectrumFunction(data, function,
+                                                   mcaIndex=mcaIndex,
+                                                   output=output,
+                                                   nthreads=nthreads)
+    if (output is not data) and hasattr(stack, "data"):
+        stack.data = output
+    return output
 
-    elif mcaIndex == 0:
-        data.shape = oldShape[0], -1
-        for i in range(data.shape[-1]):
-            data[roi_min:roi_max, i] = snip1d(data[roi_min:roi_max, i],
-                                               width, smoothing)
-        data.shape = oldShape
-    else:
-        raise ValueError("Invalid 1D index %d" % mcaIndex)
-    return
+def subtractSnip1DBackgroundFromStack(stack, width, roi_min=None, roi_max=None,  smoothing=1, output=None, nthreads=None):
+    """
+    Subtract the SNIP background of every spectrum of the stack. The
+    channels outside [roi_min, roi_max) are set to 0.
+
+    Writable numpy arrays are modified in place. Other stacks (HDF5
+    datasets) are processed into a temporary memory mapped file replacing
+    the data of the stack (or into the given output). Returns the result.
+    """
+    return _snip1DStackOperation(stack, width, roi_min, roi_max, smoothing,
+                                 True, output, nthreads)
+
+def replaceStackWithSnip1DBackground(stack, width, roi_min=None, roi_max=None,  smoothing=1, output=None, nthreads=None):
+    """
+    Replace every spectrum of the stack by its SNIP background. See
+    subtractSnip1DBackgroundFromStack.
+    """
+    return _snip1DStackOperation(stack, width, roi_min, roi_max, smoothing,
+                                 False, output, nthreads)
 
 
 def getImageBackground(image, width, roi_min=None, roi_max=None, smoothing=1):
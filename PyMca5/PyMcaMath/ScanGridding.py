@@ -0,0 +1,191 @@
+#/*##########################################################################
+#
+# The PyMca X-Ray Fluorescence Toolkit
+#
+# Copyright (c) 2004-2026 European Synchrotron Radiation Facility
+#
+# This file is part of the PyMca X-ray Fluorescence Toolkit developed at
+# the ESRF by the Software group.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#############################################################################*/
+__author__ = "V.A. Sole - ESRF Data Analysis"
+__contact__ = "sole@esrf.fr"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+__doc__ = """
+Regular grids from sets of 1D scans, each one taken at a fixed motor value.
+
+In the plane of the grid each scan k samples the straight line
+
+    x = offsets[k] + slope * y
+
+at the ordinates y. For instance, in a RIXS plane of incident energy (x)
+versus energy transfer (y), scans of the emission energy at a fixed
+incident energy are vertical lines (slope 0) and scans of the incident
+energy at a fixed emission energy are diagonals (slope 1).
+
+Instead of triangulating all the points, each scan is interpolated on the
+rows of the grid and then the rows are resampled between neighbouring
+scans. The cost is linear in the number of points and of pixels.
+"""
+import logging
+import numpy
+
+from PyMca5.PyMcaMath import CurveAlignment
+
+_logger = logging.getLogger(__name__)
+
+
+def _sortScans(offsets, yList, zList):
+    offsets = numpy.asarray(offsets, dtype=numpy.float64).ravel()
+    if offsets.size != len(yList):
+        raise ValueError("One offset per scan needed")
+    order = numpy.argsort(offsets, kind="mergesort")
+    offsets = offsets[order]
+    ySorted, zSorted = [], []
+    for i in order:
+        y = numpy.asarray(yList[i], dtype=numpy.float64).ravel()
+        z = numpy.asarray(zList[i], dtype=numpy.float64).ravel()
+        if y.size > 1 and y[0] > y[-1]:
+            y = y[::-1]
+            z = z[::-1]
+        if y.size > 2 and numpy.any(y[1:] < y[:-1]):
+            idx = numpy.argsort(y, kind="mergesort")
+            y = y[idx]
+            z = z[idx]
+        ySorted.append(y)
+        zSorted.append(z)
+    return offsets, ySorted, zSorted
+
+
+def interpolateScans(offsets, yList, zList, xGrid, yGrid, slope=0.0):
+    """
+    Linear interpolation of the scans on the grid.
+
+    :param offsets: Position of each scan along x at y = 0
+    :param yList: List of 1D arrays with the ordinates of each scan
+    :param zList: List of 1D arrays with the values of each scan
+    :param xGrid: Increasing 1D array
+    :param yGrid: Increasing 1D array
+    :param slope: Common slope of the scans
+    :return: Array of shape (len(yGrid), len(xGrid)), NaN outside the scans
+    """
+    offsets, yList, zList = _sortScans(offsets, yList, zList)
+    xGrid = numpy.asarray(xGrid, dtype=numpy.float64)
+    yGrid = numpy.asarray(yGrid, dtype=numpy.float64)
+    nScans = len(yList)
+
+    # 1. each scan on the rows of the grid, all scans at once
+    rows, inside = CurveAlignment.resampleCurves(yList, zList, yGrid)
+    yMin = numpy.array([y[0] for y in yList])
+    yMax = numpy.array([y[-1] for y in yList])
+    inside = (yGrid[None, :] >= yMin[:, None]) & \
+             (yGrid[None, :] <= yMax[:, None])
+    rows[~inside] = numpy.nan
+
+    # 2. along each row, between the two scans surrounding each pixel
+    position = xGrid[None, :] - slope * yGrid[:, None]
+    rowIndex = numpy.arange(yGrid.size)[:, None]
+    if nScans < 2:
+        output = numpy.full(position.shape, numpy.nan)
+        hit = position == offsets[0]
+        output[hit] = numpy.broadcast_to(rows[0][:, None],
+                                         position.shape)[hit]
+        return output
+    right = numpy.searchsorted(offsets, position, side="right")
+    valid = (right > 0) & (position <= offsets[-1])
+    right = numpy.clip(right, 1, nScans - 1)
+    left = right - 1
+    delta = offsets[right] - offsets[left]
+    delta[delta == 0] = 1.0
+    weight = (position - offsets[left]) / delta
+    leftValues = rows[left, rowIndex]
+    rightValues = rows[right, rowIndex]
+    output = leftValues * (1.0 - weight) + rightValues * weight
+    # pixels lying on a scan do not depend on its neighbours
+    output = numpy.where(weight == 0.0, leftValues,
+                         numpy.where(weight == 1.0, rightValues, output))
+    output[~valid] = numpy.nan
+    return output
+
+
+def binScans(offsets, yList, zList, xGrid, yGrid, slope=0.0, weights=None):
+    """
+    Average of the values of the points falling in each pixel of the grid.
+
+    :param offsets: Position of each scan along x at y = 0
+    :param yList: List of 1D arrays with the ordinates of each scan
+    :param zList: List of 1D arrays with the values of each scan
+    :param xGrid: Equidistant increasing 1D array of pixel centers
+    :param yGrid: Equidistant increasing 1D array of pixel centers
+    :param slope: Common slope of the scans
+    :param weights: Optional list of 1D arrays with the weight of each point
+    :return: Array of shape (len(yGrid), len(xGrid)), NaN in empty pixels
+    """
+    offsets = numpy.asarray(offsets, dtype=numpy.float64).ravel()
+    lengths = [len(numpy.ravel(y)) for y in yList]
+    y = numpy.concatenate([numpy.ravel(y) for y in yList]).astype(numpy.float64)
+    z = numpy.concatenate([numpy.ravel(z) for z in zList]).astype(numpy.float64)
+    x = numpy.repeat(offsets, lengths) + slope * y
+    if weights is None:
+        w = numpy.ones(z.shape, dtype=numpy.float64)
+    else:
+        w = numpy.concatenate([numpy.ravel(v) for v in weights]).astype(
+                                                               numpy.float64)
+    nx, ny = len(xGrid), len(yGrid)
+
+    def getIndex(values, grid):
+        if len(grid) > 1:
+            step = (grid[-1] - grid[0]) / (len(grid) - 1.)
+        else:
+            step = 1.0
+        return numpy.floor((values - grid[0]) / step + 0.5).astype(numpy.int64)
+
+    i = getIndex(y, yGrid)
+    j = getIndex(x, xGrid)
+    good = (i >= 0) & (i < ny) & (j >= 0) & (j < nx) & numpy.isfinite(z)
+    pixel = i[good] * nx + j[good]
+    total = numpy.bincount(pixel, weights=z[good] * w[good],
+                           minlength=nx * ny)
+    norm = numpy.bincount(pixel, weights=w[good], minlength=nx * ny)
+    output = numpy.full(nx * ny, numpy.nan)
+    filled = norm > 0
+    output[filled] = total[filled] / norm[filled]
+    output.shape = ny, nx
+    return output
+
+
+def gridScans(offsets, yList, zList, xGrid, yGrid, slope=0.0,
+              method="interpolation", weights=None):
+    """
+    Regular grid from a set of 1D scans.
+
+    :param method: "interpolation" (see interpolateScans) or "binning"
+                   (see binScans)
+    :return: Array of shape (len(yGrid), len(xGrid))
+    """
+    if method == "interpolation":
+        return interpolateScans(offsets, yList, zList, xGrid, yGrid,
+                                slope=slope)
+    elif method == "binning":
+        return binScans(offsets, yList, zList, xGrid, yGrid, slope=slope,
+                        weights=weights)
+    raise ValueError("Unknown gridding method <%s>" % method)
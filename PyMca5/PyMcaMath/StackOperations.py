@@ -0,0 +1,394 @@
+#/*##########################################################################
+#
+# The PyMca X-Ray Fluorescence Toolkit
+#
+# Copyright (c) 2004-2026 European Synchrotron Radiation Facility
+#
+# This file is part of the PyMca X-ray Fluorescence Toolkit developed at
+# the ESRF by the Software group.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#############################################################################*/
+__author__ = "V.A. Sole - ESRF Data Analysis"
+__contact__ = "sole@esrf.fr"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+__doc__ = """
+Block-wise operations on stacks of spectra.
+
+The stack is split in blocks of complete spectra of bounded size. Each
+block is processed on a pool of threads with numpy operations writing in
+place, so that the temporary memory does not depend on the stack size.
+Stacks can be numpy arrays or any sliceable object (HDF5 datasets of
+dynamically loaded stacks for instance). Read-only stacks are processed
+into a separate output array. For stacks that are not numpy arrays that
+output is a memory mapped temporary file, so that dynamically loaded
+stacks are never copied in memory.
+"""
+import os
+import logging
+import tempfile
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+import numpy
+
+_logger = logging.getLogger(__name__)
+
+# target size of the blocks in bytes
+BLOCK_BYTES = 4 * 1024 * 1024
+
+OPERATIONS = ["divide", "multiply", "subtract", "log", "log10"]
+
+
+def getStackData(stack):
+    """
+    Data and index of the spectrum axis of a stack.
+
+    :param stack: DataObject with data and info or an array
+    :return: tuple (data, mcaIndex)
+    """
+    if hasattr(stack, "info") and hasattr(stack, "data"):
+        return stack.data, stack.info.get("McaIndex", -1)
+    return stack, -1
+
+
+def getTemporaryArray(shape, dtype, directory=None):
+    """
+    Disk backed array: a memory mapped .npy file in the temporary directory.
+
+    The file is removed once mapped where the platform allows it, its
+    space being released when the array is not used anymore.
+
+    :param shape: Shape of the array
+    :param dtype: Type of the array
+    :param directory: Directory of the file (default the temporary one)
+    :return: numpy.memmap
+    """
+    fd, fileName = tempfile.mkstemp(prefix="pymca_stack_", suffix=".npy",
+                                    dir=directory)
+    os.close(fd)
+    try:
+        array = numpy.lib.format.open_memmap(fileName, mode="w+",
+                                             dtype=numpy.dtype(dtype),
+                                             shape=tuple(shape))
+    except:
+        os.remove(fileName)
+        raise
+    try:
+        # not needed anymore once mapped
+        os.remove(fileName)
+    except OSError:
+        _logger.debug("Cannot remove temporary file %s", fileName)
+    return array
+
+
+def getOutput(data, floating=True, directory=None):
+    """
+    Array into which the result of an operation on data can be written.
+
+    Writable floating point arrays are used in place. With floating set,
+    32 and 64 bit integer arrays are reinterpreted in place as floating
+    point arrays of the same item size (the blocks are read before being
+    overwritten). Otherwise a new array is allocated, of type float32 if
+    the data are not of a floating point type. The new array is in memory
+    when data is a numpy array and a temporary memory mapped file (see
+    getTemporaryArray) for any other sliceable object.
+
+    :param data: numpy array or sliceable object
+    :param floating: The output has to be of a floating point type
+    :param directory: Directory of the temporary file if any
+    :return: numpy array of the shape of data
+    """
+    if isinstance(data, numpy.ndarray) and data.flags.writeable:
+        if data.dtype.kind == "f" or not floating:
+            return data
+        if data.dtype.kind in "iu" and data.flags.c_contiguous:
+            if data.dtype.itemsize == 4:
+                return data.view(numpy.float32)
+            if data.dtype.itemsize == 8:
+                return data.view(numpy.float64)
+    dtype = numpy.dtype(data.dtype)
+    if floating and (dtype.kind != "f"):
+        dtype = numpy.float32
+    if isinstance(data, numpy.ndarray):
+        return numpy.empty(data.shape, dtype=dtype)
+    return getTemporaryArray(data.shape, dtype, directory=directory)
+
+
+def getBlockSlices(shape, mcaIndex=-1, itemsize=8, blockBytes=None,
+                   chunks=None):
+    """
+    Split a stack in blocks of complete spectra of about blockBytes.
+
+    The innermost axes are taken complete as long as possible, so that
+    the blocks of C ordered arrays are contiguous. When given, the chunk
+    shape of an HDF5 dataset is used to align the blocks on chunks.
+
+    :param shape: Shape of the stack
+    :param mcaIndex: Index of the spectrum axis
+    :param itemsize: Number of bytes of each element
+    :param blockBytes: Target size of the blocks (default BLOCK_BYTES)
+    :param chunks: Chunk shape or None
+    :return: List of tuples of slices
+    """
+    shape = tuple(int(n) for n in shape)
+    ndim = len(shape)
+    if not ndim:
+        return [()]
+    if blockBytes is None:
+        blockBytes = BLOCK_BYTES
+    mcaIndex = mcaIndex % ndim
+    nSpectra = max(1, int(blockBytes // max(1, shape[mcaIndex] * itemsize)))
+    extent = list(shape)
+    others = [i for i in range(ndim) if i != mcaIndex]
+    for axis in others:
+        extent[axis] = 1
+    for axis in reversed(others):
+        if nSpectra >= shape[axis]:
+            extent[axis] = shape[axis]
+            nSpectra //= max(1, shape[axis])
+        else:
+            if chunks is not None and chunks[axis] < nSpectra:
+                nSpectra -= nSpectra % chunks[axis]
+            extent[axis] = nSpectra
+            break
+    extent = [max(1, e) for e in extent]
+    counts = [(n + e - 1) // e for n, e in zip(shape, extent)]
+    return [tuple(slice(i * e, min((i + 1) * e, n))
+                  for i, e, n in zip(index, extent, shape))
+            for index in numpy.ndindex(*counts)]
+
+
+def applyBlockwise(data, function, mcaIndex=-1, output=None, dtype=None,
+                   blockBytes=None, nthreads=None):
+    """
+    Apply a function to all the blocks of complete spectra of a stack.
+
+    The function is called as function(block, slices, axis) where slices
+    locate the block in the stack and axis is the spectrum axis. It can
+    modify the block in place and return it, or return a new array of the
+    same shape. When the output is the data itself and the data are a
+    numpy array of the working type, the blocks are views of the data.
+    Otherwise they are copies converted to the working type.
+
+    :param data: numpy array or sliceable object
+    :param function: Callable
+    :param mcaIndex: Index of the spectrum axis
+    :param output: Destination of the same shape (default data)
+    :param dtype: Working type of the blocks (default the output type)
+    :param blockBytes: Target size of the blocks (default BLOCK_BYTES)
+    :param nthreads: Number of threads (default is the number of CPUs)
+    :return: The output
+    """
+    if output is None:
+        output = data
+    if tuple(output.shape) != tuple(data.shape):
+        raise ValueError("Output shape %s does not match data shape %s" % \
+                         (output.shape, data.shape))
+    if dtype is None:
+        dtype = output.dtype
+    dtype = numpy.dtype(dtype)
+    inPlace = (output is data) and isinstance(data, numpy.ndarray) and \
+              (data.dtype == dtype)
+    if inPlace and not data.flags.writeable:
+        raise TypeError("Data are read-only, an output is needed")
+    ndim = len(data.shape)
+    axis = mcaIndex % ndim if ndim else 0
+    itemsize = max(dtype.itemsize, numpy.dtype(data.dtype).itemsize)
+    slices = getBlockSlices(data.shape, mcaIndex=mcaIndex,
+                            itemsize=itemsize, blockBytes=blockBytes,
+                            chunks=getattr(data, "chunks", None))
+
+    def process(blockSlices):
+        if inPlace:
+            block = data[blockSlices]
+        else:
+            block = numpy.array(data[blockSlices], dtype=dtype)
+        result = function(block, blockSlices, axis)
+        if result is None:
+            result = block
+        if not (inPlace and (result is block)):
+            output[blockSlices] = result
+
+    if nthreads is None:
+        nthreads = multiprocessing.cpu_count()
+    if (nthreads < 2) or (len(slices) < 2):
+        for blockSlices in slices:
+            process(blockSlices)
+    else:
+        pool = ThreadPool(min(nthreads, len(slices)))
+        try:
+            pool.map(process, slices, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    return output
+
+
+def applySpectrumFunction(data, function, mcaIndex=-1, output=None,
+                          dtype=None, blockBytes=None, nthreads=None):
+    """
+    Apply a function to all the spectra of a stack, one block at a time.
+
+    The function receives a C contiguous 2D array with one spectrum per
+    row and returns an array of the same shape.
+
+    See applyBlockwise for the other parameters.
+    """
+    def blockFunction(block, slices, axis):
+        moved = numpy.moveaxis(block, axis, -1)
+        spectra = numpy.ascontiguousarray(moved).reshape(-1, moved.shape[-1])
+        result = numpy.asarray(function(spectra))
+        result = result.reshape(moved.shape)
+        return numpy.moveaxis(result, -1, axis)
+    return applyBlockwise(data, blockFunction, mcaIndex=mcaIndex,
+                          output=output, dtype=dtype,
+                          blockBytes=blockBytes, nthreads=nthreads)
+
+
+def _operate(block, operand, valid, operation):
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        if operation == "divide":
+            numpy.divide(block, operand, out=block)
+        elif operation == "multiply":
+            numpy.multiply(block, operand, out=block)
+        elif operation == "subtract":
+            numpy.subtract(block, operand, out=block)
+        else:
+            numpy.divide(block, operand, out=block)
+            if operation == "log":
+                numpy.log(block, out=block)
+            else:
+                numpy.log10(block, out=block)
+            numpy.negative(block, out=block)
+    if valid is not None:
+        numpy.copyto(block, 0, where=~valid)
+    return block
+
+
+def _getOperand(values, operation):
+    """
+    Operand with the invalid values replaced and the mask of valid values
+    (None if all of them are valid).
+    """
+    values = numpy.array(values, dtype=numpy.float64)
+    if operation not in OPERATIONS:
+        raise ValueError("Unknown operation <%s>" % operation)
+    valid = numpy.array(numpy.isfinite(values))
+    if operation == "divide":
+        valid &= (values != 0)
+    elif operation in ["log", "log10"]:
+        valid &= numpy.where(valid, values, 0.0) > 0
+    if valid.all():
+        return values, None
+    if operation == "subtract":
+        values[~valid] = 0.0
+    else:
+        values[~valid] = 1.0
+    return values, valid
+
+
+def _broadcastOperation(data, operand, valid, operation, mcaIndex,
+                        output, imageOperand, blockBytes, nthreads):
+    if output is None:
+        output = getOutput(data)
+    dtype = output.dtype
+    if dtype.kind != "f":
+        dtype = numpy.float64
+    operand = operand.astype(dtype)
+
+    def function(block, slices, axis):
+        if imageOperand:
+            # the pixels of the block
+            index = list(slices)
+            index[axis] = slice(None)
+            index = tuple(index)
+            blockOperand = operand[index]
+            blockValid = None if valid is None else valid[index]
+        else:
+            blockOperand = operand
+            blockValid = valid
+        return _operate(block, blockOperand, blockValid, operation)
+
+    return applyBlockwise(data, function, mcaIndex=mcaIndex,
+                          output=output, dtype=dtype,
+                          blockBytes=blockBytes, nthreads=nthreads)
+
+
+def curveOperation(data, curve, operation="divide", mcaIndex=-1,
+                   output=None, blockBytes=None, nthreads=None):
+    """
+    Combine every spectrum of a stack with a curve (or a scalar).
+
+    The result is 0 at the channels where the curve is not finite, is
+    zero when dividing or is not positive when taking logarithms.
+
+    :param data: numpy array or sliceable object
+    :param curve: 1D array with one value per channel or a scalar
+    :param operation: "divide", "multiply", "subtract", "log" for
+                      -log(data/curve) or "log10" for -log10(data/curve)
+    :param mcaIndex: Index of the spectrum axis
+    :param output: Destination (default see getOutput)
+    :param blockBytes: Target size of the blocks (default BLOCK_BYTES)
+    :param nthreads: Number of threads (default is the number of CPUs)
+    :return: The output
+    """
+    operand, valid = _getOperand(curve, operation)
+    ndim = len(data.shape)
+    if operand.ndim:
+        mcaIndex = mcaIndex % ndim
+        if operand.size != data.shape[mcaIndex]:
+            raise ValueError("Curve size %d does not match %d channels" % \
+                             (operand.size, data.shape[mcaIndex]))
+        shape = [1] * ndim
+        shape[mcaIndex] = operand.size
+        operand.shape = shape
+        if valid is not None:
+            valid.shape = shape
+    return _broadcastOperation(data, operand, valid, operation, mcaIndex,
+                               output, False, blockBytes, nthreads)
+
+
+def imageOperation(data, image, operation="divide", mcaIndex=-1,
+                   output=None, blockBytes=None, nthreads=None):
+    """
+    Combine every image of a stack with an image, pixel by pixel.
+
+    The result is 0 at the pixels where the image is not finite, is zero
+    when dividing or is not positive when taking logarithms.
+
+    :param image: Array with one value per spectrum of the stack
+    :param operation: See curveOperation
+
+    See curveOperation for the other parameters.
+    """
+    operand, valid = _getOperand(image, operation)
+    ndim = len(data.shape)
+    mcaIndex = mcaIndex % ndim
+    shape = list(data.shape)
+    shape[mcaIndex] = 1
+    if operand.size != (numpy.prod(shape, dtype=numpy.int64)):
+        raise ValueError("Image size %d does not match %d spectra" % \
+                         (operand.size, numpy.prod(shape, dtype=numpy.int64)))
+    operand.shape = shape
+    if valid is not None:
+        valid.shape = shape
+    return _broadcastOperation(data, operand, valid, operation, mcaIndex,
+                               output, True, blockBytes, nthreads)
@@ -373,6 +373,7 @@ def RestreinedLeastSquaresFit(model0,parameters0,data0,maxiter,
                 selfweight = 1.0 / (abs(selfy) + numpy.equal(abs(selfy),0))
     n_param = len(parameters)
     index = numpy.arange(0,nr0,2)
+    compiled = _compileConstraints(constrains)
     while (iiter > 0):
         niter = niter + 1
         if (niter < 2) and (n_param*3 < nr0):
@@ -389,6 +390,7 @@ def RestreinedLeastSquaresFit(model0,parameters0,data0,maxiter,
                                                  model,fittedpar,
                                                  x,y,weight,constrains,model_deriv=model_deriv)
         nr, nc = alpha0.shape
+        quoted, quotedA, quotedB = _getQuotedArrays(constrains, free_index)
         flag = 0
         lastdeltachi = chisq0
         while flag == 0:
@@ -410,33 +412,14 @@ def RestreinedLeastSquaresFit(model0,parameters0,data0,maxiter,
                     for j in range(npar):
                         narray[i,j] = narray[i,j]/(alphadiag[i]*alphadiag[j])
                 deltapar = numpy.dot(beta, narray)
-            pwork = numpy.zeros(deltapar.shape, numpy.float)
-            for i in range(n_free):
-                if constrains [0] [free_index[i]] == CFREE:
-                    pwork [0] [i] = fitparam [i] + deltapar [0] [i]
-                elif constrains [0] [free_index[i]] == CPOSITIVE:
-                    #abs method
-                    pwork [0] [i] = fitparam [i] + deltapar [0] [i]
-                    #square method
-                    #pwork [0] [i] = (numpy.sqrt(fitparam [i]) + deltapar [0] [i]) * \
-                    #                (numpy.sqrt(fitparam [i]) + deltapar [0] [i])
-                elif constrains [0] [free_index[i]] == CQUOTED:
-                    pmax=max(constrains[1] [free_index[i]],
-                            constrains[2] [free_index[i]])
-                    pmin=min(constrains[1] [free_index[i]],
-                            constrains[2] [free_index[i]])
-                    A = 0.5 * (pmax + pmin)
-                    B = 0.5 * (pmax - pmin)
-                    if (B != 0):
-                        pwork [0] [i] = A + \
-                                    B * numpy.sin(numpy.arcsin((fitparam[i] - A)/B)+ \
-                                    deltapar [0] [i])
-                    else:
-                        print("Error processing constrained fit")
-                        print("Parameter limits are",pmin,' and ',pmax)
-                        print("A = ",A,"B = ",B)
-                newpar [free_index[i]] = pwork [0] [i]
-            newpar=numpy.array(getparameters(newpar,constrains))
+            # free and positive parameters (abs method)
+            pwork = fitparam + deltapar[0]
+            if len(quoted):
+                pwork[quoted] = quotedA + quotedB * \
+                    numpy.sin(numpy.arcsin((fitparam[quoted] - quotedA) / quotedB) +
+                              deltapar[0][quoted])
+            newpar[free_index] = pwork
+            newpar = _getParametersArray(newpar, compiled)
             workpar = numpy.take(newpar,noigno)
             #yfit = model(workpar.tolist(), x)
             yfit = model(workpar,x)
@@ -510,73 +493,43 @@ def ChisqAlphaBeta(model0, parameters, x,y,weight, constrains,model_deriv=None,l
                 print("Initial value = %f" % parameters[i])
                 print("Limits are %f and %f" % (pmin, pmax))
                 print("Parameter will be kept at its starting value")
+    if n_free == 0:
+        raise ValueError("No free parameters to fit")
     fitparam = numpy.array(fitparam, numpy.float)
-    alpha = numpy.zeros((n_free, n_free),numpy.float)
-    beta = numpy.zeros((1,n_free),numpy.float)
     delta = (fitparam + numpy.equal(fitparam,0.0)) * 0.00001
     nr  = x.shape[0]
-    ##############
-    # Prior to each call to the function one has to re-calculate the
-    # parameters
-    pwork = parameters.__copy__()
-    for i in range(n_free):
-        pwork [free_index[i]] = fitparam [i]
-    newpar = getparameters(pwork.tolist(),constrains)
-    newpar = numpy.take(newpar,noigno)
-    if n_free == 0:
-        raise ValueError("No free parameters to fit")
+    # the constraints are parsed once and the parameters are then
+    # obtained in array form prior to each call to the function
+    compiled = _compileConstraints(constrains)
+    noigno = numpy.array(noigno, dtype=numpy.int64)
+    free_index_array = numpy.array(free_index, dtype=numpy.int64)
+    pwork = numpy.array(parameters, dtype=numpy.float, copy=True)
+    pwork[free_index_array] = fitparam
+    # the jacobian is filled row by row in a preallocated array
+    deriv = numpy.empty((n_free, nr), numpy.float)
     for i in range(n_free):
         if model_deriv is None:
-            #pwork = parameters.__copy__()
             pwork [free_index[i]] = fitparam [i] + delta [i]
-            newpar = getparameters(pwork.tolist(),constrains)
-            newpar=numpy.take(newpar,noigno)
-            f1 = model(newpar, x)
+            f1 = model(_getParametersArray(pwork, compiled)[noigno], x)
             pwork [free_index[i]] = fitparam [i] - delta [i]
-            newpar = getparameters(pwork.tolist(),constrains)
-            newpar=numpy.take(newpar,noigno)
-            f2 = model(newpar, x)
-            help0 = (f1-f2) / (2.0 * delta [i])
-            help0 = help0 * derivfactor[i]
+            f2 = model(_getParametersArray(pwork, compiled)[noigno], x)
             pwork [free_index[i]] = fitparam [i]
-            #removed I resize outside the loop:
-            #help0 = numpy.resize(help0,(1,nr))
-        else:
-            help0=model_deriv(pwork,free_index[i],x)
-            help0 = help0 * derivfactor[i]
-
-        if i == 0 :
-            deriv = help0
+            help0 = (f1-f2) / (2.0 * delta [i])
         else:
-            deriv = numpy.concatenate((deriv,help0), 0)
-    #line added to resize outside the loop
-    deriv=numpy.resize(deriv,(n_free,nr))
+            help0 = model_deriv(pwork,free_index[i],x)
+        help0 = numpy.ravel(help0)
+        if help0.size != nr:
+            help0 = numpy.resize(help0, (nr,))
+        numpy.multiply(help0, derivfactor[i], out=deriv[i])
     if linear:
-        pseudobetahelp = weight * y
+        help0 = weight * y
     else:
-        newpar = getparameters(pwork.tolist(),constrains)
-        newpar = numpy.take(newpar,noigno)
-        yfit = model(newpar, x)
+        yfit = model(_getParametersArray(pwork, compiled)[noigno], x)
         deltay = y - yfit
         help0 = weight * deltay
-    for i in range(n_free):
-        derivi = numpy.resize(deriv [i,:], (1,nr))
-        if linear:
-            if i==0:
-                beta = numpy.resize(numpy.sum((pseudobetahelp * derivi),1),(1,1))
-            else:
-                beta = numpy.concatenate((beta, numpy.resize(numpy.sum((pseudobetahelp * derivi),1),(1,1))), 1)
-        else:
-            help1 = numpy.resize(numpy.sum((help0 * derivi),1),(1,1))
-            if i == 0:
-                beta = help1
-            else:
-                beta = numpy.concatenate((beta, help1), 1)
-        help1 = numpy.inner(deriv,weight*derivi)
-        if i == 0:
-            alpha = help1
-        else:
-            alpha = numpy.concatenate((alpha, help1),1)
+    # alpha = J W J^T and beta = (W dy) J^T
+    beta = numpy.dot(deriv, numpy.ravel(help0)).reshape(1, n_free)
+    alpha = numpy.dot(deriv * weight, deriv.T)
     if linear:
         #not used
         chisq = 0.0
@@ -585,6 +538,64 @@ def ChisqAlphaBeta(model0, parameters, x,y,weight, constrains,model_deriv=None,l
     return chisq, alpha, beta, \
            n_free, free_index, noigno, fitparam, derivfactor
 
+def _compileConstraints(constrains):
+    """
+    Parse the constraints once to be able to obtain the actual parameters
+    in array form. Returns the mask of positive parameters and the list of
+    (index, code, related index, value) of the parameters depending on
+    other parameters. That list keeps the order of the parameters because
+    those parameters have to be evaluated sequentially.
+    """
+    codes = constrains[0]
+    positive = numpy.array([code == CPOSITIVE for code in codes], dtype=bool)
+    dependent = []
+    for i in range(len(codes)):
+        if codes[i] in [CFACTOR, CDELTA, CSUM]:
+            dependent.append((i, codes[i],
+                              int(constrains[1][i]), constrains[2][i]))
+        elif codes[i] == CIGNORED:
+            dependent.append((i, codes[i], 0, 0))
+    return positive, dependent
+
+def _getQuotedArrays(constrains, free_index):
+    """
+    Return the indices among the free parameters of the quoted ones and
+    the center and half width of their allowed intervals.
+    """
+    quoted = []
+    quotedA = []
+    quotedB = []
+    for i in range(len(free_index)):
+        if constrains[0][free_index[i]] == CQUOTED:
+            pmax = max(constrains[1][free_index[i]],
+                       constrains[2][free_index[i]])
+            pmin = min(constrains[1][free_index[i]],
+                       constrains[2][free_index[i]])
+            quoted.append(i)
+            quotedA.append(0.5 * (pmax + pmin))
+            quotedB.append(0.5 * (pmax - pmin))
+    return numpy.array(quoted, dtype=numpy.int64), \
+           numpy.array(quotedA, dtype=numpy.float), \
+           numpy.array(quotedB, dtype=numpy.float)
+
+def _getParametersArray(parameters, compiled):
+    """
+    Array version of getparameters using the output of _compileConstraints
+    """
+    positive, dependent = compiled
+    newparam = numpy.array(parameters, dtype=numpy.float, copy=True)
+    newparam[positive] = numpy.abs(newparam[positive])
+    for i, code, j, value in dependent:
+        if code == CFACTOR:
+            newparam[i] = value * newparam[j]
+        elif code == CDELTA:
+            newparam[i] = value + newparam[j]
+        elif code == CIGNORED:
+            newparam[i] = 0
+        elif code == CSUM:
+            newparam[i] = value - newparam[j]
+    return newparam
+
 def getparameters(parameters,constrains):
     # 0 = Free       1 = Positive     2 = Quoted
     # 3 = Fixed      4 = Factor       5 = Delta
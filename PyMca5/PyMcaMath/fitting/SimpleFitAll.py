@@ -34,6 +34,7 @@
 import logging
 
 from PyMca5.PyMcaIO import ConfigDict
+from . import SimpleFitParallel
 import PyMca5
 
 
@@ -143,7 +144,16 @@ def setConfigurationFile(self, fname):
     def setConfiguration(self, ddict):
         self.fit.setConfiguration(ddict, try_import=True)
 
-    def processAll(self):
+    def processAll(self, nprocesses=1, batchsize=None):
+        """
+        Fit all the curves and write the results to the output file.
+
+        :param int nprocesses: Number of worker processes. If 1, the fits
+            are performed in the calling process. None or a value lower
+            than one means as many processes as available CPUs.
+        :param int batchsize: Number of curves sent at once to a worker.
+            By default it is chosen from the number of curves and processes.
+        """
         assert self.curves_y is not None, "You must first call setData()!"
         data = self.curves_y
 
@@ -169,19 +179,69 @@ def processAll(self):
         self._parameters = None
         self._progress = 0
         self._status = "Fitting"
-        for i in range(self._nSpectra):
-            self._progress = (i * 100.) / self._nSpectra
+        nprocesses = SimpleFitParallel.getNumberOfProcesses(nprocesses)
+        if nprocesses > 1 and self._nSpectra > 1:
+            self._processAllInPool(nprocesses, batchsize)
+        else:
+            for i in range(self._nSpectra):
+                self._progress = (i * 100.) / self._nSpectra
+                try:
+                    self.processSpectrum(i)
+                except:
+                    _logger.error(
+                            "Error %s processing index = %d", sys.exc_info()[1], i)
+                    if _logger.getEffectiveLevel() == logging.DEBUG:
+                        raise
+        self.onProcessSpectraFinished()
+        self._status = "Ready"
+        if self.progressCallback is not None:
+            self.progressCallback(self._nSpectra, self._nSpectra)
+
+    def _processAllInPool(self, nprocesses, batchsize=None):
+        """
+        Fit the curves on a pool of worker processes, each one with its
+        own copy of the fit, and write the results in bulk, in order.
+        """
+        first = 0
+        if self.__estimationPolicy == "once":
+            # estimate (and fit) the first curve here to share its
+            # estimation with all the workers
             try:
-                self.processSpectrum(i)
+                self.processSpectrum(0)
             except:
                 _logger.error(
-                        "Error %s processing index = %d", sys.exc_info()[1], i)
+                        "Error %s processing index = %d", sys.exc_info()[1], 0)
                 if _logger.getEffectiveLevel() == logging.DEBUG:
                     raise
-        self.onProcessSpectraFinished()
-        self._status = "Ready"
-        if self.progressCallback is not None:
-            self.progressCallback(self._nSpectra, self._nSpectra)
+            first = 1
+        estimate = self.__estimationPolicy == "always"
+        if estimate:
+            estimation = None
+        else:
+            # with 'Estimate never' the workers use the parameters already
+            # set in the fit, as processSpectrum does
+            estimation = self.fit._getEstimationState()
+
+        def items():
+            for i in range(first, self._nSpectra):
+                x, y, sigma, xmin, xmax = self.getFitInputValues(i)
+                yield (i, x, y, sigma, xmin, xmax)
+
+        configuration = self.fit.getConfiguration()
+        nDone = first
+        for results in SimpleFitParallel.iterResults(
+                            self.fit, items(), self._nSpectra - first,
+                            nprocesses,
+                            estimation=estimation,
+                            estimate=estimate,
+                            evaluate=True,
+                            batchsize=batchsize):
+            nDone += len(results)
+            self._progress = (nDone * 100.) / self._nSpectra
+            self._currentFitIndex = results[-1]['index']
+            self._appendResultsToHdf5(results, configuration)
+            if self.progressCallback is not None:
+                self.progressCallback(nDone, self._nSpectra)
 
     def processSpectrum(self, i):
         self._currentFitStartTime = datetime.datetime.now().isoformat()
@@ -191,6 +251,7 @@ def processSpectrum(self, i):
         if self._parameters is None and self.__estimationPolicy != "never":
             _logger.debug("First estimation")
             self.fit.estimate()
+            self._parameters = self.fit.final_theory
         elif self.__estimationPolicy == "always":
             _logger.debug("Estimation due to settings")
             self.fit.estimate()
@@ -265,100 +326,146 @@ def fitOneSpectrumFinished(self):
     def _appendOneResultToHdf5(self, resultDict):
         # Get all the  necessary data (TODO: pass it to method as attrs)
         idx = self._currentFitIndex
-        end_time = self._currentFitEndTime
-        start_time = self._currentFitStartTime
-        sigma = self._currentSigma
-        legend = self.legends[idx]
-        xlabel = self.xlabels[idx]
-        ylabel = self.ylabels[idx]
         x, y, _inSigma, xMin, xMax = self.getFitInputValues(idx)
         fitted_data = self.fit.evaluateDefinedFunction(x)
         configIni = ConfigDict.ConfigDict(self.fit.getConfiguration()).tostring()
-        fit_paramlist = self.fit.paramlist
         filename = self.getOutputFileName()
 
         # Write the data to file (append)
         with h5py.File(filename, mode="r+") as h5f:
-            entry = h5f.create_group("fit_curve_%d" % idx)
-            entry.attrs["NX_class"] = to_h5py_utf8("NXentry")
-            entry.attrs["default"] = to_h5py_utf8("fit_process/results/plot")
-            entry.create_dataset("start_time",
-                                 data=to_h5py_utf8(start_time))
-            entry.create_dataset("end_time", data=to_h5py_utf8(end_time))
-            entry.create_dataset("title",
-                                 data=to_h5py_utf8("Fit of '%s'" % legend))
-
-            process = entry.create_group("fit_process")
-            process.attrs["NX_class"] = to_h5py_utf8("NXprocess")
-            process.create_dataset("program", data=to_h5py_utf8("pymca"))
-            process.create_dataset("version", data=to_h5py_utf8(PyMca5.version()))
-            process.create_dataset("date", data=to_h5py_utf8(end_time))
-
-            configuration = process.create_group("configuration")
-            configuration.attrs["NX_class"] = to_h5py_utf8("NXnote")
-            configuration.create_dataset("type", data=to_h5py_utf8("text/plain"))
-            configuration.create_dataset("data", data=to_h5py_utf8(configIni))
-            configuration.create_dataset("file_name", data=to_h5py_utf8("SimpleFit.ini"))
-            configuration.create_dataset("description",
-                                         data=to_h5py_utf8("Fit configuration"))
-
-            results = process.create_group("results")
-            results.attrs["NX_class"] = to_h5py_utf8("NXcollection")
-
-            estimation = results.create_group("estimation")
-            estimation.attrs["NX_class"] = to_h5py_utf8("NXcollection")
-
-            for p in fit_paramlist:
-                pgroup = estimation.create_group(p["name"])
-                # constraint code can be an int, convert to str
-                if numpy.issubdtype(numpy.array(p['code']).dtype,
-                                    numpy.integer):
-                    pgroup.create_dataset('code', data=to_h5py_utf8(CONS[p['code']]))
-                else:
-                    pgroup.create_dataset('code', data=to_h5py_utf8(p['code']))
-                pgroup.create_dataset('cons1', data=p['cons1'])
-                pgroup.create_dataset('cons2', data=p['cons2'])
-                pgroup.create_dataset('estimation', data=p['estimation'])
-
-            for key, value in resultDict.items():
-                if not numpy.issubdtype(type(key), numpy.character):
-                    _logger.debug("skipping key %s (not a text string)", key)
+            self._writeOneResult(h5f, idx, resultDict,
+                                 paramlist=self.fit.paramlist,
+                                 x=x, y=y,
+                                 sigma=self._currentSigma,
+                                 fitted_data=fitted_data,
+                                 configIni=configIni,
+                                 start_time=self._currentFitStartTime,
+                                 end_time=self._currentFitEndTime)
+
+    def _appendResultsToHdf5(self, results, configuration):
+        """
+        Write a list of results obtained by worker processes opening
+        the output file only once.
+
+        :param results: List of dictionaries as returned by
+            SimpleFitParallel.fitCurve
+        :param configuration: Fit configuration to be written with the
+            fitted limits of each curve
+        """
+        configCache = {}
+        filename = self.getOutputFileName()
+        with h5py.File(filename, mode="r+") as h5f:
+            for output in results:
+                idx = output['index']
+                if output['error'] is not None:
+                    _logger.error(
+                        "Error %s processing index = %d", output['error'], idx)
                     continue
-                if key == "fittedvalues":
-                    output_key = "parameter_values"
-                elif key == "parameters":
-                    output_key = "parameter_names"
-                elif key == "sigma_values":
-                    output_key = "parameter_sigmas"
-                else:
-                    output_key = key
-
-                value_dtype = numpy.array(value).dtype
-                if numpy.issubdtype(value_dtype, numpy.number) or\
-                        numpy.issubdtype(value_dtype, numpy.bool_):
-                    # straightforward conversion to HDF5
-                    results.create_dataset(output_key,
-                                           data=value)
-                elif numpy.issubdtype(value_dtype, numpy.character):
-                    # ensure utf-8 output
-                    results.create_dataset(output_key,
-                                           data=to_h5py_utf8(value))
-
-            plot = results.create_group("plot")
-            plot.attrs["NX_class"] = to_h5py_utf8("NXdata")
-            plot.attrs["signal"] = to_h5py_utf8("raw_data")
-            plot.attrs["auxiliary_signals"] = to_h5py_utf8(["fitted_data"])
-            plot.attrs["axes"] = to_h5py_utf8(["x"])
-            plot.attrs["title"] = to_h5py_utf8("Fit of '%s'" % legend)
-            signal = plot.create_dataset("raw_data", data=y)
-            if ylabel is not None:
-                signal.attrs["long_name"] = to_h5py_utf8(ylabel)
-            axis = plot.create_dataset("x", data=x)
-            if xlabel is not None:
-                axis.attrs["long_name"] = to_h5py_utf8(xlabel)
-            if sigma is not None:
-                plot.create_dataset("errors", data=sigma)
-            plot.create_dataset("fitted_data", data=fitted_data)
+                if output['result'] is None:
+                    _logger.warning("result not valid for index %d", idx)
+                    continue
+                key = (output['xmin'], output['xmax'])
+                if key not in configCache:
+                    configuration['fit']['xmin'] = output['xmin']
+                    configuration['fit']['xmax'] = output['xmax']
+                    configCache[key] = \
+                        ConfigDict.ConfigDict(configuration).tostring()
+                x, y, _inSigma, xMin, xMax = self.getFitInputValues(idx)
+                self._writeOneResult(h5f, idx, output['result'],
+                                     paramlist=output['paramlist'],
+                                     x=x, y=y,
+                                     sigma=output['sigma'],
+                                     fitted_data=output['fitted_data'],
+                                     configIni=configCache[key],
+                                     start_time=output['start_time'],
+                                     end_time=output['end_time'])
+
+    def _writeOneResult(self, h5f, idx, resultDict, paramlist, x, y, sigma,
+                        fitted_data, configIni, start_time, end_time):
+        legend = self.legends[idx]
+        xlabel = self.xlabels[idx]
+        ylabel = self.ylabels[idx]
+
+        entry = h5f.create_group("fit_curve_%d" % idx)
+        entry.attrs["NX_class"] = to_h5py_utf8("NXentry")
+        entry.attrs["default"] = to_h5py_utf8("fit_process/results/plot")
+        entry.create_dataset("start_time",
+                             data=to_h5py_utf8(start_time))
+        entry.create_dataset("end_time", data=to_h5py_utf8(end_time))
+        entry.create_dataset("title",
+                             data=to_h5py_utf8("Fit of '%s'" % legend))
+
+        process = entry.create_group("fit_process")
+        process.attrs["NX_class"] = to_h5py_utf8("NXprocess")
+        process.create_dataset("program", data=to_h5py_utf8("pymca"))
+        process.create_dataset("version", data=to_h5py_utf8(PyMca5.version()))
+        process.create_dataset("date", data=to_h5py_utf8(end_time))
+
+        configuration = process.create_group("configuration")
+        configuration.attrs["NX_class"] = to_h5py_utf8("NXnote")
+        configuration.create_dataset("type", data=to_h5py_utf8("text/plain"))
+        configuration.create_dataset("data", data=to_h5py_utf8(configIni))
+        configuration.create_dataset("file_name", data=to_h5py_utf8("SimpleFit.ini"))
+        configuration.create_dataset("description",
+                                     data=to_h5py_utf8("Fit configuration"))
+
+        results = process.create_group("results")
+        results.attrs["NX_class"] = to_h5py_utf8("NXcollection")
+
+        estimation = results.create_group("estimation")
+        estimation.attrs["NX_class"] = to_h5py_utf8("NXcollection")
+
+        for p in paramlist:
+            pgroup = estimation.create_group(p["name"])
+            # constraint code can be an int, convert to str
+            if numpy.issubdtype(numpy.array(p['code']).dtype,
+                                numpy.integer):
+                pgroup.create_dataset('code', data=to_h5py_utf8(CONS[p['code']]))
+            else:
+                pgroup.create_dataset('code', data=to_h5py_utf8(p['code']))
+            pgroup.create_dataset('cons1', data=p['cons1'])
+            pgroup.create_dataset('cons2', data=p['cons2'])
+            pgroup.create_dataset('estimation', data=p['estimation'])
+
+        for key, value in resultDict.items():
+            if not numpy.issubdtype(type(key), numpy.character):
+                _logger.debug("skipping key %s (not a text string)", key)
+                continue
+            if key == "fittedvalues":
+                output_key = "parameter_values"
+            elif key == "parameters":
+                output_key = "parameter_names"
+            elif key == "sigma_values":
+                output_key = "parameter_sigmas"
+            else:
+                output_key = key
+
+            value_dtype = numpy.array(value).dtype
+            if numpy.issubdtype(value_dtype, numpy.number) or\
+                    numpy.issubdtype(value_dtype, numpy.bool_):
+                # straightforward conversion to HDF5
+                results.create_dataset(output_key,
+                                       data=value)
+            elif numpy.issubdtype(value_dtype, numpy.character):
+                # ensure utf-8 output
+                results.create_dataset(output_key,
+                                       data=to_h5py_utf8(value))
+
+        plot = results.create_group("plot")
+        plot.attrs["NX_class"] = to_h5py_utf8("NXdata")
+        plot.attrs["signal"] = to_h5py_utf8("raw_data")
+        plot.attrs["auxiliary_signals"] = to_h5py_utf8(["fitted_data"])
+        plot.attrs["axes"] = to_h5py_utf8(["x"])
+        plot.attrs["title"] = to_h5py_utf8("Fit of '%s'" % legend)
+        signal = plot.create_dataset("raw_data", data=y)
+        if ylabel is not None:
+            signal.attrs["long_name"] = to_h5py_utf8(ylabel)
+        axis = plot.create_dataset("x", data=x)
+        if xlabel is not None:
+            axis.attrs["long_name"] = to_h5py_utf8(xlabel)
+        if sigma is not None:
+            plot.create_dataset("errors", data=sigma)
+        plot.create_dataset("fitted_data", data=fitted_data)
 
     def getOutputFileName(self):
         return os.path.join(self.outputDir,
@@ -621,6 +621,29 @@ def estimate(self):
         self._setStatus("Estimate finished")
         return self.paramlist
 
+    def _getEstimationState(self):
+        """
+        Return a picklable copy of the current estimation (parameter list,
+        parameter names and number of background parameters) or None if
+        no estimation has been performed yet.
+        """
+        if not hasattr(self, "paramlist"):
+            return None
+        return {'paramlist': copy.deepcopy(self.paramlist),
+                'final_theory': list(self.final_theory),
+                'n_background_parameters': self.__nBackgroundParameters}
+
+    def _setEstimationState(self, ddict):
+        """
+        Restore an estimation obtained with _getEstimationState. It allows
+        fitting without estimating with a different SimpleFit instance.
+        """
+        if ddict is None:
+            return
+        self.paramlist = copy.deepcopy(ddict['paramlist'])
+        self.final_theory = list(ddict['final_theory'])
+        self.__nBackgroundParameters = ddict['n_background_parameters']
+
     def _setStatus(self, status):
         self.__status = status
 
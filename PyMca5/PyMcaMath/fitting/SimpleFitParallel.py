@@ -0,0 +1,215 @@
+#/*##########################################################################
+#
+# The PyMca X-Ray Fluorescence Toolkit
+#
+# Copyright (c) 2004-2019 European Synchrotron Radiation Facility
+#
+# This file is part of the PyMca X-ray Fluorescence Toolkit developed at
+# the ESRF by the Software group.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#############################################################################*/
+__author__ = "V.A. Sole - ESRF Data Analysis"
+__contact__ = "sole@esrf.fr"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+__doc__ = """
+Process pool helpers used by SimpleFitAll and StackSimpleFit to fit
+curves in parallel.
+
+Each worker process holds its own configured SimpleFit instance. The
+main process sends batches of curves and receives compact results in
+submission order, so that the output can be written by a single writer.
+"""
+import sys
+import copy
+import collections
+import itertools
+import datetime
+import logging
+import multiprocessing
+import numpy
+
+from . import SimpleFitModule
+
+_logger = logging.getLogger(__name__)
+
+# the SimpleFit instance of the current worker process
+_WORKER_FIT = None
+
+
+def getNumberOfProcesses(nprocesses=None):
+    """
+    Return the actual number of processes to be used. None or a value
+    lower than one means as many as available CPUs.
+    """
+    if (nprocesses is None) or (nprocesses < 1):
+        try:
+            nprocesses = multiprocessing.cpu_count()
+        except NotImplementedError:
+            nprocesses = 1
+    return int(nprocesses)
+
+
+def getBatchSize(ncurves, nprocesses, batchsize=None):
+    """
+    Return the number of curves to be sent to a worker at once.
+
+    By default, aim at several batches per worker for load balancing while
+    keeping the communication overhead small.
+    """
+    if batchsize is not None and batchsize > 0:
+        return int(batchsize)
+    return int(max(1, min(100, ncurves // (4 * nprocesses))))
+
+
+def getWorkerConfiguration(fit):
+    """
+    Return a copy of the configuration of the fit instance that can be sent
+    to a worker process. Widgets are not needed to fit.
+    """
+    ddict = fit.getConfiguration()
+    for key in ddict['functions']:
+        ddict['functions'][key]['widget'] = None
+    return ddict
+
+
+def getPool(nprocesses, configuration, estimation=None):
+    """
+    Create a pool of nprocesses workers, each one with a SimpleFit instance
+    configured with the given configuration and, optionally, estimation.
+    """
+    if sys.version_info >= (3, 4):
+        # do not fork a process that may be running Qt threads
+        context = multiprocessing.get_context("spawn")
+    else:
+        context = multiprocessing
+    return context.Pool(processes=nprocesses,
+                        initializer=_initializeWorker,
+                        initargs=(configuration, estimation))
+
+
+def _initializeWorker(configuration, estimation=None):
+    global _WORKER_FIT
+    fit = SimpleFitModule.SimpleFit()
+    fit.setConfiguration(configuration, try_import=True)
+    fit._setEstimationState(estimation)
+    _WORKER_FIT = fit
+
+
+def fitBatch(args):
+    """
+    Fit a batch of curves with the fit instance of the worker.
+
+    :param args: Tuple (batch, estimate, evaluate) where batch is a list
+        of (index, x, y, sigma, xmin, xmax) tuples, estimate indicates if
+        the estimation has to be performed for every curve and evaluate
+        indicates if the fitted curve has to be returned.
+    :return: List of result dictionaries in the same order as the batch
+    """
+    batch, estimate, evaluate = args
+    return [fitCurve(_WORKER_FIT, item, estimate=estimate, evaluate=evaluate)
+            for item in batch]
+
+
+def fitCurve(fit, item, estimate=True, evaluate=False):
+    """
+    Fit one curve and return a picklable dictionary with the keys:
+
+    - index: index of the curve
+    - result: the fit result as returned by SimpleFit.getResult
+    - paramlist: the parameter list used as starting point (if evaluate)
+    - fitted_data: the fitted curve evaluated at x (if evaluate)
+    - sigma: the uncertainties used in the fit (if evaluate)
+    - xmin, xmax: the fitted limits
+    - start_time, end_time: ISO formatted time stamps
+    - error: the error message if the fit failed, None otherwise
+    """
+    index, x, y, sigma, xmin, xmax = item
+    output = {'index': index,
+              'result': None,
+              'error': None,
+              'start_time': datetime.datetime.now().isoformat()}
+    try:
+        fit.setData(x, y, sigma=sigma, xmin=xmin, xmax=xmax)
+        if estimate:
+            fit.estimate()
+        fit.startFit()
+        output['result'] = fit.getResult(configuration=False)['result']
+        output['xmin'] = fit._fitConfiguration['fit']['xmin']
+        output['xmax'] = fit._fitConfiguration['fit']['xmax']
+        output['end_time'] = datetime.datetime.now().isoformat()
+        if evaluate and output['result'] is not None:
+            output['paramlist'] = copy.deepcopy(fit.paramlist)
+            output['fitted_data'] = fit.evaluateDefinedFunction(x)
+            if sigma is not None:
+                output['sigma'] = abs(sigma + (sigma == 0))
+            else:
+                output['sigma'] = numpy.sqrt(abs(y) + (y == 0))
+    except:
+        output['error'] = "%s" % (sys.exc_info()[1],)
+        output['result'] = None
+    return output
+
+
+def iterResults(fit, items, ncurves, nprocesses, estimation=None,
+                estimate=True, evaluate=False, batchsize=None):
+    """
+    Fit the curves provided by the items iterable on a process pool.
+
+    Batches are submitted while results are consumed, so that no more than
+    a few batches per worker are kept in memory at any time.
+
+    :param fit: Configured SimpleFit instance used as template
+    :param items: Iterable of (index, x, y, sigma, xmin, xmax) tuples
+    :param int ncurves: Number of items
+    :param int nprocesses: Number of worker processes
+    :param estimation: Estimation state to be used when not estimating
+    :param bool estimate: Estimate every curve prior to fit
+    :param bool evaluate: Return fitted curves and starting parameters
+    :param batchsize: Number of curves per task
+    :return: Generator of result lists, one per batch, in input order
+    """
+    if not ncurves:
+        return
+    batchsize = getBatchSize(ncurves, nprocesses, batchsize)
+    maxPending = 2 * nprocesses
+    items = iter(items)
+    pool = getPool(nprocesses,
+                   getWorkerConfiguration(fit),
+                   estimation=estimation)
+    try:
+        pending = collections.deque()
+        while True:
+            batch = list(itertools.islice(items, batchsize))
+            if not len(batch):
+                break
+            pending.append(pool.apply_async(fitBatch,
+                                            ((batch, estimate, evaluate),)))
+            if len(pending) >= maxPending:
+                yield pending.popleft().get()
+        while len(pending):
+            yield pending.popleft().get()
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
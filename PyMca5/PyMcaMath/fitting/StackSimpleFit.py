@@ -36,6 +36,7 @@
 import logging
 from PyMca5.PyMcaIO import ConfigDict
 from . import SimpleFitModule
+from . import SimpleFitParallel
 from PyMca5.PyMcaIO import ArraySave
 from PyMca5 import PyMcaDirs
 
@@ -102,7 +103,18 @@ def setConfigurationFile(self, fname):
     def setConfiguration(self, ddict):
         self.fit.setConfiguration(ddict, try_import=True)
 
-    def processStack(self, mask=None):
+    def processStack(self, mask=None, nprocesses=1, batchsize=None):
+        """
+        Fit all the (unmasked) curves of the stack.
+
+        :param mask: Optional 2D array. Only pixels with non-zero values
+            are fitted.
+        :param int nprocesses: Number of worker processes. If 1, the fits
+            are performed in the calling process. None or a value lower
+            than one means as many processes as available CPUs.
+        :param int batchsize: Number of curves sent at once to a worker.
+            By default it is chosen from the number of curves and processes.
+        """
         self.mask = mask
         data_index = self.dataIndex
         if data_index == None:
@@ -172,25 +184,95 @@ def processStack(self, mask=None):
         self._column = -1
         self._progress = 0
         self._status = "Fitting"
-        for i in range(nPixels):
-            self._progress = (i * 100.)/ nPixels
-            if (self._column+1) == self._nColumns:
-                self._column = 0
-                self._row   += 1
-            else:
-                self._column += 1
+        nprocesses = SimpleFitParallel.getNumberOfProcesses(nprocesses)
+        if nprocesses > 1 and nPixels > 1:
+            self._processStackInPool(nPixels, nprocesses, batchsize)
+        else:
+            for i in range(nPixels):
+                self._progress = (i * 100.)/ nPixels
+                if (self._column+1) == self._nColumns:
+                    self._column = 0
+                    self._row   += 1
+                else:
+                    self._column += 1
+                try:
+                    if self.mask[self._row, self._column]:
+                        self.processStackData(i)
+                except:
+                    _logger.warning("Error %s processing index = %d, row = %d column = %d",
+                                    sys.exc_info()[1], i, self._row, self._column)
+                    if _logger.getEffectiveLevel() == logging.DEBUG:
+                        raise
+        self.onProcessStackFinished()
+        self._status = "Ready"
+        if self.progressCallback is not None:
+            self.progressCallback(nPixels, nPixels)
+
+    def _setCurrentPixel(self, i):
+        self._row = i // self._nColumns
+        self._column = i % self._nColumns
+
+    def _processStackInPool(self, nPixels, nprocesses, batchsize=None):
+        """
+        Fit the unmasked pixels on a pool of worker processes, each one with
+        its own copy of the fit, and store the results in pixel order.
+        """
+        indices = [i for i in range(nPixels)
+                   if self.mask[i // self._nColumns, i % self._nColumns]]
+        if not len(indices):
+            return
+        if not self.__ALWAYS_ESTIMATE:
+            # estimate (and fit) the first pixel here to share its
+            # estimation with all the workers
+            i = indices[0]
+            self._setCurrentPixel(i)
             try:
-                if self.mask[self._row, self._column]:
-                    self.processStackData(i)
+                self.processStackData(i)
             except:
                 _logger.warning("Error %s processing index = %d, row = %d column = %d",
                                 sys.exc_info()[1], i, self._row, self._column)
                 if _logger.getEffectiveLevel() == logging.DEBUG:
                     raise
-        self.onProcessStackFinished()
-        self._status = "Ready"
-        if self.progressCallback is not None:
-            self.progressCallback(nPixels, nPixels)
+            indices = indices[1:]
+            estimation = self.fit._getEstimationState()
+        else:
+            estimation = None
+
+        def items():
+            for i in indices:
+                self._setCurrentPixel(i)
+                x, y, sigma, xmin, xmax = self.getFitInputValues(i)
+                yield (i, x, y, sigma, xmin, xmax)
+
+        nDone = nPixels - len(indices)
+        specLines = []
+        for results in SimpleFitParallel.iterResults(
+                            self.fit, items(), len(indices), nprocesses,
+                            estimation=estimation,
+                            estimate=self.__ALWAYS_ESTIMATE,
+                            evaluate=False,
+                            batchsize=batchsize):
+            for output in results:
+                i = output['index']
+                self._setCurrentPixel(i)
+                self._currentFitIndex = i
+                if output['error'] is not None:
+                    _logger.warning("Error %s processing index = %d, row = %d column = %d",
+                                    output['error'], i, self._row, self._column)
+                    continue
+                fitOutput = {'result': output['result']}
+                if self.fixedLenghtOutput:
+                    self._storeFitResult(fitOutput)
+                elif output['result'] is not None:
+                    specLines.append(self._getSpecfileScanText(fitOutput))
+            if len(specLines):
+                specfile = self.getOutputFileNames()['specfile']
+                self._appendTextToSpecfile(specfile, "".join(specLines))
+                specLines = []
+            nDone = max(nDone, results[-1]['index'] + 1)
+            self._progress = (nDone * 100.) / nPixels
+            if self.progressCallback is not None:
+                self.progressCallback(nDone, nPixels)
 
     def processStackData(self, i):
         self.aboutToGetStackData(i)
@@ -315,6 +397,9 @@ def fitFinished(self):
 
         #get parameter results
         fitOutput = self.fit.getResult(configuration=False)
+        self._storeFitResult(fitOutput)
+
+    def _storeFitResult(self, fitOutput):
         result = fitOutput['result']
         row= self._row
         column = self._column
@@ -363,10 +448,11 @@ def fitFinished(self):
     def _appendOneResultToSpecfile(self, filename, result=None):
         if result is None:
             result = self.fit.getResult(configuration=False)
+        self._appendTextToSpecfile(filename, self._getSpecfileScanText(result))
 
+    def _getSpecfileScanText(self, result):
         scanNumber = self._currentFitIndex
 
-        #open file in append mode
         fitResult = result['result']
         fittedValues = fitResult['fittedvalues']
         fittedParameters = fitResult['parameters']
@@ -381,8 +467,12 @@ def _appendOneResultToSpecfile(self, filename, result=None):
         for parValue in fittedValues:
             text += "% .7E" % parValue
         text += "\n"
+        return text
+
+    def _appendTextToSpecfile(self, filename, text):
+        #open file in append mode
         sf = open(filename, 'ab')
-        sf.write(text)
+        sf.write(text.encode("utf-8"))
         sf.close()
 
     def getOutputFileNames(self):
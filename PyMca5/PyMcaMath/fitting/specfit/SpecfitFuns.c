@@ -112,32 +112,33 @@ SpecfitFuns_snip1d(PyObject *self, PyObject *args)
     }
 
     width = (int )width0;
+    doublePointer = (double *) PyArray_DATA(ret);
 
+    /* the array is a private copy, stacks can be processed by threads */
+    Py_BEGIN_ALLOW_THREADS
     for (n = 0; n < n_spectra; n++)
     {
         for (i=0; i<smooth_iterations; i++)
         {
-            doublePointer = (double *) PyArray_DATA(ret);
             smooth1d(&(doublePointer[n*n_channels]), n_channels);
         }
         if (llsflag)
         {
-            doublePointer = (double *) PyArray_DATA(ret);
             lls(&(doublePointer[n*n_channels]), n_channels);
         }
     }
 
 
-    snip1d_multiple((double *) PyArray_DATA(ret), n_channels, width, n_spectra);
+    snip1d_multiple(doublePointer, n_channels, width, n_spectra);
 
     for (n = 0; n < n_spectra; n++)
     {
         if (llsflag)
         {
-            doublePointer = (double *) PyArray_DATA(ret);
             lls_inv(&(doublePointer[n*n_channels]), n_channels);
         }
     }
+    Py_END_ALLOW_THREADS
 
     return PyArray_Return(ret);
 }
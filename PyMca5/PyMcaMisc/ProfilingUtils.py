@@ -42,7 +42,9 @@
 except ImportError:
     from io import StringIO
 import os
+import time
 import logging
+from collections import OrderedDict
 from contextlib import contextmanager
 
 
@@ -134,3 +136,131 @@ def profile(memory=True, time=True, memlimit=10,
     else:
         with print_time_context(restrictions=restrictions, sortby=sortby):
             yield
+
+
+class Telemetry(object):
+    """
+    Accumulates the elapsed time of processing stages and counters
+    (bytes read, spectra fitted, ...) and reports the progress of a
+    long processing through an optional callback.
+
+    Usage:
+        telemetry = Telemetry(progressCallback=print, total=nSpectra)
+        with telemetry.stage('read'):
+            ...
+        telemetry.increment('bytes_read', chunk.nbytes)
+        telemetry.progress(nSpectraInChunk)
+
+    The callback receives the dictionary returned by getProgress.
+    """
+
+    def __init__(self, progressCallback=None, progressInterval=1.0,
+                 total=None):
+        """
+        :param callable progressCallback: called with the progress dictionary
+        :param num progressInterval: minimal time in seconds between calls
+        :param int total: expected number of items to be processed
+        """
+        self.progressCallback = progressCallback
+        self.progressInterval = progressInterval
+        self.reset(total=total)
+
+    def reset(self, total=None):
+        self.timers = OrderedDict()
+        self.counters = OrderedDict()
+        self.total = total
+        self.processed = 0
+        self._tstart = time.time()
+        self._tlast = self._tstart
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Add the elapsed time of the context to the timer of the stage
+        """
+        t0 = time.time()
+        try:
+            yield
+        finally:
+            self.addTime(name, time.time() - t0)
+
+    def addTime(self, name, seconds):
+        self.timers[name] = self.timers.get(name, 0.) + seconds
+
+    def increment(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def iterStage(self, iterable, name):
+        """
+        Iterate while adding the time spent to get each item to a stage
+        """
+        iterator = iter(iterable)
+        while True:
+            t0 = time.time()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.addTime(name, time.time() - t0)
+                return
+            self.addTime(name, time.time() - t0)
+            yield item
+
+    @property
+    def elapsed(self):
+        return time.time() - self._tstart
+
+    def getProgress(self):
+        """
+        :returns dict: processed, total, elapsed (s), rate (items/s) and
+                       eta (s, None when total is unknown)
+        """
+        elapsed = self.elapsed
+        if elapsed > 0:
+            rate = self.processed / elapsed
+        else:
+            rate = 0.
+        eta = None
+        if self.total is not None and rate > 0:
+            eta = max(self.total - self.processed, 0) / rate
+        return {'processed': self.processed,
+                'total': self.total,
+                'elapsed': elapsed,
+                'rate': rate,
+                'eta': eta}
+
+    def progress(self, n=1, force=False):
+        """
+        Add processed items and call the progress callback when
+        progressInterval seconds passed since the last call.
+
+        :param int n: number of items processed since the last call
+        :param bool force: call the progress callback anyway
+        """
+        self.processed += n
+        if self.progressCallback is None:
+            return
+        now = time.time()
+        if force or (now - self._tlast) >= self.progressInterval:
+            self._tlast = now
+            self.progressCallback(self.getProgress())
+
+    def asDict(self):
+        """
+        :returns dict: timers (s), counters and total elapsed time (s)
+        """
+        return {'timers': OrderedDict(self.timers),
+                'counters': OrderedDict(self.counters),
+                'elapsed': self.elapsed}
+
+    def log(self, level=logging.DEBUG, log=None):
+        if log is None:
+            log = logger
+        if not log.isEnabledFor(level):
+            return
+        for name, value in self.timers.items():
+            log.log(level, "%s elapsed = %f", name, value)
+        for name, value in self.counters.items():
+            log.log(level, "%s = %s", name, value)
+        ddict = self.getProgress()
+        if ddict['processed']:
+            log.log(level, "Processed per second = %f", ddict['rate'])
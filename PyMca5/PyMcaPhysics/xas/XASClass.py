@@ -92,6 +92,116 @@ def k2e(kvalues):
     tmpx = ((tmpx > 0) * 2-1) * tmpx * tmpx * ccte
     return tmpx
 
+def _polsplDesignMatrix(x, low, high, ncoefficients):
+    """
+    Matrix of the powers of x of each interval. Points at the limit of two
+    intervals contribute to both of them.
+    """
+    starts = numpy.cumsum([0] + list(ncoefficients))
+    design = numpy.zeros((x.size, starts[-1]), dtype=numpy.float64)
+    for j in range(len(ncoefficients)):
+        inside = (x >= low[j]) & (x <= high[j])
+        design[inside, starts[j]:starts[j + 1]] = \
+                    numpy.vander(x[inside], ncoefficients[j], increasing=True)
+    return design
+
+def _polsplConstraintMatrix(knots, ncoefficients):
+    """
+    Matrix of the conditions matching the value and the first derivative
+    of consecutive polynomials at the knots.
+    """
+    starts = numpy.cumsum([0] + list(ncoefficients))
+    constraints = numpy.zeros((2 * len(knots), starts[-1]), dtype=numpy.float64)
+    for j, xk in enumerate(knots):
+        for side, interval in [(-1.0, j), (1.0, j + 1)]:
+            start = starts[interval]
+            powers = numpy.arange(ncoefficients[interval])
+            constraints[2 * j, start:start + powers.size] = \
+                                            side * pow(xk, powers)
+            constraints[2 * j + 1, start + 1:start + powers.size] = \
+                            side * powers[1:] * pow(xk, powers[1:] - 1)
+    return constraints
+
+def _polsplSolve(x, y, low, high, ncoefficients, knots, weights=None):
+    """
+    Solution of the system formed by the normal equations of the least
+    squares fit and the knot constraints added through Lagrange multipliers.
+    All the spectra share the system matrix, they are solved at once.
+
+    :return: Array of shape (..., n + 2 * len(knots)) with the n coefficients
+             followed by the multipliers
+    """
+    x = numpy.asarray(x, dtype=numpy.float64)
+    y = numpy.asarray(y, dtype=numpy.float64)
+    design = _polsplDesignMatrix(x, low, high, ncoefficients)
+    constraints = _polsplConstraintMatrix(knots, ncoefficients)
+    if weights is not None:
+        weighted = design * numpy.asarray(weights, dtype=numpy.float64)[:, None]
+    else:
+        weighted = design
+    n = design.shape[1]
+    m = constraints.shape[0]
+    system = numpy.zeros((n + m, n + m), dtype=numpy.float64)
+    system[:n, :n] = numpy.dot(design.T, weighted)
+    system[:n, n:] = constraints.T
+    system[n:, :n] = constraints
+    rhs = numpy.zeros((n + m, int(y.size // x.size)), dtype=numpy.float64)
+    rhs[:n] = numpy.dot(weighted.T, y.reshape(-1, x.size).T)
+    try:
+        solution = numpy.linalg.solve(system, rhs)
+    except numpy.linalg.LinAlgError:
+        # empty intervals
+        _logger.warning("Singular spline system, using least squares")
+        solution = numpy.linalg.lstsq(system, rhs, rcond=None)[0]
+    return solution.T.reshape(y.shape[:-1] + (n + m,))
+
+def polsplFit(x, y, low, high, ncoefficients, knots=None, weights=None):
+    """
+    Least squares fit of adjacent polynomials matching in value and first
+    derivative at the knots.
+
+    :param x: 1D array of abscissas shared by all the spectra
+    :param y: Array of shape (..., len(x)), one spectrum per row
+    :param low: Lower limit of each interval
+    :param high: Upper limit of each interval
+    :param ncoefficients: Number of polynomial coefficients of each interval
+    :param knots: Points joining consecutive intervals (default high[:-1])
+    :param weights: Optional 1D array with the weight of each point
+    :return: Array of shape (..., sum(ncoefficients)) with the coefficients
+             of each interval in increasing powers of x
+    """
+    ncoefficients = [int(n) for n in ncoefficients]
+    if knots is None:
+        knots = high[:-1]
+    solution = _polsplSolve(x, y, low, high, ncoefficients, knots,
+                            weights=weights)
+    return solution[..., :sum(ncoefficients)]
+
+def polsplEvaluate(x, coefficients, ncoefficients, knots):
+    """
+    Evaluate the adjacent polynomials fitted by polsplFit. The first and
+    last polynomials are extrapolated beyond the fitted range.
+
+    :param x: 1D array
+    :param coefficients: Array of shape (..., sum(ncoefficients))
+    :param ncoefficients: Number of polynomial coefficients of each interval
+    :param knots: Points joining consecutive intervals
+    :return: Array of shape (..., len(x))
+    """
+    x = numpy.asarray(x, dtype=numpy.float64)
+    coefficients = numpy.asarray(coefficients, dtype=numpy.float64)
+    starts = numpy.cumsum([0] + [int(n) for n in ncoefficients])
+    # a point at a knot belongs to the interval at its left
+    interval = numpy.searchsorted(numpy.asarray(knots), x, side="left")
+    output = numpy.zeros(coefficients.shape[:-1] + x.shape,
+                         dtype=numpy.float64)
+    for j in range(len(ncoefficients)):
+        idx = interval == j
+        powers = numpy.vander(x[idx], int(ncoefficients[j]), increasing=True)
+        output[..., idx] = numpy.dot(coefficients[..., starts[j]:starts[j + 1]],
+                                     powers.T)
+    return output
+
 def polspl_evaluate(set2,xl,xh,c,nc,nr):
     r"""
         polspl_evaluate(set2,xl,xh,c,nc,nr): for internal use of postedge
@@ -115,50 +225,15 @@ def polspl_evaluate(set2,xl,xh,c,nc,nr):
     	2009-05-13 srio@esrf.eu updated doc
         2014-12-04 srio@esrf.eu Translated to python
     """
-
-    fit = set2*0.0
     #;change xl(1) and xh(nr) to extrapolate the fit
     xl[1] = numpy.min(set2[0,:])
     xh[nr] = numpy.max(set2[0,:])
 
-    #;
-    #; calculatest the first point
-    #;
-    xval=set2[0,0]
-    yval=0.0
-    for k in range(1,int(nc[1]+1)):
-        yval =  yval+ c[k] * numpy.power(xval,(k-1))
-    fit[0,0] = xval
-    fit[1,0] = yval
-
-    #;
-    #; now the rest of the points
-    #;
-    if _logger.getEffectiveLevel() == logging.DEBUG:
-        fit2 = fit *1
-        for i in range(len(set2[0,:])):  # loop over all the points
-            for j in range(1,int(nr+1)): # loop over the # of intervals
-                if ((set2[0,i] > xl[j]) and (set2[0,i] <= xh[j])):
-                    cstart=numpy.sum(nc[0:j])
-                    xval = set2[0,i]
-                    yval = 0.0
-                    for k in range(1,int(nc[j]+1)):
-                        yval =  yval+ c[cstart+k] * numpy.power(xval,(k-1))
-                    fit2[0,i] = xval
-                    fit2[1,i] = yval
-
-    for j in range(1,int(nr+1)): # loop over the # of intervals
-        idx = (set2[0, :] > xl[j]) & (set2[0,:] <= xh[j])
-        xval = set2[0, idx]
-        cstart=numpy.sum(nc[0:j])
-        yval = 0.0 * xval
-        for k in range(1,int(nc[j]+1)):
-            yval += c[cstart+k] * numpy.power(xval,(k-1))
-        fit[0, idx] = xval
-        fit[1, idx] = yval
-
-    if _logger.getEffectiveLevel() == logging.DEBUG:
-        _logger.debug("GOOD? = %s", numpy.allclose(fit, fit2))
+    ncoefficients = nc[1:nr + 1]
+    fit = set2 * 0.0
+    fit[0] = set2[0]
+    fit[1] = polsplEvaluate(set2[0], c[1:int(numpy.sum(ncoefficients)) + 1],
+                            ncoefficients, xh[1:nr])
     return fit
 
 def polspl(x,y,w,npts,xl,xh,nr,nc):
@@ -183,10 +258,7 @@ def polspl(x,y,w,npts,xl,xh,nr,nc):
      OUTPUTS:
     	array with all coeffs, the first nc(1) of which belong to the first range,
     	the second nc(2) of which belong to the second range, and so forth.
-
-     SIDE EFFECTS:
-    	Quite inefficient, because it uses a lot of loops inherited from
-    	the Fortran code. However, for small set of data it is useful.
+    	They are followed by the Lagrange multipliers of the knot constraints.
 
      PROCEDURE:
     	(Translated from a Fortran Code)
@@ -194,8 +266,10 @@ def polspl(x,y,w,npts,xl,xh,nr,nc):
     	in order to save space on a mini-computer.  This means that the
     	is rather poorly conditioned, and hence the limits on the
     	degree of the polynomial.  The method of solution is Lagrange's
-    	undetermined multipliers for the knot constraints and gaussian
-    	elimination to solve the linear system.
+    	undetermined multipliers for the knot constraints.
+    	The design matrix and the constraints are built with array
+    	operations (see polsplFit) and the system is solved with
+    	numpy.linalg.solve instead of the original gaussian elimination.
 
      MODIFICATION HISTORY:
      	Written by:	Manuel Sanchez del Rio. ESRF February, 1993
@@ -232,132 +306,21 @@ def polspl(x,y,w,npts,xl,xh,nr,nc):
         C
 
     """
-
-    # ;
-    # ; few definitions
-    # ;
-    df = numpy.zeros(26)
-    a = numpy.zeros((36,37))
-    nbs = numpy.zeros(11,dtype=int)
-    xk = numpy.zeros(10)
-    c = numpy.zeros(36)
-    j=0
-    i=0
-    ne_idl=0
-    n = 0
-    k = 0
-    ibl = 0
-    ns = 0
-    ns1 = 0
-
-    nbs[1]=1
-    for i in range(1,nr+1):
-        n=n+int(nc[i])
-        nbs[i+1]=n+1
-        if xl[i] < xh[i]:
-            pass
+    for i in range(1, nr + 1):
+        if xl[i] > xh[i]:
+            xl[i], xh[i] = xh[i], xl[i]
+    knots = numpy.zeros(nr - 1)
+    for ibl in range(1, nr):
+        if xl[ibl] > xl[ibl + 1]:
+            knots[ibl - 1] = .5 * (xl[ibl] + xh[ibl + 1])
         else:
-            t=xl[i]
-            xl[i]=xh[i]
-            xh[i]=t
-
-    n=n+2*(nr-1)
-    n1=n+1
-    xl[nr+1]=0.
-    xh[nr+1]=0.
-    # this loop ...
-    for ibl in range(1,nr+1):
-        xk[ibl]=.5*(xh[ibl]+xl[ibl+1])
-        if (xl[ibl] > xl[ibl+1]):
-            xk[ibl]=.5*(xl[ibl]+xh[ibl+1])
-        ns=nbs[ibl]
-        ne_idl=nbs[ibl+1]-1
-        for i in range(1, npts+1):
-            if((x[i] < xl[ibl]) or (x[i] > xh[ibl])):
-                pass
-            else:
-                df[ns]=1.0
-                ns1=ns+1
-                for j in range(ns1,ne_idl+1):
-                    df[j]=df[j-1]*x[i]
-                for j in range(ns,ne_idl+1):
-                    for k in range(j,ne_idl+1):
-                        a[j,k]=a[j,k]+df[j]*df[k]*w[i]
-                    a[j,n1]=a[j,n1]+df[j]*y[i]*w[i]
-    # ... has to be faster
-    ncol=nbs[nr+1]-1
-    nk=nr-1
-
-    if (nk == 0):
-        pass
-    else:
-        for ik in range(1,nk+1):
-            ncol=ncol+1
-            ns=nbs[ik]
-            ne_idl=nbs[ik+1]-1
-            a[ns,ncol]=-1.
-            ns=ns+1
-            for i in range(ns,ne_idl+1):
-                a[i,ncol]=a[i-1,ncol]*xk[ik]
-            ncol=ncol+1
-            a[ns,ncol]=-1.
-            ns=ns+1
-            if (ns > ne_idl):
-                pass
-            else:
-                for i in range(ns,ne_idl+1):
-                    a[i,ncol]=(ns-i-2)*numpy.power(xk[ik],(i-ns+1))
-            ncol=ncol-1
-            ns=nbs[ik+1]
-            ne_idl=nbs[ik+2]-1
-            a[ns,ncol]=1.0
-            ns=ns+1
-            for i in range(ns,ne_idl+1):
-                a[i,ncol]=a[i-1,ncol]*xk[ik]
-            ncol=ncol+1
-            a[ns,ncol]=1.0
-            ns=ns+1
-            if (ns > ne_idl):
-                pass
-            else:
-                for i in range(ns,ne_idl+1):
-                    a[i,ncol]=(i-ns+2)*numpy.power(xk[ik],(i-ns+1))
-
-    for i in range(1,n+1):
-        i1=i-1
-        for j in range(1,i1+1):
-            a[i,j]=a[j,i]
-    nm1=n-1
-
-    for i in range(1,nm1+1):
-        i1=i+1
-        m=i
-        t=numpy.abs(a[i,i])
-        for j in range(i1,n+1):
-            if (t >= numpy.abs(a[j,i])):
-                pass
-            else:
-                m=j
-                t=numpy.abs(a[j,i])
-        if (m == i):
-            pass
-        else:
-            for j in range(1,n1+1):
-                t=a[i,j]
-                a[i,j]=a[m,j]
-                a[m,j]=t
-        for j in range(i1,n+1):
-            t=a[j,i]/a[i,i]
-            for k in range(i1,n1+1):
-                a[j,k]=a[j,k]-t*a[i,k]
-    c[n]=a[n,n1]/a[n,n]
-    for i in range(1,nm1+1):
-        ni=n-i
-        t=a[ni,n1]
-        ni1=ni+1
-        for j in range(ni1,n+1):
-            t=t-c[j]*a[ni,j]
-        c[ni]=t/a[ni,ni]
+            knots[ibl - 1] = .5 * (xh[ibl] + xl[ibl + 1])
+    solution = _polsplSolve(x[1:npts + 1], y[1:npts + 1],
+                            xl[1:nr + 1], xh[1:nr + 1],
+                            [int(n) for n in nc[1:nr + 1]], knots,
+                            weights=w[1:npts + 1])
+    c = numpy.zeros(max(36, solution.size + 1))
+    c[1:solution.size + 1] = solution
     return c
 
 def polspl_test():
@@ -394,54 +357,13 @@ def polspl_test():
     #print("fit: ",fit)
     return
 
-
-def postEdge(set2,kmin=None,kmax=None,polDegree=[3,3,3],knots=None, full=False):
-    r"""
-        postEdge(set2,kmin=None,kmax=None,polDegree=[3,3,3],knots=None)
-
-     PURPOSE:
-    	This procedure calculates the post edge fit of a xafs spectrum
-
-     INPUTS:
-    	set2: input set of data
-
-     KEYWORD PARAMETERS:
-        kmin the bottom limit for the fit (defaults kmin=0)
-        kmax the upper limit for the fit (defaults max)
-
-     OUTPUTS:
-    	a set with the fit
-
-     MODIFICATION HISTORY:
-     	Written by:	Manuel Sanchez del Rio. ESRF
-    	February, 1993
-        1996-08-13 MSR (srio@esrf.fr) changes wmenu->wmenu2 and
-                   xtext->widget_message
-    	1998-10-01 srio@esrf.fr adapts for delia.
-    	2000-02-12 MSR (srio@esrf.fr) adds Dialog_Parent keyword
-    	2014-12-04 srio@esrf.eu Translated to python
-
-    """
-    #Note that in/out arrays are numpy way: numpy.array((npoints,2))
-
-    xl = numpy.zeros(10)
-    xh = numpy.zeros(10)
-    c = numpy.zeros(36)
-    nc = numpy.zeros(10, numpy.int32)
+def _getPostEdgeIntervals(kmin, kmax, polDegree, knots):
     if len(polDegree) > 10:
         _logger.warning("Error: Maximum number of intervals is 10")
         _logger.warning("       Number of intervals forced to 10")
         polDegree = polDegree[0:9]
 
-    x1 = 0.0 # set2[:,0].min()
-    x2 = set2[:,0].max()
-
-    if kmin != None:
-        x1 = kmin
-    if kmax != None:
-        x2 = kmax
-
-    xrange1 = [x1,x2]
+    xrange1 = [kmin, kmax]
     _logger.debug("++++++++++++++++++%s", xrange1)
     if knots not in [None, []]:
         if len(knots) == len(polDegree):
@@ -462,77 +384,103 @@ def postEdge(set2,kmin=None,kmax=None,polDegree=[3,3,3],knots=None, full=False):
         else:
             xrange1 = knots[0],knots[-1]
 
-
     nr = len(polDegree)
-    xl[1] = xrange1[0]
-    xh[nr] = xrange1[1]
-
-    for i in range(1,nr+1):
-        nc[i] = polDegree[i-1] + 1
-
-    if knots == None:
-        step = (xh[nr]-xl[1])/float(nr)
-        for i in range(1,nr):
-            xl[i+1] = xl[i] + step
-            xh[i]   = xl[i+1]
+    limits = numpy.zeros(nr + 1)
+    limits[0] = xrange1[0]
+    limits[nr] = xrange1[1]
+    if knots in [None, []]:
+        step = (limits[nr] - limits[0]) / float(nr)
+        for i in range(1, nr):
+            limits[i] = limits[i - 1] + step
     else:
-        for i in range(1,nr):
-            xl[i+1] = knots[i]
-            xh[i]   = xl[i+1]
+        limits[1:nr] = knots[1:nr]
+    ncoefficients = [int(degree) + 1 for degree in polDegree]
+    for i in range(nr):
+        _logger.debug("%d %9d %9.2f %9.2f ",
+                      i + 1, ncoefficients[i] - 1, limits[i], limits[i + 1])
+    return limits, ncoefficients
 
+def postEdgeSpectra(k, mu, kmin=None, kmax=None, polDegree=(3, 3, 3),
+                    knots=None, full=False):
+    r"""
+    Post edge spline fit of one or several spectra sharing the same k values.
+
+    :param k: 1D array with the k values
+    :param mu: Array of shape (..., len(k)), one spectrum per row
+    :param kmin: Lower limit of the fit (default 0)
+    :param kmax: Upper limit of the fit (default max(k))
+    :param polDegree: Degree of the polynomial of each interval
+    :param knots: Optional limits of the intervals
+    :param full: If True, also return the knots and the fit at the knots
+    :return: The fit with the shape of mu. If full is True, a tuple
+             (fit, xNodes, yNodes) with the yNodes of shape (..., nKnots)
+    """
+    k = numpy.asarray(k, dtype=numpy.float64)
+    mu = numpy.asarray(mu, dtype=numpy.float64)
+    if kmin is None:
+        kmin = 0.0
+    if kmax is None:
+        kmax = k.max()
+    limits, ncoefficients = _getPostEdgeIntervals(kmin, kmax,
+                                                  list(polDegree), knots)
     #
     # select only points in selected interval
     #
-    goodi = (set2[:,0] >= xrange1[0]) & (set2[:,0] <= xrange1[1])
-    set22 = set2[goodi,:]
+    goodi = (k >= limits[0]) & (k <= limits[-1])
+    _logger.debug(' Number of fitting points: %d', goodi.sum())
+    _logger.debug(' polynomials used for fitting: %d', len(ncoefficients))
+
+    innerKnots = limits[1:-1]
+    coefficients = polsplFit(k[goodi], mu[..., goodi],
+                             limits[:-1], limits[1:], ncoefficients,
+                             knots=innerKnots)
+    fit = polsplEvaluate(k, coefficients, ncoefficients, innerKnots)
+    if full:
+        xNodes = innerKnots.astype(numpy.float32)
+        yNodes = polsplEvaluate(innerKnots, coefficients, ncoefficients,
+                                innerKnots).astype(numpy.float32)
+        return fit, xNodes, yNodes
+    else:
+        return fit
 
-    _logger.debug(' Number of fitting points: %d', len(set22[:,0]))
-    _logger.debug(' polynomials used for fitting: %d', nr)
-    _logger.debug('#        degree   min      max')
-    for i in range(1,nr+1):
-        _logger.debug("%d %9d %9.2f %9.2f ",
-                      i, nc[i]-1, xl[i], xh[i])
+def postEdge(set2,kmin=None,kmax=None,polDegree=[3,3,3],knots=None, full=False):
+    r"""
+        postEdge(set2,kmin=None,kmax=None,polDegree=[3,3,3],knots=None)
 
-    # ;
-    # ; call spline
-    # ;
-    npts = len(set22[:,0])
-    w = numpy.ones(npts+1)
-    xx = numpy.zeros(npts+1)
-    yy = numpy.zeros(npts+1)
-    xx[1:] = set22[:,0]
-    yy[1:] = set22[:,1]
-
-    #t0 = time.time()
-    if _XAS:
-        c = _xas.polspl(xx,yy,w,npts,xl,xh,nr,nc)
-        if _logger.getEffectiveLevel() == logging.DEBUG:
-            t0 = time.time()
-            c2 = polspl(xx,yy,w,npts,xl,xh,nr,nc)
-            _logger.debug("polspl elapsed = %s", time.time() - t0)
-            _logger.debug("OK? %s", numpy.allclose(c, c2))
-    else:
-        c = polspl(xx,yy,w,npts,xl,xh,nr,nc)
+     PURPOSE:
+    	This procedure calculates the post edge fit of a xafs spectrum
+
+     INPUTS:
+    	set2: input set of data
+
+     KEYWORD PARAMETERS:
+        kmin the bottom limit for the fit (defaults kmin=0)
+        kmax the upper limit for the fit (defaults max)
 
-    #TODO: polspl_evaluate receives and returns arrays like IDL (2,npoints)
-    #t0 = time.time()
-    fit0 = polspl_evaluate(set2.T,xl,xh,c,nc,nr)
-    #print("polspl_evaluate elapsed = ", time.time() - t0)
+     OUTPUTS:
+    	a set with the fit
 
+     MODIFICATION HISTORY:
+     	Written by:	Manuel Sanchez del Rio. ESRF
+    	February, 1993
+        1996-08-13 MSR (srio@esrf.fr) changes wmenu->wmenu2 and
+                   xtext->widget_message
+    	1998-10-01 srio@esrf.fr adapts for delia.
+    	2000-02-12 MSR (srio@esrf.fr) adds Dialog_Parent keyword
+    	2014-12-04 srio@esrf.eu Translated to python
+
+    """
+    #Note that in/out arrays are numpy way: numpy.array((npoints,2))
+    result = postEdgeSpectra(set2[:, 0], set2[:, 1], kmin=kmin, kmax=kmax,
+                             polDegree=polDegree, knots=knots, full=full)
+    fit0 = numpy.zeros(set2.shape, dtype=numpy.float64)
+    fit0[:, 0] = set2[:, 0]
     if full:
-        xNodes = numpy.zeros((nr-1,), dtype=numpy.float32)
-        yNodes = numpy.zeros((nr-1,), dtype=numpy.float32)
-        for j in range(1,int(nr)): # loop over the # of intervals
-            xval = xh[j]
-            cstart=numpy.sum(nc[0:j])
-            yval = 0.0
-            for k in range(1,int(nc[j]+1)):
-                yval += c[cstart+k] * numpy.power(xval,(k-1))
-            xNodes[j-1] = xval
-            yNodes[j-1] = yval
-        return fit0.T, xNodes, yNodes
+        fit0[:, 1] = result[0]
+        return fit0, result[1], result[2]
     else:
-        return fit0.T
+        fit0[:, 1] = result
+        return fit0
 
 def postEdge0(k, mu, kmin=None, kmax=None, degrees=(3, 3, 3), knots=None, full=False):
     set0 = numpy.zeros((k.size, 2), dtype=k.dtype)
@@ -603,100 +551,107 @@ def getFTWindowWeights(tk, window="Gaussian", windpar=0.2, wrange=None):
     apo1 = xmin + windpar
     apo2 = xmax - windpar
 
-    npoint = len(tk)
-    wind = numpy.ones(npoint, dtype=numpy.float)
+    tk = numpy.asarray(tk, dtype=numpy.float64)
+    wind = numpy.ones(tk.shape, dtype=numpy.float64)
 
     if window in ["Gaussian", "Gauss"]:
         wind = numpy.power((tk - xp)/xm, 2)
         wind = numpy.exp(-wind * 9.2)
-
-    elif window == "Hanning":
-        for i in range(npoint):
-            if tk[i] <= apo1:
-                wind[i] = 0.5*(1.0-numpy.cos(numpy.pi*(tk[i]-xmin)/windpar))
-            if tk[i] >= apo2:
-                wind[i] = 0.5*(1.0+numpy.cos(numpy.pi*(tk[i]-apo2)/windpar))
-    elif window == "Box":
-        for i in range(npoint):
-            if tk[i] <= apo1:
-                wind[i] = 0.0
-            if tk[i] >= apo2:
-                wind[i] = 0.0
-    elif window in ["Parzen", "Triangle", "Triangular"]:
-        for i in range(npoint):
-            if tk[i] <= apo1:
-                wind[i] = (tk[i]-xmin)/windpar
-            if tk[i] >= apo2:
-                wind[i] = 1 - (tk[i]-apo2)/windpar
-    elif window == "Welch":
-        for i in range(npoint):
-            if tk[i] <= apo1:
-                wind[i] = 1.0 - numpy.power( ( (tk[i]-apo1) / windpar), 2)
-            if tk[i] >= apo2:
-                wind[i] =  1.0 - numpy.power( (tk[i]-apo2) / windpar, 2 )
-    elif window == "Hamming":
-        for i in range(npoint):
-            if tk[i] <= apo1:
-                wind[i] = 1.08 - (.54+0.46*numpy.cos(numpy.pi*(tk[i]-xmin)/windpar))
-            if tk[i] >= apo2:
-                wind[i] =   1.08 - (.54-0.46*numpy.cos(numpy.pi*(tk[i]-apo2)/windpar))
-    elif window == "Tukey":
-        for i in range(npoint):
-            if tk[i] <= apo1:
-                wind[i] = 1.0 - numpy.power(numpy.cos(0.5*numpy.pi*(tk[i]-xmin)/windpar),2)
-            if tk[i] >= apo2:
-                wind[i] = numpy.power(numpy.cos(-0.5*numpy.pi*(tk[i]-apo2)/windpar),2)
-    elif window == "Papul":
-        for i in range(npoint):
-            if tk[i] <= apo1:
-                a=(1./numpy.pi)*numpy.sin(numpy.pi*(tk[i]-xmin)/windpar) + \
-                  (1.-(tk[i]-xmin)/windpar)*numpy.cos(numpy.pi*(tk[i]-xmin)/windpar)
-                wind[i] = 1.0 - a
-            if tk[i] >= apo2:
-                a=(1./numpy.pi)*numpy.sin(numpy.pi*(tk[i]-apo2)/windpar) + \
-                  (1.-(tk[i]-apo2)/windpar)*numpy.cos(numpy.pi*(tk[i]-apo2)/windpar)
-                wind[i] = a
+    elif window in _APODIZATIONS:
+        # closed forms of the rising and falling edges of the window
+        rising, falling = _APODIZATIONS[window]
+        idx = tk <= apo1
+        wind[idx] = rising((tk[idx] - xmin) / windpar)
+        idx = tk >= apo2
+        wind[idx] = falling((tk[idx] - apo2) / windpar)
     elif _XAS and window in ["Kaiser", "Kasel"]:
         wind= (_xas.j0(windpar * numpy.sqrt(1. - 4.0 * pow((tk-xp)/xm, 2))) - 1.0)/ (_xas.j0(windpar) - 1.0)
     else:
         raise ValueError("Window <%s> not implemented" % window)
     return wind
 
+def _papul(u):
+    return (1. / numpy.pi) * numpy.sin(numpy.pi * u) + \
+           (1. - u) * numpy.cos(numpy.pi * u)
+
+# rising and falling edges as functions of the distance to the limits of
+# the window expressed in units of the apodization width
+_APODIZATIONS = {
+    "Hanning": (lambda u: 0.5 * (1.0 - numpy.cos(numpy.pi * u)),
+                lambda v: 0.5 * (1.0 + numpy.cos(numpy.pi * v))),
+    "Box": (lambda u: 0.0 * u,
+            lambda v: 0.0 * v),
+    "Parzen": (lambda u: u,
+               lambda v: 1 - v),
+    "Welch": (lambda u: 1.0 - numpy.power(u - 1.0, 2),
+              lambda v: 1.0 - numpy.power(v, 2)),
+    "Hamming": (lambda u: 1.08 - (.54 + 0.46 * numpy.cos(numpy.pi * u)),
+                lambda v: 1.08 - (.54 - 0.46 * numpy.cos(numpy.pi * v))),
+    "Tukey": (lambda u: 1.0 - numpy.power(numpy.cos(0.5 * numpy.pi * u), 2),
+              lambda v: numpy.power(numpy.cos(-0.5 * numpy.pi * v), 2)),
+    "Papul": (lambda u: 1.0 - _papul(u),
+              _papul)}
+_APODIZATIONS["Triangle"] = _APODIZATIONS["Parzen"]
+_APODIZATIONS["Triangular"] = _APODIZATIONS["Parzen"]
+
+def _interpolateSpectra(x, y, xNew):
+    """
+    Equivalent of numpy.interp(xNew, x, y, left=0.0, right=0.0) applied to
+    each spectrum of y, an array of shape (..., len(x)).
+    """
+    x = numpy.asarray(x, dtype=numpy.float64)
+    xNew = numpy.asarray(xNew, dtype=numpy.float64)
+    y = numpy.asarray(y)
+    if x.size < 2:
+        output = numpy.zeros(y.shape[:-1] + xNew.shape, dtype=numpy.float64)
+        if x.size:
+            output[..., xNew == x[0]] = y[..., :1]
+        return output
+    left = numpy.clip(numpy.searchsorted(x, xNew, side="right") - 1,
+                      0, x.size - 2)
+    delta = x[left + 1] - x[left]
+    delta[delta == 0] = 1.0
+    weight = (xNew - x[left]) / delta
+    output = y[..., left] * (1.0 - weight) + y[..., left + 1] * weight
+    output[..., (xNew < x[0]) | (xNew > x[-1])] = 0.0
+    return output
+
 def getFT(k, exafs, npoints=2048, rrange=(0.0, 7.0),
            krange=None, kstep=0.02, kweight=0,
            window="gaussian", apodization=0.2, wweights=None):
+    r"""
+    Fourier transform of one EXAFS spectrum or of an array of shape
+    (..., len(k)) of spectra sharing the same k values, transformed with
+    a single FFT call.
+
+    Returns a dictionary. "FTRadius" is common to all the spectra, while
+    "FTIntensity", "FTReal" and "FTImaginary" have one row per spectrum.
+    """
     if krange is not None:
         idx = (k >= krange[0]) & (k <= krange[1])
         k = k[idx]
-        exafs = exafs[idx]
+        exafs = exafs[..., idx]
     if wweights is None:
         wweights = getFTWindowWeights(k,
                                       window=window,
                                       windpar=apodization,
                                       wrange=krange)
-    if 0:
-        set3 = numpy.zeros((k.size, 2), dtype=numpy.float)
-        set3[:, 0] = k
-        set3[:, 1] = exafs * wweights
-        setFT = exex.fastftr(set3,npoint=npoints,rrange=[0.,7.],kstep=0.02)
-    npoint2 = k.size
-    xmin = k[0]
-    xmax = k[-1]
-
 
     # ;
     # ; creates the input interpolated values
     # ;
     interpolatedDataX = numpy.linspace(0.0, npoints-1, npoints) * kstep
-    interpolatedDataY = numpy.interp( interpolatedDataX , k, wweights * exafs * pow(k, kweight),
-                                      left=0.0, right=0.0)
+    interpolatedDataY = _interpolateSpectra(k,
+                                    wweights * exafs * pow(k, kweight),
+                                    interpolatedDataX)
 
     # ; calculates the fft and generates the conjugated variable (rr)
+    # ; only the requested interval in r (rrange) is kept
 
-    ff = numpy.fft.ifft(interpolatedDataY)
     rstep = numpy.pi / npoints / kstep
     rr = numpy.linspace(0.0, npoints-1, npoints) * rstep
-
+    goodi = (rr  >= rrange[0]) & (rr  <= rrange[1])
+    ff = numpy.fft.ifft(interpolatedDataY, axis=-1)[..., goodi]
 
     # ;
     # ; prepare the results
@@ -705,26 +660,17 @@ def getFT(k, exafs, npoints=2048, rrange=(0.0, 7.0),
     coef = npoints * kstep / numpy.sqrt(numpy.pi) * numpy.sqrt(2.)
     f12 = coef*numpy.real(ff)             # real part of fft
     f13 = coef*numpy.imag(ff)*(-1.)       # imaginary part of fft
-
-    # ;
-    # ; cut the results to the selected interval in r (rrange)
-    # ;
-
-    goodi = (rr  >= rrange[0]) & (rr  <= rrange[1])
-    f13 = f13[goodi]
-    f12 = f12[goodi]
     f10 = rr[goodi]
     f11 = numpy.sqrt( f12*f12 + f13*f13)
 
     # ;
     # ; define the result array
     # ;
-    fourier = numpy.zeros((len(f10),4))
-    fourier[:,0] = f10
-    fourier[:,1] = f11
-    fourier[:,2] = f12
-    fourier[:,3] = f13
-    #print("OK = ", numpy.allclose(fourier, setFT))
+    fourier = numpy.zeros(f11.shape + (4,))
+    fourier[..., 0] = f10
+    fourier[..., 1] = f11
+    fourier[..., 2] = f12
+    fourier[..., 3] = f13
     ddict = {}
     ddict["Set"] = fourier
     ddict["InterpolatedK"] = interpolatedDataX
@@ -748,7 +694,9 @@ def getBackFT(fourier,npoint=4096,krange=[2.0,12.0],rstep=None,rmin=None,rmax=No
      INPUTS:
            fourier:  a 4 col set with r,modulus,real and imaginary part
                    of a Fourier Transform of an Exafs spectum, as produced
-                   by FTR or FASTFTR procedures
+                   by FTR or FASTFTR procedures. An array of shape
+                   (..., npt, 4) of sets sharing the same r values is
+                   transformed with a single FFT call.
 
      KEYWORD PARAMETERS:
     	krange=[kmin,kmax] : range of the conjugated variable for
@@ -764,6 +712,7 @@ def getBackFT(fourier,npoint=4096,krange=[2.0,12.0],rstep=None,rmin=None,rmax=No
            This procedure returns a 4-columns set (backftr) with
            the conjugated variable (k) in column 0, the real part of the
            BFT in col 1, the modulus in col 2 and the phase in col 3.
+           For a batch of sets, an array of shape (..., nptout, 4).
 
      MODIFICATION HISTORY:
      	Written by:	Manuel Sanchez del Rio. ESRF March, 1993
@@ -774,21 +723,24 @@ def getBackFT(fourier,npoint=4096,krange=[2.0,12.0],rstep=None,rmin=None,rmax=No
     kmin = krange[0]
     kmax = krange[1]
 
-    npt = len(fourier[:,0])
-    fou = numpy.zeros((npoint,4))
+    # a batch of sets sharing the same r values is accepted
+    fourier = numpy.asarray(fourier)
+    radius = fourier[(0,) * (fourier.ndim - 2)][:, 0]
+    npt = len(radius)
+    fou = numpy.zeros(fourier.shape[:-2] + (npoint, 4))
 
     if rmin == None:
-        rmin = (fourier[:,0]).min()
+        rmin = radius.min()
     if rmax == None:
-        rmax = (fourier[:,0]).max()
+        rmax = radius.max()
 
     #;
     #; fill "fou" set
     #;
     if rstep == None: #;--- no interpolation
         nn = int(npt/2)
-        rstep = fourier[nn+1,0] - fourier[nn,0]
-        rstep2 = fourier[nn+2,0] - fourier[nn+1,0]
+        rstep = radius[nn+1] - radius[nn]
+        rstep2 = radius[nn+2] - radius[nn+1]
         rdiff = numpy.abs (rstep - rstep2)
         _logger.debug(' back rstep = %f', rstep)
         _logger.debug(' rdiff = %f', rdiff)
@@ -798,18 +750,18 @@ def getBackFT(fourier,npoint=4096,krange=[2.0,12.0],rstep=None,rmin=None,rmax=No
         ptstart = int(rmin/rstep)
         _logger.debug(' ptstart = %d', ptstart)
         _logger.debug(' ptstart+npt = %d', ptstart+npt)
-        fou[ptstart:ptstart+npt,:]=fourier
+        fou[..., ptstart:ptstart+npt, :] = fourier
     else: #;--- interpolation
-        fou[:,0] = numpy.linspace(0,0,npoint-1,npoint)*rstep
-        fou[:,1] = numpy.interp(fou[:,0],fourier[:,0],fourier[:,1],left=0.0,right=0.0)
-        fou[:,2] = numpy.interp(fou[:,0],fourier[:,0],fourier[:,2],left=0.0,right=0.0)
-        fou[:,3] = numpy.interp(fou[:,0],fourier[:,0],fourier[:,3],left=0.0,right=0.0)
+        rr = numpy.linspace(0, npoint-1, npoint) * rstep
+        fou[..., 0] = rr
+        for i in range(1, 4):
+            fou[..., i] = _interpolateSpectra(radius, fourier[..., i], rr)
 
     #;
     #; call back fft
     #;
-    c = fou[:,2] - 1.0j * fou[:,3]
-    af = numpy.fft.fft(c)
+    c = fou[..., 2] - 1.0j * fou[..., 3]
+    af = numpy.fft.fft(c, axis=-1)
 
     #;
     #; create the array of the conjugated variable
@@ -831,19 +783,18 @@ def getBackFT(fourier,npoint=4096,krange=[2.0,12.0],rstep=None,rmin=None,rmax=No
     #;
 
     goodi = (kk  >= kmin) & (kk  <= kmax)
-    afr = afr[goodi]
-    afi = afi[goodi]
+    afr = afr[..., goodi]
+    afi = afi[..., goodi]
     afk = kk[goodi]
-    nptout = len(afr)
 
     #;
     #; define the output set
     #;
-    backftr = numpy.zeros((nptout,4))
-    backftr[:,0] = afk                  # the conjugated variable (k [A^-1])
-    backftr[:,1] = afr                  # the real part of backftr or atra
-    backftr[:,2] = numpy.sqrt(afr*afr+afi*afi)    # the modulus of backftr
-    backftr[:,3] = numpy.arctan2(afi,afr)          # the phase
+    backftr = numpy.zeros(afr.shape + (4,))
+    backftr[..., 0] = afk                  # the conjugated variable (k [A^-1])
+    backftr[..., 1] = afr                  # the real part of backftr or atra
+    backftr[..., 2] = numpy.sqrt(afr*afr+afi*afi)    # the modulus of backftr
+    backftr[..., 3] = numpy.arctan2(afi,afr)          # the phase
 
     return backftr
 
@@ -1188,12 +1139,13 @@ def postEdge(self, k, mu, backend=None):
             knots = config["Knots"]["Values"]
             if not hasattr(knots, "__len__"):
                 knots = [knots]
-        fit0, xNodes, yNodes = postEdge0(k, mu, kMin, kMax,
+        # mu can contain several spectra sharing the same k values
+        fit0, xNodes, yNodes = postEdgeSpectra(k, mu, kMin, kMax,
                          config["Knots"]["Orders"],
                          knots=knots, full=True)
         ddict = {}
-        ddict["PostEdgeK"] = fit0[:, 0]
-        ddict["PostEdgeB"] = fit0[:, 1]
+        ddict["PostEdgeK"] = k
+        ddict["PostEdgeB"] = fit0
         ddict["KnotsX"] = xNodes
         ddict["KnotsY"] = yNodes
         ddict["KMin"] = kMin
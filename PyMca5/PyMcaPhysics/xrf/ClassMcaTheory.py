@@ -41,6 +41,7 @@
 if FISX:
     FisxHelper = ConcentrationsTool.FisxHelper
 from . import Elements
+from . import McaTheoryCache
 from PyMca5.PyMcaMath.fitting import SpecfitFuns
 from PyMca5.PyMcaIO import ConfigDict
 from PyMca5.PyMcaMath.fitting import Gefit
@@ -215,6 +216,9 @@ def __configure(self):
             self.config['fit']['energyscatter']   = [1]
         maxenergy = None
         energylist= None
+        energyweight = None
+        energyflag = None
+        energyscatter = None
         if self.config['fit']['energy'] is not None:
           if max(self.config['fit']['energyflag']) == 0:
               energylist = None
@@ -259,6 +263,120 @@ def __configure(self):
         self.config['detector']['ethreshold'] = ethreshold
         self.config['detector']['ithreshold'] = ithreshold
         self.config['detector']['nthreshold'] = nthreshold
+        # the peak description only depends on the physics described by the
+        # configuration and it can be shared among instances and sessions
+        cacheKey = None
+        state = None
+        if McaTheoryCache.isEnabled():
+            cacheKey = McaTheoryCache.getKey(self.config,
+                                        attflag=self.attflag,
+                                        fisxescape=self.__USE_FISX_ESCAPE)
+            state = McaTheoryCache.get(cacheKey)
+        if state is None:
+            state = self.__configurePeaks(maxenergy,
+                                          energylist,
+                                          energyweight,
+                                          energyflag,
+                                          energyscatter,
+                                          deltaonepeak,
+                                          detele,
+                                          ethreshold,
+                                          ithreshold,
+                                          nthreshold)
+            if cacheKey is not None:
+                McaTheoryCache.put(cacheKey, state)
+        else:
+            _logger.debug("Using cached peak description")
+            # keep the Elements module in the same state as when calculated
+            for ele in state["updatedelements"]:
+                if maxenergy != Elements.Element[ele]['buildparameters']['energy']:
+                    Elements.updateDict (energy= maxenergy)
+            if state["fisx"] is not None:
+                self.config['fisx'] = state["fisx"]
+        self._fluoRates = state["fluorates"]
+        PEAKS0 = state["peaks0"]
+        PEAKS0NAMES = state["peaks0names"]
+        PEAKS0ESCAPE = state["peaks0escape"]
+        PEAKSW = state["peaksw"]
+        HYPERMET = state["hypermet"]
+        NGLOBAL = state["nglobal"]
+        PARAMETERS = state["parameters"]
+        CONTINUUM = state["continuum"]
+
+        self.PEAKS0     = PEAKS0
+        self.PEAKS0ESCAPE = PEAKS0ESCAPE
+        #for i in range(len(PEAKS0)):
+        #    print self.PEAKS0[i]
+        #    print self.PEAKS0ESCAPE[i]
+        self.PEAKS0NAMES= PEAKS0NAMES
+        self.PEAKSW     = PEAKSW
+        self.FASTER     = 1
+        self.__HYPERMET   = HYPERMET
+        self.NGLOBAL    = NGLOBAL
+        self.PARAMETERS = PARAMETERS
+        self.ESCAPE     = self.config['fit']['escapeflag']
+        self.__SUM        = self.config['fit']['sumflag']
+        self.__CONTINUUM     = CONTINUUM
+        self.MAXITER    = self.config['fit']['maxiter']
+        self.STRIP      = self.config['fit']['stripflag']
+        #if self.laststrip is not None:
+        self.__mycounter = 0
+        calculateStrip = False
+        if (self.STRIP != self.laststrip) or \
+           (self.config['fit']['stripalgorithm'] != self.laststripalgorithm) or \
+           (self.config['fit']['stripfilterwidth'] != self.laststripfilterwidth) or \
+           (self.config['fit']['stripanchorsflag'] != self.laststripanchorsflag) or \
+           (self.config['fit']['stripanchorslist'] != self.laststripanchorslist):
+            calculateStrip = True
+        if not calculateStrip:
+            if self.config['fit']['stripalgorithm'] == 1:
+                #checking if needed to calculate SNIP
+                if (self.config['fit']['snipwidth'] != self.lastsnipwidth):
+                    calculateStrip = True
+            else:
+                #checking if needed to calculate strip
+                if (self.config['fit']['stripiterations'] != self.laststripiterations) or \
+                   (self.config['fit']['stripwidth'] != self.laststripwidth) or \
+                   (self.config['fit']['stripconstant'] != self.laststripconstant):
+                    calculateStrip = True
+        if (self.lastxmin != self.config['fit']['xmin']) or\
+           (self.lastxmax != self.config['fit']['xmax']):
+            if self.ydata0 is not None:
+                _logger.debug("Limits changed")
+                self.setData(x=self.xdata0,
+                             y=self.ydata0,
+                             sigmay=self.sigmay0,
+                             xmin = self.config['fit']['xmin'],
+                             xmax = self.config['fit']['xmax'],
+                             time = self.__lastTime)
+                return
+
+        if hasattr(self, "xdata"):
+            if self.STRIP:
+                if calculateStrip:
+                    _logger.debug("Calling to calculate non analytical background in config")
+                    self.__getselfzz()
+                else:
+                    _logger.debug("Using previous non analytical background in config")
+                self.datatofit = numpy.concatenate((self.xdata,
+                                self.ydata-self.zz, self.sigmay),1)
+                self.laststrip = 1
+            else:
+                _logger.debug("Using previous data")
+                self.datatofit = numpy.concatenate((self.xdata,
+                                self.ydata, self.sigmay),1)
+                self.laststrip = 0
+
+    def __configurePeaks(self, maxenergy, energylist, energyweight,
+                         energyflag, energyscatter, deltaonepeak,
+                         detele, ethreshold, ithreshold, nthreshold):
+        """
+        Calculate the description of the peaks and the fit parameters
+        associated to the current configuration.
+
+        The returned state is cached by the McaTheoryCache module.
+        """
+        updatedElements = []
         usematrix = 0
         attenuatorlist =[]
         filterlist = []
@@ -315,6 +433,7 @@ def __configure(self):
                   ele = element[0:1].upper()+element[1:2].lower()
               else:
                   ele = element.upper()
+              updatedElements.append(ele)
               if maxenergy != Elements.Element[ele]['buildparameters']['energy']:
                   Elements.updateDict (energy= maxenergy)
               if type(self.config['peaks'][element]) == type([]):
@@ -523,6 +642,7 @@ def __configure(self):
                         ele = element[0:1].upper()+element[1:2].lower()
                     else:
                         ele = element.upper()
+                    updatedElements.append(ele)
                     if maxenergy != Elements.Element[ele]['buildparameters']['energy']:
                         Elements.updateDict (energy= maxenergy)
                     if type(self.config['peaks'][element]) == type([]):
@@ -952,69 +1072,21 @@ def __configure(self):
                             #PARAMETERS.append("Scatter Peak")
                             #PARAMETERS.append("Scatter Compton")
 
-        self.PEAKS0     = PEAKS0
-        self.PEAKS0ESCAPE = PEAKS0ESCAPE
-        #for i in range(len(PEAKS0)):
-        #    print self.PEAKS0[i]
-        #    print self.PEAKS0ESCAPE[i]
-        self.PEAKS0NAMES= PEAKS0NAMES
-        self.PEAKSW     = PEAKSW
-        self.FASTER     = 1
-        self.__HYPERMET   = HYPERMET
-        self.NGLOBAL    = NGLOBAL
-        self.PARAMETERS = PARAMETERS
-        self.ESCAPE     = self.config['fit']['escapeflag']
-        self.__SUM        = self.config['fit']['sumflag']
-        self.__CONTINUUM     = CONTINUUM
-        self.MAXITER    = self.config['fit']['maxiter']
-        self.STRIP      = self.config['fit']['stripflag']
-        #if self.laststrip is not None:
-        self.__mycounter = 0
-        calculateStrip = False
-        if (self.STRIP != self.laststrip) or \
-           (self.config['fit']['stripalgorithm'] != self.laststripalgorithm) or \
-           (self.config['fit']['stripfilterwidth'] != self.laststripfilterwidth) or \
-           (self.config['fit']['stripanchorsflag'] != self.laststripanchorsflag) or \
-           (self.config['fit']['stripanchorslist'] != self.laststripanchorslist):
-            calculateStrip = True
-        if not calculateStrip:
-            if self.config['fit']['stripalgorithm'] == 1:
-                #checking if needed to calculate SNIP
-                if (self.config['fit']['snipwidth'] != self.lastsnipwidth):
-                    calculateStrip = True
-            else:
-                #checking if needed to calculate strip
-                if (self.config['fit']['stripiterations'] != self.laststripiterations) or \
-                   (self.config['fit']['stripwidth'] != self.laststripwidth) or \
-                   (self.config['fit']['stripconstant'] != self.laststripconstant):
-                    calculateStrip = True
-        if (self.lastxmin != self.config['fit']['xmin']) or\
-           (self.lastxmax != self.config['fit']['xmax']):
-            if self.ydata0 is not None:
-                _logger.debug("Limits changed")
-                self.setData(x=self.xdata0,
-                             y=self.ydata0,
-                             sigmay=self.sigmay0,
-                             xmin = self.config['fit']['xmin'],
-                             xmax = self.config['fit']['xmax'],
-                             time = self.__lastTime)
-                return
-
-        if hasattr(self, "xdata"):
-            if self.STRIP:
-                if calculateStrip:
-                    _logger.debug("Calling to calculate non analytical background in config")
-                    self.__getselfzz()
-                else:
-                    _logger.debug("Using previous non analytical background in config")
-                self.datatofit = numpy.concatenate((self.xdata,
-                                self.ydata-self.zz, self.sigmay),1)
-                self.laststrip = 1
-            else:
-                _logger.debug("Using previous data")
-                self.datatofit = numpy.concatenate((self.xdata,
-                                self.ydata, self.sigmay),1)
-                self.laststrip = 0
+        if self._fluoRates is None:
+            fisx = None
+        else:
+            fisx = self.config['fisx']
+        return {"peaks0": PEAKS0,
+                "peaks0names": PEAKS0NAMES,
+                "peaks0escape": PEAKS0ESCAPE,
+                "peaksw": PEAKSW,
+                "hypermet": HYPERMET,
+                "nglobal": NGLOBAL,
+                "parameters": PARAMETERS,
+                "continuum": CONTINUUM,
+                "fluorates": self._fluoRates,
+                "fisx": fisx,
+                "updatedelements": updatedElements}
 
     def setdata(self, *var, **kw):
         print("ClassMcaTheory.setdata deprecated, please use setData")
@@ -2194,8 +2194,7 @@ def getmassattcoef(compound, energy=None):
     #single element case
     if compound in Element.keys():
         return getelementmassattcoef(compound,energy)
-    elts= [ w for w in re.split('[0-9]', compound) if w != '' ]
-    nbs= [ int(w) for w in re.split('[a-zA-Z]', compound) if w != '' ]
+    elts, nbs = _parseCompound(compound)
     if len(elts)==1 and len(nbs)==0:
         if elts in Element.keys():
             return getelementmassattcoef(compound,energy)
@@ -2207,92 +2206,11 @@ def getmassattcoef(compound, energy=None):
     fraction = [Element[elt]['mass'] *nb for (elt, nb) in zip(elts, nbs) ]
     div      = sum(fraction)
     fraction = [x/div for x in fraction]
-    #print "fraction = ",fraction
-    ddict={}
-    ddict['energy']   = []
-    ddict['coherent'] = []
-    ddict['compton']  = []
-    ddict['photo']    = []
-    ddict['pair']     = []
-    ddict['total']    = []
-    eltindex = 0
     if energy is None:
-        energy=[]
-        for ele in elts:
-            xcom_data = getelementmassattcoef(ele,None)['energy']
-            for ene in xcom_data:
-                if ene not in energy:
-                    energy.append(ene)
-        energy.sort()
-
-    for ele in elts:
-        xcom_data = getelementmassattcoef(ele,None)
-        #now I have to interpolate at the different energies
-        if not hasattr(energy, "__len__"):
-            energy =[energy]
-        eneindex = 0
-        for ene in energy:
-            if ene < 1.0:
-                if PyMcaEPDL97.EPDL97_DICT[ele]['original']:
-                    #make sure the binding energies are those used by this module and not EADL ones
-                    PyMcaEPDL97.setElementBindingEnergies(ele,
-                                                          Element[ele]['binding'])
-                tmpDict = PyMcaEPDL97.getElementCrossSections(ele, ene)
-                cohe  = tmpDict['coherent'][0]
-                comp  = tmpDict['compton'][0]
-                photo = tmpDict['photo'][0]
-                pair  = 0.0
-            else:
-                i0=max(numpy.nonzero(xcom_data['energy'] <= ene)[0])
-                i1=min(numpy.nonzero(xcom_data['energy'] >= ene)[0])
-                if (i1 == i0) or (i0>i1):
-                    cohe=xcom_data['coherent'][i1]
-                    comp=xcom_data['compton'][i1]
-                    photo=xcom_data['photo'][i1]
-                    pair=xcom_data['pair'][i1]
-                else:
-                    if LOGLOG:
-                        A=xcom_data['energylog10'][i0]
-                        B=xcom_data['energylog10'][i1]
-                        logene = numpy.log10(ene)
-                        c2=(logene-A)/(B-A)
-                        c1=(B-logene)/(B-A)
-                    else:
-                        A=xcom_data['energy'][i0]
-                        B=xcom_data['energy'][i1]
-                        c2=(ene-A)/(B-A)
-                        c1=(B-ene)/(B-A)
-                    cohe= pow(10.0,c2*xcom_data['coherentlog10'][i1]+\
-                                   c1*xcom_data['coherentlog10'][i0])
-                    comp= pow(10.0,c2*xcom_data['comptonlog10'][i1]+\
-                                   c1*xcom_data['comptonlog10'][i0])
-                    photo=pow(10.0,c2*xcom_data['photolog10'][i1]+\
-                                   c1*xcom_data['photolog10'][i0])
-                    if xcom_data['pair'][i1] > 0.0:
-                        c2 = c2*numpy.log10(xcom_data['pair'][i1])
-                        if xcom_data['pair'][i0] > 0.0:
-                            c1 = c1*numpy.log10(xcom_data['pair'][i0])
-                            pair = pow(10.0,c1+c2)
-                        else:
-                            pair =0.0
-                    else:
-                        pair =0.0
-            if eltindex == 0:
-                ddict['energy'].append(ene)
-                ddict['coherent'].append(cohe *fraction[eltindex])
-                ddict['compton'].append(comp *fraction[eltindex])
-                ddict['photo'].append(photo *fraction[eltindex])
-                ddict['pair'].append(pair*fraction[eltindex])
-                ddict['total'].append((cohe+comp+photo+pair)*fraction[eltindex])
-            else:
-                ddict['coherent'][eneindex] += cohe  *fraction[eltindex]
-                ddict['compton'] [eneindex] += comp  *fraction[eltindex]
-                ddict['photo']   [eneindex] += photo *fraction[eltindex]
-                ddict['pair']    [eneindex] += pair  *fraction[eltindex]
-                ddict['total']   [eneindex] += (cohe+comp+photo+pair) * fraction[eltindex]
-            eneindex += 1
-        eltindex += 1
-    return ddict
+        energy = _getXcomEnergyGrid(elts)
+    if not hasattr(energy, "__len__"):
+        energy =[energy]
+    return _getMassAttenuationSum(list(zip(elts, fraction)), energy)
 
 def __materialInCompoundList(lst):
     for item in lst:
@@ -2417,11 +2335,7 @@ def getMaterialMassAttenuationCoefficients(compoundList0, fractionList0, energy0
             elts=[compound]
             nbs =[1]
         else:
-            elts= [ w for w in re.split('[0-9]', compound) if w != '' ]
-            try:
-                nbs= [ int(w) for w in re.split('[a-zA-Z]', compound) if w != '' ]
-            except:
-                raise ValueError("Compound '%s' not understood" % compound)
+            elts, nbs = _parseCompound(compound)
             if len(elts)==1 and len(nbs)==0:
                 elts=[compound]
                 nbs =[1]
@@ -2435,12 +2349,7 @@ def getMaterialMassAttenuationCoefficients(compoundList0, fractionList0, energy0
         fraction = [x * div for x in fraction]
         if energy is None:
             #get energy list
-            energy = []
-            for ele in elts:
-                xcom_data = getelementmassattcoef(ele,None)['energy']
-                for ene in xcom_data:
-                    if ene not in energy:
-                        energy.append(ene)
+            energy = _getXcomEnergyGrid(elts)
         for ele in elts:
             if ele not in materialElements.keys():
                 materialElements[ele]  = fraction[elts.index(ele)]
@@ -2452,85 +2361,9 @@ def getMaterialMassAttenuationCoefficients(compoundList0, fractionList0, energy0
         energy.sort()
 
     #I have the energy grid, the elements and their fractions
-    dict={}
-    dict['energy']   = []
-    dict['coherent'] = []
-    dict['compton']  = []
-    dict['photo']    = []
-    dict['pair']     = []
-    dict['total']    = []
-    eltindex = 0
-    for ele in materialElements.keys():
-        if 'xcom' in Element[ele]:
-            xcom_data = Element[ele]['xcom']
-        else:
-            xcom_data = getelementmassattcoef(ele,None)
-        #now I have to interpolate at the different energies
-        if (type(energy) != type([])):
-            energy =[energy]
-        eneindex = 0
-        for ene in energy:
-            if ene < 1.0:
-                if PyMcaEPDL97.EPDL97_DICT[ele]['original']:
-                    #make sure the binding energies are those used by this module and not EADL ones
-                    PyMcaEPDL97.setElementBindingEnergies(ele,
-                                                          Element[ele]['binding'])
-                tmpDict = PyMcaEPDL97.getElementCrossSections(ele, ene)
-                cohe  = tmpDict['coherent'][0]
-                comp  = tmpDict['compton'][0]
-                photo = tmpDict['photo'][0]
-                pair  = 0.0
-            else:
-                i0=max(numpy.nonzero(xcom_data['energy'] <= ene)[0])
-                i1=min(numpy.nonzero(xcom_data['energy'] >= ene)[0])
-                if (i1 == i0) or (i0>i1):
-                    cohe=xcom_data['coherent'][i1]
-                    comp=xcom_data['compton'][i1]
-                    photo=xcom_data['photo'][i1]
-                    pair=xcom_data['pair'][i1]
-                else:
-                    if LOGLOG:
-                        A=xcom_data['energylog10'][i0]
-                        B=xcom_data['energylog10'][i1]
-                        logene = numpy.log10(ene)
-                        c2=(logene-A)/(B-A)
-                        c1=(B-logene)/(B-A)
-                    else:
-                        A=xcom_data['energy'][i0]
-                        B=xcom_data['energy'][i1]
-                        c2=(ene-A)/(B-A)
-                        c1=(B-ene)/(B-A)
-                    cohe= pow(10.0,c2*xcom_data['coherentlog10'][i1]+\
-                                   c1*xcom_data['coherentlog10'][i0])
-                    comp= pow(10.0,c2*xcom_data['comptonlog10'][i1]+\
-                                   c1*xcom_data['comptonlog10'][i0])
-                    photo=pow(10.0,c2*xcom_data['photolog10'][i1]+\
-                                   c1*xcom_data['photolog10'][i0])
-                    if xcom_data['pair'][i1] > 0.0:
-                        c2 = c2*numpy.log10(xcom_data['pair'][i1])
-                        if xcom_data['pair'][i0] > 0.0:
-                            c1 = c1*numpy.log10(xcom_data['pair'][i0])
-                            pair = pow(10.0,c1+c2)
-                        else:
-                            pair =0.0
-                    else:
-                        pair =0.0
-            if eltindex == 0:
-                dict['energy'].append(ene)
-                dict['coherent'].append(cohe * materialElements[ele])
-                dict['compton'].append(comp * materialElements[ele])
-                dict['photo'].append(photo * materialElements[ele])
-                dict['pair'].append(pair* materialElements[ele])
-                dict['total'].append((cohe+comp+photo+pair)* materialElements[ele])
-            else:
-                dict['coherent'][eneindex] += cohe  * materialElements[ele]
-                dict['compton'] [eneindex] += comp  * materialElements[ele]
-                dict['photo']   [eneindex] += photo * materialElements[ele]
-                dict['pair']    [eneindex] += pair  * materialElements[ele]
-                dict['total']   [eneindex] += (cohe+comp+photo+pair) *  materialElements[ele]
-            eneindex += 1
-        eltindex += 1
-    return dict
+    if (type(energy) != type([])):
+        energy =[energy]
+    return _getMassAttenuationSum(list(materialElements.items()), energy)
 
 
 def getcandidates(energy,threshold=None,targetrays=None):
@@ -2737,68 +2570,174 @@ def getelementmassattcoef(ele,energy=None):
 
     if energy is None:
         return  Element[ele]['xcom']
-    ddict={}
-    ddict['energy']   = []
-    ddict['coherent'] = []
-    ddict['compton']  = []
-    ddict['photo']    = []
-    ddict['pair']     = []
-    ddict['total']    = []
     if not hasattr(energy, "__len__"):
         energy =[energy]
-    for ene in energy:
-        if ene < 1.0:
-            if PyMcaEPDL97.EPDL97_DICT[ele]['original']:
-                #make sure the binding energies are those used by this module and not EADL ones
-                PyMcaEPDL97.setElementBindingEnergies(ele,
-                                                      Element[ele]['binding'])
-            tmpDict = PyMcaEPDL97.getElementCrossSections(ele, ene)
-            cohe  = tmpDict['coherent'][0]
-            comp  = tmpDict['compton'][0]
-            photo = tmpDict['photo'][0]
-            pair  = 0.0
+    cohe, comp, photo, pair = _getElementCrossSections(ele, energy)
+    ddict={}
+    ddict['energy']   = list(energy)
+    ddict['coherent'] = list(cohe)
+    ddict['compton']  = list(comp)
+    ddict['photo']    = list(photo)
+    ddict['pair']     = list(pair)
+    ddict['total']    = list(cohe + comp + photo + pair)
+    return ddict
+
+# parsed compound formulas: formula -> (elements, numbers of atoms)
+_COMPOUND_CACHE = {}
+
+def _parseCompound(compound):
+    """
+    Split a formula like 'C22H10N2O5' into the tuples of element symbols
+    and of numbers of atoms. The result is memoized.
+    """
+    try:
+        return _COMPOUND_CACHE[compound]
+    except KeyError:
+        pass
+    except TypeError:
+        # unhashable input
+        raise ValueError("Compound '%s' not understood" % (compound,))
+    elts = [ w for w in re.split('[0-9]', compound) if w != '' ]
+    try:
+        nbs = [ int(w) for w in re.split('[a-zA-Z]', compound) if w != '' ]
+    except:
+        raise ValueError("Compound '%s' not understood" % compound)
+    result = tuple(elts), tuple(nbs)
+    _COMPOUND_CACHE[compound] = result
+    return result
+
+# logarithm of the pair production cross sections: element -> (pair, log10)
+_PAIR_LOG10_CACHE = {}
+
+def _getXcomTables(ele):
+    """
+    Return the XCOM tables of the element
+    """
+    xcom_data = Element[ele].get('xcom', None)
+    if xcom_data is None:
+        xcom_data = getelementmassattcoef(ele, None)
+    return xcom_data
+
+def _getPairLog10(ele, xcom_data):
+    """
+    Return the logarithm of the pair production cross section of the
+    element (only used where positive). The XCOM tables of the element
+    are not modified.
+    """
+    cached = _PAIR_LOG10_CACHE.get(ele, None)
+    if (cached is not None) and (cached[0] is xcom_data['pair']):
+        return cached[1]
+    pair = numpy.array(xcom_data['pair'], dtype=numpy.float64)
+    pairlog10 = numpy.zeros(pair.shape, numpy.float64)
+    positive = pair > 0.0
+    pairlog10[positive] = numpy.log10(pair[positive])
+    _PAIR_LOG10_CACHE[ele] = (xcom_data['pair'], pairlog10)
+    return pairlog10
+
+def _getXcomEnergyGrid(elts):
+    """
+    Sorted list of the distinct XCOM energies of the given elements
+    """
+    energy = [numpy.asarray(_getXcomTables(ele)['energy']) for ele in elts]
+    return numpy.unique(numpy.concatenate(energy)).tolist()
+
+def _getElementCrossSections(ele, energy):
+    """
+    Interpolate the coherent, Compton, photoelectric and pair production
+    mass attenuation coefficients of an element at all the energies at
+    once.
+
+    :param str ele: element symbol
+    :param energy: sequence of energies in keV
+    :return: four arrays with the values at each energy in cm2/g
+    """
+    energy = numpy.array(energy, dtype=numpy.float64).reshape(-1)
+    cohe = numpy.zeros(energy.shape, numpy.float64)
+    comp = numpy.zeros(energy.shape, numpy.float64)
+    photo = numpy.zeros(energy.shape, numpy.float64)
+    pair = numpy.zeros(energy.shape, numpy.float64)
+    low = energy < 1.0
+    if low.any():
+        if PyMcaEPDL97.EPDL97_DICT[ele]['original']:
+            #make sure the binding energies are those used by this module and not EADL ones
+            PyMcaEPDL97.setElementBindingEnergies(ele,
+                                                  Element[ele]['binding'])
+        for i in numpy.nonzero(low)[0]:
+            tmpDict = PyMcaEPDL97.getElementCrossSections(ele, energy[i])
+            cohe[i]  = tmpDict['coherent'][0]
+            comp[i]  = tmpDict['compton'][0]
+            photo[i] = tmpDict['photo'][0]
+    high = numpy.nonzero(~low)[0]
+    if not high.size:
+        return cohe, comp, photo, pair
+    xcom_data = _getXcomTables(ele)
+    ene = energy[high]
+    table = xcom_data['energy']
+    # i0: last point not above ene, i1: first point not below ene
+    i0 = numpy.searchsorted(table, ene, side='right') - 1
+    i1 = numpy.searchsorted(table, ene, side='left')
+    if (i0.min() < 0) or (i1.max() >= len(table)):
+        raise ValueError("Energy out of the tabulated range of %s" % ele)
+    if LOGLOG:
+        A = xcom_data['energylog10'][i0]
+        B = xcom_data['energylog10'][i1]
+        x = numpy.log10(ene)
+    else:
+        A = table[i0]
+        B = table[i1]
+        x = ene
+    # i1 <= i0 means tabulated energy (at an edge i1 takes the lower side)
+    tabulated = i1 <= i0
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        c2 = (x - A) / (B - A)
+        c1 = (B - x) / (B - A)
+        values = []
+        for key in ['coherent', 'compton', 'photo']:
+            logtable = xcom_data[key + 'log10']
+            interpolated = numpy.power(10.0, c2 * logtable[i1] + \
+                                             c1 * logtable[i0])
+            values.append(numpy.where(tabulated,
+                                      xcom_data[key][i1],
+                                      interpolated))
+        pairtable = numpy.asarray(xcom_data['pair'])
+        logtable = _getPairLog10(ele, xcom_data)
+        interpolated = numpy.power(10.0, c1 * logtable[i0] + \
+                                         c2 * logtable[i1])
+        interpolated[(pairtable[i1] <= 0.0) | (pairtable[i0] <= 0.0)] = 0.0
+        values.append(numpy.where(tabulated, pairtable[i1], interpolated))
+    cohe[high], comp[high], photo[high], pair[high] = values
+    return cohe, comp, photo, pair
+
+def _getMassAttenuationSum(elementFractions, energy):
+    """
+    Mass attenuation coefficients of a mixture of elements
+
+    :param elementFractions: list of (element symbol, mass fraction)
+    :param list energy: energies in keV
+    :return: dictionary with energy, coherent, compton, photo, pair and
+             total lists
+    """
+    ddict = {}
+    for key in ['energy', 'coherent', 'compton', 'photo', 'pair', 'total']:
+        ddict[key] = []
+    result = None
+    for ele, fraction in elementFractions:
+        cohe, comp, photo, pair = _getElementCrossSections(ele, energy)
+        total = (cohe + comp + photo + pair) * fraction
+        if result is None:
+            result = [cohe * fraction, comp * fraction,
+                      photo * fraction, pair * fraction, total]
         else:
-            i0=max(numpy.nonzero(Element[ele]['xcom']['energy'] <= ene)[0])
-            i1=min(numpy.nonzero(Element[ele]['xcom']['energy'] >= ene)[0])
-            if i1 <= i0:
-                cohe=Element[ele]['xcom']['coherent'][i1]
-                comp=Element[ele]['xcom']['compton'][i1]
-                photo=Element[ele]['xcom']['photo'][i1]
-                pair=Element[ele]['xcom']['pair'][i1]
-            else:
-                if LOGLOG:
-                    A=Element[ele]['xcom']['energylog10'][i0]
-                    B=Element[ele]['xcom']['energylog10'][i1]
-                    logene = numpy.log10(ene)
-                    c2=(logene-A)/(B-A)
-                    c1=(B-logene)/(B-A)
-                else:
-                    A=Element[ele]['xcom']['energy'][i0]
-                    B=Element[ele]['xcom']['energy'][i1]
-                    c2=(ene-A)/(B-A)
-                    c1=(B-ene)/(B-A)
-
-                cohe= pow(10.0,c2*Element[ele]['xcom']['coherentlog10'][i1]+\
-                               c1*Element[ele]['xcom']['coherentlog10'][i0])
-                comp= pow(10.0,c2*Element[ele]['xcom']['comptonlog10'][i1]+\
-                               c1*Element[ele]['xcom']['comptonlog10'][i0])
-                photo=pow(10.0,c2*Element[ele]['xcom']['photolog10'][i1]+\
-                               c1*Element[ele]['xcom']['photolog10'][i0])
-                if Element[ele]['xcom']['pair'][i1] > 0.0:
-                    c2 = c2*numpy.log10(Element[ele]['xcom']['pair'][i1])
-                    if Element[ele]['xcom']['pair'][i0] > 0.0:
-                        c1 = c1*numpy.log10(Element[ele]['xcom']['pair'][i0])
-                        pair = pow(10.0,c1+c2)
-                    else:
-                        pair =0.0
-                else:
-                    pair =0.0
-        ddict['energy'].append(ene)
-        ddict['coherent'].append(cohe)
-        ddict['compton'].append(comp)
-        ddict['photo'].append(photo)
-        ddict['pair'].append(pair)
-        ddict['total'].append(cohe+comp+photo+pair)
+            result[0] += cohe * fraction
+            result[1] += comp * fraction
+            result[2] += photo * fraction
+            result[3] += pair * fraction
+            result[4] += total
+    if result is not None:
+        ddict['energy'] = list(energy)
+        for key, values in zip(['coherent', 'compton', 'photo', 'pair',
+                                'total'], result):
+            ddict[key] = list(values)
     return ddict
 
 def getElementLShellRates(symbol,energy=None,photoweights = None):
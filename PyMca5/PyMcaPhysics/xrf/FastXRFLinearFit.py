@@ -45,7 +45,9 @@
 from PyMca5.PyMcaMath.fitting import Gefit
 from PyMca5.PyMcaMath.fitting import SpecfitFuns
 from PyMca5.PyMcaIO import ConfigDict
+from PyMca5.PyMcaIO import HDF5ChunkWriter
 from PyMca5.PyMcaMisc import PhysicalMemory
+from PyMca5.PyMcaMisc import ProfilingUtils
 from .FastXRFLinearFitOutput import OutputBuffer
 from . import McaStackView
 
@@ -59,6 +61,7 @@ def __init__(self, mcafit=None):
             self._mcaTheory = ClassMcaTheory.McaTheory()
         else:
             self._mcaTheory = mcafit
+        self._telemetry = ProfilingUtils.Telemetry()
 
     def setFitConfiguration(self, configuration):
         self._mcaTheory.setConfiguration(configuration)
@@ -74,7 +77,7 @@ def setFitConfigurationFile(self, ffile):
     def fitMultipleSpectra(self, x=None, y=None, xmin=None, xmax=None,
                            configuration=None, concentrations=False,
                            ysum=None, weight=None, refit=True, livetime=None,
-                           outbuffer=None):
+                           outbuffer=None, progresscallback=None):
         """
         This method performs the actual fit. The y keyword is the only mandatory input argument.
 
@@ -90,7 +93,15 @@ def fitMultipleSpectra(self, x=None, y=None, xmin=None, xmax=None,
                    are to be calculated by using fundamental parameters with
                    automatic time. The default is None.
         :outbuffer dict: 
-        :return dict: outbuffer
+        :param callable progresscallback: called periodically with a
+                        dictionary containing the number of processed and
+                        total spectra, the spectra per second and the
+                        estimated time to finish (ETA) in seconds.
+        :return dict: outbuffer. Its telemetry item holds the stage timers
+                      (configuration, reference, model, read, background,
+                      lstsq, fit, refit, concentrations and, after saving,
+                      write) and counters (bytes_read, spectra_fitted,
+                      spectra_refitted, refit_iterations).
         """
         # Parse data
         x, data, mcaIndex, livetime = self._fitParseData(x=x, y=y,
@@ -104,6 +115,11 @@ def fitMultipleSpectra(self, x=None, y=None, xmin=None, xmax=None,
 
             # Configure fit
             nSpectra = data.size // data.shape[mcaIndex]
+            telemetry = ProfilingUtils.Telemetry(
+                                    progressCallback=progresscallback,
+                                    total=nSpectra)
+            self._telemetry = telemetry
+            outbuffer['telemetry'] = telemetry
             configorg, config, weight, weightPolicy, \
             autotime, liveTimeFactor = self._fitConfigure(
                                                 configuration=configuration,
@@ -112,6 +128,8 @@ def fitMultipleSpectra(self, x=None, y=None, xmin=None, xmax=None,
                                                 weight=weight,
                                                 nSpectra=nSpectra)
             outbuffer['configuration'] = configorg
+            telemetry.addTime('configuration', time.time() - t0)
+            t0 = time.time()
 
             # Sum spectrum
             if ysum is None:
@@ -128,6 +146,8 @@ def fitMultipleSpectra(self, x=None, y=None, xmin=None, xmax=None,
                                                   sumover=sumover)
             else:
                 yref = ysum
+            telemetry.addTime('reference', time.time() - t0)
+            t0 = time.time()
 
             # Get the basis of the linear models (i.e. derivative to peak areas)
             if xmin is None:
@@ -148,21 +168,10 @@ def fitMultipleSpectra(self, x=None, y=None, xmin=None, xmax=None,
             nObs = iXMax-iXMin
 
             # Least-squares parameters
-            if weightPolicy == 2:
-                # Individual spectrum weights (assumed Poisson)
-                SVD = False
-                sigma_b = None
-            elif weightPolicy == 1:
-                # Average weight from sum spectrum (assume Poisson)
-                # the +1 is to prevent misbehavior due to weights less than 1.0
-                sigma_b = 1 + numpy.sqrt(yref[sliceChan])/nSpectra
-                sigma_b = sigma_b.reshape(-1, 1)
-                SVD = True
-            else:
-                # No weights
-                SVD = True
-                sigma_b = None
-            lstsq_kwargs = {'svd': SVD, 'sigma_b': sigma_b, 'weight': weight}
+            lstsq_kwargs = self._fitLstSqKwargs(weightPolicy=weightPolicy,
+                                                weight=weight, yref=yref,
+                                                sliceChan=sliceChan,
+                                                nSpectra=nSpectra)
 
             # Allocate output buffers
             stackShape = data.shape
@@ -191,6 +200,7 @@ def fitMultipleSpectra(self, x=None, y=None, xmin=None, xmax=None,
                                                 shape=stackShape,
                                                 dtype=dtypeResult,
                                                 chunks=True,
+                                                mcaIndex=mcaIndex,
                                                 fill_value=0)
                 idx = [slice(None)]*fitmodel.ndim
                 idx[mcaIndex] = slice(0, iXMin)
@@ -201,7 +211,7 @@ def fitMultipleSpectra(self, x=None, y=None, xmin=None, xmax=None,
                 fitmodel = None
                 nFreeParameters = None
 
-            _logger.debug("Configuration elapsed = %f", time.time() - t0)
+            telemetry.addTime('model', time.time() - t0)
             t0 = time.time()
 
             # Fit all spectra
@@ -211,11 +221,8 @@ def fitMultipleSpectra(self, x=None, y=None, xmin=None, xmax=None,
                             config=config, anchorslist=anchorslist,
                             lstsq_kwargs=lstsq_kwargs)
 
-            t = time.time() - t0
-            _logger.debug("First fit elapsed = %f", t)
-            if t > 0.:
-                _logger.debug("Spectra per second = %f",
-                              numpy.prod(imageShape)/float(t))
+            telemetry.addTime('fit', time.time() - t0)
+            telemetry.progress(0, force=True)
             t0 = time.time()
 
             # Refit spectra with negative peak areas
@@ -226,8 +233,7 @@ def fitMultipleSpectra(self, x=None, y=None, xmin=None, xmax=None,
                             config=config, anchorslist=anchorslist,
                             lstsq_kwargs=lstsq_kwargs, freeNames=freeNames,
                             nFreeBkg=nFreeBkg, nFreeParameters=nFreeParameters)
-                t = time.time() - t0
-                _logger.debug("Fit of negative peaks elapsed = %f", t)
+                telemetry.addTime('refit', time.time() - t0)
                 t0 = time.time()
 
             # Return results as a dictionary
@@ -238,15 +244,18 @@ def fitMultipleSpectra(self, x=None, y=None, xmin=None, xmax=None,
                                      nxdata='fit',
                                      data=data,
                                      dtype=dtypeResult,
-                                     chunks=True)
+                                     chunks=True,
+                                     mcaIndex=mcaIndex)
             if outbuffer.saveResiduals:
                 outaxes = True
-                residuals = outbuffer.allocateH5('residuals',
-                                                 nxdata='fit', 
-                                                 data=data,
-                                                 dtype=dtypeResult,
-                                                 chunks=True)
-                residuals[()] -= fitmodel
+                # evaluated chunk by chunk while writing
+                residuals = HDF5ChunkWriter.ArrayDifference(data, fitmodel)
+                outbuffer.allocateH5('residuals',
+                                     nxdata='fit',
+                                     data=residuals,
+                                     dtype=dtypeResult,
+                                     chunks=True,
+                                     mcaIndex=mcaIndex)
             if outaxes:
                 # Generic axes
                 stackAxesNames = ['dim{}'.format(i) for i in range(data.ndim)]
@@ -269,10 +278,213 @@ def fitMultipleSpectra(self, x=None, y=None, xmin=None, xmax=None,
                                              results=results,
                                              autotime=autotime,
                                              liveTimeFactor=liveTimeFactor)
-                t = time.time() - t0
-                _logger.debug("Calculation of concentrations elapsed = %f", t)
+                telemetry.addTime('concentrations', time.time() - t0)
+            telemetry.log()
             return outbuffer
 
+    def followMultipleSpectra(self, filename, dataset, x=None, xmin=None,
+                              xmax=None, configuration=None, weight=None,
+                              refit=True, outbuffer=None, nrows=None,
+                              timeout=10.0, interval=0.1,
+                              progresscallback=None, rowcallback=None):
+        """
+        Fit the spectra of an HDF5 dataset while it is being acquired.
+
+        The file is opened in SWMR read mode. The first dimension of the
+        dataset is the growing one (the rows of the map) and the last one
+        holds the channels. The writer is expected to resize the dataset,
+        write the new rows and flush them. The model is configured once,
+        from the sum spectrum of the first row, and only the new rows are
+        fitted, reusing the singular value decomposition of the model.
+        Their results are appended along the row axis to the parameters
+        and uncertainties of the output buffer.
+
+        :param str filename: HDF5 file written in SWMR mode
+        :param str dataset: path of the dataset in the file
+        :param x: 1D array containing the x axis (usually the channels) of the spectra.
+        :param xmin: lower limit of the fitting region
+        :param xmax: upper limit of the fitting region
+        :param weight: 0 Means no weight, 1 Use an average weight, 2 Individual weights (slow)
+        :param refit: if False, no check for negative results. Default is True.
+        :param int nrows: stop after fitting this number of rows. Default
+                          is to follow the dataset until the timeout.
+        :param float timeout: stop when no new row appears during this
+                              number of seconds
+        :param float interval: polling interval in seconds
+        :param callable progresscallback: see fitMultipleSpectra
+        :param callable rowcallback: called with the outbuffer and the
+                        range of rows fitted (first, last + 1). Following
+                        stops when it returns True.
+        :return dict: outbuffer
+        """
+        if outbuffer is None:
+            outbuffer = OutputBuffer()
+        if outbuffer.saveData or outbuffer.saveFit or outbuffer.saveResiduals:
+            raise ValueError("Data, fit and residuals cannot be saved "
+                             "while following a dataset")
+        with h5py.File(filename, "r", libver="latest", swmr=True) as h5f:
+            dset = h5f[dataset]
+            if dset.ndim < 2:
+                raise ValueError("Dataset with rows of spectra expected")
+            nRowsAvailable = self._followWait(dset, 0, timeout, interval)
+            if not nRowsAvailable:
+                raise RuntimeError("No data written to %s::%s" %
+                                   (filename, dataset))
+            with outbuffer._bufferContext(update=False):
+                t0 = time.time()
+                telemetry = ProfilingUtils.Telemetry(
+                                    progressCallback=progresscallback)
+                self._telemetry = telemetry
+                outbuffer['telemetry'] = telemetry
+
+                # Configure the model from the first row
+                row = dset[0:1]
+                nSpectra = row.size // row.shape[-1]
+                configorg, config, weight, weightPolicy, \
+                autotime, liveTimeFactor = self._fitConfigure(
+                                                configuration=configuration,
+                                                concentrations=False,
+                                                weight=weight,
+                                                nSpectra=nSpectra)
+                outbuffer['configuration'] = configorg
+                telemetry.addTime('configuration', time.time() - t0)
+                t0 = time.time()
+
+                yref = self._fitReferenceSpectrum(data=row, mcaIndex=-1,
+                                                  sumover='all')
+                telemetry.addTime('reference', time.time() - t0)
+                t0 = time.time()
+
+                if xmin is None:
+                    xmin = config['fit']['xmin']
+                if xmax is None:
+                    xmax = config['fit']['xmax']
+                dtypeCalculcation = self._fitDtypeCalculation(row)
+                self._mcaTheory.setData(x=x, y=yref, xmin=xmin, xmax=xmax)
+                derivatives, freeNames, nFree, nFreeBkg = \
+                            self._fitCreateModel(dtype=dtypeCalculcation)
+                outbuffer['parameter_names'] = freeNames
+                anchorslist = self._fitBkgAnchorList(config=config)
+                iXMin, iXMax = self._fitMcaTrimInfo(x=x)
+                sliceChan = slice(iXMin, iXMax)
+                lstsq_kwargs = self._fitLstSqKwargs(weightPolicy=weightPolicy,
+                                                    weight=weight, yref=yref,
+                                                    sliceChan=sliceChan,
+                                                    nSpectra=nSpectra)
+                dtypeResult = self._fitDtypeResult(row)
+                telemetry.addTime('model', time.time() - t0)
+
+                nRowsFitted = 0
+                while True:
+                    t0 = time.time()
+                    if nrows is not None:
+                        nRowsAvailable = min(nRowsAvailable, nrows)
+                    data = dset[nRowsFitted:nRowsAvailable]
+                    telemetry.addTime('read', time.time() - t0)
+                    telemetry.increment('bytes_read', data.nbytes)
+                    self._followFit(data, outbuffer=outbuffer,
+                                    sliceChan=sliceChan,
+                                    derivatives=derivatives,
+                                    config=config, anchorslist=anchorslist,
+                                    lstsq_kwargs=lstsq_kwargs,
+                                    dtypeResult=dtypeResult,
+                                    freeNames=freeNames, nFreeBkg=nFreeBkg,
+                                    refit=refit)
+                    _logger.debug("Rows %d to %d fitted in %f s",
+                                  nRowsFitted, nRowsAvailable - 1,
+                                  time.time() - t0)
+                    first = nRowsFitted
+                    nRowsFitted = nRowsAvailable
+                    if rowcallback is not None:
+                        if rowcallback(outbuffer, (first, nRowsFitted)):
+                            break
+                    if nrows is not None and nRowsFitted >= nrows:
+                        break
+                    nRowsAvailable = self._followWait(dset, nRowsFitted,
+                                                      timeout, interval)
+                    if nRowsAvailable <= nRowsFitted:
+                        _logger.info("No new rows during %s s", timeout)
+                        break
+                telemetry.log()
+        return outbuffer
+
+    @staticmethod
+    def _followWait(dset, nRows, timeout, interval):
+        """Wait until the dataset has more than nRows rows
+        """
+        t0 = time.time()
+        while True:
+            dset.refresh()
+            n = dset.shape[0]
+            if n > nRows or (time.time() - t0) > timeout:
+                return n
+            time.sleep(interval)
+
+    def _followFit(self, data, outbuffer=None, sliceChan=None,
+                   derivatives=None, config=None, anchorslist=None,
+                   lstsq_kwargs=None, dtypeResult=None, freeNames=None,
+                   nFreeBkg=None, refit=True):
+        """Fit the new rows and append the results to the output buffer
+        """
+        nFree = derivatives.shape[1]
+        paramShape = (nFree,) + data.shape[:-1]
+        results = numpy.empty(paramShape, dtype=dtypeResult)
+        uncertainties = numpy.empty(paramShape, dtype=dtypeResult)
+        if outbuffer.save_diagnostics:
+            nFreeParameters = numpy.full(data.shape[:-1], nFree,
+                                         dtype=numpy.int32)
+        else:
+            nFreeParameters = None
+        t0 = time.time()
+        self._fitLstSqAll(data=data, sliceChan=sliceChan, mcaIndex=-1,
+                          derivatives=derivatives, fitmodel=None,
+                          results=results, uncertainties=uncertainties,
+                          config=config, anchorslist=anchorslist,
+                          lstsq_kwargs=lstsq_kwargs)
+        self._telemetry.addTime('fit', time.time() - t0)
+        if refit:
+            # the reduced models must not replace the decomposition
+            # of the full model used by the next rows
+            t0 = time.time()
+            svd = lstsq_kwargs.get('last_svd', None)
+            self._fitLstSqNegative(data=data, sliceChan=sliceChan, mcaIndex=-1,
+                            derivatives=derivatives, fitmodel=None,
+                            results=results, uncertainties=uncertainties,
+                            config=config, anchorslist=anchorslist,
+                            lstsq_kwargs=lstsq_kwargs, freeNames=freeNames,
+                            nFreeBkg=nFreeBkg, nFreeParameters=nFreeParameters)
+            lstsq_kwargs['last_svd'] = svd
+            self._telemetry.addTime('refit', time.time() - t0)
+        outbuffer.extend('parameters', results, axis=1)
+        outbuffer.extend('uncertainties', uncertainties, axis=1)
+        if nFreeParameters is not None:
+            nObs = McaStackView.sliceLen(sliceChan, data.shape[-1])
+            outbuffer.extend('nFreeParameters', nFreeParameters, axis=0)
+            outbuffer.extend('nObservations',
+                             numpy.full(data.shape[:-1], nObs,
+                                        dtype=numpy.int32), axis=0)
+
+    @staticmethod
+    def _fitLstSqKwargs(weightPolicy=None, weight=None, yref=None,
+                        sliceChan=None, nSpectra=None):
+        """Keyword arguments of the least-squares solver
+        """
+        if weightPolicy == 2:
+            # Individual spectrum weights (assumed Poisson)
+            SVD = False
+            sigma_b = None
+        elif weightPolicy == 1:
+            # Average weight from sum spectrum (assume Poisson)
+            # the +1 is to prevent misbehavior due to weights less than 1.0
+            sigma_b = 1 + numpy.sqrt(yref[sliceChan])/nSpectra
+            sigma_b = sigma_b.reshape(-1, 1)
+            SVD = True
+        else:
+            # No weights
+            SVD = True
+            sigma_b = None
+        return {'svd': SVD, 'sigma_b': sigma_b, 'weight': weight}
+
     @staticmethod
     def _fitParseData(x=None, y=None, livetime=None):
         """Parse the input data (MCA and livetime)
@@ -448,7 +660,7 @@ def _fitReferenceSpectrum(self, data=None, mcaIndex=None, sumover='all'):
             # First spectrum
             idx = [0]*data.ndim
             idx[mcaIndex] = slice(None)
-            yref = data[idx].astype(dtype)
+            yref = data[tuple(idx)].astype(dtype)
         return yref
 
     def _fitCreateModel(self, dtype=None):
@@ -574,7 +786,8 @@ def _fitLstSqAll(self, data=None, sliceChan=None, mcaIndex=None,
                                          mcaSlice=sliceChan,
                                          mcaAxis=mcaIndex,
                                          nMca=nMca)
-        for chunk in chunkItems:
+        telemetry = self._telemetry
+        for chunk in telemetry.iterStage(chunkItems, 'read'):
             if fitmodel is None:
                 (idx, idxShape), chunk = chunk
                 chunkModel = None
@@ -582,17 +795,22 @@ def _fitLstSqAll(self, data=None, sliceChan=None, mcaIndex=None,
                 ((idx, idxShape), chunk), (_, chunkModel) = chunk
                 chunkModel = chunkModel.T
             chunk = chunk.T
+            telemetry.increment('bytes_read', chunk.nbytes)
 
             # Subtract background
             if bkgsub:
-                self._fitBkgSubtract(chunk, config=config,
-                                     anchorslist=anchorslist,
-                                     fitmodel=chunkModel)
+                with telemetry.stage('background'):
+                    self._fitBkgSubtract(chunk, config=config,
+                                         anchorslist=anchorslist,
+                                         fitmodel=chunkModel)
 
             # Solve linear system of equations
-            ddict = lstsq(derivatives, chunk, digested_output=True,
-                          **lstsq_kwargs)
+            with telemetry.stage('lstsq'):
+                ddict = lstsq(derivatives, chunk, digested_output=True,
+                              **lstsq_kwargs)
             lstsq_kwargs['last_svd'] = ddict.get('svd', None)
+            telemetry.increment('spectra_fitted', chunk.shape[1])
+            telemetry.progress(chunk.shape[1])
 
             # Save results
             idx = (slice(None),) + idx
@@ -643,7 +861,8 @@ def _fitLstSqReduced(self, data=None, sliceChan=None, mcaIndex=None,
                                              mcaSlice=sliceChan,
                                              mcaAxis=mcaIndex,
                                              nMca=nMca)
-            for chunk in chunkItems:
+            telemetry = self._telemetry
+            for chunk in telemetry.iterStage(chunkItems, 'read'):
                 if fitmodel is None:
                     (idx, idxShape), chunk = chunk
                     chunkModel = None
@@ -651,17 +870,21 @@ def _fitLstSqReduced(self, data=None, sliceChan=None, mcaIndex=None,
                     ((idx, idxShape), chunk), (_, chunkModel) = chunk
                     chunkModel = chunkModel.T
                 chunk = chunk.T
+                telemetry.increment('bytes_read', chunk.nbytes)
 
                 # Subtract background
                 if bkgsub:
-                    self._fitBkgSubtract(chunk, config=config,
-                                         anchorslist=anchorslist,
-                                         fitmodel=chunkModel)
+                    with telemetry.stage('background'):
+                        self._fitBkgSubtract(chunk, config=config,
+                                             anchorslist=anchorslist,
+                                             fitmodel=chunkModel)
 
                 # Solve linear system of equations
-                ddict = lstsq(A, chunk, digested_output=True,
-                              **lstsq_kwargs)
+                with telemetry.stage('lstsq'):
+                    ddict = lstsq(A, chunk, digested_output=True,
+                                  **lstsq_kwargs)
                 lstsq_kwargs['last_svd'] = ddict.get('svd', None)
+                telemetry.increment('spectra_refitted', chunk.shape[1])
 
                 # Save results
                 iParam = 0
@@ -787,6 +1010,7 @@ def _fitLstSqNegative(self, data=None, freeNames=None, nFreeBkg=None,
             nmin = 0.0025 * badMask.size
             _logger.debug("Refit iteration #{}. Fixed to zero: {}"
                           .format(iIter, badNames))
+            self._telemetry.increment('refit_iterations')
             self._fitLstSqReduced(data=data, mask=badMask,
                                   skipParams=badParameters,
                                   skipNames=badNames,
@@ -1008,7 +1232,8 @@ def main():
                    'tif=', 'edf=', 'csv=', 'h5=',
                    'filepattern=', 'begin=', 'end=', 'increment=',
                    'outroot=', 'outentry=', 'outprocess=',
-                   'diagnostics=', 'debug=', 'overwrite=']
+                   'diagnostics=', 'debug=', 'overwrite=',
+                   'compression=', 'jobs=']
     try:
         opts, args = getopt.getopt(
                      sys.argv[1:],
@@ -1038,6 +1263,8 @@ def main():
     saveData = 0
     debug = 0
     overwrite = 1
+    compression = None
+    nthreads = None
     for opt, arg in opts:
         if opt == '--cfg':
             configurationFile = arg
@@ -1089,6 +1316,10 @@ def main():
             debug = int(arg)
         elif opt == '--overwrite':
             overwrite = int(arg)
+        elif opt == '--compression':
+            compression = arg
+        elif opt == '--jobs':
+            nthreads = int(arg)
 
     logging.basicConfig()
     if debug:
@@ -1123,7 +1354,8 @@ def main():
                         outputRoot=outputRoot, fileEntry=fileEntry,
                         fileProcess=fileProcess, saveData=saveData,
                         saveFit=saveFit, saveResiduals=saveResiduals,
-                        tif=tif, edf=edf, csv=csv, h5=h5, overwrite=overwrite)
+                        tif=tif, edf=edf, csv=csv, h5=h5, overwrite=overwrite,
+                        compression=compression, nthreads=nthreads)
 
     from PyMca5.PyMcaMisc import ProfilingUtils
     with ProfilingUtils.profile(memory=debug, time=debug):
@@ -38,6 +38,7 @@
 from six import string_types
 from contextlib import contextmanager
 from PyMca5.PyMcaIO import NexusUtils
+from PyMca5.PyMcaIO import HDF5ChunkWriter
 
 _logger = logging.getLogger(__name__)
 
@@ -46,7 +47,8 @@ class OutputBuffer(object):
 
     def __init__(self, outputDir=None, outputRoot=None, fileEntry=None,
                  fileProcess=None, tif=False, edf=False, csv=False, h5=True,
-                 overwrite=False, saveResiduals=False, saveFit=False, saveData=False):
+                 overwrite=False, saveResiduals=False, saveFit=False, saveData=False,
+                 compression=None, nthreads=None):
         """
         Fast fitting output buffer, to be saved as:
          .h5 : outputDir/outputRoot.h5::/fileEntry/fileProcess
@@ -74,9 +76,13 @@ def __init__(self, outputDir=None, outputRoot=None, fileEntry=None,
         :param bool csv:
         :param bool h5:
         :param bool overwrite:
+        :param compression: compression of the HDF5 fit cubes (model, residuals
+                            and data), see HDF5ChunkWriter.getCompressionOptions
+        :param int nthreads: number of threads compressing the cubes
         """
         self._init_buffer = False
         self._output = {}
+        self._capacity = {}
         self._nxprocess = None
 
         self.outputDir = outputDir
@@ -91,6 +97,8 @@ def __init__(self, outputDir=None, outputRoot=None, fileEntry=None,
         self.saveFit = saveFit
         self.saveData = saveData
         self.overwrite = overwrite
+        self.compression = compression
+        self.nthreads = nthreads
 
     @property
     def outputRoot(self):
@@ -199,6 +207,24 @@ def overwrite(self, value):
         self._check_bufferContext()
         self._overwrite = value
 
+    @property
+    def compression(self):
+        return self._compression
+
+    @compression.setter
+    def compression(self, value):
+        self._check_bufferContext()
+        self._compression = value
+
+    @property
+    def nthreads(self):
+        return self._nthreads
+
+    @nthreads.setter
+    def nthreads(self, value):
+        self._check_bufferContext()
+        self._nthreads = value
+
     def _check_bufferContext(self):
         if self._init_buffer:
             raise RuntimeError('Buffer is locked')
@@ -240,23 +266,84 @@ def allocateMemory(self, name, fill_value=None, shape=None, dtype=None):
             buffer = numpy.zeros(shape, dtype=dtype)
         else:
             buffer = numpy.full(shape, fill_value, dtype=dtype)
+        self._capacity.pop(name, None)
+        self._output[name] = buffer
+        return buffer
+
+    def extend(self, name, data, axis=0):
+        """
+        Append data to a buffer along an axis. The buffer is created when
+        missing. Memory buffers keep spare capacity so that appending is
+        amortized, HDF5 datasets must be resizable along the axis.
+
+        :param str name:
+        :param numpy.ndarray data:
+        :param int axis:
+        :returns: the extended buffer
+        """
+        buffer = self._output.get(name, None)
+        data = numpy.asarray(data)
+        if buffer is None:
+            n = data.shape[axis]
+            shape = list(data.shape)
+            shape[axis] = max(2 * n, 1)
+            self._capacity[name] = numpy.empty(shape, dtype=data.dtype)
+            buffer = self._capacity[name][self._axisSlice(axis, 0, n)]
+            buffer[()] = data
+        elif isinstance(buffer, NexusUtils.h5py.Dataset):
+            n = buffer.shape[axis]
+            buffer.resize(n + data.shape[axis], axis=axis)
+            buffer[self._axisSlice(axis, n, None)] = data
+            self.flush()
+        else:
+            n = buffer.shape[axis]
+            nnew = n + data.shape[axis]
+            capacity = self._capacity.get(name, None)
+            if capacity is None or capacity.shape[axis] < nnew:
+                shape = list(buffer.shape)
+                shape[axis] = max(2 * nnew, 1)
+                capacity = numpy.empty(shape, dtype=buffer.dtype)
+                capacity[self._axisSlice(axis, 0, n)] = buffer
+                self._capacity[name] = capacity
+            buffer = capacity[self._axisSlice(axis, 0, nnew)]
+            buffer[self._axisSlice(axis, n, None)] = data
         self._output[name] = buffer
         return buffer
 
-    def allocateH5(self, name, nxdata=None, fill_value=None, **kwargs):
+    @staticmethod
+    def _axisSlice(axis, start, stop):
+        return (slice(None),) * axis + (slice(start, stop),)
+
+    def allocateH5(self, name, nxdata=None, fill_value=None, mcaIndex=-1,
+                   **kwargs):
         """
+        With compression, the dataset chunks are chosen for spectrum and
+        image access and the initial data (if any) are compressed in parallel.
+
         :param str name:
         :param str nxdata:
         :param num fill_value:
+        :param int mcaIndex: spectrum axis (used to choose the chunks)
         :param \**kwargs: see h5py.Group.create_dataset
         """
         parent = self._nxprocess['results']
         if nxdata:
             parent = NexusUtils.nxData(parent, nxdata)
-        buffer = parent.create_dataset(name, **kwargs)
-        if fill_value is not None:
-            buffer[()] = fill_value
+        if self.compression:
+            if fill_value is not None:
+                # nothing to compress until written
+                kwargs['fillvalue'] = fill_value
+            buffer = HDF5ChunkWriter.createDataset(parent, name,
+                                                   compression=self.compression,
+                                                   mcaIndex=mcaIndex,
+                                                   nthreads=self.nthreads,
+                                                   **kwargs)
+        else:
+            buffer = parent.create_dataset(name, **kwargs)
+            if fill_value is not None:
+                buffer[()] = fill_value
         self.flush()
+        self._capacity.pop(name, None)
         self._output[name] = buffer
         return buffer
 
@@ -386,6 +473,11 @@ def save(self):
                 self._saveSingle()
             if self.h5:
                 self._saveH5()
+            telemetry = self.get('telemetry', None)
+            if telemetry is not None:
+                telemetry.addTime('write', time.time() - t0)
+                if self.h5:
+                    self._saveH5Telemetry()
 
         t = time.time() - t0
         _logger.debug("Saving results elapsed = %f", t)
@@ -522,3 +614,24 @@ def _saveH5(self):
         if signals:
             nxdata = NexusUtils.nxData(nxresults, 'diagnostics')
             NexusUtils.nxDataAddSignals(nxdata, signals)
+
+    def _saveH5Telemetry(self):
+        """
+        Save stage timers and counters in NXprocess/telemetry
+        """
+        nxprocess = self._nxprocess
+        if nxprocess is None:
+            return
+        ddict = self['telemetry'].asDict()
+        if 'telemetry' in nxprocess:
+            del nxprocess['telemetry']
+        nxtelemetry = NexusUtils.nxCollection(nxprocess, 'telemetry')
+        timers = NexusUtils.nxCollection(nxtelemetry, 'timers')
+        for name, value in ddict['timers'].items():
+            timers[name] = value
+            timers[name].attrs['units'] = 's'
+        counters = NexusUtils.nxCollection(nxtelemetry, 'counters')
+        for name, value in ddict['counters'].items():
+            counters[name] = value
+        nxtelemetry['elapsed'] = ddict['elapsed']
+        nxtelemetry['elapsed'].attrs['units'] = 's'
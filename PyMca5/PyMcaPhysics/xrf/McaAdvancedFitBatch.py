@@ -32,6 +32,7 @@
 __copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
 import sys
 import os
+import time
 import numpy
 from . import ClassMcaTheory
 from PyMca5.PyMcaCore import SpecFileLayer
@@ -49,6 +50,8 @@
 except ImportError:
     HDF5SUPPORT = False
 from PyMca5.PyMcaIO import ConfigDict
+from PyMca5.PyMcaIO import specfilewrapper
+from PyMca5.PyMcaMisc import ProfilingUtils
 from . import ConcentrationsTool
 
 
@@ -59,7 +62,8 @@ def __init__(self,initdict,filelist=None,outputdir=None,
                     concentrations=0, fitfiles=1, fitimages=1,
                     filebeginoffset = 0, fileendoffset=0,
                     mcaoffset=0, chunk = None,
-                    selection=None, lock=None, nosave=None, quiet=False):
+                    selection=None, lock=None, nosave=None, quiet=False,
+                    progresscallback=None):
         #for the time being the concentrations are bound to the .fit files
         #that is not necessary, but it will be correctly implemented in
         #future releases
@@ -105,6 +109,10 @@ def __init__(self,initdict,filelist=None,outputdir=None,
         self.chunk     = chunk
         self.selection = selection
         self.quiet = quiet
+        # stage timers (read, fit, concentrations, write), counters
+        # (bytes_read, spectra_fitted) and progress reporting
+        self.telemetry = ProfilingUtils.Telemetry( \
+                                        progressCallback=progresscallback)
 
 
     def setFileList(self,filelist=None):
@@ -162,8 +170,15 @@ def setOutputDir(self,outputdir=None):
         if outputdir is None:outputdir=os.getcwd()
         self._outputdir = outputdir
 
+    def getTelemetry(self):
+        """
+        Return the stage timers and counters of the last processing
+        """
+        return self.telemetry.asDict()
+
     def processList(self):
         self.counter =  0
+        self.telemetry.reset()
         self.__row   = self.fileBeginOffset - 1
         self.__stack = None
         for i in range(0+self.fileBeginOffset,
@@ -179,7 +194,8 @@ def processList(self):
             inputfile   = self._filelist[i]
             self.__row += 1 #should be plus fileStep?
             self.onNewFile(inputfile, self._filelist)
-            self.file = self.getFileHandle(inputfile)
+            with self.telemetry.stage('read'):
+                self.file = self.getFileHandle(inputfile)
             if self.pleaseBreak: break
             if self.__stack is None:
                 self.__stack = False
@@ -202,7 +218,11 @@ def processList(self):
                     self.listfile.write(']\n')
                     self.listfile.close()
             if (self.__ncols is not None) and (not self._nosave):
-                if self.__ncols:self.saveImage()
+                if self.__ncols:
+                    with self.telemetry.stage('write'):
+                        self.saveImage()
+        self.telemetry.progress(0, force=True)
+        self.telemetry.log()
         self.onEnd()
 
     def getFileHandle(self,inputfile):
@@ -328,6 +348,8 @@ def __processStack(self):
         keylist = ["1.1"] * nimages
         for i in range(nimages):
             keylist[i] = "1.%04d" % i
+        self.telemetry.total = nimages * \
+                    len(range(0 + self.mcaOffset, numberofmca, self.mcaStep))
 
         for i in range(nimages):
             if self.pleaseBreak: break
@@ -339,7 +361,9 @@ def __processStack(self):
             self.__row = i
             self.__col = -1
             try:
-                cache_data = data[i, :, :]
+                with self.telemetry.stage('read'):
+                    cache_data = data[i, :, :]
+                self.telemetry.increment('bytes_read', cache_data.nbytes)
             except:
                 print("Error reading dataset row %d" % i)
                 print(sys.exc_info())
@@ -369,6 +393,7 @@ def __processStack(self):
                     infoDict["McaLiveTime"] = \
                             info["McaLiveTime"][i * numberofmca + mca]
                 self.__processOneMca(x, y0, filename, key, info=infoDict)
+                self.telemetry.progress()
                 self.onMca(mca, numberofmca, filename=filename,
                                             key=key,
                                             info=infoDict)
@@ -382,7 +407,10 @@ def __processOneFile(self):
                 if self.pleaseBreak: break
                 self.onImage(scankey, fileinfo['KeyList'])
                 scan,order = scankey.split(".")
-                info,data  = ffile.LoadSource(scankey)
+                with self.telemetry.stage('read'):
+                    info,data  = ffile.LoadSource(scankey)
+                if hasattr(data, "nbytes"):
+                    self.telemetry.increment('bytes_read', data.nbytes)
                 if info['SourceType'] == "EdfFile":
                     nrows = int(info['Dim_1'])
                     ncols = int(info['Dim_2'])
@@ -407,6 +435,7 @@ def __processOneFile(self):
                         infoDict['Key']        = key
                         infoDict['McaLiveTime'] = info.get('McaLiveTime', None)
                         self.__processOneMca(x,y0,filename,key,info=infoDict)
+                        self.telemetry.progress()
                         self.onMca(mca, numberofmca, filename=filename,
                                                     key=key,
                                                     info=infoDict)
@@ -445,6 +474,15 @@ def __processOneFile(self):
                                 self.__ncols *= len(fileinfo['KeyList'])
                                 self.__ncolsModified = True
 
+                        # spectra are parsed in blocks instead of one by one
+                        lastMca = self.mcaOffset + 1 + \
+                                  (numberOfMcaToTakeFromScan - 1) * self.mcaStep
+                        mcaBlocks = specfilewrapper.iterMcaBlocks(scan_obj,
+                                                        self.mcaOffset + 1,
+                                                        lastMca,
+                                                        self.mcaStep)
+                        block = None
+                        blockIndex = 0
                         #import time
                         for mca_index in range(numberOfMcaToTakeFromScan):
                             i = 0 + self.mcaOffset + mca_index * self.mcaStep
@@ -461,14 +499,20 @@ def __processOneFile(self):
                             key = "%s.%s.%05d.%d" % (scan,order,point,mca)
                             autotime = self.mcafit.config["concentrations"].get(\
                                         "useautotime", False)
+                            t0 = time.time()
                             if autotime:
                                 #slow info reading methods needed to access time
                                 mcainfo,mcadata = ffile.LoadSource(key)
                                 info['McaLiveTime'] = mcainfo.get('McaLiveTime',
                                                               None)
                             else:
-                                mcadata = scan_obj.mca(i+1)
+                                if (block is None) or \
+                                   (mca_index >= blockIndex + block.shape[0]):
+                                    blockIndex, block = next(mcaBlocks)
+                                mcadata = block[mca_index - blockIndex]
                             y0  = numpy.array(mcadata)
+                            self.telemetry.addTime('read', time.time() - t0)
+                            self.telemetry.increment('bytes_read', y0.nbytes)
                             x = numpy.arange(len(y0))*1.0 + \
                                 self.__chann0List[mca-1]
                             filename = os.path.basename(info['SourceName'])
@@ -479,6 +523,7 @@ def __processOneFile(self):
                             infoDict['McaLiveTime'] = info.get('McaLiveTime',
                                                                None)
                             self.__processOneMca(x,y0,filename,key,info=infoDict)
+                            self.telemetry.progress()
                             self.onMca(i, info['NbMca'],filename=filename,
                                                     key=key,
                                                     info=infoDict)
@@ -564,6 +609,7 @@ def __processOneMca(self,x,y,filename,key,info=None):
                         self.mcafit = ClassMcaTheory.McaTheory(config)
                         self.mcafit.enableOptimizedLinearFit()
                     return
+                t0 = time.time()
                 try:
                     self.mcafit.estimate()
                     if self.fitFiles:
@@ -604,6 +650,9 @@ def __processOneMca(self,x,y,filename,key,info=None):
                         self.mcafit = ClassMcaTheory.McaTheory(config)
                         self.mcafit.enableOptimizedLinearFit()
                     return
+                self.telemetry.addTime('fit', time.time() - t0)
+                self.telemetry.increment('spectra_fitted')
+            t0 = time.time()
             if self._concentrations:
                 if concentrationsdone == 0:
                     if not ('concentrations' in result):
@@ -643,9 +692,11 @@ def __processOneMca(self,x,y,filename,key,info=None):
                     f=open(self._concentrationsFile,"a")
                     f.write(text)
                     f.close()
+                self.telemetry.addTime('concentrations', time.time() - t0)
 
             #output options
             # .FIT files
+            t0 = time.time()
             if self.fitFiles:
                 fitdir = self.os_path_join(self._outputdir,"FIT")
                 if not os.path.exists(fitdir):
@@ -696,6 +747,7 @@ def __processOneMca(self,x,y,filename,key,info=None):
                     self.listfile.write('\n'+outfile)
                 else:
                     self.listfile.write(',\n'+outfile)
+                self.telemetry.addTime('write', time.time() - t0)
             else:
                 if not useExistingResult:
                     if 0:
@@ -0,0 +1,239 @@
+#/*##########################################################################
+#
+# The PyMca X-Ray Fluorescence Toolkit
+#
+# Copyright (c) 2004-2019 European Synchrotron Radiation Facility
+#
+# This file is part of the PyMca X-ray Fluorescence Toolkit developed at
+# the ESRF by the Software group.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#############################################################################*/
+__author__ = "V.A. Sole - ESRF Data Analysis"
+__contact__ = "sole@esrf.fr"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+"""
+Content addressed cache of the peak description computed by McaTheory.
+
+Configuring a McaTheory instance requires the calculation of the emission
+lines, escape peaks and (in case a matrix is defined) the fluorescence
+rates of all the elements to be fitted. That calculation only depends on
+the physics described by the fit configuration and not on the spectrum to
+be fitted. The state is stored under the SHA1 hash of a canonical
+representation of the relevant configuration sections, in memory and,
+optionally, on disk in a directory specific to the cache format and to the
+PyMca version.
+
+Usage::
+
+    from PyMca5.PyMcaPhysics.xrf import McaTheoryCache
+    McaTheoryCache.setCacheDirectory("/tmp/mcatheory")
+"""
+import os
+import copy
+import json
+import hashlib
+import logging
+import tempfile
+import numpy
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+from collections import OrderedDict
+from PyMca5 import version as pymcaVersion
+
+_logger = logging.getLogger(__name__)
+
+# increase it whenever the content of the cached state changes
+CACHE_FORMAT_VERSION = 1
+
+# maximum number of configurations kept in memory
+MEMORY_SIZE = 32
+
+# sections of the configuration (or keys of them) with influence on the
+# peak description. A value of None means the whole section.
+KEY_SECTIONS = {"fit": ["energy", "energyweight", "energyflag",
+                        "energyscatter", "scatterflag", "escapeflag",
+                        "fitfunction", "hypermetflag", "continuum",
+                        "linpolorder", "exppolorder", "deltaonepeak"],
+                "detector": ["detele", "noise", "fano", "ethreshold",
+                             "ithreshold", "nthreshold"],
+                "attenuators": None,
+                "multilayer": None,
+                "materials": None,
+                "peaks": None,
+                "concentrations": None,
+                "xrfmc": None}
+
+_ENABLED = True
+_MEMORY = OrderedDict()
+_DIRECTORY = None
+_STATISTICS = {"hits": 0, "misses": 0, "disk hits": 0}
+
+
+def enable(flag=True):
+    global _ENABLED
+    _ENABLED = bool(flag)
+
+
+def disable():
+    enable(False)
+
+
+def isEnabled():
+    return _ENABLED
+
+
+def setCacheDirectory(directory=None):
+    """
+    Set the directory in which states are written to be reused by other
+    processes or sessions. None disables the on-disk cache.
+    """
+    global _DIRECTORY
+    if directory is None:
+        _DIRECTORY = None
+        return
+    _DIRECTORY = os.path.join(directory, "mcatheory_v%d_%s" % \
+                             (CACHE_FORMAT_VERSION, pymcaVersion()))
+    if not os.path.isdir(_DIRECTORY):
+        os.makedirs(_DIRECTORY)
+
+
+def getCacheDirectory():
+    return _DIRECTORY
+
+
+def clear(disk=False):
+    """
+    Empty the memory cache and, if requested, remove the files of the
+    on-disk cache.
+    """
+    _MEMORY.clear()
+    for key in _STATISTICS:
+        _STATISTICS[key] = 0
+    if disk and (_DIRECTORY is not None):
+        for fname in os.listdir(_DIRECTORY):
+            if fname.endswith(".pickle"):
+                os.remove(os.path.join(_DIRECTORY, fname))
+
+
+def getStatistics():
+    return copy.deepcopy(_STATISTICS)
+
+
+def _canonical(item):
+    # representation independent of dictionary order and of the numeric
+    # types used when reading the configuration
+    if hasattr(item, "keys"):
+        return [[str(key), _canonical(item[key])] for key in \
+                sorted(item.keys(), key=str)]
+    if isinstance(item, (list, tuple)):
+        return [_canonical(x) for x in item]
+    if isinstance(item, numpy.ndarray):
+        return [_canonical(x) for x in item.tolist()]
+    if isinstance(item, numpy.generic):
+        item = item.item()
+    if isinstance(item, bool):
+        return int(item)
+    if isinstance(item, float):
+        return repr(item)
+    return item
+
+
+def getKey(config, **kw):
+    """
+    Return the key associated to the physics relevant content of a fit
+    configuration. Additional keyword arguments (i.e. flags of the instance)
+    are part of the key.
+    """
+    ddict = {}
+    for section, keys in KEY_SECTIONS.items():
+        if section not in config:
+            continue
+        if keys is None:
+            ddict[section] = config[section]
+        else:
+            ddict[section] = dict([(key, config[section][key]) \
+                                   for key in keys if key in config[section]])
+    ddict["options"] = kw
+    ddict["version"] = [CACHE_FORMAT_VERSION, pymcaVersion()]
+    text = json.dumps(_canonical(ddict), separators=(",", ":"))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _getFileName(key):
+    return os.path.join(_DIRECTORY, key + ".pickle")
+
+
+def get(key):
+    """
+    Return a copy of the state stored under key or None if not present.
+    """
+    if key in _MEMORY:
+        _MEMORY[key] = _MEMORY.pop(key)
+        _STATISTICS["hits"] += 1
+        return copy.deepcopy(_MEMORY[key])
+    if _DIRECTORY is not None:
+        fname = _getFileName(key)
+        if os.path.exists(fname):
+            try:
+                with open(fname, "rb") as f:
+                    state = pickle.load(f)
+                _store(key, state)
+                _STATISTICS["disk hits"] += 1
+                return copy.deepcopy(state)
+            except Exception:
+                _logger.warning("Ignoring unreadable cache file %s", fname)
+    _STATISTICS["misses"] += 1
+    return None
+
+
+def _store(key, state):
+    _MEMORY[key] = state
+    while len(_MEMORY) > MEMORY_SIZE:
+        _MEMORY.popitem(last=False)
+
+
+def put(key, state):
+    """
+    Store a copy of the state under the given key.
+    """
+    state = copy.deepcopy(state)
+    _store(key, state)
+    if _DIRECTORY is None:
+        return
+    # write to a temporary file first to be safe against concurrent readers
+    fd, tmpName = tempfile.mkstemp(suffix=".tmp", dir=_DIRECTORY)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+        fname = _getFileName(key)
+        if hasattr(os, "replace"):
+            os.replace(tmpName, fname)
+        else:
+            if os.path.exists(fname):
+                os.remove(fname)
+            os.rename(tmpName, fname)
+    except Exception:
+        _logger.warning("Cannot write cache file for key %s", key)
+        if os.path.exists(tmpName):
+            os.remove(tmpName)
@@ -140,9 +140,9 @@
 from PyMca5.PyMcaIO import ConfigDict
 from PyMca5.PyMcaMath.fitting import SpecfitFunctions as SF
 from PyMca5.PyMcaMath import SNIPModule as snip
+from PyMca5.PyMcaMath import CurveAlignment
 from PyMca5.PyMcaMath.fitting.Gefit import LeastSquaresFit as LSF
 from PyMca5.PyMcaMath.fitting.SpecfitFuns import gauss
-from PyMca5.PyMcaMath.fitting import SpecfitFuns
 from os.path import join as pathjoin
 
 _logger = logging.getLogger(__name__)
@@ -661,9 +661,6 @@ def calculateShiftsFit(self, derivative=False, thr=30):
         return retList, retDict
 
     def calculateShiftsMax(self):
-        retDict = {}
-        retList = []
-
         curves = self.getAllCurves()
         nCurves = len(curves)
 
@@ -680,107 +677,49 @@ def calculateShiftsMax(self):
         if xmax0 < xmax:
             xmax = xmax0
 
-        # Get active curve
-        activeCurve = self.getActiveCurve()
-        if activeCurve is None:
-            # If active curve is not set, continue with first curve
-            activeCurve = curves[0]
-        else:
-            activeLegend = activeCurve[2]
-            idx = list.index([curve[2] for curve in curves],
-                             activeLegend)
-            activeCurve = curves[idx]
-
-        x0, y0 = activeCurve[0], activeCurve[1]
-        idx = numpy.nonzero((xmin <= x0) & (x0 <= xmax))[0]
-        x0 = numpy.take(x0, idx)
-        y0 = numpy.take(y0, idx)
-
-        # Determine the index of maximum in active curve
-        shift0 = numpy.argmax(y0)
-        _logger.debug('calculateShiftsMax -- Results:')
-        _logger.debug('\targmax(y) shift')
-        for x, y, legend, info in curves:
-            idx = numpy.nonzero((xmin <= x) & (x <= xmax))[0]
-            x = numpy.take(x, idx)
-            y = numpy.take(y, idx)
-
-            shifty = numpy.argmax(y)
-            shift = x0[shift0] - x[shifty]
-            key = legend
-            retList.append(key)
-            retDict[key] = shift
-            _logger.debug('\t%d %.3f', x[shifty], shift)
+        # Position of the maximum of all curves at once
+        activeIndex = self._getActiveCurveIndex(curves)
+        shifts = CurveAlignment.calculateShiftsMax(
+                                [curve[0] for curve in curves],
+                                [curve[1] for curve in curves],
+                                reference=activeIndex,
+                                xmin=xmin,
+                                xmax=xmax)
+        retList = [curve[2] for curve in curves]
+        retDict = dict(zip(retList, shifts.tolist()))
+        _logger.debug('calculateShiftsMax -- Results: %s', retDict)
         return retList, retDict
 
     def calculateShiftsFFT(self, portion=.95):
-        retDict = {}
-        retList = []
-
-        curves = self.interpolate()
+        curves, xeq, values, mask = self._getResampledCurves()
         nCurves = len(curves)
         if nCurves < 2:
             raise ValueError("At least 2 curves needed")
 
         # Check if scan window is zoomed in
         xmin, xmax = self.getGraphXLimits()
-        # Determine largest overlap between curves
-        xmin0, xmax0 = self.getXLimits(x for (x,y,leg,info) in curves)
-        if xmin0 > xmin:
-            xmin = xmin0
-        if xmax0 < xmax:
-            xmax = xmax0
-        _logger.debug('calculateShiftsFFT -- xmin = %.3f, xmax = %.3f', xmin, xmax)
-
-        # Get active curve
-        activeCurve = self.getActiveCurve()
-        if activeCurve is None:
-            # If active curve is not set, continue with first curve
-            activeCurve = curves[0]
-        else:
-            activeLegend = activeCurve[2]
-            idx = list.index([curve[2] for curve in curves],
-                             activeLegend)
-            activeCurve = curves[idx]
-
-        x0, y0 = activeCurve[0], activeCurve[1]
-        idx = numpy.nonzero((xmin <= x0) & (x0 <= xmax))[0]
-        x0 = numpy.take(x0, idx)
-        y0 = self.normalize(y0)
-        y0 = numpy.take(y0, idx)
-
-        fft0 = numpy.fft.fft(y0)
-        _logger.debug('calculateShiftsFFT -- results (Legend len(idx) shift):')
-        for x,y,legend,info in curves:
-            idx = numpy.nonzero((x >= xmin) & (x <= xmax))[0]
-            x = numpy.take(x, idx)
-            y = numpy.take(y, idx)
-            ffty = numpy.fft.fft(y)
-            shiftTmp = numpy.fft.ifft(fft0 * ffty.conjugate()).real
-            shiftPhase = numpy.zeros(shiftTmp.shape, dtype=shiftTmp.dtype)
-            m = shiftTmp.size//2
-            shiftPhase[m:] = shiftTmp[:-m]
-            shiftPhase[:m] = shiftTmp[-m:]
-            # Normalize shiftPhase to standardize thresholding
-            shiftPhase = self.normalize(shiftPhase)
-
-            # Thresholding
-            xShiftMax = shiftPhase.argmax()
-            left, right = xShiftMax, xShiftMax
-            threshold = portion * shiftPhase.max()
-            while (shiftPhase[left] > threshold)&\
-                  (shiftPhase[right] > threshold):
-                left  -= 1
-                right += 1
-            idx = numpy.arange(left, right+1, 1, dtype=int)
-            # The shift is determined by center-of-mass around shiftMax
-            shiftTmp = (shiftPhase[idx] * idx/shiftPhase[idx].sum()).sum()
-            shift = (shiftTmp - m) * (x[1] - x[0])
-
-            key = legend
-            retList.append(key)
-            retDict[key] = shift
-            _logger.debug('\t%s\t%d\t%f', legend, len(idx), shift)
+        # All the curves are defined on the grid points of their overlap
+        columns = mask.all(axis=0) & (xeq >= xmin) & (xeq <= xmax)
+        if columns.sum() < 2:
+            raise ValueError("Curves do not overlap")
+        _logger.debug('calculateShiftsFFT -- xmin = %.3f, xmax = %.3f',
+                      xeq[columns].min(), xeq[columns].max())
+
+        # Reference normalized over its whole range
+        activeIndex = self._getActiveCurveIndex(curves)
+        y0 = values[activeIndex]
+        y0 = (y0 - y0[mask[activeIndex]].min()) / \
+             numpy.ptp(y0[mask[activeIndex]])
+
+        # All cross-correlations at once
+        shifts = CurveAlignment.calculateShiftsFFT(values[:, columns],
+                                                   reference=y0[columns],
+                                                   step=xeq[1] - xeq[0],
+                                                   portion=portion,
+                                                   normalizeReference=False)
+        retList = [curve[2] for curve in curves]
+        retDict = dict(zip(retList, shifts.tolist()))
+        _logger.debug('calculateShiftsFFT -- results: %s', retDict)
         return retList, retDict
     # END Alignment Methods
 
@@ -822,35 +761,42 @@ def applyShifts(self):
                 return False
 
         _logger.debug('applyShifts -- Shifting ...')
-        for idx, (x, y, legend, info) in enumerate(curves):
-            shift = self.shiftDict[legend]
-
+        # Limit shift to zoomed in area
+        xmin, xmax = self.getGraphXLimits()
+        xList, yList, shifts, selected = [], [], [], []
+        for x, y, legend, info in curves:
+            shift = self.shiftDict.get(legend, None)
             if shift is None:
                 _logger.debug('\tCurve \'%s\' not found in shiftDict\n%s',
                               legend, str(self.shiftDict))
                 continue
-            if shift == float('NaN'):
+            if numpy.isnan(shift):
                 _logger.debug('\tCurve \'%s\' has NaN shift', legend)
                 continue
-
-            # Limit shift to zoomed in area
-            xmin, xmax = self.getGraphXLimits()
             mask = numpy.nonzero((xmin<=x) & (x<=xmax))[0]
-            # Execute method stored in self.shiftMethod
-            xShifted, yShifted = self.shiftMethod(shift, x[mask], y[mask])
-            if idx == 0:
-                replace = True
-            else:
-                replace = False
-            if idx == (len(curves)-1):
-                replot = True
-            else:
-                replot = False
-            # Check if scan number is adopted by new curve
-            _logger.debug('\'%s\' -- shifts -> \'%s\' by %f', self.shiftList[idx], legend, shift)
+            xList.append(x[mask])
+            yList.append(y[mask])
+            shifts.append(shift)
+            selected.append((legend, info))
+
+        # Shift all the curves in one go
+        if self.shiftMethod == self.fftShift:
+            yShiftedList = CurveAlignment.fftShiftCurves(xList, yList, shifts)
+            xShiftedList = xList
+        else:
+            xShiftedList, yShiftedList = [], []
+            for x, y, shift in zip(xList, yList, shifts):
+                xShifted, yShifted = self.shiftMethod(shift, x, y)
+                xShiftedList.append(xShifted)
+                yShiftedList.append(yShifted)
+
+        for idx, (legend, info) in enumerate(selected):
+            replace = (idx == 0)
+            replot = (idx == (len(selected) - 1))
+            _logger.debug('\'%s\' shifted by %f', legend, shifts[idx])
             #selectionlegend = info.get('selectionlegend', legend)
             selectionlegend = legend
-            self.addCurve(xShifted, yShifted,
+            self.addCurve(xShiftedList[idx], yShiftedList[idx],
                           (selectionlegend + ' SHIFT'),
                           info=info,
                           replace=replace,
@@ -860,10 +806,8 @@ def applyShifts(self):
 
     # BEGIN Shift Methods
     def fftShift(self, shift, x, y):
-        yShifted = numpy.fft.ifft(
-             numpy.exp(-2.0*numpy.pi*numpy.sqrt(numpy.complex(-1))*\
-                numpy.fft.fftfreq(len(x), d=x[1]-x[0])*shift)*numpy.fft.fft(y))
-        return x, yShifted.real
+        yShifted = CurveAlignment.fftShiftCurves([x], [y], [shift])[0]
+        return x, yShifted
 
     def xShift(self, shift, x, y):
         return x+shift, y
@@ -984,40 +928,54 @@ def interpolate(self, factor=1.):
             in the plot window.
             Format: [(x0, y0, legend0, info0), ...]
         """
+        curves, xeq, values, mask = self._getResampledCurves(factor)
+        interpCurves = []
+        for i, (x, y, legend, info) in enumerate(curves):
+            interpCurves += [(xeq[mask[i]], values[i][mask[i]], legend, info)]
+        return interpCurves
+
+    def _getResampledCurves(self, factor=1.):
+        """
+        Interpolates all the curves at once on the equidistant x-range
+        used by interpolate.
+
+        Returns
+        -------
+        curves : list
+            Curves as returned by getAllCurves
+        xeq : ndarray
+            Equidistant x-range
+        values : ndarray
+            Interpolated curves, shape (len(curves), len(xeq))
+        mask : ndarray
+            True where xeq lies within the x-range of each curve
+        """
         curves = self.getAllCurves()
         if len(curves) < 1:
             _logger.debug('interpolate -- no curves present')
             raise ValueError("At least 1 curve needed")
-            return
 
+        xList = [curve[0] for curve in curves]
+        # Average spacing between data points of the active curve
+        xeq = CurveAlignment.getCommonGrid(xList,
+                                reference=self._getActiveCurveIndex(curves),
+                                factor=factor)
+        values, mask = CurveAlignment.resampleCurves(xList,
+                                        [curve[1] for curve in curves],
+                                        xeq)
+        return curves, xeq, values, mask
+
+    def _getActiveCurveIndex(self, curves):
+        """
+        Index of the active curve in curves, 0 if there is none.
+        """
         activeCurve = self.getActiveCurve()
         if not activeCurve:
-            activeCurve = curves[0]
-        else:
-            activeLegend = activeCurve[2]
-            idx = list.index([curve[2] for curve in curves],
-                             activeLegend)
-            activeCurve = curves[idx]
-        activeX, activeY, activeLegend, activeInfo = activeCurve[0:4]
-
-        # Determine average spaceing between Datapoints
-        step = numpy.average(numpy.diff(activeX))
-        xmin, xmax = self.getXLimits([x for (x,y,leg,info) in curves],
-                                     overlap=False)
-        num  = factor * numpy.ceil((xmax-xmin)/step)
-
-        # Create equidistant x-range, exclude first and last point
-        xeq = numpy.linspace(xmin, xmax, num, endpoint=False)[:-1]
-
-        # Interpolate on sections of xeq
-        interpCurves = []
-        for (x,y,legend,info) in curves:
-            idx = numpy.nonzero((x.min()<xeq) & (xeq<x.max()))[0]
-            xi = numpy.take(xeq, idx)
-            yi = SpecfitFuns.interpol([x], y, xi.reshape(-1,1), y.min())
-            yi.shape = -1
-            interpCurves += [(xi, yi, legend, info)]
-        return interpCurves
+            return 0
+        legends = [curve[2] for curve in curves]
+        if activeCurve[2] in legends:
+            return legends.index(activeCurve[2])
+        return 0
 
     def getXLimits(self, values, overlap=True):
         """
@@ -40,6 +40,7 @@
 
 import logging
 from PyMca5 import StackPluginBase
+from PyMca5.PyMcaMath import StackOperations
 from PyMca5.PyMcaGui import SGWindow
 from PyMca5.PyMcaGui import SNIPWindow
 from PyMca5.PyMcaGui import PyMca_Icons as PyMca_Icons
@@ -176,9 +177,6 @@ def subtractActiveCurve(self):
             raise ValueError("No active curve")
         x, y, legend, info = curve[:4]
         stack = self.getStackDataObject()
-        if not isinstance(stack.data, numpy.ndarray):
-            text = "This method does not work with dynamically loaded stacks"
-            raise TypeError(text)
         x0, y0, legend0, info0 = self.getStackOriginalCurve()[:4]
         if self.getGraphXLabel().upper() not in ["CHANNEL", "POINTS"]:
             # get the used calibration
@@ -195,37 +193,18 @@ def subtractActiveCurve(self):
             idx = numpy.nonzero(selection)[0]
             if not idx.size:
                 raise ValueError("Curves do not overlap")
-            xwork = x0[idx]
             # we have got the final x values, interpolate into the
-            # curve to be subtracted
-            ywork = numpy.interp(xwork, x, y)
-            #proceed to subtract the data
-            notIdx = numpy.nonzero(selection == False)[0]
-            mcaIndex = stack.info.get('McaIndex', -1)
-            if mcaIndex in [-1, 2]:
-                #for i in range(stack.data.shape[-1]):
-                stack.data[:, :, idx] = stack.data[:, :, idx] - ywork
-                stack.data[:, :, notIdx] = 0.0
-            elif mcaIndex == 0:
-                counter = 0
-                for i in range(stack.data.shape[0]):
-                    if i in idx:
-                        stack.data[i] -= ywork[counter]
-                        counter += 1
-                    else:
-                        stack.data[i] = 0.0
-            else:
-                raise ValueError("Invalid 1D index %d" % mcaIndex)
+            # curve to be subtracted. The channels outside the curve
+            # are flagged as not valid and set to 0.
+            ywork = numpy.empty(x0.shape, numpy.float64)
+            ywork[:] = numpy.nan
+            ywork[idx] = numpy.interp(x0[idx], x, y)
         else:
-            mcaIndex = stack.info.get('McaIndex', -1)
-            if mcaIndex in [-1, 2]:
-                for i in range(stack.data.shape[-1]):
-                    stack.data[:, :, i] -= y[i]
-            elif mcaIndex == 0:
-                for i in range(stack.data.shape[0]):
-                    stack.data[i] -= y[i]
-            else:
-                raise ValueError("Invalid 1D index %d" % mcaIndex)
+            ywork = y
+        #proceed to subtract the data
+        stack.data = StackOperations.curveOperation(stack.data, ywork,
+                                operation="subtract",
+                                mcaIndex=stack.info.get('McaIndex', -1))
         self.setStack(stack)
 
 MENU_TEXT = "Stack Filtering Options"
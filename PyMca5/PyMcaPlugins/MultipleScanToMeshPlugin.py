@@ -30,9 +30,9 @@
 import sys
 import numpy
 import logging
-from matplotlib.mlab import griddata
 
 from PyMca5 import Plugin1DBase
+from PyMca5.PyMcaMath import ScanGridding
 from PyMca5.PyMcaGui import MaskImageWidget
 from PyMca5.PyMcaGui import PyMcaQt as qt
 
@@ -48,6 +48,8 @@ def __init__(self, plotWindow, **kw):
                                               None]
 
         self._rixsWidget = None
+        # "interpolation" or "binning", see PyMcaMath.ScanGridding
+        self._gridMethod = "interpolation"
 
     #Methods to be implemented by the plugin
     def getMethods(self, plottype=None):
@@ -164,90 +166,57 @@ def _rixsID26(self):
         else:
             factor = 1.0
 
-        motor2Values = numpy.zeros((nCurves,), numpy.float64)
-        xData = numpy.zeros((nData,), numpy.float32)
-        yData = numpy.zeros((nData,), numpy.float32)
-        zData = numpy.zeros((nData,), numpy.float32)
-        start = 0
+        # each curve is a line in the (incident energy, energy transfer)
+        # plane: vertical when the incident energy is fixed, diagonal when
+        # the emission energy is fixed
+        offsets = numpy.zeros((nCurves,), numpy.float64)
+        yList = []
+        zList = []
         for i in range(nCurves):
             idx = orderIndex[i]
             curve = allCurves[idx]
             info = curve[3]
-            nPoints = max(curve[0].shape)
-            end = start + nPoints
-            x = curve[0]
-            z = curve[1]
-            x.shape = -1
-            z.shape = -1
+            x = numpy.ravel(curve[0]) * factor
+            motorValue = info["MotorValues"][fixedMotorIndex] * factor
+            offsets[i] = motorValue
             if fixedMotorMne == "Mono.Energy":
-                xData[start:end] = info["MotorValues"][fixedMotorIndex] * factor
-                yData[start:end] = x * factor
+                yList.append(motorValue - x)
             else:
-                xData[start:end] = x * factor
-                yData[start:end] = info["MotorValues"][fixedMotorIndex] * factor
-            zData[start:end] = z
-            start = end
+                yList.append(x - motorValue)
+            zList.append(numpy.ravel(curve[1]))
+        if fixedMotorMne == "Mono.Energy":
+            slope = 0.0
+        else:
+            slope = 1.0
 
         # construct the grid in steps of eStep eV
         eStep = 0.05
-        n = (xMax - xMin) * (factor / eStep)
+        n = max(int((xMax - xMin) * (factor / eStep)), 2)
         grid0 = numpy.linspace(xMin * factor, xMax * factor, n)
-        grid1 = numpy.linspace(yData.min(), yData.max(), n)
-
-        # create the meshgrid
-        xx, yy = numpy.meshgrid(grid0, grid1)
-
-        if 0:
-            # get the interpolated values
-            try:
-                zz = griddata(xData, yData, zData, xx, yy)
-            except RuntimeError:
-                zz = griddata(xData, yData, zData, xx, yy, interp='linear')
-
-            # show them
-            if self._rixsWidget is None:
-                self._rixsWidget = MaskImageWidget.MaskImageWidget(\
-                                            imageicons=False,
-                                            selection=False,
-                                            profileselection=True,
-                                            scanwindow=self)
-            self._rixsWidget.setImageData(zz,
-                                          xScale=(xx.min(), xx.max()),
-                                          yScale=(yy.min(), yy.max()))
-            self._rixsWidget.show()
-        elif 1:
-            etData = xData - yData
-            grid3 = numpy.linspace(etData.min(), etData.max(), n)
-            # create the meshgrid
-            xx, yy = numpy.meshgrid(grid0, grid3)
-
-            # get the interpolated values
-            try:
-                zz = griddata(xData, etData, zData, xx, yy)
-            except RuntimeError:
-                # Natural neighbor interpolation not always possible
-                zz = griddata(xData, etData, zData, xx, yy, interp='linear')
-
-            if self._rixsWidget is None:
-                self._rixsWidget = MaskImageWidget.MaskImageWidget(\
-                                            imageicons=False,
-                                            selection=False,
-                                            aspect=True,
-                                            profileselection=True,
-                                            scanwindow=self)
-                self._rixsWidget.setLineProjectionMode('X')
-            #actualMax = zData.max()
-            #actualMin = zData.min()
-            #zz = numpy.where(numpy.isfinite(zz), zz, actualMax)
-            shape = zz.shape
-            xScale = (xx.min(), (xx.max() - xx.min())/float(zz.shape[1]))
-            yScale = (yy.min(), (yy.max() - yy.min())/float(zz.shape[0]))
-            self._rixsWidget.setImageData(zz,
-                                          xScale=xScale,
-                                          yScale=yScale)
-            self._rixsWidget.setXLabel("Incident Energy (eV)")
-            self._rixsWidget.setYLabel("Energy Transfer (eV)")
-            self._rixsWidget.show()
+        etMin = min([y.min() for y in yList])
+        etMax = max([y.max() for y in yList])
+        grid3 = numpy.linspace(etMin, etMax, n)
+
+        # get the interpolated values
+        zz = ScanGridding.gridScans(offsets, yList, zList, grid0, grid3,
+                                    slope=slope, method=self._gridMethod)
+
+        if self._rixsWidget is None:
+            self._rixsWidget = MaskImageWidget.MaskImageWidget(\
+                                        imageicons=False,
+                                        selection=False,
+                                        aspect=True,
+                                        profileselection=True,
+                                        scanwindow=self)
+            self._rixsWidget.setLineProjectionMode('X')
+        xScale = (grid0[0], (grid0[-1] - grid0[0])/float(zz.shape[1]))
+        yScale = (grid3[0], (grid3[-1] - grid3[0])/float(zz.shape[0]))
+        self._rixsWidget.setImageData(zz,
+                                      xScale=xScale,
+                                      yScale=yScale)
+        self._rixsWidget.setXLabel("Incident Energy (eV)")
+        self._rixsWidget.setYLabel("Energy Transfer (eV)")
+        self._rixsWidget.show()
         return
 
 MENU_TEXT = "MultipleScanToMeshPlugin"
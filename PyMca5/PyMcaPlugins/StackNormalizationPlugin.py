@@ -58,6 +58,7 @@
 import numpy
 import logging
 from PyMca5 import StackPluginBase
+from PyMca5.PyMcaMath import StackOperations
 # Add support for normalization by data
 from PyMca5.PyMca import PyMcaFileDialogs
 from PyMca5.PyMca import EdfFile
@@ -205,22 +206,20 @@ def logNormalizeByExternalImage(self):
         self._externalImageOperation("log")
 
     def _externalImageOperation(self, operation="divide"):
-        if operation == "log":
-            operator = numpy.log
         stack = self.getStackDataObject()
         if stack is None:
             return
-        if not isinstance(stack.data, numpy.ndarray):
-            text = "This method does not work with dynamically loaded stacks yet"
-            raise TypeError(text)
         normalizationData = self._loadExternalData()
         if normalizationData is None:
             return
         mcaIndex = stack.info.get('McaIndex', -1)
         stackShape = stack.data.shape
         if mcaIndex < 0:
-            mcaIndex = len(stackShape) - mcaIndex
-        imageSize = stack.data.size / stackShape[mcaIndex]
+            mcaIndex = len(stackShape) + mcaIndex
+        imageSize = 1
+        for i, n in enumerate(stackShape):
+            if i != mcaIndex:
+                imageSize *= n
         if normalizationData.size != imageSize:
             if normalizationData.shape[0] == imageSize:
                 if len(normalizationData.shape) == 2:
@@ -228,48 +227,16 @@ def _externalImageOperation(self, operation="divide"):
                     normalizationData = normalizationData[:, -1]
         if normalizationData.size != imageSize:
                 raise ValueError("Loaded data size does not match required size")
-        if normalizationData.dtype not in [numpy.float,
-                                           numpy.float32,
-                                           numpy.float64]:
-            normalizationData = normalizationData.astype(numpy.float32)
+        normalizationData = numpy.array(normalizationData, dtype=numpy.float64)
         if operation == "scale":
             normalizationData /= normalizationData.max()
-        # TODO: Use an intermediate array and set divisions 0/0 to 0.
-        if stack.data.dtype in [numpy.int32, numpy.uint32]:
-            view = stack.data.view(numpy.float32)
-        elif stack.data.dtype in [numpy.int64, numpy.uint64]:
-            view = stack.data.view(numpy.float64)
-        else:
-            view = stack.data
-        if mcaIndex == 0:
-            normalizationData.shape = stackShape[1:]
-            if operation in ["divide", "scale"]:
-                for i in range(stackShape[mcaIndex]):
-                    view[i] = stack.data[i] / normalizationData
-            elif operation == "log":
-                for i in range(stackShape[mcaIndex]):
-                    view[i] = -operator(stack.data[i]/normalizationData)
-        elif mcaIndex == 2:
-            normalizationData.shape = stackShape[:2]
-            if operation in ["divide", "scale"]:
-                for i in range(stackShape[mcaIndex]):
-                    view[:, :, i] = stack.data[:, :, i] / normalizationData
-            else:
-                for i in range(stackShape[mcaIndex]):
-                    view[:, :, i] = -operator(stack.data[:, :, i]/ \
-                                                    normalizationData)
-        elif mcaIndex == 1:
-            normalizationData.shape = stackShape[0], stackShape[2]
-            if operation in ["divide", "scale"]:
-                for i in range(stackShape[mcaIndex]):
-                    view[:, i, :] = stack.data[:, i, :] / normalizationData
-            else:
-                for i in range(stackShape[mcaIndex]):
-                    view[:, i, :] = -operator(stack.data[:, i, :]/ \
-                                                    normalizationData)
-        else:
-            raise ValueError("Unsupported 1D index %d" % mcaIndex)
-        self.setStack(view)
+            operation = "divide"
+        # pixels with a non valid normalization are set to 0
+        stack.data = StackOperations.imageOperation(stack.data,
+                                                    normalizationData,
+                                                    operation=operation,
+                                                    mcaIndex=mcaIndex)
+        self.setStack(stack)
 
     def divideByExternalCurve(self):
         stack = self.getStackDataObject()
@@ -279,29 +246,24 @@ def divideByExternalCurve(self):
             text = "This method does not work with dynamically loaded stacks yet"
             raise TypeError(text)
 
-    def divideByCurve(self):
-        stack = self.getStackDataObject()
-        if not isinstance(stack.data, numpy.ndarray):
-            text = "This method does not work with dynamically loaded stacks"
-            raise TypeError(text)
+    def _getActiveCurveValues(self, stack):
         curve = self.getActiveCurve()
         if curve is None:
             text = "Please make sure to have an active curve"
             raise TypeError(text)
-        x, y, legend, info = self.getActiveCurve()
-        yWork = y[y!=0].astype(numpy.float)
+        x, y, legend, info = curve[:4]
         mcaIndex = stack.info.get('McaIndex', -1)
-        if mcaIndex in [-1, 2]:
-            for i, value in enumerate(yWork):
-                stack.data[:, :, i] = stack.data[:,:,i]/value
-        elif mcaIndex == 0:
-            for i, value in enumerate(yWork):
-                stack.data[i, :, :] = stack.data[i,:,:]/value
-        elif mcaIndex == 1:
-            for i, value in enumerate(yWork):
-                stack.data[:, i, :] = stack.data[:,i,:]/value
-        else:
-            raise ValueError("Invalid 1D index %d" % mcaIndex)
+        if y.size != stack.data.shape[mcaIndex]:
+            raise ValueError("Active curve size does not match stack")
+        return y
+
+    def divideByCurve(self):
+        stack = self.getStackDataObject()
+        y = self._getActiveCurveValues(stack)
+        # channels at which the curve is zero are set to 0
+        stack.data = StackOperations.curveOperation(stack.data, y,
+                                operation="divide",
+                                mcaIndex=stack.info.get('McaIndex', -1))
         self.setStack(stack)
 
     def logNormalizeByOne(self):
@@ -312,36 +274,15 @@ def logNormalizeByHundred(self):
 
     def logNormalizeByCurve(self, divider=None):
         stack = self.getStackDataObject()
-        if not isinstance(stack.data, numpy.ndarray):
-            text = "This method does not work with dynamically loaded stacks"
-            raise TypeError(text)
         if divider is None:
-            curve = self.getActiveCurve()
-            if curve is None:
-                text = "Please make sure to have an active curve"
-                raise TypeError(text)
-            x, y, legend, info = self.getActiveCurve()
-            if divider is None:
-                yWork = y[y>0].astype(numpy.float)
-            mcaIndex = stack.info.get('McaIndex', -1)
-            if mcaIndex in [-1, 2]:
-                for i, value in enumerate(yWork):
-                    stack.data[:, :, i] = -numpy.log(stack.data[:,:,i] / value)
-            elif mcaIndex == 0:
-                for i, value in enumerate(yWork):
-                    stack.data[i, :, :] = -numpy.log(stack.data[i,:,:] / value)
-            elif mcaIndex == 1:
-                for i, value in enumerate(yWork):
-                    stack.data[:, i, :] = -numpy.log(stack.data[:,i,:] / value)
-            else:
-                raise ValueError("Invalid 1D index %d" % mcaIndex)
+            # channels at which the curve is not positive are set to 0
+            divider = self._getActiveCurveValues(stack)
+            operation = "log"
         else:
-            # this loop is to try to avoid avoid huge temporary arrays
-            if stack.data.shape[0] > 1:
-                for i in range(stack.data.shape[0]):
-                    stack.data[i] = -numpy.log10(stack.data[i] / divider)
-            else:
-                stack.data[:] = -numpy.log10(stack.data[:] / divider)
+            operation = "log10"
+        stack.data = StackOperations.curveOperation(stack.data, divider,
+                                operation=operation,
+                                mcaIndex=stack.info.get('McaIndex', -1))
         self.setStack(stack)
 
 MENU_TEXT = "Stack Normalization"
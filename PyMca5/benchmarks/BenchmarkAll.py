@@ -0,0 +1,177 @@
+#/*##########################################################################
+#
+# The PyMca X-Ray Fluorescence Toolkit
+#
+# Copyright (c) 2004-2019 European Synchrotron Radiation Facility
+#
+# This file is part of the PyMca X-ray Fluorescence Toolkit developed at
+# the ESRF by the Software group.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#############################################################################*/
+__author__ = "V.A. Sole - ESRF Data Analysis"
+__contact__ = "sole@esrf.fr"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+__doc__ = """
+Run the PyMca benchmarks and compare their results.
+
+Usage:
+
+    python -m PyMca5.benchmarks.BenchmarkAll run [--size=small|medium|large]
+        [--repeat=3] [--filter=pattern] [--nomemory] [--output=file.json]
+
+    python -m PyMca5.benchmarks.BenchmarkAll compare reference.json
+        current.json [--threshold=0.1]
+
+    python -m PyMca5.benchmarks.BenchmarkAll list
+"""
+import sys
+import fnmatch
+import logging
+
+from . import BenchmarkUtils
+from . import XrfBenchmarks
+from . import IOBenchmarks
+from . import StackBenchmarks
+from . import FitBenchmarks
+
+_logger = logging.getLogger(__name__)
+
+
+def getBenchmarkClasses():
+    """
+    Return the list of available benchmark classes
+    """
+    classes = [XrfBenchmarks.FastXRFLinearFitBenchmark,
+               XrfBenchmarks.McaTheoryFitBenchmark,
+               FitBenchmarks.ChisqAlphaBetaBenchmark,
+               FitBenchmarks.LeastSquaresFitBenchmark,
+               IOBenchmarks.EdfFileReadBenchmark,
+               IOBenchmarks.TiffIOReadBenchmark,
+               IOBenchmarks.SpecFileReadBenchmark,
+               IOBenchmarks.ConfigDictReadBenchmark,
+               IOBenchmarks.ConfigDictWriteBenchmark,
+               IOBenchmarks.ConfigDictBinaryBenchmark,
+               StackBenchmarks.StackBaseUpdateBenchmark,
+               StackBenchmarks.StackBaseROIBenchmark,
+               StackBenchmarks.StackROIBatchBenchmark,
+               StackBenchmarks.NumpyPCABenchmark,
+               StackBenchmarks.MedianFilterStackBenchmark,
+               StackBenchmarks.StackNormalizationBenchmark]
+    try:
+        import h5py
+        classes.insert(1, XrfBenchmarks.FastXRFLinearFitHdf5Benchmark)
+    except ImportError:
+        _logger.info("h5py not available. HDF5 benchmarks skipped.")
+    return classes
+
+
+def runBenchmarks(size="small", pattern=None, repeat=3, memory=True,
+                  verbose=False):
+    """
+    Run the benchmarks whose name matches the given pattern.
+
+    :param str size: small, medium or large
+    :param str pattern: Unix shell-style pattern of the benchmark names
+    :param int repeat: number of timed runs of each benchmark
+    :param bool memory: measure peak memory
+    :return: list of result dictionaries
+    """
+    results = []
+    for klass in getBenchmarkClasses():
+        if pattern and not fnmatch.fnmatch(klass.name, pattern):
+            continue
+        if verbose:
+            print("Running %s (%s)" % (klass.name, size))
+        try:
+            results.append(BenchmarkUtils.measure(klass(size),
+                                                  repeat=repeat,
+                                                  memory=memory))
+        except Exception:
+            _logger.error("Benchmark %s failed: %s", klass.name,
+                          sys.exc_info()[1])
+    return results
+
+
+def main(argv=None):
+    import getopt
+    from PyMca5.PyMcaCore.LoggingLevel import getLoggingLevel
+    if argv is None:
+        argv = sys.argv[1:]
+    if not len(argv) or argv[0] not in ["run", "compare", "list"]:
+        print(__doc__)
+        return 1
+    command = argv[0]
+    longoptions = ["size=", "repeat=", "filter=", "output=", "nomemory",
+                   "threshold=", "logging=", "debug="]
+    opts, args = getopt.getopt(argv[1:], "", longoptions)
+    logging.basicConfig(level=getLoggingLevel(opts))
+    size = "small"
+    repeat = 3
+    pattern = None
+    output = None
+    memory = True
+    threshold = 0.1
+    for opt, arg in opts:
+        if opt == "--size":
+            size = arg
+        elif opt == "--repeat":
+            repeat = int(arg)
+        elif opt == "--filter":
+            pattern = arg
+        elif opt == "--output":
+            output = arg
+        elif opt == "--nomemory":
+            memory = False
+        elif opt == "--threshold":
+            threshold = float(arg)
+    if command == "list":
+        for klass in getBenchmarkClasses():
+            print("%-45s %s" % (klass.name, klass.description))
+        return 0
+    if command == "run":
+        results = runBenchmarks(size=size, pattern=pattern, repeat=repeat,
+                                memory=memory, verbose=True)
+        print(BenchmarkUtils.formatResults(results))
+        if output:
+            BenchmarkUtils.saveResults(results, output)
+        return 0
+    if len(args) != 2:
+        print("Usage: compare reference.json current.json [--threshold=0.1]")
+        return 1
+    refEnvironment, reference = BenchmarkUtils.loadResults(args[0])
+    environment, current = BenchmarkUtils.loadResults(args[1])
+    for label, env in [("Reference", refEnvironment),
+                       ("Current", environment)]:
+        print("%s: PyMca %s, numpy %s, python %s on %s (%s)" % \
+              (label, env.get("pymca"), env.get("numpy"),
+               env.get("python"), env.get("platform"), env.get("date")))
+    comparison = BenchmarkUtils.compareResults(reference, current,
+                                               threshold=threshold)
+    print(BenchmarkUtils.formatComparison(comparison))
+    for item in comparison:
+        if item["status"].startswith("slower"):
+            return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
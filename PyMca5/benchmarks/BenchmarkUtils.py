@@ -0,0 +1,291 @@
+#/*##########################################################################
+#
+# The PyMca X-Ray Fluorescence Toolkit
+#
+# Copyright (c) 2004-2019 European Synchrotron Radiation Facility
+#
+# This file is part of the PyMca X-ray Fluorescence Toolkit developed at
+# the ESRF by the Software group.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#############################################################################*/
+__author__ = "V.A. Sole - ESRF Data Analysis"
+__contact__ = "sole@esrf.fr"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+__doc__ = """
+Benchmark definition, measurement, storage and comparison tools.
+
+A benchmark is described by a Benchmark instance. Its run method returns
+a dictionary with the amount of work done (number of spectra, number of
+bytes, ...) that is converted into throughputs using the measured time.
+"""
+import sys
+import os
+import gc
+import json
+import time
+import datetime
+import platform
+import logging
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+import numpy
+
+_logger = logging.getLogger(__name__)
+
+# units of the work counters returned by the benchmarks
+THROUGHPUT_UNITS = {"spectra": "spectra/s",
+                    "images": "images/s",
+                    "bytes": "MB/s",
+                    "iterations": "iterations/s"}
+
+FORMAT_VERSION = 1
+
+
+class Benchmark(object):
+    """
+    Base class of the benchmarks.
+
+    Derived classes implement run and, if needed, setUp and tearDown.
+    setUp and tearDown are not timed.
+    """
+    name = "benchmark"
+    description = ""
+
+    def __init__(self, size="small"):
+        self.size = size
+
+    def setUp(self):
+        pass
+
+    def run(self):
+        """
+        Perform the work to be timed.
+
+        :return: Dictionary with the amount of work done. Known keys are
+            the ones of THROUGHPUT_UNITS.
+        """
+        raise NotImplementedError("Benchmark.run must be implemented")
+
+    def tearDown(self):
+        pass
+
+
+def measure(benchmark, repeat=3, memory=True):
+    """
+    Run a benchmark and return its result dictionary.
+
+    The elapsed time is the best of repeat runs. The peak memory is the
+    peak of the memory traced by tracemalloc (python and numpy allocations)
+    during an additional run.
+
+    :param Benchmark benchmark: benchmark to be run
+    :param int repeat: number of timed runs
+    :param bool memory: measure the peak memory
+    :return dict:
+    """
+    benchmark.setUp()
+    try:
+        times = []
+        work = {}
+        for i in range(max(1, repeat)):
+            gc.collect()
+            t0 = time.time()
+            work = benchmark.run() or {}
+            times.append(time.time() - t0)
+        peak = None
+        if memory and (tracemalloc is not None):
+            gc.collect()
+            tracemalloc.start()
+            try:
+                benchmark.run()
+                current, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+    finally:
+        benchmark.tearDown()
+    elapsed = min(times)
+    result = {"name": benchmark.name,
+              "description": benchmark.description,
+              "size": benchmark.size,
+              "repeat": len(times),
+              "time": elapsed,
+              "times": times,
+              "peak_memory": peak,
+              "work": work,
+              "throughput": {}}
+    for key, value in work.items():
+        if key not in THROUGHPUT_UNITS or elapsed <= 0:
+            continue
+        if key == "bytes":
+            value = value / (1024. * 1024.)
+        result["throughput"][THROUGHPUT_UNITS[key]] = value / elapsed
+    return result
+
+
+def getEnvironment():
+    """
+    Return a dictionary describing the environment the benchmarks are run in
+    """
+    try:
+        import PyMca5
+        pymcaVersion = PyMca5.version()
+    except Exception:
+        pymcaVersion = "unknown"
+    try:
+        import h5py
+        h5pyVersion = h5py.version.version
+    except ImportError:
+        h5pyVersion = None
+    return {"pymca": pymcaVersion,
+            "numpy": numpy.__version__,
+            "h5py": h5pyVersion,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "date": datetime.datetime.now().isoformat()}
+
+
+def saveResults(results, filename, environment=None):
+    """
+    Save a list of benchmark results as JSON
+    """
+    if environment is None:
+        environment = getEnvironment()
+    ddict = {"format_version": FORMAT_VERSION,
+             "environment": environment,
+             "results": results}
+    with open(filename, "w") as f:
+        json.dump(ddict, f, indent=1, sort_keys=True)
+
+
+def loadResults(filename):
+    """
+    Read a JSON file written by saveResults.
+
+    :return: environment dictionary and list of results
+    """
+    with open(filename, "r") as f:
+        ddict = json.load(f)
+    if ddict.get("format_version", 0) > FORMAT_VERSION:
+        raise ValueError("Unsupported benchmark results version in %s" % \
+                         filename)
+    return ddict["environment"], ddict["results"]
+
+
+def compareResults(reference, current, threshold=0.1):
+    """
+    Compare two lists of results.
+
+    :param reference: list of reference results
+    :param current: list of results to be compared to the reference
+    :param float threshold: relative change above which a time or memory
+        change is flagged as a regression (or an improvement)
+    :return: List of dictionaries, one per benchmark present in both lists,
+        with the keys name, size, time_ratio, memory_ratio and status.
+        Ratios are current/reference.
+    """
+    refDict = {}
+    for result in reference:
+        refDict[(result["name"], result["size"])] = result
+    comparison = []
+    for result in current:
+        key = (result["name"], result["size"])
+        if key not in refDict:
+            continue
+        ref = refDict[key]
+        timeRatio = _ratio(result["time"], ref["time"])
+        memoryRatio = _ratio(result.get("peak_memory"),
+                             ref.get("peak_memory"))
+        status = "ok"
+        if timeRatio is not None:
+            if timeRatio > (1.0 + threshold):
+                status = "slower"
+            elif timeRatio < (1.0 - threshold):
+                status = "faster"
+        if memoryRatio is not None and memoryRatio > (1.0 + threshold):
+            if status == "slower":
+                status = "slower, more memory"
+            else:
+                status = "more memory"
+        comparison.append({"name": result["name"],
+                           "size": result["size"],
+                           "reference_time": ref["time"],
+                           "time": result["time"],
+                           "time_ratio": timeRatio,
+                           "reference_peak_memory": ref.get("peak_memory"),
+                           "peak_memory": result.get("peak_memory"),
+                           "memory_ratio": memoryRatio,
+                           "status": status})
+    return comparison
+
+
+def _ratio(value, reference):
+    if value is None or not reference:
+        return None
+    return value / float(reference)
+
+
+def formatResults(results):
+    """
+    Return a text table with the results
+    """
+    lines = ["%-45s %-7s %10s %12s  %s" % ("Benchmark", "Size", "Time (s)",
+                                          "Peak (MB)", "Throughput")]
+    for result in results:
+        if result.get("peak_memory") is None:
+            peak = "-"
+        else:
+            peak = "%.1f" % (result["peak_memory"] / (1024. * 1024.))
+        throughput = ", ".join(["%.4g %s" % (value, unit) for unit, value in \
+                                sorted(result["throughput"].items())])
+        lines.append("%-45s %-7s %10.4f %12s  %s" % (result["name"],
+                                                    result["size"],
+                                                    result["time"],
+                                                    peak,
+                                                    throughput))
+    return "\n".join(lines)
+
+
+def formatComparison(comparison):
+    """
+    Return a text table with the output of compareResults
+    """
+    lines = ["%-45s %-7s %10s %10s %8s %8s  %s" % ("Benchmark", "Size",
+                                                 "Ref. (s)", "Time (s)",
+                                                 "Time", "Memory",
+                                                 "Status")]
+    for item in comparison:
+        if item["memory_ratio"] is None:
+            memory = "-"
+        else:
+            memory = "x%.2f" % item["memory_ratio"]
+        if item["time_ratio"] is None:
+            ratio = "-"
+        else:
+            ratio = "x%.2f" % item["time_ratio"]
+        lines.append("%-45s %-7s %10.4f %10.4f %8s %8s  %s" % \
+                     (item["name"], item["size"], item["reference_time"],
+                      item["time"], ratio, memory, item["status"]))
+    return "\n".join(lines)
@@ -0,0 +1,229 @@
+#/*##########################################################################
+#
+# The PyMca X-Ray Fluorescence Toolkit
+#
+# Copyright (c) 2004-2019 European Synchrotron Radiation Facility
+#
+# This file is part of the PyMca X-ray Fluorescence Toolkit developed at
+# the ESRF by the Software group.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#############################################################################*/
+__author__ = "V.A. Sole - ESRF Data Analysis"
+__contact__ = "sole@esrf.fr"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+__doc__ = """
+Synthetic data generators used by the benchmarks.
+
+All generators are deterministic: they use their own random generator
+initialized with a fixed seed.
+"""
+import os
+import logging
+import numpy
+
+from PyMca5 import PyMcaDataDir
+from PyMca5.PyMcaCore import DataObject
+from PyMca5.PyMcaIO import ConfigDict
+from PyMca5.PyMcaIO import specfilewrapper as specfile
+
+_logger = logging.getLogger(__name__)
+
+SEED = 20190101
+
+# (number of rows, number of columns) of the maps for each size
+SIZES = {"small": (20, 25),
+         "medium": (100, 100),
+         "large": (300, 300)}
+
+
+def getMapShape(size):
+    """
+    Return the (rows, columns) shape associated to a size name
+    """
+    if size not in SIZES:
+        raise ValueError("Unknown size <%s>. Use one of %s" % \
+                         (size, list(SIZES.keys())))
+    return SIZES[size]
+
+
+def getRandomState(seed=SEED):
+    return numpy.random.RandomState(seed)
+
+
+def getSteelSpectrum():
+    """
+    Return the channels and the counts of the Steel spectrum shipped with
+    PyMca as well as the associated fit configuration.
+    """
+    spe = os.path.join(PyMcaDataDir.PYMCA_DATA_DIR, "Steel.spe")
+    cfg = os.path.join(PyMcaDataDir.PYMCA_DATA_DIR, "Steel.cfg")
+    sf = specfile.Specfile(spe)
+    counts = sf[0].mca(1)
+    sf = None
+    channels = numpy.arange(counts.size).astype(numpy.float64)
+    configuration = ConfigDict.ConfigDict()
+    configuration.read(cfg)
+    return channels, counts, configuration
+
+
+def getXrfStack(size="small", dtype=numpy.float32, seed=SEED):
+    """
+    Return a DataObject with a map of Steel spectra with Poisson noise and
+    a spatially varying intensity together with its fit configuration.
+    """
+    nRows, nColumns = getMapShape(size)
+    channels, counts, configuration = getSteelSpectrum()
+    random = getRandomState(seed)
+    scale = 0.5 + random.random_sample((nRows, nColumns, 1))
+    data = random.poisson(scale * counts[None, None, :]).astype(dtype)
+    initialTime = configuration["concentrations"]["time"]
+    stack = DataObject.DataObject()
+    stack.data = data
+    stack.info = {}
+    stack.info["McaCalib"] = [configuration["detector"]["zero"],
+                              configuration["detector"]["gain"],
+                              0.0]
+    stack.info["McaLiveTime"] = initialTime * \
+                                numpy.ones((nRows * nColumns,),
+                                           dtype=numpy.float64)
+    stack.info["McaIndex"] = 2
+    stack.x = [channels]
+    # fundamental parameters and time read from the data
+    configuration["concentrations"]["usematrix"] = 0
+    configuration["concentrations"]["useautotime"] = 1
+    configuration["fit"]["stripalgorithm"] = 1
+    return stack, configuration
+
+
+def writeHdf5Stack(filename, stack, compression=None):
+    """
+    Write the stack DataObject to an HDF5 file and return the dataset path
+    """
+    import h5py
+    path = "/entry/instrument/detector/data"
+    with h5py.File(filename, "w") as h5:
+        h5["/entry/instrument/detector/calibration"] = stack.info["McaCalib"]
+        h5["/entry/instrument/detector/channels"] = stack.x[0]
+        h5["/entry/instrument/detector/live_time"] = stack.info["McaLiveTime"]
+        h5.create_dataset(path,
+                          data=stack.data,
+                          chunks=(1, stack.data.shape[1],
+                                  stack.data.shape[2]),
+                          compression=compression)
+    return path
+
+
+def getImageStack(size="small", nImages=None, dtype=numpy.float32,
+                  seed=SEED):
+    """
+    Return a 3D array of nImages images with smooth features and noise.
+
+    The default number of images depends on the size.
+    """
+    nRows, nColumns = getMapShape(size)
+    nRows *= 4
+    nColumns *= 4
+    if nImages is None:
+        nImages = {"small": 10, "medium": 20, "large": 50}.get(size, 10)
+    random = getRandomState(seed)
+    y, x = numpy.mgrid[0:nRows, 0:nColumns]
+    images = numpy.zeros((nImages, nRows, nColumns), dtype=dtype)
+    for i in range(nImages):
+        x0 = nColumns * random.random_sample()
+        y0 = nRows * random.random_sample()
+        w = 0.1 * (nRows + nColumns) * (0.5 + random.random_sample())
+        images[i] = 1000. * numpy.exp(-((x - x0) ** 2 + (y - y0) ** 2) / \
+                                      (2 * w * w))
+        images[i] += random.random_sample((nRows, nColumns)) * 10.
+    return images
+
+
+def writeEdfImages(filename, images):
+    """
+    Write a stack of images as a multi-image EDF file
+    """
+    from PyMca5.PyMcaIO import EdfFile
+    if os.path.exists(filename):
+        os.remove(filename)
+    edf = EdfFile.EdfFile(filename, access="ab")
+    for i in range(images.shape[0]):
+        edf.WriteImage({"Title": "image %d" % i}, images[i], Append=1)
+    edf = None
+    return filename
+
+
+def writeTiffImages(filename, images):
+    """
+    Write a stack of images as a multi-image TIFF file
+    """
+    from PyMca5.PyMcaIO import TiffIO
+    if os.path.exists(filename):
+        os.remove(filename)
+    for i in range(images.shape[0]):
+        if i == 0:
+            tif = TiffIO.TiffIO(filename, mode="wb+")
+        else:
+            tif = TiffIO.TiffIO(filename, mode="rb+")
+        tif.writeImage(images[i], info={"Title": "image %d" % i})
+        tif = None
+    return filename
+
+
+def writeSpecFile(filename, nScans=10, nPoints=100, nMca=None,
+                  nChannels=1024, seed=SEED):
+    """
+    Write a SPEC file with nScans scans of nPoints points, each point with
+    one MCA spectrum of nChannels channels.
+
+    :return: Number of MCA spectra written
+    """
+    random = getRandomState(seed)
+    if nMca is None:
+        nMca = nPoints
+    channels = numpy.arange(nChannels)
+    spectrum = 100. * numpy.exp(-0.5 * ((channels - 0.3 * nChannels) / \
+                                        (0.01 * nChannels)) ** 2) + \
+               50. * numpy.exp(-0.5 * ((channels - 0.6 * nChannels) / \
+                                       (0.02 * nChannels)) ** 2) + 5.
+    with open(filename, "w") as f:
+        f.write("#F %s\n#D %s\n\n" % (filename, "Thu Jan 01 00:00:00 2019"))
+        for scan in range(nScans):
+            f.write("#S %d  ascan  mot %d %d %d 0.1\n" % (scan + 1, 0,
+                                                        nPoints - 1,
+                                                        nPoints - 1))
+            f.write("#N 3\n#L mot  I0  counts\n")
+            f.write("#@MCA %%16C\n#@CHANN %d 0 %d 1\n" % (nChannels,
+                                                        nChannels - 1))
+            mca = random.poisson(spectrum, size=(nPoints, nChannels))
+            for point in range(nPoints):
+                f.write("%d %d %d\n" % (point, 1000, mca[point].sum()))
+                if point < nMca:
+                    line = "@A"
+                    values = mca[point]
+                    for i in range(0, nChannels, 16):
+                        line += " " + " ".join(["%d" % v for v in \
+                                                values[i:i + 16]])
+                        if (i + 16) < nChannels:
+                            line += "\\\n"
+                    f.write(line + "\n")
+            f.write("\n")
+    return nScans * nMca
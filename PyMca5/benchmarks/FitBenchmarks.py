@@ -0,0 +1,131 @@
+#/*##########################################################################
+#
+# The PyMca X-Ray Fluorescence Toolkit
+#
+# Copyright (c) 2004-2026 European Synchrotron Radiation Facility
+#
+# This file is part of the PyMca X-ray Fluorescence Toolkit developed at
+# the ESRF by the Software group.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#############################################################################*/
+__author__ = "V.A. Sole - ESRF Data Analysis"
+__contact__ = "sole@esrf.fr"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+__doc__ = """
+Benchmarks of the non-linear least squares fit (Gefit) of a spectrum
+described by many peaks.
+"""
+import logging
+import numpy
+
+from .BenchmarkUtils import Benchmark
+from . import DataGenerators
+
+_logger = logging.getLogger(__name__)
+
+# number of gaussian peaks of the model for each size
+NPEAKS = {"small": 10, "medium": 25, "large": 50}
+
+
+def multiPeakModel(parameters, x):
+    """
+    Linear background plus gaussians described by (height, position, fwhm)
+    """
+    from PyMca5.PyMcaMath.fitting import SpecfitFuns
+    return parameters[0] + parameters[1] * x + \
+           SpecfitFuns.gauss(parameters[2:], x)
+
+
+def getMultiPeakData(nPeaks, nPoints=None):
+    """
+    Return x, y, the starting parameters and the constraints of a spectrum
+    of nPeaks gaussians
+    """
+    from PyMca5.PyMcaMath.fitting import Gefit
+    if nPoints is None:
+        nPoints = 100 * nPeaks
+    random = DataGenerators.getRandomState()
+    x = numpy.arange(nPoints).astype(numpy.float64)
+    step = nPoints / float(nPeaks + 1)
+    parameters = [10.0, 0.01]
+    for i in range(nPeaks):
+        parameters += [100.0 + 900.0 * random.random_sample(),
+                       (i + 1) * step, 0.15 * step]
+    y = random.poisson(multiPeakModel(parameters, x)).astype(numpy.float64)
+    # the fit starts a few percent away from the true values
+    start = numpy.array(parameters)
+    start[2::3] *= 1.0 + 0.1 * (random.random_sample(nPeaks) - 0.5)
+    start[3::3] += 0.05 * step * (random.random_sample(nPeaks) - 0.5)
+    start[4::3] *= 1.0 + 0.1 * (random.random_sample(nPeaks) - 0.5)
+    # positive heights and widths, positions within half a peak distance
+    constraints = numpy.zeros((3, len(parameters)))
+    constraints[0, 2::3] = Gefit.CPOSITIVE
+    constraints[0, 3::3] = Gefit.CQUOTED
+    constraints[1, 3::3] = start[3::3] - 0.5 * step
+    constraints[2, 3::3] = start[3::3] + 0.5 * step
+    constraints[0, 4::3] = Gefit.CPOSITIVE
+    return x, y, start.tolist(), constraints.tolist()
+
+
+class _GefitBenchmark(Benchmark):
+    def setUp(self):
+        self.nPeaks = NPEAKS.get(self.size, 10)
+        self.x, self.y, self.parameters, self.constraints = \
+                                        getMultiPeakData(self.nPeaks)
+        self.sigma = numpy.sqrt(numpy.clip(self.y, 1.0, None))
+
+    def tearDown(self):
+        self.x = None
+        self.y = None
+
+
+class ChisqAlphaBetaBenchmark(_GefitBenchmark):
+    name = "Gefit.ChisqAlphaBeta"
+    description = "Jacobian, curvature matrix and gradient of a " \
+                  "multi-peak fit iteration"
+
+    def run(self):
+        from PyMca5.PyMcaMath.fitting import Gefit
+        weight = 1.0 / (self.sigma * self.sigma)
+        parameters = numpy.array(self.parameters)
+        nIterations = 10
+        for i in range(nIterations):
+            Gefit.ChisqAlphaBeta(multiPeakModel, parameters,
+                                 self.x, self.y, weight, self.constraints)
+        return {"iterations": nIterations}
+
+
+class LeastSquaresFitBenchmark(_GefitBenchmark):
+    name = "Gefit.LeastSquaresFit"
+    description = "Constrained non-linear fit of a multi-peak spectrum"
+
+    def run(self):
+        from PyMca5.PyMcaMath.fitting import Gefit
+        result = Gefit.LeastSquaresFit(multiPeakModel, self.parameters,
+                                       xdata=self.x,
+                                       ydata=self.y,
+                                       sigmadata=self.sigma,
+                                       weightflag=1,
+                                       constrains=self.constraints,
+                                       maxiter=20,
+                                       fulloutput=1)
+        return {"iterations": result[3]}
@@ -0,0 +1,193 @@
+#/*##########################################################################
+#
+# The PyMca X-Ray Fluorescence Toolkit
+#
+# Copyright (c) 2004-2019 European Synchrotron Radiation Facility
+#
+# This file is part of the PyMca X-ray Fluorescence Toolkit developed at
+# the ESRF by the Software group.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#############################################################################*/
+__author__ = "V.A. Sole - ESRF Data Analysis"
+__contact__ = "sole@esrf.fr"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+__doc__ = """
+Benchmarks of the readers of the most common file formats.
+"""
+import os
+import shutil
+import tempfile
+import logging
+import numpy
+
+from .BenchmarkUtils import Benchmark
+from . import DataGenerators
+
+_logger = logging.getLogger(__name__)
+
+
+class _FileBenchmark(Benchmark):
+    def setUp(self):
+        self._tmpDir = tempfile.mkdtemp(prefix="pymcabench")
+        self.images = DataGenerators.getImageStack(self.size)
+
+    def tearDown(self):
+        self.images = None
+        shutil.rmtree(self._tmpDir, ignore_errors=True)
+
+
+class EdfFileReadBenchmark(_FileBenchmark):
+    name = "EdfFile.GetData"
+    description = "Read all the images of a multi-image EDF file"
+
+    def setUp(self):
+        _FileBenchmark.setUp(self)
+        self.filename = DataGenerators.writeEdfImages( \
+                            os.path.join(self._tmpDir, "images.edf"),
+                            self.images)
+
+    def run(self):
+        from PyMca5.PyMcaIO import EdfFile
+        edf = EdfFile.EdfFile(self.filename, access="rb")
+        nbytes = 0
+        nImages = edf.GetNumImages()
+        for i in range(nImages):
+            nbytes += edf.GetData(i).nbytes
+        edf = None
+        return {"images": nImages, "bytes": nbytes}
+
+
+class TiffIOReadBenchmark(_FileBenchmark):
+    name = "TiffIO.getData"
+    description = "Read all the images of a multi-image TIFF file"
+
+    def setUp(self):
+        _FileBenchmark.setUp(self)
+        self.filename = DataGenerators.writeTiffImages( \
+                            os.path.join(self._tmpDir, "images.tif"),
+                            self.images)
+
+    def run(self):
+        from PyMca5.PyMcaIO import TiffIO
+        tif = TiffIO.TiffIO(self.filename, mode="rb")
+        nbytes = 0
+        nImages = tif.getNumberOfImages()
+        for i in range(nImages):
+            nbytes += tif.getData(i).nbytes
+        tif.close()
+        return {"images": nImages, "bytes": nbytes}
+
+
+class SpecFileReadBenchmark(Benchmark):
+    name = "specfile.mca"
+    description = "Read all the MCA spectra of a SPEC file"
+
+    def setUp(self):
+        self._tmpDir = tempfile.mkdtemp(prefix="pymcabench")
+        self.filename = os.path.join(self._tmpDir, "mca.dat")
+        nScans = {"small": 5, "medium": 20, "large": 100}.get(self.size, 5)
+        DataGenerators.writeSpecFile(self.filename, nScans=nScans)
+
+    def run(self):
+        from PyMca5.PyMcaIO import specfile
+        sf = specfile.Specfile(self.filename)
+        nSpectra = 0
+        nbytes = 0
+        for i in range(len(sf)):
+            scan = sf[i]
+            nbytes += scan.data().nbytes
+            for j in range(scan.nbmca()):
+                nbytes += scan.mca(j + 1).nbytes
+                nSpectra += 1
+        sf = None
+        return {"spectra": nSpectra, "bytes": nbytes}
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpDir, ignore_errors=True)
+
+
+class _ConfigDictBenchmark(Benchmark):
+    # number of .fit like files, as many as fitted pixels in a batch
+    NFILES = {"small": 20, "medium": 200, "large": 1000}
+
+    def setUp(self):
+        from PyMca5.PyMcaIO import ConfigDict
+        self._tmpDir = tempfile.mkdtemp(prefix="pymcabench")
+        x, y, configuration = DataGenerators.getSteelSpectrum()
+        result = {}
+        for i, group in enumerate(configuration["peaks"]):
+            result[group] = {"fitarea": 1000.5 * i,
+                             "sigmaarea": 31.6 + i,
+                             "mcaarea": 998.0 * i,
+                             "peaks": ["K", "Ka", "Kb"],
+                             "ratio": numpy.array([0.88, 0.12])}
+        self.ddict = ConfigDict.ConfigDict({"result": result,
+                                            "config": configuration})
+        self.filenames = [os.path.join(self._tmpDir, "pixel_%05d.fit" % i)
+                          for i in range(self.NFILES.get(self.size, 20))]
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpDir, ignore_errors=True)
+
+
+class ConfigDictReadBenchmark(_ConfigDictBenchmark):
+    name = "ConfigDict.read"
+    description = "Read fit result files in text format"
+
+    def setUp(self):
+        _ConfigDictBenchmark.setUp(self)
+        for filename in self.filenames:
+            self.ddict.write(filename)
+
+    def run(self):
+        from PyMca5.PyMcaIO import ConfigDict
+        nbytes = 0
+        for filename in self.filenames:
+            ConfigDict.ConfigDict().read(filename)
+            nbytes += os.path.getsize(filename)
+        return {"iterations": len(self.filenames), "bytes": nbytes}
+
+
+class ConfigDictWriteBenchmark(_ConfigDictBenchmark):
+    name = "ConfigDict.write"
+    description = "Write fit result files in text format"
+
+    def run(self):
+        nbytes = 0
+        for filename in self.filenames:
+            self.ddict.write(filename)
+            nbytes += os.path.getsize(filename)
+        return {"iterations": len(self.filenames), "bytes": nbytes}
+
+
+class ConfigDictBinaryBenchmark(_ConfigDictBenchmark):
+    name = "ConfigDict.binary"
+    description = "Write and read fit result files in binary format"
+
+    def run(self):
+        from PyMca5.PyMcaIO import ConfigDict
+        nbytes = 0
+        for filename in self.filenames:
+            self.ddict.writebinary(filename)
+            ConfigDict.ConfigDict().readbinary(filename)
+            nbytes += os.path.getsize(filename)
+        return {"iterations": len(self.filenames), "bytes": nbytes}
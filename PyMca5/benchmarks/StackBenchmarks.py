@@ -0,0 +1,186 @@
+#/*##########################################################################
+#
+# The PyMca X-Ray Fluorescence Toolkit
+#
+# Copyright (c) 2004-2019 European Synchrotron Radiation Facility
+#
+# This file is part of the PyMca X-ray Fluorescence Toolkit developed at
+# the ESRF by the Software group.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#############################################################################*/
+__author__ = "V.A. Sole - ESRF Data Analysis"
+__contact__ = "sole@esrf.fr"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+__doc__ = """
+Benchmarks of the stack handling and of the multivariate analysis.
+"""
+import logging
+import numpy
+
+from .BenchmarkUtils import Benchmark
+from . import DataGenerators
+
+_logger = logging.getLogger(__name__)
+
+
+class _XrfStackBenchmark(Benchmark):
+    def setUp(self):
+        self.stack, self.configuration = \
+                        DataGenerators.getXrfStack(self.size)
+
+    def _getWork(self):
+        data = self.stack.data
+        return {"spectra": data.shape[0] * data.shape[1],
+                "bytes": data.nbytes}
+
+    def tearDown(self):
+        self.stack = None
+
+
+class StackBaseUpdateBenchmark(_XrfStackBenchmark):
+    name = "StackBase.stackUpdated"
+    description = "Set a stack and calculate the sum image and spectrum"
+
+    def setUp(self):
+        from PyMca5.PyMcaCore import StackBase
+        _XrfStackBenchmark.setUp(self)
+        # plugin loading is not part of the benchmark
+        self.stackBase = StackBase.StackBase()
+
+    def run(self):
+        # setStack calls stackUpdated
+        self.stackBase.setStack(self.stack)
+        return self._getWork()
+
+    def tearDown(self):
+        self.stackBase = None
+        _XrfStackBenchmark.tearDown(self)
+
+
+class StackBaseROIBenchmark(_XrfStackBenchmark):
+    name = "StackBase.calculateROIImages"
+    description = "Calculate the ROI images of a stack"
+
+    def setUp(self):
+        from PyMca5.PyMcaCore import StackBase
+        _XrfStackBenchmark.setUp(self)
+        self.stackBase = StackBase.StackBase()
+        self.stackBase.setStack(self.stack)
+        nChannels = self.stack.data.shape[-1]
+        self.index1 = int(0.2 * nChannels)
+        self.index2 = int(0.4 * nChannels)
+
+    def run(self):
+        self.stackBase.calculateROIImages(self.index1, self.index2)
+        return self._getWork()
+
+    def tearDown(self):
+        self.stackBase = None
+        _XrfStackBenchmark.tearDown(self)
+
+
+class StackROIBatchBenchmark(_XrfStackBenchmark):
+    name = "StackROIBatch.batchROIMultipleSpectra"
+    description = "Calculate a set of ROI images with background"
+
+    def setUp(self):
+        _XrfStackBenchmark.setUp(self)
+        nChannels = self.stack.data.shape[-1]
+        roilist = []
+        roidict = {}
+        for i in range(10):
+            name = "ROI%d" % i
+            roilist.append(name)
+            first = int((0.05 + 0.09 * i) * nChannels)
+            roidict[name] = {"type": "Channel",
+                             "from": first,
+                             "to": first + int(0.04 * nChannels)}
+        self.roiConfiguration = {"ROI": {"roilist": roilist,
+                                         "roidict": roidict}}
+
+    def run(self):
+        from PyMca5.PyMcaCore import StackROIBatch
+        instance = StackROIBatch.StackROIBatch()
+        instance.batchROIMultipleSpectra(x=self.stack.x[0],
+                                         y=self.stack.data,
+                                         configuration=self.roiConfiguration,
+                                         net=True,
+                                         xAtMinMax=True,
+                                         index=2)
+        return self._getWork()
+
+
+class NumpyPCABenchmark(Benchmark):
+    name = "PCATools.numpyPCA"
+    description = "Principal component analysis of an image stack"
+
+    def setUp(self):
+        self.images = DataGenerators.getImageStack(self.size)
+
+    def run(self):
+        from PyMca5.PyMcaMath.mva import PCATools
+        PCATools.numpyPCA(self.images, index=0, ncomponents=5)
+        return {"images": self.images.shape[0],
+                "bytes": self.images.nbytes}
+
+    def tearDown(self):
+        self.images = None
+
+
+class MedianFilterStackBenchmark(Benchmark):
+    name = "median.medfilt2dStack"
+    description = "Median filter with a wide kernel each image of a stack"
+
+    def setUp(self):
+        # images of counts
+        self.images = numpy.round(DataGenerators.getImageStack(self.size))
+
+    def run(self):
+        from PyMca5.PyMcaMath.PyMcaSciPy.signal import median
+        median.medfilt2dStack(self.images, kernel_size=[11, 11])
+        return {"images": self.images.shape[0],
+                "bytes": self.images.nbytes}
+
+    def tearDown(self):
+        self.images = None
+
+
+class StackNormalizationBenchmark(_XrfStackBenchmark):
+    name = "StackOperations.curveOperation"
+    description = "Normalize all the spectra of a stack by a curve"
+
+    def setUp(self):
+        _XrfStackBenchmark.setUp(self)
+        nChannels = self.stack.data.shape[-1]
+        self.curve = numpy.linspace(0.5, 1.5, nChannels)
+        self.output = numpy.empty(self.stack.data.shape, numpy.float64)
+
+    def run(self):
+        from PyMca5.PyMcaMath import StackOperations
+        StackOperations.curveOperation(self.stack.data, self.curve,
+                                       operation="log",
+                                       output=self.output)
+        return self._getWork()
+
+    def tearDown(self):
+        self.output = None
+        _XrfStackBenchmark.tearDown(self)
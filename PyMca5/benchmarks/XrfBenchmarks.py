@@ -0,0 +1,134 @@
+#/*##########################################################################
+#
+# The PyMca X-Ray Fluorescence Toolkit
+#
+# Copyright (c) 2004-2019 European Synchrotron Radiation Facility
+#
+# This file is part of the PyMca X-ray Fluorescence Toolkit developed at
+# the ESRF by the Software group.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#############################################################################*/
+__author__ = "V.A. Sole - ESRF Data Analysis"
+__contact__ = "sole@esrf.fr"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+__doc__ = """
+Benchmarks of the XRF fitting: fast linear fit of maps and full
+non-linear fit of single spectra.
+"""
+import os
+import shutil
+import tempfile
+import logging
+import numpy
+
+from .BenchmarkUtils import Benchmark
+from . import DataGenerators
+
+_logger = logging.getLogger(__name__)
+
+
+class FastXRFLinearFitBenchmark(Benchmark):
+    name = "FastXRFLinearFit.fitMultipleSpectra"
+    description = "Fast linear fit of a map held in memory"
+
+    def setUp(self):
+        from PyMca5.PyMcaPhysics.xrf import FastXRFLinearFit
+        self.stack, self.configuration = \
+                        DataGenerators.getXrfStack(self.size)
+        self.fastFit = FastXRFLinearFit.FastXRFLinearFit()
+
+    def run(self):
+        self.fastFit.fitMultipleSpectra(y=self.stack,
+                                        weight=0,
+                                        configuration=self.configuration,
+                                        concentrations=True,
+                                        refit=1)
+        nSpectra = self.stack.data.shape[0] * self.stack.data.shape[1]
+        return {"spectra": nSpectra,
+                "bytes": self.stack.data.nbytes}
+
+    def tearDown(self):
+        self.stack = None
+        self.fastFit = None
+
+
+class FastXRFLinearFitHdf5Benchmark(FastXRFLinearFitBenchmark):
+    name = "FastXRFLinearFit.fitMultipleSpectra[hdf5]"
+    description = "Fast linear fit of a map read from an HDF5 dataset"
+
+    def setUp(self):
+        import h5py
+        FastXRFLinearFitBenchmark.setUp(self)
+        self._tmpDir = tempfile.mkdtemp(prefix="pymcabench")
+        fname = os.path.join(self._tmpDir, "stack.h5")
+        path = DataGenerators.writeHdf5Stack(fname, self.stack)
+        self._h5 = h5py.File(fname, "r")
+        self.dataset = self._h5[path]
+        self.x = self.stack.x[0]
+        self.livetime = self.stack.info["McaLiveTime"]
+
+    def run(self):
+        self.fastFit.fitMultipleSpectra(x=self.x,
+                                        y=self.dataset,
+                                        livetime=self.livetime,
+                                        weight=0,
+                                        configuration=self.configuration,
+                                        concentrations=True,
+                                        refit=1)
+        shape = self.dataset.shape
+        return {"spectra": shape[0] * shape[1],
+                "bytes": self.dataset.size * self.dataset.dtype.itemsize}
+
+    def tearDown(self):
+        self.dataset = None
+        if self._h5 is not None:
+            self._h5.close()
+            self._h5 = None
+        shutil.rmtree(self._tmpDir, ignore_errors=True)
+        FastXRFLinearFitBenchmark.tearDown(self)
+
+
+class McaTheoryFitBenchmark(Benchmark):
+    name = "McaTheory.startfit"
+    description = "Non-linear fit of single spectra (estimate and fit)"
+
+    def setUp(self):
+        from PyMca5.PyMcaPhysics.xrf import ClassMcaTheory
+        self.x, self.y, configuration = DataGenerators.getSteelSpectrum()
+        configuration["fit"]["stripalgorithm"] = 1
+        self.mcaFit = ClassMcaTheory.McaTheory()
+        self.mcaFit.configure(configuration)
+        self.nSpectra = {"small": 2, "medium": 5, "large": 20}.get(self.size,
+                                                                   2)
+        random = DataGenerators.getRandomState()
+        self.spectra = random.poisson(self.y,
+                                      size=(self.nSpectra, self.y.size))
+
+    def run(self):
+        for i in range(self.nSpectra):
+            self.mcaFit.setData(self.x, self.spectra[i])
+            self.mcaFit.estimate()
+            self.mcaFit.startfit(digest=0)
+        return {"spectra": self.nSpectra}
+
+    def tearDown(self):
+        self.mcaFit = None
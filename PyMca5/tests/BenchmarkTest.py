@@ -0,0 +1,121 @@
+#/*##########################################################################
+#
+# The PyMca X-Ray Fluorescence Toolkit
+#
+# Copyright (c) 2004-2019 European Synchrotron Radiation Facility
+#
+# This file is part of the PyMca X-ray Fluorescence Toolkit developed at
+# the ESRF by the Software group.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#############################################################################*/
+__author__ = "V. Armando Sole - ESRF Data Analysis"
+__contact__ = "sole@esrf.fr"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+import unittest
+import os
+import shutil
+import tempfile
+
+
+class testBenchmark(unittest.TestCase):
+    def setUp(self):
+        self._outputDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._outputDir, ignore_errors=True)
+
+    def testBenchmarkImport(self):
+        from PyMca5.benchmarks import BenchmarkAll
+        self.assertTrue(len(BenchmarkAll.getBenchmarkClasses()) > 0)
+
+    def testBenchmarkRun(self):
+        from PyMca5.benchmarks import BenchmarkAll
+        results = BenchmarkAll.runBenchmarks(size="small",
+                                             pattern="PCATools*",
+                                             repeat=1)
+        self.assertEqual(len(results), 1)
+        result = results[0]
+        self.assertEqual(result["name"], "PCATools.numpyPCA")
+        self.assertTrue(result["time"] > 0)
+        self.assertTrue(result["peak_memory"] > 0)
+        self.assertTrue("images/s" in result["throughput"])
+        self.assertTrue("MB/s" in result["throughput"])
+
+    def testBenchmarkFit(self):
+        from PyMca5.benchmarks import BenchmarkAll
+        results = BenchmarkAll.runBenchmarks(size="small",
+                                             pattern="Gefit.*",
+                                             repeat=1,
+                                             memory=False)
+        self.assertEqual(sorted([result["name"] for result in results]),
+                         ["Gefit.ChisqAlphaBeta", "Gefit.LeastSquaresFit"])
+        for result in results:
+            self.assertTrue(result["work"]["iterations"] > 0)
+            self.assertTrue("iterations/s" in result["throughput"])
+
+    def testBenchmarkCompare(self):
+        from PyMca5.benchmarks import BenchmarkUtils
+        reference = [{"name": "a", "size": "small", "time": 1.0,
+                      "peak_memory": 100, "throughput": {}},
+                     {"name": "b", "size": "small", "time": 1.0,
+                      "peak_memory": 100, "throughput": {}},
+                     {"name": "c", "size": "small", "time": 1.0,
+                      "peak_memory": None, "throughput": {}}]
+        current = [{"name": "a", "size": "small", "time": 2.0,
+                    "peak_memory": 100, "throughput": {}},
+                   {"name": "b", "size": "small", "time": 0.5,
+                    "peak_memory": 200, "throughput": {}},
+                   {"name": "c", "size": "small", "time": 1.05,
+                    "peak_memory": None, "throughput": {}},
+                   {"name": "d", "size": "small", "time": 1.0,
+                    "peak_memory": None, "throughput": {}}]
+        fname = os.path.join(self._outputDir, "results.json")
+        BenchmarkUtils.saveResults(reference, fname)
+        environment, reference = BenchmarkUtils.loadResults(fname)
+        self.assertTrue("numpy" in environment)
+        comparison = BenchmarkUtils.compareResults(reference, current,
+                                                   threshold=0.1)
+        status = dict([(item["name"], item["status"]) \
+                       for item in comparison])
+        self.assertEqual(status, {"a": "slower",
+                                  "b": "more memory",
+                                  "c": "ok"})
+
+
+def getSuite(auto=True):
+    testSuite = unittest.TestSuite()
+    if auto:
+        testSuite.addTest(\
+            unittest.TestLoader().loadTestsFromTestCase(testBenchmark))
+    else:
+        # use a predefined order
+        testSuite.addTest(testBenchmark("testBenchmarkImport"))
+        testSuite.addTest(testBenchmark("testBenchmarkRun"))
+        testSuite.addTest(testBenchmark("testBenchmarkFit"))
+        testSuite.addTest(testBenchmark("testBenchmarkCompare"))
+    return testSuite
+
+def test(auto=False):
+    unittest.TextTestRunner(verbosity=2).run(getSuite(auto=auto))
+
+if __name__ == '__main__':
+    test()
@@ -111,6 +111,143 @@ def testConfigDictIO(self):
                 self.assertTrue( read == original,
                             "Read <%s> instead of <%s>" % (read, original))
 
+    def _assertIdentical(self, read, original, path="/"):
+        # same values of the same types
+        self.assertEqual(type(read), type(original),
+                         "Type mismatch at %s" % path)
+        if hasattr(original, "keys"):
+            self.assertEqual(list(read.keys()), list(original.keys()),
+                             "Key mismatch at %s" % path)
+            for key in original:
+                self._assertIdentical(read[key], original[key],
+                                      "%s%s/" % (path, key))
+        elif isinstance(original, (list, tuple)):
+            self.assertEqual(len(read), len(original),
+                             "Length mismatch at %s" % path)
+            for i in range(len(original)):
+                self._assertIdentical(read[i], original[i],
+                                      "%s%d/" % (path, i))
+        elif hasattr(original, "dtype"):
+            self.assertEqual(read.dtype, original.dtype,
+                             "dtype mismatch at %s" % path)
+            self.assertEqual(read.tobytes(), original.tobytes(),
+                             "Data mismatch at %s" % path)
+        else:
+            self.assertEqual(read, original, "Value mismatch at %s" % path)
+
+    def _readAll(self, fileName, fast):
+        from PyMca5.PyMcaIO import ConfigDict
+        useFastParser = ConfigDict.USE_FAST_PARSER
+        ConfigDict.USE_FAST_PARSER = fast
+        try:
+            instance = ConfigDict.ConfigDict()
+            instance.read(fileName)
+        except Exception:
+            instance = sys.exc_info()[0]
+        finally:
+            ConfigDict.USE_FAST_PARSER = useFastParser
+        return instance
+
+    @unittest.skipIf(sys.version_info < (3,),
+                     "Fast parser only used with python 3")
+    def testConfigDictFastParser(self):
+        from PyMca5.PyMcaIO import ConfigDict
+        from PyMca5 import PyMcaDataDir
+        tmpFile = tempfile.mkstemp(text=False)
+        os.close(tmpFile[0])
+        self._tmpFileName = tmpFile[1]
+        text = "\n".join(["# comment",
+                           "[simple]",
+                           "int = 1",
+                           "float: 2.5e3",
+                           "string =  Hello World  ",
+                           "empty =",
+                           "percent = 100%%",
+                           "; another comment",
+                           "[lists]",
+                           "items = 1, two, 3.0,",
+                           "table = 1, 2",
+                           "    3, 4",
+                           "",
+                           "\t5,",
+                           "[arrays.sub_|_section]",
+                           "vector = [ 1.0 2.0 3.0 ]",
+                           "matrix = [ [1. 2.] [3. 4.] ]",
+                           "",
+                           ""])
+        with open(self._tmpFileName, "w") as f:
+            f.write(text)
+        fast = self._readAll(self._tmpFileName, True)
+        self._assertIdentical(fast, self._readAll(self._tmpFileName, False))
+        self.assertEqual(fast["simple"]["percent"], "100%")
+        self.assertEqual(fast["lists"]["table"], [[1, 2], [3, 4], "", [5]])
+        self.assertEqual(fast["arrays"]["sub.section"]["matrix"].shape,
+                         (2, 2))
+
+        # what the fast parser does not handle still behaves the same
+        for text in ["x = 1\n[a]\n", "[a]\nx = 1\n[a]\n",
+                     "[a]\nx = 1\nx = 2\n", "[a]\nx = %(y)s\n",
+                     "[DEFAULT]\nx = 1\n[a]\ny = 2\n"]:
+            with open(self._tmpFileName, "w") as f:
+                f.write(text)
+            fast = self._readAll(self._tmpFileName, True)
+            slow = self._readAll(self._tmpFileName, False)
+            if isinstance(slow, type):
+                self.assertEqual(fast, slow)
+            else:
+                self._assertIdentical(fast, slow)
+
+        fileName = os.path.join(PyMcaDataDir.PYMCA_DATA_DIR, "McaTheory.cfg")
+        self._assertIdentical(self._readAll(fileName, True),
+                              self._readAll(fileName, False))
+
+    def testConfigDictBinary(self):
+        from PyMca5.PyMcaIO import ConfigDict
+        testDict = {"simple_types": {"float": 1.0,
+                                     "int": 1,
+                                     "big": 2**80,
+                                     "string": "Hello World",
+                                     "unicode": u"\u00c5ngstr\u00f6m",
+                                     "bytes": b"\x00\xff",
+                                     "none": None,
+                                     "bool": [True, False]},
+                    "containers": {"list": [-1, "string", 3.0, [[]]],
+                                   "tuple": (1, "a"),
+                                   1: {"nested": {}}}}
+        if ConfigDict.USE_NUMPY:
+            import numpy
+            testDict["numpy"] = {"float32": numpy.float32(0.1),
+                                 "int64": numpy.int64(-3),
+                                 "array": numpy.arange(12.).reshape(3, 4),
+                                 "bigendian": numpy.arange(3, dtype=">i2"),
+                                 "text": numpy.array(["ab", "c"]),
+                                 "empty": numpy.zeros((0, 2)),
+                                 "scalar": numpy.array(5, numpy.uint8)}
+        tmpFile = tempfile.mkstemp(text=False)
+        os.close(tmpFile[0])
+        self._tmpFileName = tmpFile[1]
+        writeInstance = ConfigDict.ConfigDict(initdict=testDict)
+        writeInstance.writebinary(self._tmpFileName)
+        readInstance = ConfigDict.ConfigDict()
+        readInstance.readbinary(self._tmpFileName)
+        self._assertIdentical(readInstance, writeInstance)
+        self.assertEqual(readInstance.getlastfile()[0], self._tmpFileName)
+        self.assertRaises(ValueError, readInstance.frombytes, b"[a]\nx = 1")
+
+    def testConfigDictBenchmark(self):
+        from PyMca5.benchmarks import BenchmarkAll
+        results = BenchmarkAll.runBenchmarks(size="small",
+                                             pattern="ConfigDict.*",
+                                             repeat=1,
+                                             memory=False)
+        names = [result["name"] for result in results]
+        self.assertEqual(names, ["ConfigDict.read",
+                                 "ConfigDict.write",
+                                 "ConfigDict.binary"])
+        for result in results:
+            self.assertTrue(result["time"] > 0)
+            self.assertTrue("iterations/s" in result["throughput"])
+
 def getSuite(auto=True):
     testSuite = unittest.TestSuite()
     if auto:
@@ -120,6 +257,9 @@ def getSuite(auto=True):
         # use a predefined order
         testSuite.addTest(testConfigDict("testConfigDictImport"))
         testSuite.addTest(testConfigDict("testConfigDictIO"))
+        testSuite.addTest(testConfigDict("testConfigDictFastParser"))
+        testSuite.addTest(testConfigDict("testConfigDictBinary"))
+        testSuite.addTest(testConfigDict("testConfigDictBenchmark"))
     return testSuite
 
 def test(auto=False):
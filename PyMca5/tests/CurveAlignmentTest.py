@@ -0,0 +1,141 @@
+#/*##########################################################################
+#
+# The PyMca X-Ray Fluorescence Toolkit
+#
+# Copyright (c) 2004-2026 European Synchrotron Radiation Facility
+#
+# This file is part of the PyMca X-ray Fluorescence Toolkit developed at
+# the ESRF by the Software group.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#############################################################################*/
+__author__ = "V. Armando Sole - ESRF Data Analysis"
+__contact__ = "sole@esrf.fr"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+import unittest
+import numpy
+
+
+class testCurveAlignment(unittest.TestCase):
+    def setUp(self):
+        random = numpy.random.RandomState(3)
+        self.shifts = random.uniform(-2.0, 2.0, 25)
+        self.shifts[0] = 0.0
+        self.xList = []
+        self.yList = []
+        for shift in self.shifts:
+            x = numpy.sort(random.uniform(-40.0, 40.0, 300 + \
+                                          random.randint(0, 50)))
+            y = numpy.exp(-0.5 * (x - shift) ** 2 / 4.0) + \
+                0.3 * numpy.exp(-0.5 * (x - shift - 8.0) ** 2 / 9.0)
+            self.xList.append(x)
+            self.yList.append(y)
+
+    def testCurveAlignmentResample(self):
+        from PyMca5.PyMcaMath import CurveAlignment
+        grid = CurveAlignment.getCommonGrid(self.xList, reference=2)
+        step = numpy.average(numpy.diff(self.xList[2]))
+        self.assertAlmostEqual(grid[1] - grid[0], step, 1)
+        values, mask = CurveAlignment.resampleCurves(self.xList,
+                                                     self.yList, grid)
+        self.assertEqual(values.shape, (len(self.xList), grid.size))
+        for i, (x, y) in enumerate(zip(self.xList, self.yList)):
+            inside = (grid > x.min()) & (grid < x.max())
+            self.assertTrue(numpy.array_equal(mask[i], inside))
+            self.assertTrue(numpy.allclose(values[i][inside],
+                                           numpy.interp(grid[inside], x, y)))
+
+    def testCurveAlignmentShiftsFFT(self):
+        from PyMca5.PyMcaMath import CurveAlignment
+        grid = CurveAlignment.getCommonGrid(self.xList)
+        values, mask = CurveAlignment.resampleCurves(self.xList,
+                                                     self.yList, grid)
+        values = values[:, mask.all(axis=0)]
+        step = grid[1] - grid[0]
+        shifts = CurveAlignment.calculateShiftsFFT(values, step=step)
+        # same result as aligning each curve separately
+        y0 = CurveAlignment.normalize(values[0])
+        fft0 = numpy.fft.fft(y0)
+        m = values.shape[1] // 2
+        for i, y in enumerate(values):
+            correlation = numpy.fft.ifft(fft0 * numpy.fft.fft(y).conjugate())
+            correlation = numpy.roll(correlation.real, m)
+            correlation = CurveAlignment.normalize(correlation)
+            peak = correlation.argmax()
+            left, right = peak, peak
+            while (correlation[left] > 0.95) and (correlation[right] > 0.95):
+                left -= 1
+                right += 1
+            idx = numpy.arange(left, right + 1)
+            center = (correlation[idx] * idx).sum() / correlation[idx].sum()
+            self.assertAlmostEqual(shifts[i], (center - m) * step, 10)
+        self.assertTrue(numpy.allclose(shifts, -self.shifts, atol=0.5 * step))
+        refined = CurveAlignment.calculateShiftsFFT(values, step=step,
+                                                    refinement="parabola")
+        self.assertTrue(numpy.allclose(refined, -self.shifts, atol=0.5 * step))
+        self.assertRaises(ValueError, CurveAlignment.calculateShiftsFFT,
+                          values, refinement="spline")
+
+    def testCurveAlignmentShiftsMax(self):
+        from PyMca5.PyMcaMath import CurveAlignment
+        shifts = CurveAlignment.calculateShiftsMax(self.xList, self.yList,
+                                                   reference=1,
+                                                   xmin=-20., xmax=20.)
+        for i, (x, y) in enumerate(zip(self.xList, self.yList)):
+            idx = (x >= -20.) & (x <= 20.)
+            x0 = self.xList[1][(self.xList[1] >= -20.) & \
+                               (self.xList[1] <= 20.)]
+            y0 = self.yList[1][(self.xList[1] >= -20.) & \
+                               (self.xList[1] <= 20.)]
+            self.assertEqual(shifts[i], x0[y0.argmax()] - x[idx][y[idx].argmax()])
+
+    def testCurveAlignmentApplyShifts(self):
+        from PyMca5.PyMcaMath import CurveAlignment
+        xList = [numpy.linspace(-40., 40., n) for n in [200, 201, 200]]
+        yList = [numpy.exp(-0.5 * x ** 2 / 4.0) for x in xList]
+        shifts = [1.5, -0.7, 3.2]
+        shifted = CurveAlignment.fftShiftCurves(xList, yList, shifts)
+        for x, y, yShifted, shift in zip(xList, yList, shifted, shifts):
+            frequencies = numpy.fft.fftfreq(len(x), d=x[1] - x[0])
+            expected = numpy.fft.ifft(numpy.fft.fft(y) * \
+                        numpy.exp(-2.0j * numpy.pi * frequencies * shift)).real
+            self.assertTrue(numpy.allclose(yShifted, expected))
+            self.assertAlmostEqual(x[yShifted.argmax()], shift, 0)
+
+
+def getSuite(auto=True):
+    testSuite = unittest.TestSuite()
+    if auto:
+        testSuite.addTest(\
+            unittest.TestLoader().loadTestsFromTestCase(testCurveAlignment))
+    else:
+        # use a predefined order
+        testSuite.addTest(testCurveAlignment("testCurveAlignmentResample"))
+        testSuite.addTest(testCurveAlignment("testCurveAlignmentShiftsFFT"))
+        testSuite.addTest(testCurveAlignment("testCurveAlignmentShiftsMax"))
+        testSuite.addTest(testCurveAlignment("testCurveAlignmentApplyShifts"))
+    return testSuite
+
+def test(auto=False):
+    unittest.TextTestRunner(verbosity=2).run(getSuite(auto=auto))
+
+if __name__ == '__main__':
+    test()
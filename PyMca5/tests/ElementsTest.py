@@ -309,6 +309,115 @@ def testMaterialCompositionCalculation(self):
             self.assertTrue(abs(c1[key] - c2[key]) < 1.0e-7,
                             "Inconsistent calculation for element %s" % key)
 
+    def testMassAttenuationVectorization(self):
+        if DEBUG:
+            print()
+            print("Testing single and multiple energy calculations")
+        # include energies below 1 keV, at tabulated points and at edges
+        xcom = self._elements.getelementmassattcoef("Fe", None)
+        energyList = [0.8, 1.5, 7.112, 10., 20.4, 90.33] + \
+                     list(xcom["energy"][:40:3])
+        keys = ['coherent', 'compton', 'photo', 'pair', 'total']
+        for compound in ["Fe", "C22H10N2O5", "Fe2O3"]:
+            data = self._elements.getmassattcoef(compound, energyList)
+            for i, energy in enumerate(energyList):
+                single = self._elements.getmassattcoef(compound, energy)
+                for key in keys:
+                    self.assertEqual(data[key][i], single[key][0],
+                        "Inconsistent %s of %s at %f keV" % \
+                        (key, compound, energy))
+        data = self._elements.getMaterialMassAttenuationCoefficients( \
+                        ["Fe2O3", "Water"], [0.5, 0.5], energyList)
+        for i, energy in enumerate(energyList):
+            single = self._elements.getMaterialMassAttenuationCoefficients( \
+                        ["Fe2O3", "Water"], [0.5, 0.5], energy)
+            for key in keys:
+                self.assertEqual(data[key][i], single[key][0])
+
+    def testMassAttenuationReferenceValues(self):
+        if DEBUG:
+            print()
+            print("Testing mass attenuation coefficients against reference")
+        # energies below 1 keV, at tabulated points and at edges
+        energyList = [0.5, 0.8, 1.5, 7.112, 10.0, 20.4, 90.33,
+                      250., 1022., 1500.]
+        # values obtained with the non vectorized getmassattcoef
+        reference = {
+            "Fe": {
+                "coherent": [1.591099, 3.228892, 4.2411, 1.7447, 1.2013,
+                             0.5021232508389019, 0.04515057797478247,
+                             0.006732, 0.00041958, 0.00019507],
+                "compton": [0.00269134, 0.00616022, 0.015301, 0.067999,
+                            0.085414, 0.11681685983933246, 0.1312205573437227,
+                            0.10406, 0.058532, 0.048115],
+                "photo": [4618.7432096600005, 13525.93494778, 3395.7, 51.382,
+                          169.41, 23.65696865991034, 0.27949352357715623,
+                          0.012431, 0.00033353, 0.00016272],
+                "pair": [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0,
+                         0.000358],
+                "total": [4620.337, 13529.17, 3399.956401, 53.194699,
+                          170.696714, 24.275908770588575, 0.4558646588956614,
+                          0.123223, 0.05928511, 0.04883078999999999],
+            },
+            "C22H10N2O5": {
+                "coherent": [1.2182103422673218, 1.367430735317835,
+                             1.0477760234988855, 0.27363746497931735,
+                             0.18118846472551503, 0.06929902040177233,
+                             0.005077650684755107, 0.0006917623048996119,
+                             4.167520973226336e-05, 1.9349269504807543e-05],
+                "compton": [0.0034302131507705047, 0.008407377867818868,
+                            0.02526501246089622, 0.12280721321540725,
+                            0.13972169849025412, 0.1638120199511447,
+                            0.15334937448782782, 0.11620627815733581,
+                            0.06457170922482972, 0.05304050922273722],
+                "photo": [11487.0294312071, 4956.677912702489,
+                          886.4571546678663, 8.370472252770412,
+                          2.859119670806349, 0.2872176190214509,
+                          0.002102762026057011, 7.686005944653115e-05,
+                          1.8245205564402222e-06, 8.991976420468931e-07],
+                "pair": [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0,
+                         8.522971082559976e-05],
+                "total": [11488.251071762521, 4958.053750815674,
+                          887.5301957038262, 8.766916930965138,
+                          3.1800298340221174, 0.5203286593743679,
+                          0.16052978719863994, 0.11697490052168195,
+                          0.06461520895511842, 0.053145987400709666],
+            },
+            "Fe2O3": {
+                "coherent": [1.350422138346423, 2.752590972850646,
+                             3.384734314339387, 1.3407259525376043,
+                             0.917321540388228, 0.38001735258457364,
+                             0.03376229482882048, 0.005008986349405135,
+                             0.0003116046462116469, 0.0001448584533500313],
+                "compton": [0.0025581659596700633, 0.00598851609239715,
+                            0.0160157401377583, 0.08077300807414411,
+                            0.09864661114589857, 0.1281035834279207,
+                            0.13651177177905752, 0.10681316217908579,
+                            0.059866201628052604, 0.049197629931120854],
+                "photo": [3672.3553217429776, 11898.69547846902,
+                          2840.1683782091422, 40.761799253288544,
+                          120.16473512836569, 16.71914582723431,
+                          0.19679578997018962, 0.008743037069505324,
+                          0.0002344437532874139, 0.00011438406011271134],
+                "pair": [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0,
+                         0.00028263969943644334],
+                "total": [3673.7083020472833, 11901.454057957964,
+                          2843.5691282636194, 42.183298213900294,
+                          121.18070327989982, 17.227266763246803,
+                          0.3670698565780677, 0.12056518559799624,
+                          0.06041225002755166, 0.04973951214402003],
+            },
+        }
+        for compound in reference:
+            data = self._elements.getmassattcoef(compound, energyList)
+            for key in reference[compound]:
+                for i, energy in enumerate(energyList):
+                    yRef = reference[compound][key][i]
+                    yTest = data[key][i]
+                    self.assertTrue(abs(yTest - yRef) <= 1.0e-12 * yRef,
+                        "Got %s %s of %s at %f keV instead of %s" % \
+                        (yTest, key, compound, energy, yRef))
+
 def getSuite(auto=True):
     testSuite = unittest.TestSuite()
     if auto:
@@ -321,6 +430,8 @@ def getSuite(auto=True):
         testSuite.addTest(testElements("testElementCrossSectionsCalculation"))
         testSuite.addTest(testElements("testMaterialCrossSectionsCalculation"))
         testSuite.addTest(testElements("testMaterialCompositionCalculation"))
+        testSuite.addTest(testElements("testMassAttenuationVectorization"))
+        testSuite.addTest(testElements("testMassAttenuationReferenceValues"))
     return testSuite
 
 def test(auto=False):
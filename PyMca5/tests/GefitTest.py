@@ -70,6 +70,59 @@ def testGefitLeastSquares(self):
         for i in range(len(originalParameters)):
             self.assertTrue(abs(fittedpar[i] - originalParameters[i]) < 0.01)
 
+    def testGefitConstrainedLeastSquares(self):
+        self.testGefitImport()
+        x = numpy.arange(500.)
+        originalParameters = numpy.array([10.5, 2, 1000.0, 200., 100,
+                                          500.0, 260., 100],
+                                         numpy.float64)
+
+        def twoGaussians(param, t):
+            return self.gaussianPlusLinearBackground(param[:5], t) + \
+                   self.gaussianPlusLinearBackground([0.0, 0.0] + \
+                                                     list(param[5:8]), t)
+        y = twoGaussians(originalParameters, x)
+
+        # second peak area related to first one, position given by delta
+        # and same width
+        startingParameters = [0.0, 1.0, 900.0, 190., 90,
+                              400., 240., 90.]
+        constraints = [["FREE", "POSITIVE", "QUOTED", "FREE", "POSITIVE",
+                        "FACTOR", "DELTA", "FACTOR"],
+                       [0, 0, 500., 0, 0, 2, 3, 4],
+                       [0, 0, 2000., 0, 0, 0.5, 60., 1.0]]
+        fittedpar, chisq, sigmapar = self.gefit.LeastSquaresFit(twoGaussians,
+                                                     startingParameters,
+                                                     xdata=x,
+                                                     ydata=y,
+                                                     constrains=constraints)
+        for i in range(len(originalParameters)):
+            self.assertTrue(abs(fittedpar[i] - originalParameters[i]) < 0.01)
+        self.assertEqual(fittedpar[5], 0.5 * fittedpar[2])
+        self.assertEqual(fittedpar[6], 60. + fittedpar[3])
+        self.assertEqual(fittedpar[7], fittedpar[4])
+
+        # fixed and ignored parameters
+        constraints = [["FREE", "IGNORE", "FREE", "FIXED", "FREE"],
+                       [0, 0, 0, 0, 0],
+                       [0, 0, 0, 0, 0]]
+
+        def gaussianPlusConstant(param, t):
+            # the ignored parameter is not passed to the function
+            return self.gaussianPlusLinearBackground([param[0], 0.0] + \
+                                                     list(param[1:]), t)
+        y = gaussianPlusConstant([10.5, 1000., 200., 100.], x)
+        fittedpar, chisq, sigmapar = self.gefit.LeastSquaresFit(
+                                                     gaussianPlusConstant,
+                                                     [0.0, 0.0, 900.0, 200., 90],
+                                                     xdata=x,
+                                                     ydata=y,
+                                                     constrains=constraints)
+        self.assertEqual(fittedpar[1], 0.0)
+        self.assertEqual(fittedpar[3], 200.)
+        for i, value in [(0, 10.5), (2, 1000.), (4, 100.)]:
+            self.assertTrue(abs(fittedpar[i] - value) < 0.01)
+
 def getSuite(auto=True):
     testSuite = unittest.TestSuite()
     if auto:
@@ -79,6 +132,7 @@ def getSuite(auto=True):
         # use a predefined order
         testSuite.addTest(testGefit("testGefitImport"))
         testSuite.addTest(testGefit("testGefitLeastSquares"))
+        testSuite.addTest(testGefit("testGefitConstrainedLeastSquares"))
     return testSuite
 
 def test(auto=False):
@@ -0,0 +1,194 @@
+#/*##########################################################################
+#
+# The PyMca X-Ray Fluorescence Toolkit
+#
+# Copyright (c) 2004-2026 European Synchrotron Radiation Facility
+#
+# This file is part of the PyMca X-ray Fluorescence Toolkit developed at
+# the ESRF by the Software group.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#############################################################################*/
+__author__ = "V. Armando Sole - ESRF Data Analysis"
+__contact__ = "sole@esrf.fr"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+import unittest
+import os
+import shutil
+import tempfile
+import numpy
+try:
+    import h5py
+    HAS_H5PY = True
+except ImportError:
+    HAS_H5PY = False
+
+
+@unittest.skipIf(not HAS_H5PY, "h5py not available")
+class testHDF5ChunkWriter(unittest.TestCase):
+    def setUp(self):
+        self._outputDir = tempfile.mkdtemp()
+        self._fileName = os.path.join(self._outputDir, "chunks.h5")
+
+    def tearDown(self):
+        shutil.rmtree(self._outputDir, ignore_errors=True)
+
+    def testChunkShape(self):
+        from PyMca5.PyMcaIO import HDF5ChunkWriter
+        chunks = HDF5ChunkWriter.getChunkShape((100, 200, 2048),
+                                               numpy.float32)
+        self.assertEqual(chunks[-1], HDF5ChunkWriter.MCA_CHUNK_SIZE)
+        nbytes = 4 * numpy.prod(chunks)
+        self.assertTrue(nbytes <= HDF5ChunkWriter.CHUNK_BYTES)
+        self.assertTrue(nbytes > HDF5ChunkWriter.CHUNK_BYTES // 2)
+        chunks = HDF5ChunkWriter.getChunkShape((2048, 100, 200),
+                                               numpy.float32, mcaIndex=0)
+        self.assertEqual(chunks[0], HDF5ChunkWriter.MCA_CHUNK_SIZE)
+        # never bigger than the dataset
+        self.assertEqual(HDF5ChunkWriter.getChunkShape((3, 4, 5), numpy.uint8),
+                         (3, 4, 5))
+
+    def testWriteDataset(self):
+        from PyMca5.PyMcaIO import HDF5ChunkWriter
+        data = numpy.random.poisson(5, (13, 17, 300)).astype(numpy.float32)
+        chunks = (4, 5, 64)
+        optionsList = [{},
+                       {"compression": "gzip"},
+                       {"compression": "gzip", "shuffle": True},
+                       {"compression": "gzip", "compression_opts": 9,
+                        "shuffle": True},
+                       {"compression": "lzf", "shuffle": True},
+                       {"fletcher32": True}]
+        with h5py.File(self._fileName, "w") as h5:
+            for i, options in enumerate(optionsList):
+                for nthreads in [1, 3]:
+                    name = "data_%d_%d" % (i, nthreads)
+                    dataset = h5.create_dataset(name,
+                                                shape=data.shape,
+                                                dtype=numpy.float64,
+                                                chunks=chunks,
+                                                **options)
+                    HDF5ChunkWriter.writeDataset(dataset, data,
+                                                 nthreads=nthreads)
+        with h5py.File(self._fileName, "r") as h5:
+            for i, options in enumerate(optionsList):
+                for nthreads in [1, 3]:
+                    name = "data_%d_%d" % (i, nthreads)
+                    self.assertTrue(numpy.array_equal(h5[name][()], data),
+                                    "Wrong data with %s" % options)
+                    # spectrum and image access
+                    self.assertTrue(numpy.array_equal(h5[name][7, 11],
+                                                      data[7, 11]))
+                    self.assertTrue(numpy.array_equal(h5[name][:, :, 150],
+                                                      data[:, :, 150]))
+        self.assertRaises(ValueError, HDF5ChunkWriter.writeDataset,
+                          h5py.File(self._fileName, "r")["data_0_1"],
+                          data[1:])
+
+    def testCreateDataset(self):
+        from PyMca5.PyMcaIO import HDF5ChunkWriter
+        x = numpy.arange(512.)
+        data = numpy.exp(-0.5 * ((x - 256) / 20.) ** 2) * 1000.
+        data = numpy.tile(data, (20, 30, 1)).astype(numpy.float32)
+        model = 0.5 * data
+        with h5py.File(self._fileName, "w") as h5:
+            HDF5ChunkWriter.createDataset(h5, "plain", data=data)
+            HDF5ChunkWriter.createDataset(h5, "gzip", data=data,
+                                          compression="gzip", nthreads=2)
+            # images stacked along the first axis
+            HDF5ChunkWriter.createDataset(h5, "images",
+                                          data=data.transpose(2, 0, 1),
+                                          compression=True, mcaIndex=0)
+            HDF5ChunkWriter.createDataset(h5, "residuals",
+                    data=HDF5ChunkWriter.ArrayDifference(data, model),
+                    dtype=numpy.float32, compression="gzip")
+            empty = HDF5ChunkWriter.createDataset(h5, "empty",
+                                                  shape=data.shape,
+                                                  dtype=numpy.float32,
+                                                  compression="gzip",
+                                                  fillvalue=1)
+            empty[3] = data[3]
+        difference = HDF5ChunkWriter.ArrayDifference(data, model)
+        self.assertTrue(numpy.allclose(numpy.asarray(difference), 0.5 * data))
+        self.assertEqual(difference.__array__(numpy.float64).dtype,
+                         numpy.float64)
+        # numpy >= 2 passes copy to __array__
+        self.assertTrue(numpy.allclose(difference.__array__(copy=True),
+                                       0.5 * data))
+        with h5py.File(self._fileName, "r") as h5:
+            self.assertTrue(numpy.array_equal(h5["plain"][()], data))
+            self.assertTrue(numpy.array_equal(h5["gzip"][()], data))
+            self.assertTrue(numpy.array_equal(h5["images"][()],
+                                              data.transpose(2, 0, 1)))
+            self.assertTrue(numpy.allclose(h5["residuals"][()], 0.5 * data))
+            self.assertEqual(h5["gzip"].compression, "gzip")
+            self.assertTrue(h5["gzip"].shuffle)
+            self.assertEqual(h5["images"].chunks[0],
+                             HDF5ChunkWriter.MCA_CHUNK_SIZE)
+            self.assertTrue(h5["gzip"].id.get_storage_size() < \
+                            0.5 * h5["plain"].id.get_storage_size())
+            self.assertTrue(numpy.array_equal(h5["empty"][3], data[3]))
+            self.assertTrue(numpy.all(h5["empty"][4] == 1))
+
+    def testArraySave(self):
+        from PyMca5.PyMcaIO import ArraySave
+        data = numpy.random.poisson(5, (6, 7, 200)).astype(numpy.int32)
+        cases = [("nexus", -1, "spectrum", data),
+                 ("nexus", -1, "image", data.transpose(2, 0, 1)),
+                 ("nexus", 0, "spectrum", data.transpose(1, 2, 0)),
+                 ("simplest", -1, None, data)]
+        for mode, mcaindex, interpretation, expected in cases:
+            for compression in [None, "gzip"]:
+                ArraySave.save3DArrayAsHDF5(data, self._fileName,
+                                            mode=mode,
+                                            mcaindex=mcaindex,
+                                            interpretation=interpretation,
+                                            compression=compression,
+                                            nthreads=2)
+                with h5py.File(self._fileName, "r") as h5:
+                    if mode == "simplest":
+                        dataset = h5["data"]
+                    else:
+                        dataset = h5["data/NXdata/data"]
+                    self.assertEqual(dataset.compression, compression)
+                    self.assertTrue(numpy.array_equal(dataset[()], expected),
+                                    "Wrong data %s %s %s" % \
+                                    (mode, interpretation, compression))
+
+
+def getSuite(auto=True):
+    testSuite = unittest.TestSuite()
+    if auto:
+        testSuite.addTest(\
+            unittest.TestLoader().loadTestsFromTestCase(testHDF5ChunkWriter))
+    else:
+        # use a predefined order
+        testSuite.addTest(testHDF5ChunkWriter("testChunkShape"))
+        testSuite.addTest(testHDF5ChunkWriter("testWriteDataset"))
+        testSuite.addTest(testHDF5ChunkWriter("testCreateDataset"))
+        testSuite.addTest(testHDF5ChunkWriter("testArraySave"))
+    return testSuite
+
+def test(auto=False):
+    unittest.TextTestRunner(verbosity=2).run(getSuite(auto=auto))
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,142 @@
+#/*##########################################################################
+#
+# The PyMca X-Ray Fluorescence Toolkit
+#
+# Copyright (c) 2004-2026 European Synchrotron Radiation Facility
+#
+# This file is part of the PyMca X-ray Fluorescence Toolkit developed at
+# the ESRF by the Software group.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#############################################################################*/
+__author__ = "V. Armando Sole - ESRF Data Analysis"
+__contact__ = "sole@esrf.fr"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+import unittest
+import numpy
+try:
+    from PyMca5.PyMcaMath.PyMcaSciPy.signal import median
+    from PyMca5.PyMcaMath.PyMcaSciPy.signal import mediantools
+    HAS_MEDIAN = True
+except ImportError:
+    HAS_MEDIAN = False
+
+# method argument of the C filter
+AUTO, SELECT, HISTOGRAM = 0, 1, 2
+
+
+def referenceMedian(image, kernel, conditional=0):
+    # shrinking window, lower of the middle values for even windows
+    output = numpy.zeros_like(image)
+    hRows, hColumns = kernel[0] // 2, kernel[1] // 2
+    for i in range(image.shape[0]):
+        for j in range(image.shape[1]):
+            window = image[max(i - hRows, 0):i + hRows + 1,
+                           max(j - hColumns, 0):j + hColumns + 1]
+            value = image[i, j]
+            if conditional and (value != window.min()) and \
+               (value != window.max()):
+                output[i, j] = value
+            else:
+                window = numpy.sort(window.ravel())
+                output[i, j] = window[(window.size - 1) // 2]
+    return output
+
+
+@unittest.skipIf(not HAS_MEDIAN, "mediantools not available")
+class testMedianFilter(unittest.TestCase):
+    def setUp(self):
+        self.random = numpy.random.RandomState(7)
+
+    def testMedianFilterReference(self):
+        image = self.random.randint(0, 500, size=(23, 31)).astype(numpy.float64)
+        for kernel in [[3, 3], [5, 9], [9, 3], [1, 7], [41, 41]]:
+            for conditional in [0, 1]:
+                expected = referenceMedian(image, kernel, conditional)
+                for method in [SELECT, HISTOGRAM, AUTO]:
+                    result = mediantools._medfilt2d(image, kernel,
+                                                    conditional, method)
+                    self.assertTrue(numpy.array_equal(result, expected),
+                        "Kernel %s conditional %d method %d" % \
+                        (kernel, conditional, method))
+        self.assertTrue(numpy.array_equal(median.medfilt2d(image, [5, 9]),
+                                          referenceMedian(image, [5, 9])))
+
+    def testMedianFilterTypes(self):
+        image = self.random.randint(0, 200, size=(40, 17))
+        for dtype in [numpy.uint8, numpy.int16, numpy.uint16, numpy.int32,
+                      numpy.uint32, numpy.int64, numpy.float32, numpy.float64]:
+            data = image.astype(dtype)
+            if dtype in [numpy.int16, numpy.int32, numpy.int64]:
+                data -= 100
+            select = mediantools._medfilt2d(data, [7, 5], 0, SELECT)
+            histogram = mediantools._medfilt2d(data, [7, 5], 0, HISTOGRAM)
+            self.assertEqual(histogram.dtype, data.dtype)
+            self.assertTrue(numpy.array_equal(select, histogram),
+                            "Methods differ for %s" % dtype)
+        # non integer values cannot use the histogram, the result is exact
+        data = self.random.random_sample((20, 30))
+        self.assertTrue(numpy.array_equal(
+                    mediantools._medfilt2d(data, [5, 5], 0, HISTOGRAM),
+                    referenceMedian(data, [5, 5])))
+        # neither with NaN values
+        data = numpy.round(data * 100)
+        data[3, 4] = numpy.nan
+        numpy.testing.assert_array_equal(
+                    mediantools._medfilt2d(data, [5, 5], 0, SELECT),
+                    mediantools._medfilt2d(data, [5, 5], 0, HISTOGRAM))
+
+    def testMedianFilterStack(self):
+        stack = numpy.round(self.random.random_sample((7, 30, 20)) * 1000)
+        stack = stack.astype(numpy.float32)
+        expected = numpy.array([median.medfilt2d(image, [5, 3], 1) \
+                                for image in stack])
+        for nthreads in [1, 3]:
+            result = median.medfilt2dStack(stack, [5, 3], conditional=1,
+                                           nthreads=nthreads)
+            self.assertTrue(numpy.array_equal(result, expected))
+        # big-endian data are accepted as by medfilt2d
+        bigEndian = stack.astype(">f4")
+        result = median.medfilt2dStack(bigEndian, [5, 3], conditional=1)
+        self.assertTrue(numpy.array_equal(result, expected))
+        self.assertTrue(numpy.array_equal(
+                    median.medfilt2d(bigEndian[0], [5, 3], 1), expected[0]))
+        self.assertRaises(ValueError, median.medfilt2dStack, stack[0])
+        self.assertRaises(ValueError, median.medfilt2dStack, stack, 4)
+
+
+def getSuite(auto=True):
+    testSuite = unittest.TestSuite()
+    if auto:
+        testSuite.addTest(\
+            unittest.TestLoader().loadTestsFromTestCase(testMedianFilter))
+    else:
+        # use a predefined order
+        testSuite.addTest(testMedianFilter("testMedianFilterReference"))
+        testSuite.addTest(testMedianFilter("testMedianFilterTypes"))
+        testSuite.addTest(testMedianFilter("testMedianFilterStack"))
+    return testSuite
+
+def test(auto=False):
+    unittest.TextTestRunner(verbosity=2).run(getSuite(auto=auto))
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,145 @@
+#/*##########################################################################
+#
+# The PyMca X-Ray Fluorescence Toolkit
+#
+# Copyright (c) 2004-2026 European Synchrotron Radiation Facility
+#
+# This file is part of the PyMca X-ray Fluorescence Toolkit developed at
+# the ESRF by the Software group.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#############################################################################*/
+__author__ = "V. Armando Sole - ESRF Data Analysis"
+__contact__ = "sole@esrf.fr"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+import unittest
+import numpy
+try:
+    from PyMca5.Object3D import Object3DIsosurface
+    HAS_MARCHING_CUBES = True
+except ImportError:
+    HAS_MARCHING_CUBES = False
+
+
+class testObject3DIsosurface(unittest.TestCase):
+    def _getSphere(self, n=40):
+        # grid centered at the origin, not uniformly spaced along z
+        x = numpy.arange(n, dtype=numpy.float32) - 0.5 * (n - 1)
+        y = 1.5 * x
+        z = numpy.sign(x) * x * x / (0.5 * n)
+        X, Y, Z = numpy.meshgrid(x, y, z, indexing="ij")
+        return numpy.sqrt(X * X + Y * Y + Z * Z), x, y, z
+
+    @unittest.skipIf(not HAS_MARCHING_CUBES, "Marching cubes not available")
+    def testIsosurfaceSphere(self):
+        values, x, y, z = self._getSphere()
+        radius = 12.0
+        vertices, normals, indices = \
+            Object3DIsosurface.getIsosurface(values, radius, x, y, z,
+                                             nthreads=1)
+        self.assertEqual(vertices.dtype, numpy.float32)
+        self.assertEqual(vertices.shape, normals.shape)
+        self.assertEqual(indices.shape[1], 3)
+        self.assertTrue(indices.shape[0] > 100)
+        self.assertEqual(indices.min(), 0)
+        self.assertEqual(indices.max(), vertices.shape[0] - 1)
+        distance = numpy.sqrt((vertices * vertices).sum(axis=1))
+        self.assertTrue(numpy.allclose(distance, radius, rtol=0.05))
+        # unit normals along the gradient of the field, outwards
+        self.assertTrue(numpy.allclose((normals * normals).sum(axis=1), 1.0,
+                                       atol=1.0e-4))
+        cosine = (normals * vertices).sum(axis=1) / distance
+        self.assertTrue(cosine.min() > 0.9)
+        # shared vertices: every edge of the closed surface in two triangles
+        edges = numpy.concatenate([indices[:, [0, 1]],
+                                   indices[:, [1, 2]],
+                                   indices[:, [2, 0]]])
+        edges.sort(axis=1)
+        edges = edges[:, 0].astype(numpy.int64) * vertices.shape[0] + \
+                edges[:, 1]
+        counts = numpy.unique(edges, return_counts=True)[1]
+        self.assertTrue(numpy.all(counts == 2))
+
+    @unittest.skipIf(not HAS_MARCHING_CUBES, "Marching cubes not available")
+    def testIsosurfaceSlabs(self):
+        values, x, y, z = self._getSphere(33)
+        for decimation in [1, 2, 3]:
+            reference = Object3DIsosurface.getIsosurface(values, 9.0, x, y, z,
+                                                     decimation=decimation,
+                                                     nthreads=1)
+            slabs = Object3DIsosurface.getSlabs(values.shape[0],
+                                                decimation, nslabs=5)
+            self.assertEqual(slabs[0][0], 0)
+            for start, end in slabs:
+                self.assertEqual(start % decimation, 0)
+                self.assertEqual(end % decimation, 0)
+            threaded = Object3DIsosurface.getIsosurface(values, 9.0, x, y, z,
+                                                    decimation=decimation,
+                                                    nthreads=3)
+            for a, b in zip(reference, threaded):
+                self.assertTrue(numpy.array_equal(a, b),
+                                "Threaded mesh differs with decimation %d" % \
+                                decimation)
+        full = Object3DIsosurface.getIsosurface(values, 9.0, x, y, z)
+        decimated = Object3DIsosurface.getIsosurface(values, 9.0, x, y, z,
+                                                     decimation=2)
+        self.assertTrue(decimated[2].shape[0] < full[2].shape[0])
+        # nothing to extract outside the data range
+        empty = Object3DIsosurface.getIsosurface(values, -1.0, x, y, z)
+        self.assertEqual(empty[0].shape, (0, 3))
+        self.assertEqual(empty[2].shape, (0, 3))
+
+    @unittest.skipIf(not HAS_MARCHING_CUBES, "Marching cubes not available")
+    def testIsosurfaceCache(self):
+        values, x, y, z = self._getSphere(24)
+        cache = Object3DIsosurface.IsosurfaceCache(values, x, y, z, maxsize=2)
+        mesh = cache.getMesh(5.0)
+        self.assertTrue(cache.isCached(5, 1))
+        self.assertTrue(cache.getMesh(5.0) is mesh)
+        cache.getMesh(5.0, decimation=2)
+        cache.getMesh(5.0)
+        cache.getMesh(7.0)
+        self.assertTrue(cache.isCached(5.0))
+        self.assertFalse(cache.isCached(5.0, 2))
+        cache.clear()
+        self.assertFalse(cache.isCached(5.0))
+        colors = Object3DIsosurface.getNormalColors(mesh[1])
+        self.assertEqual(colors.shape, mesh[1].shape)
+        self.assertTrue(colors.min() >= 0.0)
+
+
+def getSuite(auto=True):
+    testSuite = unittest.TestSuite()
+    if auto:
+        testSuite.addTest(\
+            unittest.TestLoader().loadTestsFromTestCase(testObject3DIsosurface))
+    else:
+        # use a predefined order
+        testSuite.addTest(testObject3DIsosurface("testIsosurfaceSphere"))
+        testSuite.addTest(testObject3DIsosurface("testIsosurfaceSlabs"))
+        testSuite.addTest(testObject3DIsosurface("testIsosurfaceCache"))
+    return testSuite
+
+def test(auto=False):
+    unittest.TextTestRunner(verbosity=2).run(getSuite(auto=auto))
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,240 @@
+#/*##########################################################################
+#
+# The PyMca X-Ray Fluorescence Toolkit
+#
+# Copyright (c) 2004-2026 European Synchrotron Radiation Facility
+#
+# This file is part of the PyMca X-ray Fluorescence Toolkit developed at
+# the ESRF by the Software group.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#############################################################################*/
+__author__ = "V. Armando Sole - ESRF Data Analysis"
+__contact__ = "sole@esrf.fr"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+import unittest
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+
+# seconds allowed to find the plugins in a fresh interpreter
+IMPORT_TIME_BUDGET = 1.0
+
+# seconds allowed to import the MCA window in a fresh interpreter
+MCA_WINDOW_IMPORT_TIME_BUDGET = 5.0
+
+def _isQtAvailable():
+    from PyMca5.PyMcaCore import LazyImport
+    for binding in ["PyQt5", "PySide2", "PyQt4", "PySide"]:
+        if LazyImport.isAvailable(binding):
+            return True
+    return False
+
+PLUGIN_TEXT = """
+import sys
+IMPORTED = True
+
+class DummyPlugin(object):
+    def __init__(self, plotWindow):
+        self.plotWindow = plotWindow
+
+    def getMethods(self, plottype=None):
+        return ["%s"]
+
+def getPlugin1DInstance(plotWindow, **kw):
+    return DummyPlugin(plotWindow)
+"""
+
+
+class testPluginLoader(unittest.TestCase):
+    def setUp(self):
+        from PyMca5.PyMcaGraph import PluginLoader
+        self._outputDir = tempfile.mkdtemp()
+        self._manifestFile = PluginLoader.MANIFEST_FILE
+        PluginLoader.MANIFEST_FILE = os.path.join(self._outputDir,
+                                                  "manifest.json")
+        self._pluginDir = os.path.join(self._outputDir, "plugins")
+        os.mkdir(self._pluginDir)
+        self._moduleNames = ["lazyPluginTestA", "lazyPluginTestB"]
+        for name in self._moduleNames:
+            with open(os.path.join(self._pluginDir, name + ".py"), "w") as f:
+                f.write(PLUGIN_TEXT % name)
+        with open(os.path.join(self._pluginDir, "lazyNotAPlugin.py"), "w") as f:
+            f.write("def getSomethingElse():\n    pass\n")
+        with open(os.path.join(self._pluginDir, "lazyBrokenPlugin.py"),
+                  "w") as f:
+            f.write("raise ImportError('broken')\n" + \
+                    "def getPlugin1DInstance(plotWindow, **kw):\n    pass\n")
+
+    def tearDown(self):
+        from PyMca5.PyMcaGraph import PluginLoader
+        PluginLoader.MANIFEST_FILE = self._manifestFile
+        for name in self._moduleNames + ["lazyBrokenPlugin"]:
+            if name in sys.modules:
+                del sys.modules[name]
+        if self._pluginDir in sys.path:
+            sys.path.remove(self._pluginDir)
+        shutil.rmtree(self._outputDir, ignore_errors=True)
+
+    def testPluginLoaderLazyDiscovery(self):
+        import logging
+        from PyMca5.PyMcaGraph import PluginLoader
+        level = PluginLoader._logger.level
+        PluginLoader._logger.setLevel(logging.CRITICAL)
+        try:
+            loader = PluginLoader.PluginLoader(directoryList=[self._pluginDir])
+            self.assertEqual(sorted(loader.pluginList),
+                             sorted(self._moduleNames + ["lazyBrokenPlugin"]))
+            # nothing imported yet
+            for name in self._moduleNames:
+                self.assertFalse(name in sys.modules)
+            self.assertEqual(len(loader.pluginInstanceDict), 0)
+
+            # first use
+            plugin = loader.pluginInstanceDict["lazyPluginTestA"]
+            self.assertEqual(plugin.getMethods(), ["lazyPluginTestA"])
+            self.assertTrue(plugin.plotWindow is loader)
+            self.assertTrue("lazyPluginTestA" in sys.modules)
+            self.assertFalse("lazyPluginTestB" in sys.modules)
+            self.assertTrue(loader.pluginInstanceDict["lazyPluginTestA"] \
+                            is plugin)
+
+            n, message = loader.loadPlugins(exceptions=True)
+            self.assertEqual(n, 2)
+            self.assertTrue("lazyBrokenPlugin" in message)
+            self.assertEqual(sorted(loader.pluginList),
+                             sorted(self._moduleNames))
+            self.assertTrue(loader.pluginInstanceDict["lazyPluginTestA"] \
+                            is plugin)
+            self.assertRaises(KeyError,
+                              loader.pluginInstanceDict.__getitem__,
+                              "lazyNotAPlugin")
+        finally:
+            PluginLoader._logger.setLevel(level)
+
+        # the manifest describes all the files
+        with open(PluginLoader.MANIFEST_FILE, "r") as f:
+            manifest = json.load(f)["entries"]
+        self.assertEqual(len(manifest), 4)
+        key = os.path.abspath(os.path.join(self._pluginDir,
+                                           "lazyPluginTestB.py"))
+        self.assertEqual(manifest[key]["entryPoints"],
+                         ["getPlugin1DInstance"])
+
+        # modified files are read again
+        fname = os.path.join(self._pluginDir, "lazyNotAPlugin.py")
+        with open(fname, "w") as f:
+            f.write(PLUGIN_TEXT % "lazyNotAPlugin")
+        os.utime(fname, (time.time() + 10, time.time() + 10))
+        self._moduleNames.append("lazyNotAPlugin")
+        loader.getPlugins(directoryList=[self._pluginDir])
+        self.assertTrue("lazyNotAPlugin" in loader.pluginList)
+        self.assertEqual(loader.pluginInstanceDict["lazyNotAPlugin"].\
+                         getMethods(), ["lazyNotAPlugin"])
+
+    def testPluginLoaderImportTime(self):
+        from PyMca5 import PyMcaPlugins
+        pluginsDir = os.path.dirname(PyMcaPlugins.__file__)
+        manifestFile = os.path.join(self._outputDir, "budget.json")
+        code = "\n".join([
+            "import sys, time",
+            "t0 = time.time()",
+            "from PyMca5.PyMcaGraph import PluginLoader",
+            "PluginLoader.MANIFEST_FILE = %r" % manifestFile,
+            "loader = PluginLoader.PluginLoader(directoryList=[%r])" % \
+                                                                  pluginsDir,
+            "elapsed = time.time() - t0",
+            "imported = [name for name in loader.pluginList " + \
+                         "if name in sys.modules]",
+            "print('%d %d %f' % (len(loader.pluginList), len(imported), " + \
+                                 "elapsed))"])
+        env = os.environ.copy()
+        env["PYTHONPATH"] = os.pathsep.join([p for p in sys.path if p])
+        # the second run uses the manifest written by the first one
+        for i in range(2):
+            output = subprocess.check_output([sys.executable, "-c", code],
+                                             env=env)
+            nPlugins, nImported, elapsed = output.decode().split()[-3:]
+            self.assertTrue(int(nPlugins) > 0)
+            self.assertEqual(int(nImported), 0)
+            self.assertTrue(float(elapsed) < IMPORT_TIME_BUDGET,
+                            "Plugin discovery took %s seconds" % elapsed)
+        self.assertTrue(os.path.exists(manifestFile))
+
+    @unittest.skipIf(not _isQtAvailable(), "Qt not available")
+    def testMcaWindowImportTime(self):
+        code = "\n".join([
+            "import sys, time",
+            "t0 = time.time()",
+            "from PyMca5.PyMcaGui.pymca import McaWindow",
+            "elapsed = time.time() - t0",
+            "name = 'PyMca5.PyMcaGui.physics.xrf.McaAdvancedFit'",
+            "print('%d %f' % (name in sys.modules, elapsed))"])
+        env = os.environ.copy()
+        env["PYTHONPATH"] = os.pathsep.join([p for p in sys.path if p])
+        env["QT_QPA_PLATFORM"] = "offscreen"
+        output = subprocess.check_output([sys.executable, "-c", code],
+                                         env=env)
+        imported, elapsed = output.decode().split()[-2:]
+        # the advanced fit is imported when first used
+        self.assertEqual(int(imported), 0)
+        self.assertTrue(float(elapsed) < MCA_WINDOW_IMPORT_TIME_BUDGET,
+                        "McaWindow import took %s seconds" % elapsed)
+
+    def testPluginLoaderLazyModule(self):
+        from PyMca5.PyMcaCore import LazyImport
+        name = "lazyPluginTestB"
+        sys.path.insert(0, self._pluginDir)
+        module = LazyImport.LazyModule(name)
+        self.assertTrue(LazyImport.isAvailable(name))
+        self.assertFalse(LazyImport.isAvailable("lazyNonExistingModule"))
+        self.assertFalse(LazyImport.isLoaded(module))
+        self.assertFalse(name in sys.modules)
+        self.assertTrue(module.IMPORTED)
+        self.assertTrue(LazyImport.isLoaded(module))
+        self.assertTrue(module.DummyPlugin is sys.modules[name].DummyPlugin)
+        self.assertTrue(LazyImport.load(module) is sys.modules[name])
+        # import errors are raised on first use
+        module = LazyImport.LazyModule("lazyNonExistingModule")
+        self.assertRaises(ImportError, LazyImport.load, module)
+
+def getSuite(auto=True):
+    testSuite = unittest.TestSuite()
+    if auto:
+        testSuite.addTest(\
+            unittest.TestLoader().loadTestsFromTestCase(testPluginLoader))
+    else:
+        # use a predefined order
+        testSuite.addTest(testPluginLoader("testPluginLoaderLazyDiscovery"))
+        testSuite.addTest(testPluginLoader("testPluginLoaderLazyModule"))
+        testSuite.addTest(testPluginLoader("testPluginLoaderImportTime"))
+        testSuite.addTest(testPluginLoader("testMcaWindowImportTime"))
+    return testSuite
+
+def test(auto=False):
+    unittest.TextTestRunner(verbosity=2).run(getSuite(auto=auto))
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,144 @@
+#/*##########################################################################
+#
+# The PyMca X-Ray Fluorescence Toolkit
+#
+# Copyright (c) 2004-2026 European Synchrotron Radiation Facility
+#
+# This file is part of the PyMca X-ray Fluorescence Toolkit developed at
+# the ESRF by the Software group.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#############################################################################*/
+__author__ = "V. Armando Sole - ESRF Data Analysis"
+__contact__ = "sole@esrf.fr"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+import unittest
+import numpy
+from PyMca5.PyMcaMath import ScanGridding
+
+
+class testScanGridding(unittest.TestCase):
+    def _function(self, x, y):
+        return 1.0 + 0.5 * x - 0.25 * y + 0.1 * x * y
+
+    def _getScans(self, slope):
+        # unevenly spaced scans, some of them measured backwards
+        offsets = numpy.array([0.0, 0.7, 1.1, 2.0, 3.3, 4.0])
+        yList = []
+        zList = []
+        for i, offset in enumerate(offsets):
+            y = numpy.linspace(-2.0, 2.0, 150 + 7 * i)
+            if i % 2:
+                y = y[::-1]
+            x = offset + slope * y
+            yList.append(y)
+            zList.append(self._function(x, y))
+        return offsets, yList, zList
+
+    def testInterpolation(self):
+        xGrid = numpy.linspace(-0.5, 4.5, 51)
+        yGrid = numpy.linspace(-2.5, 2.5, 41)
+        for slope in [0.0, 1.0]:
+            offsets, yList, zList = self._getScans(slope)
+            # the order of the scans is irrelevant
+            order = [3, 0, 5, 1, 4, 2]
+            zz = ScanGridding.gridScans(offsets[order],
+                                        [yList[i] for i in order],
+                                        [zList[i] for i in order],
+                                        xGrid, yGrid, slope=slope)
+            self.assertEqual(zz.shape, (yGrid.size, xGrid.size))
+            xx, yy = numpy.meshgrid(xGrid, yGrid)
+            position = xx - slope * yy
+            inside = (position >= 0.0) & (position <= 4.0) & \
+                     (yy >= -2.0) & (yy <= 2.0)
+            self.assertTrue(numpy.all(numpy.isfinite(zz[inside])))
+            self.assertTrue(numpy.all(numpy.isnan(zz[~inside])))
+            # exact along the scans, linear between them
+            expected = self._function(xx, yy)
+            if slope == 0.0:
+                delta = 0.05
+            else:
+                # the cross term is not linear along the rows
+                delta = 0.15
+            self.assertTrue(numpy.allclose(zz[inside], expected[inside],
+                                           atol=delta))
+            column = numpy.nonzero(numpy.abs(xGrid - 2.0) < 1.0e-10)[0][0]
+            onScan = inside[:, column] & (slope == 0.0)
+            self.assertTrue(numpy.allclose(zz[onScan, column],
+                                           expected[onScan, column]))
+
+    def testSingleScan(self):
+        y = numpy.linspace(0.0, 1.0, 11)
+        zz = ScanGridding.interpolateScans([1.0], [y], [2 * y],
+                                           [0.0, 1.0, 2.0], y)
+        self.assertTrue(numpy.allclose(zz[:, 1], 2 * y))
+        self.assertTrue(numpy.all(numpy.isnan(zz[:, [0, 2]])))
+
+    def testBinning(self):
+        xGrid = numpy.linspace(0.0, 4.0, 5)
+        yGrid = numpy.linspace(-2.0, 2.0, 9)
+        for slope in [0.0, 1.0]:
+            offsets, yList, zList = self._getScans(slope)
+            zz = ScanGridding.gridScans(offsets, yList, zList,
+                                        xGrid, yGrid, slope=slope,
+                                        method="binning")
+            self.assertEqual(zz.shape, (yGrid.size, xGrid.size))
+            # brute force reference
+            x = numpy.concatenate([o + slope * y \
+                                   for o, y in zip(offsets, yList)])
+            y = numpy.concatenate(yList)
+            z = numpy.concatenate(zList)
+            i = numpy.floor((y + 2.0) / 0.5 + 0.5).astype(numpy.int64)
+            j = numpy.floor(x + 0.5).astype(numpy.int64)
+            for row in range(yGrid.size):
+                for col in range(xGrid.size):
+                    selection = (i == row) & (j == col)
+                    if selection.any():
+                        self.assertAlmostEqual(zz[row, col],
+                                               z[selection].mean())
+                    else:
+                        self.assertTrue(numpy.isnan(zz[row, col]))
+        # weights
+        zz = ScanGridding.binScans([0.0], [[0.0, 0.1]], [[1.0, 4.0]],
+                                   [0.0], [0.0], weights=[[3.0, 1.0]])
+        self.assertAlmostEqual(zz[0, 0], 1.75)
+        self.assertRaises(ValueError, ScanGridding.gridScans,
+                          [0.0], [[0.0]], [[0.0]], [0.0], [0.0],
+                          method="unknown")
+
+
+def getSuite(auto=True):
+    testSuite = unittest.TestSuite()
+    if auto:
+        testSuite.addTest(\
+            unittest.TestLoader().loadTestsFromTestCase(testScanGridding))
+    else:
+        # use a predefined order
+        testSuite.addTest(testScanGridding("testInterpolation"))
+        testSuite.addTest(testScanGridding("testSingleScan"))
+        testSuite.addTest(testScanGridding("testBinning"))
+    return testSuite
+
+def test(auto=False):
+    unittest.TextTestRunner(verbosity=2).run(getSuite(auto=auto))
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,138 @@
+#/*##########################################################################
+#
+# The PyMca X-Ray Fluorescence Toolkit
+#
+# Copyright (c) 2004-2019 European Synchrotron Radiation Facility
+#
+# This file is part of the PyMca X-ray Fluorescence Toolkit developed at
+# the ESRF by the Software group.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#############################################################################*/
+__author__ = "V. Armando Sole - ESRF Data Analysis"
+__contact__ = "sole@esrf.fr"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+import unittest
+import os
+import shutil
+import tempfile
+import numpy
+try:
+    import h5py
+    HAS_H5PY = True
+except ImportError:
+    HAS_H5PY = False
+
+
+class testSimpleFit(unittest.TestCase):
+    def setUp(self):
+        self._outputDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._outputDir, ignore_errors=True)
+
+    def _getFit(self, policy="Estimate always"):
+        from PyMca5.PyMcaMath.fitting import SimpleFitModule
+        from PyMca5.PyMcaMath.fitting import SpecfitFunctions
+        fit = SimpleFitModule.SimpleFit()
+        fit.importFunctions(SpecfitFunctions)
+        fit.setFitFunction('Gaussians')
+        fit.setBackgroundFunction('Constant')
+        configuration = fit.getConfiguration()
+        configuration['fit']['function_estimation_policy'] = policy
+        configuration['fit']['background_estimation_policy'] = policy
+        configuration['fit']['strip_flag'] = 0
+        fit.setConfiguration(configuration)
+        return fit
+
+    def _getCurves(self, n=12):
+        from PyMca5.PyMcaMath.fitting import SpecfitFuns
+        x = numpy.arange(500.)
+        curves = []
+        for i in range(n):
+            curves.append(10.0 + SpecfitFuns.gauss([100. + 10 * i,
+                                                    200. + i, 20.], x))
+        return x, curves
+
+    def testSimpleFitImport(self):
+        from PyMca5.PyMcaMath.fitting import SimpleFitModule
+        from PyMca5.PyMcaMath.fitting import SimpleFitParallel
+
+    @unittest.skipIf(not HAS_H5PY, "h5py not available")
+    def testSimpleFitAllInPool(self):
+        from PyMca5.PyMcaMath.fitting import SimpleFitAll
+        x, curves = self._getCurves()
+        for policy in ["Estimate always", "Estimate once"]:
+            values = {}
+            for nprocesses in [1, 2]:
+                instance = SimpleFitAll.SimpleFitAll(self._getFit(policy))
+                instance.setData(x, curves)
+                instance.setOutputDirectory(self._outputDir)
+                instance.setOutputFileName("%s_%d.h5" % (policy[-4:],
+                                                         nprocesses))
+                instance.processAll(nprocesses=nprocesses, batchsize=3)
+                path = "fit_curve_%d/fit_process/results/parameter_values"
+                with h5py.File(instance.getOutputFileName(), "r") as h5f:
+                    self.assertEqual(len(list(h5f.keys())), len(curves))
+                    values[nprocesses] = numpy.array(
+                        [h5f[path % i][()] for i in range(len(curves))])
+            self.assertTrue(numpy.allclose(values[1], values[2]),
+                            "Parallel fit differs with policy %s" % policy)
+            self.assertTrue(numpy.allclose(values[1][:, 1],
+                                           100. + 10 * numpy.arange(12)))
+
+    def testStackSimpleFitInPool(self):
+        from PyMca5.PyMcaMath.fitting import StackSimpleFit
+        x, curves = self._getCurves()
+        data = numpy.array(curves).reshape(3, 4, -1)
+        mask = numpy.ones((3, 4), numpy.uint8)
+        mask[1, 2] = 0
+        images = {}
+        for nprocesses in [1, 2]:
+            instance = StackSimpleFit.StackSimpleFit(self._getFit())
+            instance.setData(x, data)
+            instance.setOutputDirectory(self._outputDir)
+            instance.setOutputFileBaseName("stack_%d" % nprocesses)
+            instance.processStack(mask=mask, nprocesses=nprocesses)
+            images[nprocesses] = numpy.array([instance._images[p]
+                                         for p in instance._parameters])
+        self.assertTrue(numpy.allclose(images[1], images[2]))
+        self.assertEqual(images[2][1, 1, 2], 0.0)
+        self.assertAlmostEqual(images[2][1, 0, 0], 100., 3)
+
+
+def getSuite(auto=True):
+    testSuite = unittest.TestSuite()
+    if auto:
+        testSuite.addTest(\
+            unittest.TestLoader().loadTestsFromTestCase(testSimpleFit))
+    else:
+        # use a predefined order
+        testSuite.addTest(testSimpleFit("testSimpleFitImport"))
+        testSuite.addTest(testSimpleFit("testSimpleFitAllInPool"))
+        testSuite.addTest(testSimpleFit("testStackSimpleFitInPool"))
+    return testSuite
+
+def test(auto=False):
+    unittest.TextTestRunner(verbosity=2).run(getSuite(auto=auto))
+
+if __name__ == '__main__':
+    test()
@@ -143,6 +143,161 @@ def testSpecfileReadingCompatibleWithUserLocale(self):
                     (datacol[1], data[0][1]))
         gc.collect()
 
+    def _writeMcaFile(self, fname, nmca, nchannels, offset=0):
+        text  = "#F %s\n\n" % fname
+        text += "#S 1  mesh\n"
+        text += "#N 1\n"
+        text += "#L point\n"
+        text += "#@MCA %16C\n"
+        text += "#@CHANN %d 0 %d 1\n" % (nchannels, nchannels - 1)
+        for i in range(nmca):
+            values = ["%d" % (offset + 10 * i + j) for j in range(nchannels)]
+            # non integer and negative values
+            values[1] = "%.3f" % (0.5 + i)
+            values[2] = "-%d" % i
+            lines = [" ".join(values[j:j + 16]) \
+                     for j in range(0, nchannels, 16)]
+            text += "%d\n" % i
+            text += "@A " + "\\\n".join(lines) + "\n"
+        text += "\n"
+        with open(fname, "w") as f:
+            f.write(text)
+
+    def testSpecfileMcaBlock(self):
+        import numpy
+        from PyMca5.PyMcaIO import specfilewrapper
+        self.testSpecfileImport()
+        mcaFile = self.fname + "_mca.dat"
+        self._writeMcaFile(mcaFile, 25, 40)
+        try:
+            self._sf = self.specfileClass.Specfile(mcaFile)
+            self._scan = self._sf[0]
+            self.assertEqual(self._scan.nbmca(), 25)
+            reference = numpy.array([self._scan.mca(i + 1) \
+                                     for i in range(25)])
+            self.assertEqual(reference.shape, (25, 40))
+            self.assertEqual(reference[3, 1], 3.5)
+            self.assertEqual(reference[3, 2], -3.0)
+            block = self._scan.mcablock()
+            self.assertTrue(numpy.array_equal(block, reference))
+            block = self._scan.mcablock(4, 9)
+            self.assertTrue(numpy.array_equal(block, reference[3:9]))
+            self.assertRaises(self.specfileClass.error,
+                              self._scan.mcablock, 0, 3)
+            self.assertRaises(self.specfileClass.error,
+                              self._scan.mcablock, 1, 26)
+
+            # strided reading by blocks
+            blocks = [block for block in specfilewrapper.iterMcaBlocks( \
+                                    self._scan, 2, 25, 3, chunksize=3)]
+            self.assertEqual([index for index, block in blocks], [0, 3, 6])
+            data = numpy.concatenate([block for index, block in blocks])
+            self.assertTrue(numpy.array_equal(data, reference[1::3]))
+            block = self._scan.mcablock(2, 25, 3)
+            self.assertTrue(numpy.array_equal(block, reference[1::3]))
+            self.assertRaises(self.specfileClass.error,
+                              self._scan.mcablock, 1, 25, 0)
+
+            # two detectors with different number of channels, only
+            # the spectra of the selected detector are parsed
+            self._sf = None
+            self._scan = None
+            gc.collect()
+            text  = "#F %s\n\n" % mcaFile
+            text += "#S 1  mesh\n"
+            text += "#N 1\n"
+            text += "#L point\n"
+            for i in range(6):
+                text += "%d\n" % i
+                for nchannels in [30, 20]:
+                    text += "@A " + " ".join(["%d" % (100 * i + j) \
+                                    for j in range(nchannels)]) + "\n"
+            text += "\n"
+            with open(mcaFile, "w") as f:
+                f.write(text)
+            self._sf = self.specfileClass.Specfile(mcaFile)
+            self._scan = self._sf[0]
+            self.assertEqual(self._scan.nbmca(), 12)
+            self.assertRaises(self.specfileClass.error,
+                              self._scan.mcablock)
+            for detector, nchannels in [(1, 30), (2, 20)]:
+                reference = numpy.array([self._scan.mca(i) \
+                                         for i in range(detector, 13, 2)])
+                self.assertEqual(reference.shape, (6, nchannels))
+                blocks = [block for block in specfilewrapper.iterMcaBlocks(\
+                                    self._scan, detector, 12, 2, chunksize=4)]
+                self.assertEqual([index for index, block in blocks], [0, 4])
+                data = numpy.concatenate([block for index, block in blocks])
+                self.assertTrue(numpy.array_equal(data, reference))
+
+            # several files read in threads
+            fileList = []
+            for i in range(4):
+                fileList.append(self.fname + "_mca_%d.dat" % i)
+                self._writeMcaFile(fileList[-1], 5, 20, offset=1000 * i)
+            blocks = list(specfilewrapper.readMcaBlocks(fileList,
+                                                        nthreads=2))
+            self.assertEqual(len(blocks), 4)
+            for i in range(4):
+                self.assertEqual(blocks[i].shape, (5, 20))
+                self.assertEqual(blocks[i][2, 5], 1000 * i + 25)
+        finally:
+            self._sf = None
+            self._scan = None
+            gc.collect()
+            for fname in [mcaFile] + \
+                    [self.fname + "_mca_%d.dat" % i for i in range(4)]:
+                if os.path.exists(fname):
+                    os.remove(fname)
+
+    def testSpecfileMcaBlockNumbers(self):
+        import locale
+        import numpy
+        from PyMca5.PyMcaIO import specfilewrapper
+        self.testSpecfileImport()
+        # converted exactly as by strtod in the C locale
+        exact = ["0", "-0", "+7", "007", "0.5", ".25", "3.", "-1.75",
+                 "0.001", "1e3", "2.5E-3", "-4.2e+10", "0.1", "0.3",
+                 "123456789012345", "9.87654321098765e-22", "1.5e22"]
+        # long mantissas and large exponents
+        other = ["12345678901234567890", "0.12345678901234567",
+                 "3.14159265358979323846", "1e-300", "6.02214076e23"]
+        tokens = exact + other
+        mcaFile = self.fname + "_numbers.dat"
+        text  = "#F %s\n\n" % mcaFile
+        text += "#S 1  numbers\n"
+        text += "#N 1\n"
+        text += "#L point\n"
+        text += "#@MCA %16C\n"
+        for i in range(3):
+            text += "%d\n" % i
+            text += "@A " + " ".join(tokens[:11]) + "\\\n" + \
+                    " ".join(tokens[11:]) + "\n"
+        text += "\n"
+        with open(mcaFile, "w") as f:
+            f.write(text)
+        current = locale.setlocale(locale.LC_NUMERIC)
+        try:
+            blocks = list(specfilewrapper.readMcaBlocks([mcaFile] * 4,
+                                                        nthreads=4))
+            # the parsing threads do not touch the locale
+            self.assertEqual(locale.setlocale(locale.LC_NUMERIC), current)
+            expected = numpy.array([float(x) for x in tokens])
+            n = len(exact)
+            for block in blocks:
+                self.assertEqual(block.shape, (3, len(tokens)))
+                for i in range(3):
+                    self.assertTrue(numpy.array_equal(block[i, :n],
+                                                      expected[:n]))
+                    self.assertTrue(numpy.allclose(block[i, n:],
+                                                   expected[n:],
+                                                   rtol=1.0e-15, atol=0))
+            self.assertEqual(numpy.signbit(blocks[0][0, 1]), True)
+        finally:
+            gc.collect()
+            if os.path.exists(mcaFile):
+                os.remove(mcaFile)
+
 def getSuite(auto=True):
     testSuite = unittest.TestSuite()
     if auto:
@@ -154,6 +309,8 @@ def getSuite(auto=True):
         testSuite.addTest(testSpecfile("testSpecfileReading"))
         testSuite.addTest(\
             testSpecfile("testSpecfileReadingCompatibleWithUserLocale"))
+        testSuite.addTest(testSpecfile("testSpecfileMcaBlock"))
+        testSuite.addTest(testSpecfile("testSpecfileMcaBlockNumbers"))
     return testSuite
 
 def test(auto=False):
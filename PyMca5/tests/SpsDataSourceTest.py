@@ -0,0 +1,127 @@
+#/*##########################################################################
+#
+# The PyMca X-Ray Fluorescence Toolkit
+#
+# Copyright (c) 2004-2026 European Synchrotron Radiation Facility
+#
+# This file is part of the PyMca X-ray Fluorescence Toolkit developed at
+# the ESRF by the Software group.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#############################################################################*/
+__author__ = "V. Armando Sole - ESRF Data Analysis"
+__contact__ = "sole@esrf.fr"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+import unittest
+import os
+import gc
+import numpy
+try:
+    from PyMca5.PyMcaIO import sps
+    HAS_SPS = hasattr(sps, "getdataview")
+except ImportError:
+    HAS_SPS = False
+
+
+@unittest.skipIf(not HAS_SPS, "sps not available")
+class testSpsDataSource(unittest.TestCase):
+    def setUp(self):
+        # a SPEC version of our own, as SPEC itself would create it
+        self._spec = "pymcatest%d" % os.getpid()
+        self._array = "image"
+        self._data = numpy.arange(200.).reshape(10, 20)
+        sps.create(self._spec, self._array, 10, 20, sps.DOUBLE,
+                   sps.TAG_ARRAY | sps.TAG_IMAGE)
+        self._update(self._data)
+
+    def _update(self, data):
+        sps.putdata(self._spec, self._array, data)
+        sps.updatedone(self._spec, self._array)
+
+    def testDataView(self):
+        view = sps.getdataview(self._spec, self._array)
+        self.assertEqual(view.shape, self._data.shape)
+        self.assertEqual(view.dtype, numpy.float64)
+        self.assertFalse(view.flags.writeable)
+        self.assertTrue(numpy.array_equal(view, self._data))
+        self.assertEqual(sps.dataviewcounter(view),
+                         sps.updatecounter(self._spec, self._array))
+
+        # no copy: updates are seen and the counter tells about them
+        counter = sps.dataviewcounter(view[2:, 1])
+        self._update(self._data + 1)
+        self.assertTrue(numpy.array_equal(view, self._data + 1))
+        self.assertNotEqual(sps.dataviewcounter(view), counter)
+        self.assertRaises(sps.error, sps.dataviewcounter, self._data)
+
+        # slices keep the mapping alive
+        row = view[3]
+        del view
+        gc.collect()
+        self.assertTrue(numpy.array_equal(row, self._data[3] + 1))
+
+    def testZeroCopyDataObject(self):
+        from PyMca5.PyMcaCore import SpsDataSource
+        for zerocopy in [False, True]:
+            self._update(self._data)
+            source = SpsDataSource.SpsDataSource(self._spec,
+                                                 zerocopy=zerocopy)
+            self.assertTrue(self._array in source.getSourceInfo()["KeyList"])
+            dataObject = source.getDataObject(self._array)
+            self.assertTrue(numpy.array_equal(dataObject.data, self._data))
+            self.assertEqual(dataObject.info.get("zerocopy", False), zerocopy)
+            self.assertEqual(dataObject.data.flags.writeable, not zerocopy)
+            self.assertTrue(source.isDataObjectConsistent(dataObject))
+
+            selection = {"rows": {"x": [], "y": [4], "m": []}}
+            rowObject = source.getDataObject(self._array,
+                                             selection=selection)
+            self.assertTrue(source.isDataObjectConsistent(rowObject))
+
+            # SPEC writes while the data are in use
+            self._update(self._data * 2)
+            if zerocopy:
+                self.assertFalse(source.isDataObjectConsistent(dataObject))
+                self.assertFalse(source.isDataObjectConsistent(rowObject))
+                self.assertTrue(numpy.array_equal(rowObject.y[0],
+                                                  self._data[4] * 2))
+            else:
+                self.assertTrue(source.isDataObjectConsistent(dataObject))
+                self.assertTrue(numpy.array_equal(dataObject.data,
+                                                  self._data))
+
+
+def getSuite(auto=True):
+    testSuite = unittest.TestSuite()
+    if auto:
+        testSuite.addTest(\
+            unittest.TestLoader().loadTestsFromTestCase(testSpsDataSource))
+    else:
+        # use a predefined order
+        testSuite.addTest(testSpsDataSource("testDataView"))
+        testSuite.addTest(testSpsDataSource("testZeroCopyDataObject"))
+    return testSuite
+
+def test(auto=False):
+    unittest.TextTestRunner(verbosity=2).run(getSuite(auto=auto))
+
+if __name__ == '__main__':
+    test()
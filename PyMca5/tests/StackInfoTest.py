@@ -451,13 +451,23 @@ def testFitHdf5Stack(self):
         if not os.path.exists(cfgFile):
             configuration.write(cfgFile)
             os.chmod(cfgFile, 0o777)
+        progress = []
         batch = McaAdvancedFitBatch.McaAdvancedFitBatch(cfgFile,
                                         filelist=[self._h5File],
                                         outputdir=self._outputDir,
                                         concentrations=True,
                                         selection=selection,
-                                        quiet=True)
+                                        quiet=True,
+                                        progresscallback=progress.append)
         batch.processList()
+        telemetry = batch.getTelemetry()
+        self.assertEqual(telemetry['counters']['spectra_fitted'],
+                         nRows * nColumns)
+        for stage in ['read', 'fit', 'write']:
+            self.assertTrue(stage in telemetry['timers'],
+                            "Missing %s stage timer" % stage)
+        self.assertEqual(progress[-1]['processed'], nRows * nColumns)
+        self.assertEqual(progress[-1]['total'], nRows * nColumns)
 
         # recover the results
         imageFile = os.path.join(self._outputDir, "IMAGES", "Steel.dat")
@@ -516,6 +526,539 @@ def testFitHdf5Stack(self):
         configuration['fit']['stripalgorithm'] = 1
         self._assert_fastfit(stack, configuration, live_time, nTimes)
 
+    @unittest.skipIf(not HAS_H5PY, "skipped h5py missing")
+    def testFastFitTelemetry(self):
+        import shutil
+        import tempfile
+        from PyMca5.PyMcaIO import specfilewrapper as specfile
+        from PyMca5.PyMcaIO import ConfigDict
+        from PyMca5.PyMcaPhysics.xrf import FastXRFLinearFit
+        from PyMca5.PyMcaPhysics.xrf.FastXRFLinearFitOutput import \
+                                                            OutputBuffer
+        spe = os.path.join(self.dataDir, "Steel.spe")
+        cfg = os.path.join(self.dataDir, "Steel.cfg")
+        sf = specfile.Specfile(spe)
+        counts = sf[0].mca(1)
+        sf = None
+        configuration = ConfigDict.ConfigDict()
+        configuration.read(cfg)
+        configuration['fit']['stripalgorithm'] = 1
+        data = numpy.tile(counts, (4, 5, 1))
+        outputDir = tempfile.mkdtemp()
+        try:
+            outbuffer = OutputBuffer(outputDir=outputDir,
+                                     outputRoot="telemetry",
+                                     h5=True)
+            progress = []
+            ffit = FastXRFLinearFit.FastXRFLinearFit()
+            with outbuffer.saveContext():
+                ffit.fitMultipleSpectra(y=data,
+                                        weight=0,
+                                        configuration=configuration,
+                                        refit=1,
+                                        outbuffer=outbuffer,
+                                        progresscallback=progress.append)
+            telemetry = outbuffer['telemetry'].asDict()
+            self.assertEqual(telemetry['counters']['spectra_fitted'], 20)
+            self.assertTrue(telemetry['counters']['bytes_read'] > 0)
+            for stage in ['configuration', 'read', 'background', 'lstsq',
+                          'fit', 'write']:
+                self.assertTrue(stage in telemetry['timers'],
+                                "Missing %s stage timer" % stage)
+            self.assertEqual(progress[-1]['processed'], 20)
+            self.assertEqual(progress[-1]['total'], 20)
+            with h5py.File(outbuffer.filename('.h5'), "r") as h5:
+                group = h5["images/fast_xrf_fit/telemetry"]
+                self.assertEqual(group["counters/spectra_fitted"][()], 20)
+                self.assertTrue(group["timers/write"][()] >= 0)
+        finally:
+            shutil.rmtree(outputDir, ignore_errors=True)
+
+    @unittest.skipIf(not HAS_H5PY, "h5py not available")
+    def testFastFitCompressedOutput(self):
+        import tempfile
+        from PyMca5.PyMcaIO import specfilewrapper as specfile
+        from PyMca5.PyMcaIO import ConfigDict
+        from PyMca5.PyMcaPhysics.xrf import FastXRFLinearFit
+        from PyMca5.PyMcaPhysics.xrf.FastXRFLinearFitOutput import \
+                                                            OutputBuffer
+        spe = os.path.join(self.dataDir, "Steel.spe")
+        cfg = os.path.join(self.dataDir, "Steel.cfg")
+        sf = specfile.Specfile(spe)
+        counts = sf[0].mca(1)
+        sf = None
+        configuration = ConfigDict.ConfigDict()
+        configuration.read(cfg)
+        configuration['fit']['stripalgorithm'] = 1
+        data = numpy.tile(counts, (6, 8, 1))
+        self._outputDir = tempfile.mkdtemp()
+        cubes = {}
+        sizes = {}
+        for compression in [None, "gzip"]:
+            outbuffer = OutputBuffer(outputDir=self._outputDir,
+                                     outputRoot="fit_%s" % compression,
+                                     saveFit=True, saveResiduals=True,
+                                     saveData=True, h5=True,
+                                     compression=compression,
+                                     nthreads=2)
+            ffit = FastXRFLinearFit.FastXRFLinearFit()
+            with outbuffer.saveContext():
+                ffit.fitMultipleSpectra(y=data,
+                                        weight=0,
+                                        configuration=configuration,
+                                        refit=1,
+                                        outbuffer=outbuffer)
+            with h5py.File(outbuffer.filename('.h5'), "r") as h5:
+                group = h5["images/fast_xrf_fit/results/fit"]
+                cubes[compression] = dict((name, group[name][()])
+                                for name in ["data", "model", "residuals"])
+                sizes[compression] = sum(group[name].id.get_storage_size()
+                                for name in ["data", "model", "residuals"])
+                if compression:
+                    for name in ["data", "model", "residuals"]:
+                        self.assertEqual(group[name].compression, compression)
+        for name in ["data", "model", "residuals"]:
+            self.assertTrue(numpy.allclose(cubes[None][name],
+                                           cubes["gzip"][name],
+                                           equal_nan=True),
+                            "Different %s when compressed" % name)
+        model = cubes["gzip"]["model"]
+        self.assertTrue(numpy.allclose(cubes["gzip"]["residuals"],
+                                       cubes["gzip"]["data"] - model,
+                                       equal_nan=True))
+        self.assertTrue(sizes["gzip"] < sizes[None])
+
+    @unittest.skipIf(not HAS_H5PY, "h5py not available")
+    def testFastFitFollower(self):
+        import tempfile
+        import multiprocessing
+        from PyMca5.PyMcaIO import specfilewrapper as specfile
+        from PyMca5.PyMcaIO import ConfigDict
+        from PyMca5.PyMcaPhysics.xrf import FastXRFLinearFit
+        spe = os.path.join(self.dataDir, "Steel.spe")
+        cfg = os.path.join(self.dataDir, "Steel.cfg")
+        sf = specfile.Specfile(spe)
+        counts = sf[0].mca(1)
+        sf = None
+        configuration = ConfigDict.ConfigDict()
+        configuration.read(cfg)
+        configuration['fit']['stripalgorithm'] = 1
+        nRows, nColumns = 6, 3
+        scale = numpy.arange(1, nRows * nColumns + 1).reshape(nRows, nColumns)
+        data = (scale[:, :, None] * counts[None, None, :]).astype(numpy.float32)
+
+        self._outputDir = tempfile.mkdtemp()
+        fileName = os.path.join(self._outputDir, "swmr.h5")
+        with h5py.File(fileName, "w", libver="latest") as h5:
+            h5.create_dataset("mca", shape=(0,) + data.shape[1:],
+                              maxshape=(None,) + data.shape[1:],
+                              chunks=(1,) + data.shape[1:],
+                              dtype=data.dtype)
+        ready = multiprocessing.Event()
+        writer = multiprocessing.Process(target=_swmrWriter,
+                                         args=(fileName, "mca", data,
+                                               0.1, ready))
+        writer.start()
+        try:
+            self.assertTrue(ready.wait(30))
+            batches = []
+            def rowcallback(outbuffer, rows):
+                batches.append(rows)
+                self.assertEqual(outbuffer['parameters'].shape[1], rows[1])
+            ffit = FastXRFLinearFit.FastXRFLinearFit()
+            outbuffer = ffit.followMultipleSpectra(fileName, "mca",
+                                            configuration=configuration,
+                                            weight=0, refit=1,
+                                            nrows=nRows, timeout=30,
+                                            interval=0.02,
+                                            rowcallback=rowcallback)
+        finally:
+            writer.join(30)
+        self.assertEqual(writer.exitcode, 0)
+        self.assertEqual(batches[0][0], 0)
+        self.assertEqual(batches[-1][1], nRows)
+        self.assertTrue(len(batches) > 1)
+        telemetry = outbuffer['telemetry'].asDict()
+        self.assertEqual(telemetry['counters']['spectra_fitted'],
+                         nRows * nColumns)
+
+        ffit = FastXRFLinearFit.FastXRFLinearFit()
+        reference = ffit.fitMultipleSpectra(y=data, weight=0,
+                                            configuration=configuration,
+                                            refit=1)
+        self.assertEqual(list(outbuffer['parameter_names']),
+                         list(reference['parameter_names']))
+        parameters = outbuffer['parameters']
+        self.assertEqual(parameters.shape, reference['parameters'].shape)
+        self.assertTrue(numpy.allclose(parameters,
+                                       reference['parameters'],
+                                       rtol=1.0e-4, atol=1.0e-3))
+        self.assertTrue(numpy.allclose(outbuffer['uncertainties'],
+                                       reference['uncertainties'],
+                                       rtol=1.0e-4, atol=1.0e-3))
+
+    def testTextImageStack(self):
+        import glob
+        import tempfile
+        from PyMca5.PyMcaIO import TextImageStack
+        self._outputDir = tempfile.mkdtemp()
+        nImages = 12
+        images = numpy.arange(nImages * 5 * 7, dtype=numpy.float64)
+        images = images.reshape(nImages, 5, 7) / 4.
+        fileList = []
+        for i in range(nImages):
+            fileName = os.path.join(self._outputDir, "image_%04d.txt" % i)
+            if i == 1:
+                numpy.savetxt(fileName, images[i], delimiter=",")
+            elif i == 2:
+                numpy.savetxt(fileName, images[i], header="commented")
+            else:
+                numpy.savetxt(fileName, images[i], delimiter="\t")
+            fileList.append(fileName)
+        cachePattern = os.path.join(self._outputDir, ".pymca_textstack_*.npy")
+
+        stack = TextImageStack.TextImageStack(cache=False)
+        stack.loadFileList(fileList)
+        self.assertTrue(numpy.allclose(stack.data, images))
+        self.assertEqual(glob.glob(cachePattern), [])
+
+        for nprocesses in [1, 2]:
+            for cached in [False, True]:
+                stack = TextImageStack.TextImageStack(nprocesses=nprocesses)
+                stack.loadFileList(fileList)
+                self.assertTrue(isinstance(stack.data, numpy.memmap))
+                self.assertTrue(numpy.allclose(stack.data, images))
+                self.assertEqual(stack.info["Size"], nImages)
+                self.assertEqual(len(glob.glob(cachePattern)), 1)
+                # copy on write, the cache is not modified
+                stack.data[0] = -1
+                stack = None
+            for name in glob.glob(cachePattern):
+                os.remove(name)
+
+        # each file is parsed once
+        readTextImage = TextImageStack.readTextImage
+        readFiles = []
+        def countingRead(filename, *var, **kw):
+            readFiles.append(filename)
+            return readTextImage(filename, *var, **kw)
+        TextImageStack.readTextImage = countingRead
+        try:
+            stack = TextImageStack.TextImageStack(fileList, nprocesses=1)
+            self.assertEqual(sorted(readFiles), fileList)
+            self.assertTrue(numpy.allclose(stack.data, images))
+            stack = None
+            # and not at all when the cache is used
+            readFiles = []
+            stack = TextImageStack.TextImageStack(fileList, nprocesses=1)
+            self.assertEqual(readFiles, [])
+            stack = None
+        finally:
+            TextImageStack.readTextImage = readTextImage
+
+        # a modified input is not read from the cache and the cache of the
+        # previous version is removed
+        oldCache = glob.glob(cachePattern)
+        self.assertEqual(len(oldCache), 1)
+        numpy.savetxt(fileList[3], images[3] + 1)
+        stack = TextImageStack.TextImageStack(fileList)
+        self.assertTrue(numpy.allclose(stack.data[3], images[3] + 1))
+        newCache = glob.glob(cachePattern)
+        self.assertEqual(len(newCache), 1)
+        self.assertTrue(newCache[0] != oldCache[0])
+        stack = None
+        # other lists of files keep their caches
+        stack = TextImageStack.TextImageStack(fileList[:4])
+        stack = None
+        self.assertEqual(len(glob.glob(cachePattern)), 2)
+
+        # integer types only accept integer values, as numpy.loadtxt
+        self.assertRaises(ValueError, TextImageStack.TextImageStack,
+                          fileList, dtype=numpy.int32, cache=False)
+        intFile = os.path.join(self._outputDir, "integers.txt")
+        numpy.savetxt(intFile, images[4] * 40, fmt="%d")
+        self.assertTrue(numpy.array_equal(
+            TextImageStack.readTextImage(intFile, dtype=numpy.int32),
+            (images[4] * 40).astype(numpy.int32)))
+        # out of range
+        self.assertRaises(ValueError, TextImageStack.readTextImage,
+                          intFile, dtype=numpy.uint8)
+        # an existing cache is replaced
+        name = os.path.join(self._outputDir, "replaced.npy")
+        for value in [1, 2]:
+            with open(name + ".tmp", "w") as f:
+                f.write("%d" % value)
+            TextImageStack._replaceFile(name + ".tmp", name)
+        with open(name) as f:
+            self.assertEqual(f.read(), "2")
+        self.assertFalse(os.path.exists(name + ".tmp"))
+
+    def testTextMapStacks(self):
+        import tempfile
+        from PyMca5.PyMcaIO import TextNumberReader
+        from PyMca5.PyMcaIO import LuciaMap
+        from PyMca5.PyMcaIO import RenishawMap
+        self._outputDir = tempfile.mkdtemp()
+        nRows = 3
+        nColumns = 4
+        nChannels = 50
+        data = numpy.arange(nRows * nColumns * nChannels, dtype=numpy.float32)
+        data = data.reshape(nRows, nColumns, nChannels) * 0.5 - 7.
+
+        # Renishaw map, x changing first, two spectra of the second row
+        # swapped (the first row gives the order of the columns)
+        wl = numpy.linspace(100., 200., nChannels)
+        order = [(i, j) for i in range(nRows) for j in range(nColumns)]
+        order[5], order[6] = order[6], order[5]
+        renishaw = os.path.join(self._outputDir, "map.txt")
+        with open(renishaw, "w") as f:
+            for i, j in order:
+                for k in range(nChannels):
+                    f.write("%g\t%g\t%.4f\t%g\n" % \
+                            (10. + i, 20. + 2 * j, wl[k], data[i, j, k]))
+
+        # Lucia map with its information file
+        lucia = os.path.join(self._outputDir, "map_01.mca")
+        with open(lucia, "w") as f:
+            f.write("Date: today\nLucia map\n\n")
+            for spectrum in data.reshape(-1, nChannels):
+                f.write("\n".join(["%g" % v for v in spectrum]))
+                f.write("\n" + "-" * 30 + "\n")
+        with open(os.path.join(self._outputDir, "map_Infos_01.dat"), "w") as f:
+            f.write("# Vertical width: 2.0\n# Vertical step: 1.0\n")
+
+        # progress reported within the announced range, always ended
+        def progressClass(readerClass):
+            class ProgressReader(readerClass):
+                def onBegin(self, n):
+                    self.calls = [("begin", n)]
+                def onProgress(self, n):
+                    self.calls.append(("progress", n))
+                def onEnd(self):
+                    self.calls.append(("end", None))
+            return ProgressReader
+
+        # without the last line end iterChunks yields one chunk more
+        with open(renishaw, "rb") as f:
+            text = f.read()
+        unterminated = os.path.join(self._outputDir, "unterminated.txt")
+        with open(unterminated, "wb") as f:
+            f.write(text.rstrip())
+
+        chunkBytes = TextNumberReader.CHUNK_BYTES
+        try:
+            for size in [chunkBytes, 700, 333]:
+                # chunks of a few lines
+                TextNumberReader.CHUNK_BYTES = size
+                for readerClass, fname in [(RenishawMap.RenishawMap, renishaw),
+                                           (RenishawMap.RenishawMap,
+                                            unterminated),
+                                           (LuciaMap.LuciaMap, lucia)]:
+                    stack = progressClass(readerClass)(fname)
+                    self.assertEqual(stack.data.shape, data.shape)
+                    self.assertTrue(numpy.allclose(stack.data, data))
+                    nMax = stack.calls[0][1]
+                    values = [n for call, n in stack.calls[1:-1]]
+                    self.assertEqual(values, sorted(values))
+                    self.assertTrue(max(values) <= nMax)
+                    self.assertEqual(values[-1], nMax)
+                    self.assertEqual(stack.calls[-1], ("end", None))
+                stack = RenishawMap.RenishawMap(renishaw)
+                self.assertTrue(numpy.allclose(stack.x[0], wl, atol=1.0e-4))
+                self.assertEqual(stack.info["McaIndex"], 2)
+                stack = LuciaMap.LuciaMap(lucia)
+                self.assertEqual(stack.header, "Date: today\nLucia map")
+        finally:
+            TextNumberReader.CHUNK_BYTES = chunkBytes
+
+        # not a regular map, the progress is ended anyway
+        irregular = os.path.join(self._outputDir, "irregular.txt")
+        with open(irregular, "w") as f:
+            for i, j in order[:-1]:
+                for k in range(nChannels):
+                    f.write("%g\t%g\t%.4f\t%g\n" % \
+                            (10. + i, 20. + 2 * j, wl[k], data[i, j, k]))
+        reader = progressClass(RenishawMap.RenishawMap)
+        calls = []
+        def onEnd(self):
+            calls.append("end")
+        reader.onEnd = onEnd
+        self.assertRaises(IOError, reader, irregular)
+        self.assertEqual(calls, ["end"])
+
+        # memory mapped output
+        npyFile = os.path.join(self._outputDir, "map.npy")
+        stack = RenishawMap.RenishawMap(renishaw, dataFile=npyFile)
+        self.assertTrue(isinstance(stack.data, numpy.memmap))
+        stack.data.flush()
+        stack = None
+        # one spectrum per row
+        self.assertTrue(numpy.allclose(numpy.load(npyFile),
+                                       data.reshape(-1, nChannels)))
+
+        # y changing first, the spectra are written to their rows
+        renishaw = os.path.join(self._outputDir, "mapy.txt")
+        with open(renishaw, "w") as f:
+            for j in range(nColumns):
+                for i in range(nRows):
+                    for k in range(nChannels):
+                        f.write("%g\t%g\t%.4f\t%g\n" % \
+                                (10. + i, 20. + 2 * j, wl[k], data[i, j, k]))
+        npyFile = os.path.join(self._outputDir, "mapy.npy")
+        stack = RenishawMap.RenishawMap(renishaw, dataFile=npyFile)
+        self.assertEqual(stack.data.shape, (nColumns, nRows, nChannels))
+        self.assertTrue(numpy.allclose(stack.data,
+                                       data.transpose(1, 0, 2)))
+        stack = None
+
+        # numbers mixed with text
+        self.assertTrue(numpy.allclose(
+            TextNumberReader.parseNumbers(b"1, 2.5;-3e2\tx=4 --\n5"),
+            [1, 2.5, -300, 4, 5]))
+        self.assertEqual(TextNumberReader.countNumbers(b" 1 2\n3,4 "), 4)
+
+    def testBinaryMapStacks(self):
+        import tempfile
+        from PyMca5.PyMcaIO import OmnicMap
+        from PyMca5.PyMcaIO import SupaVisioMap
+        self._outputDir = tempfile.mkdtemp()
+        nRows = 3
+        nColumns = 4
+        nChannels = 20
+        data = numpy.arange(nRows * nColumns * nChannels, dtype=numpy.float32)
+        data = data.reshape(nRows, nColumns, nChannels) * 0.5 - 7.
+        data[1, 2, 3] = numpy.nan
+
+        # OMNIC map, each spectrum preceded by a 100 bytes header
+        omnic = os.path.join(self._outputDir, "map.map")
+        with open(omnic, "wb") as f:
+            f.write(b"\x00" * 400)
+            for i in range(nRows):
+                for j in range(nColumns):
+                    text = "Spectrum %d of %d, X = %.1f, Y = %.1f" % \
+                           (i * nColumns + j + 1, nRows * nColumns,
+                            10. * j, 5. * i)
+                    header = b"\x00" * 16 + text.encode("utf-8")
+                    f.write(header + b"\x00" * (100 - len(header)))
+                    f.write(data[i, j].astype("<f4").tobytes())
+        stack = OmnicMap.OmnicMap(omnic)
+        self.assertEqual(stack.data.shape, data.shape)
+        self.assertEqual(stack.data[1, 2, 3], 0.0)
+        data[1, 2, 3] = 0.0
+        self.assertTrue(numpy.allclose(stack.data, data))
+        self.assertEqual(stack.info["McaCalib"], [0.0, 1.0, 0.0])
+        stack = None
+
+        # SupaVisio map, a list of (y, x, channel) events
+        nX = 3
+        nY = 2
+        events = numpy.array([[0, 0, 5], [1, 2, 7], [1, 2, 7],
+                              [0, 1, 3000], [1, 1, 0]], dtype="<u2")
+        supaVisio = os.path.join(self._outputDir, "map.pige")
+        with open(supaVisio, "wb") as f:
+            f.write(numpy.array([0, nY, nX], dtype="<u2").tobytes())
+            f.write(events.tobytes())
+            f.write(numpy.zeros((6,), dtype="<u2").tobytes())
+        stack = SupaVisioMap.SupaVisioMap(supaVisio)
+        expected = numpy.zeros((nX, nY, 2048))
+        expected[0, 0, 5] = 1
+        expected[2, 1, 7] = 2
+        expected[1, 1, 0] = 1
+        self.assertEqual(stack.data.shape, expected.shape)
+        self.assertTrue(numpy.allclose(stack.data, expected))
+
+    @unittest.skipIf(not HAS_H5PY, "skipped h5py missing")
+    def testHdf5VirtualStack(self):
+        import tempfile
+        from PyMca5.PyMcaIO import specfilewrapper as specfile
+        from PyMca5.PyMcaIO import ConfigDict
+        from PyMca5.PyMcaIO import HDF5Stack1D
+        from PyMca5.PyMcaCore import StackBase
+        spe = os.path.join(self.dataDir, "Steel.spe")
+        cfg = os.path.join(self.dataDir, "Steel.cfg")
+        sf = specfile.Specfile(spe)
+        counts = sf[0].mca(1)
+        sf = None
+        configuration = ConfigDict.ConfigDict()
+        configuration.read(cfg)
+        calibration = configuration["detector"]["zero"], \
+                      configuration["detector"]["gain"], 0.0
+        initialTime = configuration["concentrations"]["time"]
+
+        # one file per map line
+        self._outputDir = tempfile.mkdtemp()
+        nRows = 4
+        nColumns = 6
+        nTimes = 3
+        data = numpy.tile(counts.astype(numpy.float32),
+                          (nRows, nColumns, 1))
+        live_time = numpy.arange(nRows * nColumns)
+        live_time = initialTime + (live_time % nTimes) * initialTime
+        fileList = []
+        for i in range(nRows):
+            fileName = os.path.join(self._outputDir, "line_%04d.h5" % i)
+            with h5py.File(fileName, "w") as h5:
+                mca = h5.require_group("/entry/instrument/mca_0")
+                mca["data"] = data[i]
+                mca["data"].attrs["interpretation"] = "spectrum"
+                mca["live_time"] = live_time[i * nColumns:(i + 1) * nColumns]
+                mca["calibration"] = numpy.array(calibration)
+            fileList.append(fileName)
+        selection = {"y": "/instrument/mca_0/data"}
+
+        inMemory = HDF5Stack1D.HDF5Stack1D(fileList, selection, lazy=False)
+        stack = HDF5Stack1D.HDF5Stack1D(fileList, selection, lazy=True)
+        self.assertTrue(isinstance(inMemory.data, numpy.ndarray))
+        self.assertTrue(isinstance(stack.data, h5py.Dataset))
+        self.assertTrue(stack.data.is_virtual)
+        self.assertEqual(stack.data.shape, (nRows, nColumns, counts.size))
+        self.assertTrue(numpy.allclose(stack.data[()], inMemory.data))
+        self.assertTrue(numpy.allclose(stack.data[()], data))
+        self.assertTrue(numpy.allclose(stack.info["McaLiveTime"], live_time))
+        self.assertTrue(numpy.allclose(stack.info["McaCalib"], calibration))
+        for key in ["McaIndex", "Dim_1", "Dim_2", "Dim_3"]:
+            self.assertEqual(stack.info[key], inMemory.info[key])
+
+        # the monitor needs the data in memory
+        monitorStack = HDF5Stack1D.HDF5Stack1D(fileList,
+                                {"y": "/instrument/mca_0/data",
+                                 "m": "/instrument/mca_0/live_time"},
+                                lazy=True)
+        self.assertTrue(isinstance(monitorStack.data, numpy.ndarray))
+        monitorStack = None
+
+        # the virtual stack is handled as any other dynamic stack
+        sb = StackBase.StackBase()
+        sb.setStack(stack)
+        x, y, legend, info = sb.getStackOriginalCurve()
+        self.assertTrue(numpy.allclose(y, data.sum(axis=(0, 1))))
+        mask = numpy.zeros((nRows, nColumns), dtype=numpy.uint8)
+        mask[1, 2:5] = 1
+        sb.setSelectionMask(mask)
+        mcaObject = sb.calculateMcaDataObject(normalize=False)
+        self.assertTrue(numpy.allclose(mcaObject.y[0],
+                                       data[mask > 0].sum(axis=0)))
+        sb = None
+
+        configuration["concentrations"]["usematrix"] = 0
+        configuration["concentrations"]["useautotime"] = 1
+        configuration['fit']['stripalgorithm'] = 1
+        self._assert_fastfit(stack, configuration, live_time, nTimes)
+        stack = None
+
+
+def _swmrWriter(fileName, name, data, delay, ready):
+    # writes the rows one by one as an acquisition would do
+    import time
+    with h5py.File(fileName, "r+", libver="latest") as h5:
+        dset = h5[name]
+        h5.swmr_mode = True
+        ready.set()
+        for i in range(data.shape[0]):
+            time.sleep(delay)
+            dset.resize(i + 1, axis=0)
+            dset[i] = data[i]
+            dset.flush()
 
 def getSuite(auto=True):
     testSuite = unittest.TestSuite()
@@ -528,6 +1071,13 @@ def getSuite(auto=True):
         testSuite.addTest(testStackInfo("testDataFilePresence"))
         testSuite.addTest(testStackInfo("testStackFastFit"))
         testSuite.addTest(testStackInfo("testFitHdf5Stack"))
+        testSuite.addTest(testStackInfo("testFastFitTelemetry"))
+        testSuite.addTest(testStackInfo("testFastFitCompressedOutput"))
+        testSuite.addTest(testStackInfo("testFastFitFollower"))
+        testSuite.addTest(testStackInfo("testTextImageStack"))
+        testSuite.addTest(testStackInfo("testTextMapStacks"))
+        testSuite.addTest(testStackInfo("testBinaryMapStacks"))
+        testSuite.addTest(testStackInfo("testHdf5VirtualStack"))
     return testSuite
 
 def test(auto=False):
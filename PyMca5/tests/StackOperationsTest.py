@@ -0,0 +1,264 @@
+#/*##########################################################################
+#
+# The PyMca X-Ray Fluorescence Toolkit
+#
+# Copyright (c) 2004-2026 European Synchrotron Radiation Facility
+#
+# This file is part of the PyMca X-ray Fluorescence Toolkit developed at
+# the ESRF by the Software group.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#############################################################################*/
+__author__ = "V. Armando Sole - ESRF Data Analysis"
+__contact__ = "sole@esrf.fr"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+import os
+import shutil
+import tempfile
+import unittest
+import numpy
+try:
+    import h5py
+    HAS_H5PY = True
+except ImportError:
+    HAS_H5PY = False
+from PyMca5.PyMcaMath import StackOperations
+from PyMca5.PyMcaMath import SNIPModule
+from PyMca5.PyMcaMath import SGModule
+
+
+class DummyStack(object):
+    def __init__(self, data, mcaIndex):
+        self.data = data
+        self.info = {"McaIndex": mcaIndex}
+
+
+class testStackOperations(unittest.TestCase):
+    def setUp(self):
+        self.path = None
+        numpy.random.seed(7)
+        self.data = numpy.random.poisson(100., (9, 7, 40)).astype(numpy.float64)
+
+    def tearDown(self):
+        if self.path is not None:
+            shutil.rmtree(self.path)
+
+    def _getDataset(self, data, name="stack.h5"):
+        if self.path is None:
+            self.path = tempfile.mkdtemp()
+        fileName = os.path.join(self.path, name)
+        with h5py.File(fileName, "w") as h5:
+            h5.create_dataset("data", data=data, chunks=(2, 7, 40))
+        self._h5 = h5py.File(fileName, "r")
+        self.addCleanup(self._h5.close)
+        return self._h5["data"]
+
+    def testBlockSlices(self):
+        shape = (9, 7, 40)
+        for mcaIndex in [0, 1, -1]:
+            for blockBytes in [1, 400 * 8, 3 * 7 * 40 * 8, 10 ** 9]:
+                counts = numpy.zeros(shape, dtype=numpy.int64)
+                slices = StackOperations.getBlockSlices(shape, mcaIndex,
+                                                        8, blockBytes)
+                for blockSlices in slices:
+                    counts[blockSlices] += 1
+                    # complete spectra
+                    block = counts[blockSlices]
+                    self.assertEqual(block.shape[mcaIndex], shape[mcaIndex])
+                    nSpectra = block.size // shape[mcaIndex]
+                    self.assertTrue(nSpectra == 1 or \
+                                    nSpectra * shape[mcaIndex] * 8 <= \
+                                    blockBytes)
+                self.assertTrue(numpy.all(counts == 1))
+        # aligned on chunks
+        slices = StackOperations.getBlockSlices(shape, -1, 8, 5 * 7 * 40 * 8,
+                                                chunks=(2, 7, 40))
+        self.assertEqual([s[0].start for s in slices], [0, 4, 8])
+
+    def testCurveOperations(self):
+        curve = numpy.linspace(0.5, 2.0, 40)
+        curve[3] = 0.0
+        for mcaIndex in [0, 1, 2, -1]:
+            data = numpy.moveaxis(self.data, -1, mcaIndex).copy()
+            shape = [1, 1, 1]
+            shape[mcaIndex] = curve.size
+            reference = data / curve.reshape(shape)
+            index = [slice(None)] * 3
+            index[mcaIndex] = 3
+            reference[tuple(index)] = 0.0
+            for nthreads in [1, 3]:
+                work = data.copy()
+                output = StackOperations.curveOperation(work, curve,
+                                                        "divide",
+                                                        mcaIndex=mcaIndex,
+                                                        blockBytes=800,
+                                                        nthreads=nthreads)
+                # in place
+                self.assertTrue(output is work)
+                self.assertTrue(numpy.allclose(output, reference))
+            output = StackOperations.curveOperation(data.copy(), curve,
+                                                    "log",
+                                                    mcaIndex=mcaIndex,
+                                                    blockBytes=800)
+            reference[tuple(index)] = 1.0
+            reference = -numpy.log(reference)
+            self.assertTrue(numpy.allclose(output, reference))
+        output = StackOperations.curveOperation(self.data.copy(), 100.,
+                                                "log10", blockBytes=800)
+        self.assertTrue(numpy.allclose(output,
+                                       -numpy.log10(self.data / 100.)))
+        # subtraction with channels flagged as not valid
+        curve = numpy.arange(40.)
+        curve[:5] = numpy.nan
+        output = StackOperations.curveOperation(self.data.copy(), curve,
+                                                "subtract", blockBytes=800)
+        self.assertTrue(numpy.all(output[:, :, :5] == 0))
+        self.assertTrue(numpy.allclose(output[:, :, 5:],
+                                       self.data[:, :, 5:] - curve[5:]))
+        self.assertRaises(ValueError, StackOperations.curveOperation,
+                          self.data, curve[:10], "divide")
+        self.assertRaises(ValueError, StackOperations.curveOperation,
+                          self.data, curve, "unknown")
+
+    def testIntegerInPlace(self):
+        data = self.data.astype(numpy.int32)
+        image = numpy.arange(1., 64.).reshape(9, 7)
+        reference = data / image[:, :, None]
+        output = StackOperations.imageOperation(data, image, "divide",
+                                                blockBytes=300, nthreads=2)
+        # the memory of the data is reused
+        self.assertEqual(output.dtype, numpy.float32)
+        self.assertTrue(numpy.may_share_memory(output, data))
+        self.assertTrue(numpy.allclose(output, reference, rtol=1.0e-6))
+        # other integer types are processed into a new array
+        data = self.data.astype(numpy.uint16)
+        output = StackOperations.imageOperation(data, image, "divide")
+        self.assertFalse(numpy.may_share_memory(output, data))
+        self.assertTrue(numpy.allclose(output, reference, rtol=1.0e-6))
+
+    def testImageOperations(self):
+        image = numpy.random.random((9, 7)) + 0.5
+        image[2, 3] = 0.0
+        for mcaIndex in [0, 1, -1]:
+            data = numpy.moveaxis(self.data, -1, mcaIndex).copy()
+            operand = numpy.expand_dims(image, mcaIndex % 3)
+            reference = -numpy.log(data / numpy.where(operand == 0, 1, operand))
+            output = StackOperations.imageOperation(data, image.ravel(), "log",
+                                                    mcaIndex=mcaIndex,
+                                                    blockBytes=1000,
+                                                    nthreads=2)
+            index = [2, 3]
+            index.insert(mcaIndex % 3, slice(None))
+            reference[tuple(index)] = 0.0
+            self.assertTrue(numpy.allclose(output, reference))
+
+    @unittest.skipIf(not HAS_H5PY, "h5py not available")
+    def testDynamicStack(self):
+        dataset = self._getDataset(self.data)
+        curve = numpy.linspace(1.0, 2.0, 40)
+        output = StackOperations.curveOperation(dataset, curve, "divide",
+                                                blockBytes=2000, nthreads=2)
+        # written on disk, not in memory
+        self.assertTrue(isinstance(output, numpy.memmap))
+        self.assertTrue(numpy.allclose(output, self.data / curve))
+        # integer datasets get a float32 output on disk too
+        intDataset = self._getDataset(self.data.astype(numpy.uint16),
+                                      name="uint16.h5")
+        output = StackOperations.imageOperation(intDataset,
+                                                numpy.ones((9, 7)) * 2.,
+                                                "divide", blockBytes=2000)
+        self.assertTrue(isinstance(output, numpy.memmap))
+        self.assertEqual(output.dtype, numpy.float32)
+        self.assertTrue(numpy.allclose(output,
+                                       self.data.astype(numpy.uint16) / 2.))
+        output = None
+        # in memory stacks keep the in memory path
+        output = StackOperations.getOutput(self.data.astype(numpy.uint16))
+        self.assertFalse(isinstance(output, numpy.memmap))
+        self.assertEqual(output.dtype, numpy.float32)
+        self.assertRaises(ValueError, StackOperations.applyBlockwise,
+                          dataset, lambda *var: None,
+                          output=numpy.empty((2, 2)))
+        readOnly = self.data.copy()
+        readOnly.flags.writeable = False
+        self.assertRaises(TypeError, StackOperations.applyBlockwise,
+                          readOnly, lambda *var: None, dtype=numpy.float64)
+        # SNIP on the dynamic stack replaces the data of the stack object
+        stack = DummyStack(dataset, -1)
+        SNIPModule.subtractSnip1DBackgroundFromStack(stack, 10)
+        self.assertTrue(isinstance(stack.data, numpy.memmap))
+        reference = self.data.reshape(-1, 40).copy()
+        for spectrum in reference:
+            spectrum -= SNIPModule.getSpectrumBackground(spectrum, 10)
+        self.assertTrue(numpy.allclose(stack.data.reshape(-1, 40), reference,
+                                       rtol=1.0e-5))
+
+    def testSpectrumFunctions(self):
+        for mcaIndex in [0, -1]:
+            data = numpy.moveaxis(self.data, -1, mcaIndex).copy()
+            spectra = self.data.reshape(-1, 40)
+            # SNIP background in a ROI
+            stack = DummyStack(data.copy(), mcaIndex)
+            SNIPModule.replaceStackWithSnip1DBackground(stack, 8, 5, 30,
+                                                        nthreads=2)
+            result = numpy.moveaxis(stack.data, mcaIndex, -1).reshape(-1, 40)
+            for i in [0, 17, 62]:
+                reference = numpy.zeros(40)
+                reference[5:30] = SNIPModule.getSpectrumBackground(
+                                                    spectra[i, 5:30], 8)
+                self.assertTrue(numpy.allclose(result[i], reference))
+            # Savitzky-Golay
+            for order in [0, 1]:
+                stack = DummyStack(data.copy(), mcaIndex)
+                SGModule.replaceStackWithSavitzkyGolay(stack, 3, 2, order)
+                result = numpy.moveaxis(stack.data, mcaIndex,
+                                        -1).reshape(-1, 40)
+                coeff = SGModule.calc_coeff(3, 2, order)
+                for i in [0, 17, 62]:
+                    reference = spectra[i].copy()
+                    reference[3:-3] = numpy.convolve(spectra[i], coeff,
+                                                     mode="valid")
+                    if order:
+                        reference[:3] = reference[3]
+                        reference[-3:] = reference[-4]
+                    self.assertTrue(numpy.allclose(result[i], reference))
+
+
+def getSuite(auto=True):
+    testSuite = unittest.TestSuite()
+    if auto:
+        testSuite.addTest(\
+            unittest.TestLoader().loadTestsFromTestCase(testStackOperations))
+    else:
+        # use a predefined order
+        testSuite.addTest(testStackOperations("testBlockSlices"))
+        testSuite.addTest(testStackOperations("testCurveOperations"))
+        testSuite.addTest(testStackOperations("testIntegerInPlace"))
+        testSuite.addTest(testStackOperations("testImageOperations"))
+        testSuite.addTest(testStackOperations("testDynamicStack"))
+        testSuite.addTest(testStackOperations("testSpectrumFunctions"))
+    return testSuite
+
+def test(auto=False):
+    unittest.TextTestRunner(verbosity=2).run(getSuite(auto=auto))
+
+if __name__ == '__main__':
+    test()
@@ -67,6 +67,18 @@ def testShow(self):
         widget.show()
         self.qapp.processEvents()
 
+    def testAdvancedFitOnFirstUse(self):
+        widget = McaWindow.McaWindow()
+        self.assertFalse(widget.isAdvancedFitCreated())
+        widget.setAdvancedFitConfiguration(configDir="fitDir")
+        self.assertEqual(widget.getAdvancedFitConfiguration(),
+                         (None, "fitDir"))
+        self.assertFalse(widget.isAdvancedFitCreated())
+        advancedfit = widget.advancedfit
+        self.assertTrue(widget.isAdvancedFitCreated())
+        self.assertTrue(widget.advancedfit is advancedfit)
+        self.assertEqual(advancedfit.configDir, "fitDir")
+
 
 class TestMcaAdvancedFit(TestCaseQt):
     def setUp(self):
@@ -0,0 +1,154 @@
+#/*##########################################################################
+#
+# The PyMca X-Ray Fluorescence Toolkit
+#
+# Copyright (c) 2004-2026 European Synchrotron Radiation Facility
+#
+# This file is part of the PyMca X-ray Fluorescence Toolkit developed at
+# the ESRF by the Software group.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#############################################################################*/
+__author__ = "V. Armando Sole - ESRF Data Analysis"
+__contact__ = "sole@esrf.fr"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+import unittest
+import numpy
+
+
+class testXASClass(unittest.TestCase):
+    def setUp(self):
+        self.k = numpy.linspace(0.5, 16.0, 600)
+        self.mu = 1.0 + 0.05 * self.k - 0.001 * self.k ** 2 + \
+                  0.02 * numpy.sin(4.4 * self.k) * numpy.exp(-0.01 * self.k ** 2)
+
+    def testXASClassPolspl(self):
+        from PyMca5.PyMcaPhysics.xas import XASClass
+        npts = self.k.size
+        x = numpy.zeros(npts + 1)
+        y = numpy.zeros(npts + 1)
+        w = numpy.ones(npts + 1)
+        x[1:] = self.k
+        y[1:] = self.mu
+        xl = numpy.zeros(10)
+        xh = numpy.zeros(10)
+        nc = numpy.zeros(10, numpy.int32)
+        xl[1:4] = [0.5, 5.0, 10.0]
+        xh[1:4] = [5.0, 10.0, 16.0]
+        nc[1:4] = [4, 3, 4]
+        c = XASClass.polspl(x, y, w, npts, xl.copy(), xh.copy(), 3, nc)
+        if XASClass._XAS:
+            from PyMca5.PyMca import _xas
+            reference = _xas.polspl(x, y, w, npts, xl.copy(), xh.copy(), 3, nc)
+            self.assertTrue(numpy.allclose(c[:16], reference[:16],
+                                           rtol=1.0e-6, atol=1.0e-12))
+
+        # value and first derivative are continuous at the knots
+        coefficients = c[1:12]
+        starts = [0, 4, 7, 11]
+        for j, knot in enumerate([5.0, 10.0]):
+            left = coefficients[starts[j]:starts[j + 1]][::-1]
+            right = coefficients[starts[j + 1]:starts[j + 2]][::-1]
+            self.assertAlmostEqual(numpy.polyval(left, knot),
+                                   numpy.polyval(right, knot))
+            self.assertAlmostEqual(numpy.polyval(numpy.polyder(left), knot),
+                                   numpy.polyval(numpy.polyder(right), knot))
+
+    def testXASClassPostEdgeSpectra(self):
+        from PyMca5.PyMcaPhysics.xas import XASClass
+        spectra = numpy.array([self.mu * (1.0 + 0.1 * i) + 0.01 * i \
+                               for i in range(20)])
+        fit, xNodes, yNodes = XASClass.postEdgeSpectra(self.k, spectra,
+                                                       2.0, 16.0, (3, 3, 3),
+                                                       full=True)
+        self.assertEqual(fit.shape, spectra.shape)
+        self.assertEqual(yNodes.shape, (20, 2))
+        self.assertTrue(numpy.allclose(xNodes, [6.6666667, 11.333333]))
+        for i in [0, 7, 19]:
+            fit0, x0, y0 = XASClass.postEdge0(self.k, spectra[i], 2.0, 16.0,
+                                              (3, 3, 3), full=True)
+            self.assertTrue(numpy.allclose(fit0[:, 0], self.k))
+            self.assertTrue(numpy.allclose(fit0[:, 1], fit[i]))
+            self.assertTrue(numpy.allclose(y0, yNodes[i]))
+        # the fit follows the smooth background, not the oscillation
+        background = 1.0 + 0.05 * self.k - 0.001 * self.k ** 2
+        idx = self.k > 2.0
+        self.assertTrue(numpy.abs(fit[0][idx] - background[idx]).max() < 0.01)
+
+    def testXASClassFourierTransform(self):
+        from PyMca5.PyMcaPhysics.xas import XASClass
+        k = self.k
+        wrange = [2.0, 14.0]
+        w = XASClass.getFTWindowWeights(k, "Hanning", 1.0, wrange)
+        self.assertAlmostEqual(w[numpy.argmin(numpy.abs(k - 8.0))], 1.0)
+        idx = k <= 3.0
+        self.assertTrue(numpy.allclose(w[idx],
+                        0.5 * (1.0 - numpy.cos(numpy.pi * (k[idx] - 2.0)))))
+        w = XASClass.getFTWindowWeights(k, "Box", 1.0, wrange)
+        self.assertTrue(numpy.all(w[(k > 3.0) & (k < 13.0)] == 1.0))
+        self.assertTrue(numpy.all(w[k <= 3.0] == 0.0))
+
+        chi = numpy.array([numpy.sin(2 * (2.0 + 0.1 * i) * k) * \
+                           numpy.exp(-0.01 * k * k) for i in range(10)])
+        batch = XASClass.getFT(k, chi, krange=wrange, kweight=2,
+                               window="Hanning", apodization=1.0)
+        self.assertEqual(batch["FTIntensity"].shape,
+                         (10, batch["FTRadius"].size))
+        self.assertEqual(batch["Set"].shape, (10, batch["FTRadius"].size, 4))
+        for i in [0, 9]:
+            ddict = XASClass.getFT(k, chi[i], krange=wrange, kweight=2,
+                                   window="Hanning", apodization=1.0)
+            self.assertTrue(numpy.allclose(ddict["Set"], batch["Set"][i]))
+            signal = numpy.interp(ddict["InterpolatedK"], ddict["K"],
+                                  ddict["WindowWeight"] * chi[i][
+                                  (k >= wrange[0]) & (k <= wrange[1])] * \
+                                  ddict["K"] ** 2, left=0.0, right=0.0)
+            self.assertTrue(numpy.allclose(ddict["InterpolatedSignal"],
+                                           signal))
+            # the peak is at the distance of the oscillation
+            radius = ddict["FTRadius"][numpy.argmax(ddict["FTIntensity"])]
+            self.assertTrue(abs(radius - (2.0 + 0.1 * i)) < 0.1)
+
+        back = XASClass.getBackFT(batch["Set"], rmin=1.0, rmax=3.0,
+                                  krange=[2.0, 20.0])
+        self.assertEqual(back.ndim, 3)
+        self.assertEqual(back.shape[0], 10)
+        self.assertTrue(numpy.allclose(back[4],
+                        XASClass.getBackFT(batch["Set"][4], rmin=1.0,
+                                           rmax=3.0, krange=[2.0, 20.0])))
+
+def getSuite(auto=True):
+    testSuite = unittest.TestSuite()
+    if auto:
+        testSuite.addTest(\
+            unittest.TestLoader().loadTestsFromTestCase(testXASClass))
+    else:
+        # use a predefined order
+        testSuite.addTest(testXASClass("testXASClassPolspl"))
+        testSuite.addTest(testXASClass("testXASClassPostEdgeSpectra"))
+        testSuite.addTest(testXASClass("testXASClassFourierTransform"))
+    return testSuite
+
+def test(auto=False):
+    unittest.TextTestRunner(verbosity=2).run(getSuite(auto=auto))
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,221 @@
+#/*##########################################################################
+#
+# The PyMca X-Ray Fluorescence Toolkit
+#
+# Copyright (c) 2004-2020 European Synchrotron Radiation Facility
+#
+# This file is part of the PyMca X-ray Fluorescence Toolkit developed at
+# the ESRF by the Software group.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#############################################################################*/
+__author__ = "V. Armando Sole - ESRF Data Analysis"
+__contact__ = "sole@esrf.fr"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+import unittest
+import os
+import shutil
+import tempfile
+import numpy
+
+
+class testXiaCorrect(unittest.TestCase):
+    def setUp(self):
+        self._inputDir = tempfile.mkdtemp()
+        self._outputDir = tempfile.mkdtemp()
+        self._detectors = [0, 1, 3]
+        self._npoints = 20
+        self._nchannels = 64
+
+    def tearDown(self):
+        shutil.rmtree(self._inputDir, ignore_errors=True)
+        shutil.rmtree(self._outputDir, ignore_errors=True)
+
+    def _writeEdf(self, filename, header, data):
+        from PyMca5.PyMcaIO import EdfFile
+        edf = EdfFile.EdfFile(filename, access="wb")
+        edf.WriteImage(header, data, Append=0)
+        edf = None
+
+    def _writeScan(self, prefix):
+        from PyMca5.PyMcaCore import XiaEdf
+        ndet = len(self._detectors)
+        stat = numpy.zeros((self._npoints, ndet * XiaEdf.XiaStatNb),
+                           numpy.int32)
+        for i, det in enumerate(self._detectors):
+            offset = i * XiaEdf.XiaStatNb
+            points = numpy.arange(self._npoints)
+            stat[:, offset + XiaEdf.XiaStatIndex["det"]] = det
+            stat[:, offset + XiaEdf.XiaStatIndex["icr"]] = 1000 + 37 * points
+            stat[:, offset + XiaEdf.XiaStatIndex["ocr"]] = 800 + \
+                                                           (i + 1) * points
+            stat[:, offset + XiaEdf.XiaStatIndex["lt"]] = 900 + 11 * points
+        # invalid points in the middle, at the borders and in a row
+        offset = 0
+        stat[3, offset + XiaEdf.XiaStatIndex["ocr"]] = 0
+        stat[0, offset + XiaEdf.XiaStatIndex["lt"]] = 0
+        offset = XiaEdf.XiaStatNb
+        stat[7:9, offset + XiaEdf.XiaStatIndex["icr"]] = 0
+        stat[-1, offset + XiaEdf.XiaStatIndex["lt"]] = 0
+        header = {"xnb": ndet,
+                  "xdet": " ".join(["%d" % det for det in self._detectors])}
+        self._writeEdf(os.path.join(self._inputDir,
+                                    "%s_xiast_0000_0000.edf" % prefix),
+                       header, stat)
+        spectra = {}
+        for i, det in enumerate(self._detectors):
+            data = numpy.arange(self._npoints * self._nchannels,
+                                dtype=numpy.int32)
+            data.shape = self._npoints, self._nchannels
+            data = data % 97 + i
+            spectra[det] = data
+            self._writeEdf(os.path.join(self._inputDir,
+                                "%s_xia%02d_0000_0000.edf" % (prefix, det)),
+                           {"xdet": det}, data)
+        return stat, spectra
+
+    def _referenceFactor(self, stat, idx, deadtime, livetime):
+        # point by point correction as done by former versions
+        from PyMca5.PyMcaCore import XiaEdf
+        pts = stat.shape[0]
+        offset = idx * XiaEdf.XiaStatNb
+        factor = numpy.ones((pts,), numpy.float64)
+        if livetime:
+            lvt = stat[:, offset + XiaEdf.XiaStatIndex["lt"]] / 1000.
+            check = lvt > 0
+            for ipt in range(pts):
+                if not check[ipt]:
+                    if ipt != 0 and check[ipt - 1] and \
+                       ipt != pts - 1 and check[ipt + 1]:
+                        lvt[ipt] = (lvt[ipt + 1] + lvt[ipt - 1]) / 2.
+                    elif ipt != 0 and check[ipt - 1]:
+                        lvt[ipt] = lvt[ipt - 1]
+                    elif ipt != pts - 1 and check[ipt + 1]:
+                        lvt[ipt] = lvt[ipt + 1]
+                    else:
+                        lvt[ipt] = 1.
+            factor /= lvt
+        if deadtime:
+            count = numpy.zeros((pts, 2), numpy.float64)
+            count[:, 0] = stat[:, offset + XiaEdf.XiaStatIndex["ocr"]]
+            count[:, 1] = stat[:, offset + XiaEdf.XiaStatIndex["icr"]]
+            check = numpy.sum(count > 0, 1)
+            for ipt in range(pts):
+                if check[ipt] != 2:
+                    if ipt != 0 and check[ipt - 1] == 2 and \
+                       ipt != pts - 1 and check[ipt + 1] == 2:
+                        count[ipt] = (count[ipt - 1] + count[ipt + 1]) / 2.
+                    elif ipt != 0 and check[ipt - 1] == 2:
+                        count[ipt] = count[ipt - 1]
+                    elif ipt != pts - 1 and check[ipt + 1] == 2:
+                        count[ipt] = count[ipt + 1]
+                    else:
+                        count[ipt] = -1
+            for ipt in range(pts):
+                if count[ipt, 0] > 0 and count[ipt, 1] > 0:
+                    factor[ipt] *= count[ipt, 1] / count[ipt, 0]
+        return factor
+
+    def testXiaEdfScanCorrection(self):
+        from PyMca5.PyMcaCore import XiaEdf
+        stat, spectra = self._writeScan("scan")
+        statFile = os.path.join(self._inputDir, "scan_xiast_0000_0000.edf")
+        detFiles = [os.path.join(self._inputDir,
+                                 "scan_xia%02d_0000_0000.edf" % det)
+                    for det in self._detectors]
+        for deadtime, livetime in [(1, 0), (0, 1), (1, 1)]:
+            for dtype in [None, numpy.float32]:
+                xia = XiaEdf.XiaEdfScanFile(statFile, detFiles)
+                for idx, det in enumerate(self._detectors):
+                    message = xia.correct(det, deadtime, livetime, dtype)
+                    expected = spectra[det] * \
+                        self._referenceFactor(stat, idx, deadtime,
+                                              livetime)[:, None]
+                    if dtype is None:
+                        self.assertEqual(xia.data.dtype, numpy.float64)
+                        self.assertTrue(numpy.allclose(xia.data, expected,
+                                                       rtol=1.0e-12))
+                    else:
+                        self.assertEqual(xia.data.dtype, numpy.float32)
+                        self.assertTrue(numpy.allclose(xia.data, expected,
+                                                       rtol=1.0e-6))
+                    if det == 3:
+                        self.assertEqual(message, [])
+                    elif det == 1 and deadtime:
+                        self.assertTrue("[7-8]" in message[-1])
+                    self.assertEqual(int(xia.header["xcorr"]),
+                                     deadtime + 2 * livetime)
+                    self.assertRaises(XiaEdf.XiaEdfError, xia.correct,
+                                      det, deadtime, livetime)
+
+    def testXiaCorrectFiles(self):
+        from PyMca5.PyMcaCore import XiaCorrect
+        from PyMca5.PyMcaCore import XiaEdf
+        from PyMca5.PyMcaIO import EdfFile
+        stats = {}
+        for prefix in ["first", "second", "third"]:
+            stats[prefix] = self._writeScan(prefix)
+        filelist = [os.path.join(self._inputDir, name)
+                    for name in os.listdir(self._inputDir)]
+        messages = []
+        def log_cb(message, *var):
+            messages.append(message)
+        results = {}
+        for nthreads in [1, 3]:
+            outdir = os.path.join(self._outputDir, "out%d" % nthreads)
+            os.mkdir(outdir)
+            groups = XiaCorrect.parseFiles(filelist, log_cb=log_cb)
+            self.assertEqual(len(groups), 3)
+            XiaCorrect.correctFiles(groups, deadtime=1, livetime=1,
+                                    outdir=outdir, nthreads=nthreads,
+                                    log_cb=log_cb, error_cb=log_cb)
+            results[nthreads] = [str(msg).replace(outdir, "")
+                                 for msg in messages]
+            del messages[:]
+            for prefix in stats:
+                stat, spectra = stats[prefix]
+                for idx, det in enumerate(self._detectors):
+                    name = os.path.join(outdir,
+                            "%s_corr_xia%02d_0000_0000.edf" % (prefix, det))
+                    data = EdfFile.EdfFile(name, access="rb").GetData(0)
+                    expected = spectra[det] * \
+                        self._referenceFactor(stat, idx, 1, 1)[:, None]
+                    self.assertTrue(numpy.allclose(data, expected))
+        # same messages in the same order
+        self.assertEqual(results[1][:-3], results[3][:-3])
+
+
+def getSuite(auto=True):
+    testSuite = unittest.TestSuite()
+    if auto:
+        testSuite.addTest(\
+            unittest.TestLoader().loadTestsFromTestCase(testXiaCorrect))
+    else:
+        # use a predefined order
+        testSuite.addTest(testXiaCorrect("testXiaEdfScanCorrection"))
+        testSuite.addTest(testXiaCorrect("testXiaCorrectFiles"))
+    return testSuite
+
+def test(auto=False):
+    unittest.TextTestRunner(verbosity=2).run(getSuite(auto=auto))
+
+if __name__ == '__main__':
+    test()
@@ -546,6 +546,58 @@ def testStainlessSteelDataFit(self):
                 "Strategy: Element %s discrepancy too large %.1f %%" % \
                   (element.split()[0], delta))
 
+    def testMcaTheoryCache(self):
+        import shutil
+        import tempfile
+        from PyMca5.PyMcaPhysics.xrf import ClassMcaTheory
+        from PyMca5.PyMcaPhysics.xrf import McaTheoryCache
+        from PyMca5.PyMcaIO import ConfigDict
+        configuration = ConfigDict.ConfigDict()
+        configuration.readfp(StringIO(cfg))
+
+        def configure(counter):
+            # the instantiation itself configures with the defaults
+            mcaFit = ClassMcaTheory.ClassMcaTheory()
+            before = McaTheoryCache.getStatistics()[counter]
+            mcaFit.configure(configuration)
+            self.assertEqual(McaTheoryCache.getStatistics()[counter],
+                             before + 1)
+            return mcaFit
+
+        tmpDir = tempfile.mkdtemp()
+        try:
+            McaTheoryCache.clear()
+            reference = configure("misses")
+            cached = configure("hits")
+            McaTheoryCache.setCacheDirectory(tmpDir)
+            McaTheoryCache.clear()
+            configure("misses")
+            McaTheoryCache.clear()
+            fromDisk = configure("disk hits")
+            for mcaFit in [cached, fromDisk]:
+                self.assertEqual(mcaFit.PARAMETERS, reference.PARAMETERS)
+                self.assertEqual(mcaFit.PEAKS0NAMES, reference.PEAKS0NAMES)
+                self.assertEqual(mcaFit.NGLOBAL, reference.NGLOBAL)
+                self.assertEqual(repr(mcaFit.PEAKS0), repr(reference.PEAKS0))
+                self.assertEqual(repr(mcaFit.PEAKS0ESCAPE),
+                                 repr(reference.PEAKS0ESCAPE))
+                self.assertEqual(repr(mcaFit._fluoRates),
+                                 repr(reference._fluoRates))
+                # instances do not share the work arrays
+                self.assertTrue(mcaFit.PEAKSW[0] is not reference.PEAKSW[0])
+
+            # a physics relevant change gives a different key
+            key = McaTheoryCache.getKey(configuration)
+            configuration["detector"]["detele"] = "Ge"
+            self.assertNotEqual(key, McaTheoryCache.getKey(configuration))
+            configuration["detector"]["detele"] = "Si"
+            configuration["fit"]["xmax"] += 10
+            self.assertEqual(key, McaTheoryCache.getKey(configuration))
+        finally:
+            McaTheoryCache.setCacheDirectory(None)
+            McaTheoryCache.clear()
+            shutil.rmtree(tmpDir, ignore_errors=True)
+
 def getSuite(auto=True):
     testSuite = unittest.TestSuite()
     if auto:
@@ -556,6 +608,7 @@ def getSuite(auto=True):
         testSuite.addTest(testXrf("testTrainingDataFilePresence"))
         testSuite.addTest(testXrf("testTrainingDataFit"))
         testSuite.addTest(testXrf("testStainlessSteelDataFit"))
+        testSuite.addTest(testXrf("testMcaTheoryCache"))
     return testSuite
 
 def test(auto=False):
@@ -37,6 +37,7 @@
 from PyMca5.tests.EdfFileTest import test as testEdfFile
 from PyMca5.tests.ElementsTest import test as testElements
 from PyMca5.tests.GefitTest import test as testGefit
+from PyMca5.tests.SimpleFitTest import test as testSimpleFit
 from PyMca5.tests.PCAToolsTest import test as testPCATools
 from PyMca5.tests.SpecfileTest import test as testSpecfile
 from PyMca5.tests.specfilewrapperTest import test as testSpecfilewrapper
@@ -44,3 +45,14 @@
 from PyMca5.tests.McaStackViewTest import test as testMcaStackView
 from PyMca5.tests.NexusUtilsTest import test as testNexusUtils
 from PyMca5.tests.StackInfoTest import test as testStackInfo
+from PyMca5.tests.BenchmarkTest import test as testBenchmark
+from PyMca5.tests.XiaCorrectTest import test as testXiaCorrect
+from PyMca5.tests.HDF5ChunkWriterTest import test as testHDF5ChunkWriter
+from PyMca5.tests.SpsDataSourceTest import test as testSpsDataSource
+from PyMca5.tests.Object3DIsosurfaceTest import test as testObject3DIsosurface
+from PyMca5.tests.MedianFilterTest import test as testMedianFilter
+from PyMca5.tests.CurveAlignmentTest import test as testCurveAlignment
+from PyMca5.tests.ScanGriddingTest import test as testScanGridding
+from PyMca5.tests.StackOperationsTest import test as testStackOperations
+from PyMca5.tests.XASClassTest import test as testXASClass
+from PyMca5.tests.PluginLoaderTest import test as testPluginLoader
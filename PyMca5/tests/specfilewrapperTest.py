@@ -34,6 +34,7 @@
 import sys
 import os
 import gc
+import shutil
 import tempfile
 
 class testSpecfilewrapper(unittest.TestCase):
@@ -159,6 +160,164 @@ def testTrainingSpectrumReading(self):
         mca = self._scan.mca(1)
         self.assertTrue(numpy.alltrue(datacol == mca))
 
+    def testSpecfilewrapperIndexCache(self):
+        from PyMca5.PyMcaIO import SpecFileIndexCache
+        from PyMca5.PyMcaCore import SpecFileDataSource
+        cacheDir = tempfile.mkdtemp()
+        specName = os.path.join(cacheDir, "indexed.dat")
+        def writeScans(first, last, mode):
+            with open(specName, mode) as f:
+                if mode == "w":
+                    f.write("#F %s\n#D today\n\n" % specName)
+                for i in range(first, last + 1):
+                    f.write("#S %d ascan\n#N 2\n#L x  y\n" % i)
+                    f.write("1 %d\n2 %d\n\n" % (i, 2 * i))
+        try:
+            SpecFileIndexCache.setCacheDirectory(cacheDir)
+            writeScans(1, 5, "w")
+            indexName = SpecFileIndexCache.getIndexFileName(specName)
+            self._sf = self.specfileClass.Specfile(specName)
+            self.assertEqual(self._sf.scanno(), 5)
+            self._sf = None
+            gc.collect()
+            self.assertTrue(os.path.exists(indexName),
+                            "SPEC file index not written")
+
+            # reading from the index
+            self._sf = self.specfileClass.Specfile(specName)
+            self.assertEqual(self._sf.list(), "1:5")
+            self.assertEqual(self._sf.select("5.1").data()[1, 1], 10)
+            self._sf = None
+            gc.collect()
+
+            # appended scans
+            writeScans(6, 8, "a")
+            self._sf = self.specfileClass.Specfile(specName)
+            self.assertEqual(self._sf.scanno(), 8)
+            self.assertEqual(self._sf.select("8.1").data()[1, 1], 16)
+            self._sf = None
+            gc.collect()
+
+            # earlier scans rewritten in place, same size and larger size
+            with open(specName, "r") as f:
+                text = f.read()
+            size = len(text)
+            text = text.replace("1 3\n", "1 30\n")
+            text = text.replace("#S 4 ascan", "#S 4 scan")
+            self.assertEqual(len(text), size)
+            with open(specName, "w") as f:
+                f.write(text)
+            mtime = os.path.getmtime(specName) + 10
+            os.utime(specName, (mtime, mtime))
+            self._sf = self.specfileClass.Specfile(specName)
+            self.assertEqual(self._sf.scanno(), 8)
+            self.assertEqual(self._sf.select("3.1").data()[1, 0], 30)
+            self.assertEqual(self._sf.select("4.1").data()[1, 1], 8)
+            self.assertEqual(self._sf.select("4.1").command(), "scan")
+            self._sf = None
+            gc.collect()
+            text = text.replace("1 5\n", "1 500\n")
+            with open(specName, "w") as f:
+                f.write(text)
+            self._sf = self.specfileClass.Specfile(specName)
+            self.assertEqual(self._sf.select("5.1").data()[1, 0], 500)
+            self.assertEqual(self._sf.select("6.1").data()[1, 1], 12)
+            self._sf = None
+            gc.collect()
+
+            # rewritten shorter file
+            writeScans(1, 2, "w")
+            source = SpecFileDataSource.SpecFileDataSource(specName)
+            self.assertEqual(source.getSourceInfo()["KeyList"],
+                             ["1.1", "2.1"])
+            writeScans(3, 4, "a")
+            source.refresh()
+            self.assertEqual(source.getSourceInfo()["KeyList"],
+                             ["1.1", "2.1", "3.1", "4.1"])
+            writeScans(1, 1, "w")
+            source.refresh()
+            self.assertEqual(source.getSourceInfo()["KeyList"], ["1.1"])
+            source = None
+            gc.collect()
+
+            # parsers of other formats are cached while the file is the same
+            self._sf = self.specfileClass.Specfile(self.fname)
+            self._sf = self.specfileClass.Specfile(self.fname)
+            self.assertEqual(self._sf.__class__.__name__, "specfilewrapper")
+            self.assertEqual(self._sf[0].datacol(2)[1], 2.5)
+            self.assertTrue(SpecFileIndexCache.loadParser(self.fname) \
+                            is not None)
+            # parsers pickled with another format are not used
+            SpecFileIndexCache.PARSER_FORMAT_VERSION += 1
+            try:
+                self.assertTrue(SpecFileIndexCache.loadParser(self.fname) \
+                                is None)
+            finally:
+                SpecFileIndexCache.PARSER_FORMAT_VERSION -= 1
+            self.assertTrue(SpecFileIndexCache.loadParser(self.fname) \
+                            is not None)
+            with open(self.fname, "a") as f:
+                f.write("4.9  16  64\n")
+            self.assertTrue(SpecFileIndexCache.loadParser(self.fname) is None)
+            self._sf = self.specfileClass.Specfile(self.fname)
+            self.assertEqual(self._sf[0].lines(), 4)
+        finally:
+            self._sf = None
+            gc.collect()
+            SpecFileIndexCache.setCacheDirectory(None)
+            shutil.rmtree(cacheDir, ignore_errors=True)
+
+    def testSpecFileDataSourceRefresh(self):
+        from PyMca5.PyMcaCore import SpecFileDataSource
+        tmpDir = tempfile.mkdtemp()
+        specName = os.path.join(tmpDir, "refreshed.dat")
+        def writeScans(first, last, mode):
+            with open(specName, mode) as f:
+                if mode == "w":
+                    f.write("#F %s\n#D today\n\n" % specName)
+                for i in range(first, last + 1):
+                    f.write("#S %d ascan\n#N 2\n#L x  y\n" % i)
+                    f.write("1 %d\n2 %d\n\n" % (i, 2 * i))
+        source = None
+        try:
+            writeScans(1, 5, "w")
+            source = SpecFileDataSource.SpecFileDataSource(specName)
+            self.assertEqual(source.getDataObject("3.1").data[0, 1], 3)
+
+            # appended scans
+            writeScans(6, 6, "a")
+            source.refresh()
+            self.assertEqual(len(source.getSourceInfo()["KeyList"]), 6)
+            self.assertEqual(source.getDataObject("6.1").data[1, 1], 12)
+
+            # earlier scan rewritten in place, same size
+            with open(specName, "r") as f:
+                text = f.read()
+            size = len(text)
+            text = text.replace("1 3\n", "1 7\n")
+            self.assertEqual(len(text), size)
+            with open(specName, "w") as f:
+                f.write(text)
+            mtime = os.path.getmtime(specName) + 10
+            os.utime(specName, (mtime, mtime))
+            source.refresh()
+            self.assertEqual(source.getDataObject("3.1").data[0, 1], 7)
+
+            # earlier scan rewritten in place, larger size
+            text = text.replace("1 7\n", "1 3000\n")
+            with open(specName, "w") as f:
+                f.write(text)
+            writeScans(7, 7, "a")
+            source.refresh()
+            self.assertEqual(len(source.getSourceInfo()["KeyList"]), 7)
+            self.assertEqual(source.getDataObject("3.1").data[0, 1], 3000)
+            self.assertEqual(source.getDataObject("5.1").data[1, 1], 10)
+            self.assertEqual(source.getDataObject("7.1").data[1, 1], 14)
+        finally:
+            source = None
+            gc.collect()
+            shutil.rmtree(tmpDir, ignore_errors=True)
+
 def getSuite(auto=True):
     testSuite = unittest.TestSuite()
     if auto:
@@ -172,6 +331,8 @@ def getSuite(auto=True):
             testSpecfilewrapper(\
                 "testSpecfilewrapperReadingCompatibleWithUserLocale"))
         testSuite.addTest(testSpecfilewrapper("testTrainingSpectrumReading"))
+        testSuite.addTest(testSpecfilewrapper("testSpecfilewrapperIndexCache"))
+        testSuite.addTest(testSpecfilewrapper("testSpecFileDataSourceRefresh"))
     return testSuite
 
 def test(auto=False):
@@ -165,6 +165,7 @@ def use_gui():
 
 
 packages = ['PyMca5', 'PyMca5.PyMcaPlugins', 'PyMca5.tests',
+            'PyMca5.benchmarks',
             'PyMca5.PyMca',
             'PyMca5.PyMcaCore',
             'PyMca5.PyMcaPhysics',
@@ -361,6 +362,16 @@ def build_Object3DCTools(ext_modules):
     ext_modules.append(module)
 
 
+def build_Object3DMarchingCubes(ext_modules):
+    # no OpenGL involved, it can be used to compute meshes off-screen
+    module = Extension(name='PyMca5.Object3D.Object3DMarchingCubes',
+                       sources=glob.glob('PyMca5/Object3D/Object3DMarchingCubes/*.c'),
+                       define_macros=define_macros,
+                       include_dirs=[numpy.get_include(),
+                                     'PyMca5/Object3D/Object3DCTools'])
+    ext_modules.append(module)
+
+
 def build_Object3DQhull(extensions):
     libraries = []
     sources = ["PyMca5/Object3D/Object3DQhull/Object3DQhull.c"]
@@ -511,6 +522,7 @@ def build_xas_xas(ext_modules):
 build_PyMcaIOHelper(ext_modules)
 
 build_Object3DCTools(ext_modules)
+build_Object3DMarchingCubes(ext_modules)
 build_Object3DQhull(ext_modules)
 
 build_PyMcaSciPy(ext_modules)